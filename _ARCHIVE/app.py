@@ -6,6 +6,16 @@ from tkinter import ttk
 from PIL import Image, ImageTk
 import time
 import datetime
+import sys
+import queue
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from status_server import fetch_status, format_scan, status_settings
+    STATUS_SETTINGS = status_settings()
+except ImportError:
+    fetch_status = None
 
 
 entry = None
@@ -19,6 +29,11 @@ button_additional_commands = None
 button_resubmit_scan = None
 progressbar = None
 status_label = None
+live_status_label = None
+
+STATUS_POLL_MS = 1000
+status_results = queue.Queue()  # (scan_id, status) from the fetch thread, read on the Tk thread
+status_fetching = False
 
 
 def load_image(scan_id):
@@ -193,6 +208,28 @@ def on_resubmit_scan_finish(start_time):
     status_label.config(text=f"Additional commands finished in {time.time() - start_time:.2f}s", fg="green")
     enable_buttons()
 
+def fetch_status_in_background(scan_id):
+    # Runs off the Tk thread so a slow or absent status server never freezes the window
+    status = fetch_status(scan_id, STATUS_SETTINGS['host'], STATUS_SETTINGS['port'], timeout=0.3)
+    status_results.put((scan_id, status))
+
+def poll_status():
+    # Live step/progress of the entered scan from the status server (blank when none runs)
+    global status_fetching
+    scan_id = entry.get().strip()
+    try:
+        fetched_id, status = status_results.get_nowait()
+        status_fetching = False
+        live_status_label.config(text=format_scan(status) if status and fetched_id == scan_id else "")
+    except queue.Empty:
+        pass
+    if not scan_id:
+        live_status_label.config(text="")
+    elif fetch_status and not status_fetching:
+        status_fetching = True
+        threading.Thread(target=fetch_status_in_background, args=(scan_id,), daemon=True).start()
+    root.after(STATUS_POLL_MS, poll_status)
+
 def main():
     global root
     global entry
@@ -206,6 +243,7 @@ def main():
     global button_resubmit_scan
     global progressbar
     global status_label
+    global live_status_label
 
     root = tk.Tk()
     root.title("Scan ID Image Viewer")
@@ -247,6 +285,10 @@ def main():
     status_label = tk.Label(frame, text="")
     status_label.grid(row=8, column=0, columnspan=2)
 
+    live_status_label = tk.Label(frame, text="")
+    live_status_label.grid(row=9, column=0, columnspan=2)
+    root.after(STATUS_POLL_MS, poll_status)
+
     root.mainloop()
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import os
+import sys
 import bpy
 import math
 import numpy
@@ -7,6 +8,10 @@ from typing import NamedTuple
 from mathutils import Vector
 from dataclasses import dataclass
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pipeline_log
+import pipeline_timeline
+
 
 print('\n▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
 print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
@@ -40,29 +45,8 @@ def get_args():
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ DEBUG UTILS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 
-def print_decorated(message, symbol="▬", padding=0):
-    border = symbol * (len(message) + padding)
-    decorated_message = f"\n{message}\n{border}"
-    print(decorated_message)
-
-
-def print_enhanced(text, text_color="white", label="", label_color="white", prefix="", suffix=""):
-    color_code = {
-        'black': '\033[30m',
-        'red': '\033[31m',
-        'green': '\033[32m',
-        'yellow': '\033[33m',
-        'blue': '\033[34m',
-        'magenta': '\033[35m',
-        'cyan': '\033[36m',
-        'white': '\033[37m',
-        'reset': '\033[0m'
-    }
-
-    if label == "":
-        return print(f"{prefix}{color_code[text_color]}{text}{color_code['reset']}{suffix}")
-    
-    print(f"{prefix}[{color_code[label_color]}{label}{color_code['reset']}] {color_code[text_color]}{text}{color_code['reset']}{suffix}")
+log = pipeline_log.get_logger("add_rig")
+print_decorated, print_enhanced = pipeline_log.print_helpers(log)
 
 
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
@@ -468,8 +452,9 @@ def get_body_parts_from_keypoints(results_filepath):
         body_part = BodyPart(name.lower(), point_mid=Point(float(x), 0.0, float(z)), point_front=Point(0,0,0), point_back=Point(0,0,0))
         body_parts.append(body_part)
 
+    print_enhanced(f"{len(body_parts)} body parts", label="KEYPOINTS", label_color="cyan")
     for part in body_parts:
-        print_enhanced(f"{part.point_mid}", label=f"{part.name}", label_color="cyan")
+        log.debug("%s: %s", part.name, part.point_mid)
 
     return body_parts
 
@@ -722,9 +707,9 @@ def update_body_parts_data(scan_obj, body_parts:BodyPart):
             continue
         body_parts.append(BodyPart(f"right_forearm{i-1}_mid", Point(*forearm_location), point_zero, point_zero))
 
-    print_enhanced(f"Updated Body Parts", label=f"INFO", label_color="yellow", prefix="\n")
+    print_enhanced(f"Updated Body Parts: {len(body_parts)}", label=f"INFO", label_color="yellow", prefix="\n")
     for part in body_parts:
-        print_enhanced(f"{part.point_mid}", label=f"{part.name}", label_color="green")
+        log.debug("%s: %s", part.name, part.point_mid)
 
     return body_parts
 
@@ -1113,38 +1098,10 @@ keypoints_to_ignore = [
     ]
 
 
-def main():
-    print_decorated("MAIN VARIABLES")
-    args = get_args()
-    scan = str(args.scan)
-    path = str(args.path)
-    software_path = str(args.software)
-    use_clean_start = int(args.clean_start)
-
-    results_filepath = os.path.join(path, scan, "photogrammetry", f"{scan}_results.txt")
-    scan_obj_filepath = os.path.join(path, scan, "photogrammetry", f"{scan}.blend")
-    armature_filepath = os.path.join(software_path, "skeleton_template.blend")
-
-    print_enhanced(path, label="PATH", label_color="cyan", prefix="\n")
-    print_enhanced(scan, label="SCAN", label_color="cyan")
-    print_enhanced(software_path, label="SOFTWARE", label_color="cyan")
-    print_enhanced(use_clean_start, label="USE CLEAN START", label_color="cyan")
-
-    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MAIN STEPS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-    print_decorated("MAIN STEPS")
-
-    if use_clean_start:
-        scene_clean_start()
+def rig_scan_object(scan_obj, results_filepath, armature_filepath, timeline=None):
+    """snaps the template armature to the pose landmarks and binds scan_obj to it; leaves the "rig" and keypoints collections in the scene"""
+    timeline = timeline or pipeline_timeline.NullTimeline()
 
-    # APPEND SCAN OBJECT
-    print_decorated("APPEND SCAN OBJECT")
-    scan_obj = append_scan_object(scan_obj_filepath)
-    if scan_obj is None:
-        print_enhanced("scan_obj is None", text_color="red", label="ERROR", label_color="red")
-        return
-    
     # FETCH AND UPDATE BODY PARTS
     print_decorated("FETCH AND UPDATE BODY PARTS")
     body_parts = get_body_parts_from_keypoints(results_filepath)
@@ -1171,7 +1128,8 @@ def main():
     print_decorated("RIGGING")
     armature = append_armature(armature_filepath)
     snap_bones(armature, body_parts_updated)
-    scan_obj_rigging(scan_obj, armature)
+    with timeline.span("automatic_weights"):
+        scan_obj_rigging(scan_obj, armature)
     object_add_corrective_smooth_modifier(scan_obj)
 
     # ORGANIZING
@@ -1187,11 +1145,51 @@ def main():
         for keypoint in keypoints_front:
             move_object_to_collection(keypoint, "keypoints_front")
 
+    return armature
+
+
+def main():
+    print_decorated("MAIN VARIABLES")
+    args = get_args()
+    scan = str(args.scan)
+    path = str(args.path)
+    software_path = str(args.software)
+    use_clean_start = int(args.clean_start)
+    pipeline_log.for_scan(path, scan, step="add_rig")
+
+    results_filepath = os.path.join(path, scan, "photogrammetry", f"{scan}_results.txt")
+    scan_obj_filepath = os.path.join(path, scan, "photogrammetry", f"{scan}.blend")
+    armature_filepath = os.path.join(software_path, "skeleton_template.blend")
+
+    print_enhanced(path, label="PATH", label_color="cyan", prefix="\n")
+    print_enhanced(scan, label="SCAN", label_color="cyan")
+    print_enhanced(software_path, label="SOFTWARE", label_color="cyan")
+    print_enhanced(use_clean_start, label="USE CLEAN START", label_color="cyan")
+
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MAIN STEPS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+    print_decorated("MAIN STEPS")
+
+    if use_clean_start:
+        scene_clean_start()
+
+    # APPEND SCAN OBJECT
+    print_decorated("APPEND SCAN OBJECT")
+    scan_obj = append_scan_object(scan_obj_filepath)
+    if scan_obj is None:
+        print_enhanced("scan_obj is None", text_color="red", label="ERROR", label_color="red")
+        return
+    
+    timeline = pipeline_timeline.for_scan(path, scan, step="add_rig")
+    rig_scan_object(scan_obj, results_filepath, armature_filepath, timeline)
+
     # SAVING
     print_decorated("SAVING")
     pack_textures()
     output_filepath = os.path.join(path, scan, "photogrammetry", f"{scan}-rig.blend")
-    save_as(output_filepath)
+    with timeline.span("save"):
+        save_as(output_filepath)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Per-step artifact manifests for crash-resumable pipeline runs.
+
+After a step succeeds, a manifest is written to photogrammetry/.manifests/<step>.json.
+It lists every output and input (size, mtime, sha256), the version (hash) of each
+producing script and the step duration. A step's manifest is removed before the step
+runs, so a crash or reboot in the middle of a step always leaves that step incomplete.
+
+Verification is cheap: a file whose size and mtime match the manifest is trusted; only
+files whose mtime changed are re-hashed (or every file with --deep).
+
+Usage:
+    python3 artifact_manifest.py resume --takes /takes --scan X       # prints the first incomplete step (1-5, 6 = done)
+    python3 artifact_manifest.py verify --takes /takes --scan X --step cleanup
+    python3 artifact_manifest.py record --takes /takes --scan X --step cleanup --duration 9.2
+    python3 artifact_manifest.py clear --takes /takes --scan X --step cleanup
+    python3 artifact_manifest.py show --takes /takes --scan X
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+MANIFEST_DIRNAME = '.manifests'
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ ENTRIES ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def sha256_file(path) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def directory_listing(path) -> Dict:
+    """Cheap fingerprint of a directory: names, sizes and mtimes of every visible file."""
+    sha = hashlib.sha256()
+    count = 0
+    total = 0
+    root = Path(path)
+    for file_path in sorted(p for p in root.rglob('*') if p.is_file() and not p.name.startswith('.')):
+        stat = file_path.stat()
+        sha.update(f"{file_path.relative_to(root)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+        count += 1
+        total += stat.st_size
+    return {'type': 'dir', 'files': count, 'size': total, 'listing': sha.hexdigest()}
+
+
+def describe(path, previous: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Manifest entry for a file or directory, None if it does not exist.
+
+    Args:
+        path: File or directory
+        previous: Earlier entry for the same path; its hash is reused when size and mtime match
+    """
+    path = Path(path)
+    if path.is_dir():
+        return directory_listing(path)
+    if not path.is_file():
+        return None
+    stat = path.stat()
+    if (previous and previous.get('type') == 'file' and previous.get('size') == stat.st_size
+            and previous.get('mtime_ns') == stat.st_mtime_ns):
+        return dict(previous)
+    return {'type': 'file', 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256_file(path)}
+
+
+def entry_matches(path, entry: Dict, deep=False) -> Tuple[bool, str]:
+    """Compare a path against its manifest entry. Returns (matches, reason)."""
+    path = Path(path)
+    if entry.get('type') == 'dir':
+        if not path.is_dir():
+            return False, 'missing'
+        if directory_listing(path) != entry:
+            return False, 'changed'
+        return True, ''
+
+    try:
+        stat = path.stat()
+    except OSError:
+        return False, 'missing'
+    if stat.st_size != entry.get('size'):
+        return False, 'size changed'
+    if stat.st_mtime_ns == entry.get('mtime_ns') and not deep:
+        return True, ''
+    # touched or copied: only the content decides
+    if sha256_file(path) != entry.get('sha256'):
+        return False, 'content changed'
+    return True, ''
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MANIFESTS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+@dataclass
+class ArtifactManifest:
+    """What a completed step produced and what it was produced from (paths relative to the scan/scripts dir)."""
+    step: str
+    scan_id: str
+    outputs: Dict[str, Dict] = field(default_factory=dict)
+    inputs: Dict[str, Dict] = field(default_factory=dict)
+    scripts: Dict[str, Dict] = field(default_factory=dict)
+    duration: float = 0.0
+    created_at: str = ''
+    host: str = ''
+    version: int = MANIFEST_VERSION
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {name for name in cls.__dataclass_fields__}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
+def manifest_path(scan_dir, step_name) -> Path:
+    return Path(scan_dir) / 'photogrammetry' / MANIFEST_DIRNAME / f"{step_name}.json"
+
+
+def load_manifest(scan_dir, step_name) -> Optional[ArtifactManifest]:
+    path = manifest_path(scan_dir, step_name)
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"WARNING: Ignoring unreadable manifest {path}: {e}")
+        return None
+    if data.get('version') != MANIFEST_VERSION:
+        return None
+    return ArtifactManifest.from_dict(data)
+
+
+def clear_manifest(scan_dir, step_name):
+    """Mark a step incomplete (called before the step runs)."""
+    try:
+        os.remove(manifest_path(scan_dir, step_name))
+    except FileNotFoundError:
+        pass
+
+
+def write_manifest(scan_dir, scan_id, step_name, outputs: Iterable[str], inputs: Iterable[str] = (),
+                   scripts: Iterable[str] = (), scripts_dir=SCRIPT_DIR, duration=0.0) -> ArtifactManifest:
+    """
+    Record a completed step. Raises FileNotFoundError if an output is missing.
+
+    Args:
+        scan_dir: takes/<scan>
+        scan_id: Scan identifier
+        step_name: Step (or checkpoint) name
+        outputs: Output paths relative to scan_dir
+        inputs: Input paths relative to scan_dir (files or directories)
+        scripts: Producing scripts/assets relative to scripts_dir
+        scripts_dir: Directory holding the pipeline scripts
+        duration: Step duration in seconds
+    """
+    scan_dir = Path(scan_dir)
+    previous = load_manifest(scan_dir, step_name)
+    previous_entries = {}
+    if previous:
+        previous_entries = {**previous.inputs, **previous.outputs}
+
+    manifest = ArtifactManifest(step=step_name, scan_id=scan_id, duration=round(duration, 3),
+                                created_at=time.strftime('%Y-%m-%d %H:%M:%S'), host=socket.gethostname())
+    for relative_path in outputs:
+        entry = describe(scan_dir / relative_path, previous_entries.get(relative_path))
+        if entry is None:
+            raise FileNotFoundError(f"output missing: {relative_path}")
+        manifest.outputs[relative_path] = entry
+    for relative_path in inputs:
+        entry = describe(scan_dir / relative_path, previous_entries.get(relative_path))
+        if entry is not None:
+            manifest.inputs[relative_path] = entry
+    for relative_path in scripts:
+        entry = describe(Path(scripts_dir) / relative_path)
+        if entry is not None:
+            manifest.scripts[relative_path] = entry
+
+    save_manifest(scan_dir, manifest)
+    return manifest
+
+
+def save_manifest(scan_dir, manifest: ArtifactManifest):
+    path = manifest_path(scan_dir, manifest.step)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(asdict(manifest), f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def verify_manifest(scan_dir, step_name, scripts_dir=None, deep=False) -> Tuple[bool, str]:
+    """
+    Check that a step's recorded outputs and inputs are still intact.
+
+    Args:
+        scan_dir: takes/<scan>
+        step_name: Step (or checkpoint) name
+        scripts_dir: Also require the producing scripts to be unchanged (None skips the check)
+        deep: Re-hash every file instead of trusting matching size/mtime
+
+    Returns:
+        (ok, reason) where reason explains the first mismatch
+    """
+    manifest = load_manifest(scan_dir, step_name)
+    if manifest is None:
+        return False, 'no manifest'
+    scan_dir = Path(scan_dir)
+    for label, entries, base in (('output', manifest.outputs, scan_dir), ('input', manifest.inputs, scan_dir)):
+        for relative_path, entry in entries.items():
+            ok, reason = entry_matches(base / relative_path, entry, deep)
+            if not ok:
+                return False, f"{label} {relative_path} {reason}"
+    if scripts_dir is not None:
+        for relative_path, entry in manifest.scripts.items():
+            ok, reason = entry_matches(Path(scripts_dir) / relative_path, entry, deep)
+            if not ok:
+                return False, f"script {relative_path} {reason}"
+    return True, ''
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ STEPS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def record_step(step, scan_dir, scan_id, scripts_dir=SCRIPT_DIR, duration=0.0) -> ArtifactManifest:
+    """Write the manifest of a pipeline_runner.Step."""
+    manifest = write_manifest(scan_dir, scan_id, step.name,
+                              outputs=[p.format(scan=scan_id) for p in step.outputs],
+                              inputs=[p.format(scan=scan_id) for p in step.inputs],
+                              scripts=step.scripts, scripts_dir=scripts_dir, duration=duration)
+    _adopt_rewritten_inputs(manifest, step.depends_on, scan_dir)
+    return manifest
+
+
+def _adopt_rewritten_inputs(manifest: ArtifactManifest, upstream_names, scan_dir):
+    """
+    A step may legitimately rewrite its inputs (face detection rotates and re-saves
+    {scan}.blend/png); update the upstream manifests so they stay complete.
+    """
+    for upstream_name in upstream_names:
+        upstream = load_manifest(scan_dir, upstream_name)
+        if upstream is None:
+            continue
+        rewritten = {path: entry for path, entry in manifest.inputs.items()
+                     if path in upstream.outputs and upstream.outputs[path] != entry}
+        if rewritten:
+            upstream.outputs.update(rewritten)
+            save_manifest(scan_dir, upstream)
+
+
+def verify_step(step, scan_dir, scan_id, scripts_dir=None, deep=False, adopt=True) -> Tuple[bool, str]:
+    """
+    verify_manifest for a pipeline_runner.Step.
+
+    Args:
+        adopt: Outputs from before manifests existed are adopted (a manifest is written
+            for them) instead of forcing the step to run again
+    """
+    ok, reason = verify_manifest(scan_dir, step.name, scripts_dir, deep)
+    if ok or not adopt or reason != 'no manifest':
+        return ok, reason
+    if not all((Path(scan_dir) / pattern.format(scan=scan_id)).exists() for pattern in step.outputs):
+        return ok, reason
+    record_step(step, scan_dir, scan_id, scripts_dir or SCRIPT_DIR)
+    return True, ''
+
+
+def first_incomplete_step(steps, scan_dir, scan_id, scripts_dir=None, deep=False):
+    """
+    First step (in order) without a valid manifest.
+
+    Returns:
+        (step, reason), or (None, '') when every step is complete
+    """
+    for step in steps:
+        ok, reason = verify_step(step, scan_dir, scan_id, scripts_dir, deep)
+        if not ok:
+            return step, reason
+    return None, ''
+
+
+def _resolve_step(name):
+    from pipeline_runner import STEPS_BY_NAME, STEPS_BY_NUMBER
+    step = STEPS_BY_NUMBER.get(int(name)) if name.isdigit() else STEPS_BY_NAME.get(name)
+    return step
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-step artifact manifests")
+    parser.add_argument('command', choices=['resume', 'verify', 'record', 'clear', 'show'])
+    parser.add_argument('--takes', required=True, help="Takes path")
+    parser.add_argument('--scan', required=True, help="Scan identifier")
+    parser.add_argument('--step', help="Step number or name (or a checkpoint name with --outputs)")
+    parser.add_argument('--duration', type=float, default=0.0, help="Step duration in seconds (record)")
+    parser.add_argument('--outputs', nargs='*', help="Scan-relative outputs for a custom checkpoint (record)")
+    parser.add_argument('--inputs', nargs='*', default=[], help="Scan-relative inputs for a custom checkpoint (record)")
+    parser.add_argument('--scripts', nargs='*', default=[], help="Scripts-relative producers for a custom checkpoint (record)")
+    parser.add_argument('--scripts-dir', default=str(SCRIPT_DIR), help="Directory holding the pipeline scripts")
+    parser.add_argument('--no-script-check', action='store_true', help="Do not require unchanged scripts")
+    parser.add_argument('--deep', action='store_true', help="Re-hash every file instead of trusting size/mtime")
+    parser.add_argument('--quiet', '-q', action='store_true', help="Only print the result")
+    args = parser.parse_args()
+
+    scan_dir = Path(args.takes) / args.scan
+    scripts_dir = None if args.no_script_check else args.scripts_dir
+
+    if args.command == 'resume':
+        from pipeline_runner import PIPELINE_STEPS
+        step, reason = first_incomplete_step(PIPELINE_STEPS, scan_dir, args.scan, scripts_dir, args.deep)
+        if not args.quiet:
+            message = f"resume at step {step.number} ({step.name}): {reason}" if step else "all steps complete"
+            print(f"📋 {args.scan}: {message}", file=sys.stderr)
+        print(step.number if step else len(PIPELINE_STEPS) + 1)
+        return
+
+    if args.command == 'show':
+        manifest_dir = scan_dir / 'photogrammetry' / MANIFEST_DIRNAME
+        for path in sorted(manifest_dir.glob('*.json')):
+            manifest = load_manifest(scan_dir, path.stem)
+            if manifest is None:
+                continue
+            ok, reason = verify_manifest(scan_dir, manifest.step, scripts_dir, args.deep)
+            status = "✅" if ok else f"❌ {reason}"
+            print(f"{manifest.step:<22} {manifest.created_at}  {manifest.duration:>8.1f}s  "
+                  f"{len(manifest.outputs)} output(s)  {status}")
+        return
+
+    if not args.step:
+        parser.error(f"{args.command} needs --step")
+    step = None if args.outputs else _resolve_step(args.step)
+    step_name = step.name if step else args.step
+
+    if args.command == 'clear':
+        clear_manifest(scan_dir, step_name)
+    elif args.command == 'verify':
+        if step:
+            ok, reason = verify_step(step, scan_dir, args.scan, scripts_dir, args.deep)
+        else:
+            ok, reason = verify_manifest(scan_dir, step_name, scripts_dir, args.deep)
+        if not args.quiet:
+            print(f"✅ {step_name} complete" if ok else f"❌ {step_name}: {reason}")
+        sys.exit(0 if ok else 1)
+    elif args.command == 'record':
+        try:
+            if step:
+                record_step(step, scan_dir, args.scan, args.scripts_dir, args.duration)
+            elif args.outputs:
+                write_manifest(scan_dir, args.scan, step_name, args.outputs, args.inputs, args.scripts,
+                               args.scripts_dir, args.duration)
+            else:
+                parser.error(f"Unknown step '{args.step}' (pass --outputs for a custom checkpoint)")
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if not args.quiet:
+            print(f"📋 Manifest written: {manifest_path(scan_dir, step_name)}")
+
+
+if __name__ == "__main__":
+    main()
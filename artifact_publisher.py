@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Asynchronous artifact publication.
+
+A step's outputs used to reach their destination only after the whole run: the
+scratch sync-back (scan_staging.py) copied every file at the end, and nothing was
+delivered anywhere else. The publisher starts copying a step's artifacts the
+moment its artifact manifest is committed, on a small bounded pool of background
+threads, while the pipeline continues with the next step. The run only waits for
+the transfers that are still in flight when its last step finished.
+
+Destinations:
+    mirror      - the real takes folder when the run works on a scratch copy: every
+                  output of the step, followed by its manifest (a crash mid-transfer
+                  therefore leaves the step incomplete there, never inconsistent)
+    deliveries  - config.json "publisher.destinations": folders (with {scan}) that
+                  receive selected final artifacts, e.g. {scan}.png and -rig.blend
+
+Every copy goes to a temporary name and is renamed into place, so an artifact
+becomes visible complete. The moment it does is logged and recorded in the scan
+timeline (kind 'publish': transfer time, queue time, bytes, destination).
+
+Usage:
+    python3 artifact_publisher.py publish --takes /takes --scan X --step add_rig     # deliver one step's artifacts now
+    python3 artifact_publisher.py publish --takes /scratch/takes --scan X --step 4 --mirror /takes
+    python3 artifact_publisher.py destinations [-e local]                             # exit status 1 if none
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import artifact_manifest
+import pipeline_timeline
+from scan_staging import copy_file
+
+DEFAULT_SETTINGS = {
+    'workers': 2,
+    'destinations': [],
+}
+
+
+def publisher_settings(config) -> Dict:
+    """Settings from the 'publisher' section of config.json."""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get_section('publisher'))
+    return settings
+
+
+@dataclass
+class Destination:
+    """
+    Where a scan's artifacts are published.
+
+    Args:
+        path: Destination folder; {scan} is replaced by the scan id
+        artifacts: Scan-relative artifact patterns ({scan} allowed) to publish; None publishes
+            every output of every step, keeping the scan-relative layout
+        name: Label used in logs and timeline records
+    """
+    path: str
+    artifacts: Optional[List[str]] = None
+    name: str = ''
+
+    def targets(self, scan_id, relative_paths) -> List[Tuple[str, Path]]:
+        """(scan-relative source, destination file) pairs of the given files that go here."""
+        root = Path(os.path.expanduser(self.path.format(scan=scan_id)))
+        if self.artifacts is None:
+            return [(path, root / path) for path in relative_paths]
+        wanted = {pattern.format(scan=scan_id) for pattern in self.artifacts}
+        return [(path, root / Path(path).name) for path in relative_paths if path in wanted]
+
+
+@dataclass
+class Publication:
+    step: str
+    artifact: str
+    destination: str
+    target: str
+    queued_at: float
+    started_at: float = 0.0
+    visible_at: float = 0.0
+    bytes: int = 0
+    error: str = ''
+
+    @property
+    def transfer_s(self) -> float:
+        return self.visible_at - self.started_at if self.visible_at else 0.0
+
+    @property
+    def queued_s(self) -> float:
+        return (self.started_at or self.queued_at) - self.queued_at
+
+
+class ArtifactPublisher:
+    """
+    Bounded background pool publishing step artifacts as soon as their manifest exists.
+
+    Args:
+        scan_id: Scan identifier
+        destinations: List of Destination
+        workers: Concurrent transfers
+        log: Callable(message) for visibility/failure messages
+        timeline: Timeline receiving a 'publish' record per artifact
+    """
+
+    def __init__(self, scan_id, destinations: List[Destination], workers=DEFAULT_SETTINGS['workers'], log=print,
+                 timeline=None):
+        self.scan_id = scan_id
+        self.destinations = list(destinations)
+        self.log = log
+        self.timeline = timeline or pipeline_timeline.NullTimeline()
+        self.publications: List[Publication] = []
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)),
+                                            thread_name_prefix=f"publish-{scan_id}")
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def bind(self, timeline, log=None):
+        """Record into the run's timeline and log (the pipeline runner calls this)."""
+        self.timeline = timeline
+        if log is not None:
+            self.log = log
+
+    def publish_step(self, step, scan_dir):
+        """
+        Queue a step's outputs (and rewritten inputs) for every destination; mirror
+        destinations also get the step's manifest once its outputs are visible.
+
+        Returns immediately; call drain() to wait for the transfers.
+        """
+        scan_dir = Path(scan_dir)
+        paths = [p.format(scan=self.scan_id) for p in tuple(step.outputs) + tuple(step.rewrites)]
+        paths = [path for path in paths if (scan_dir / path).is_file()]
+        manifest = artifact_manifest.manifest_path(scan_dir, step.name)
+        for destination in self.destinations:
+            data = [self._submit(step.name, destination, scan_dir / source, target, source)
+                    for source, target in destination.targets(self.scan_id, paths)]
+            if destination.artifacts is None and manifest.is_file():
+                relative = str(manifest.relative_to(scan_dir))
+                target = destination.targets(self.scan_id, [relative])[0][1]
+                # FIFO pool: every data transfer this waits for started before it, so it cannot deadlock
+                self._submit(step.name, destination, manifest, target, relative, after=data)
+
+    def _submit(self, step_name, destination, source, target, artifact, after=()):
+        publication = Publication(step_name, artifact, destination.name or destination.path, str(target), time.time())
+        with self._lock:
+            self.publications.append(publication)
+            future = self._executor.submit(self._transfer, publication, source, list(after))
+            self._futures.append(future)
+        return future
+
+    def _transfer(self, publication: Publication, source, after):
+        failed = [f.result().artifact for f in after if f.result().error]
+        publication.started_at = time.time()
+        try:
+            if failed:
+                raise RuntimeError(f"not published because {', '.join(failed)} failed")
+            publication.bytes = copy_file(source, publication.target)
+            publication.visible_at = time.time()
+        except (OSError, RuntimeError) as e:
+            publication.error = str(e)
+            self.log(f"❌ {publication.artifact} could not be published to {publication.destination}: {e}")
+        else:
+            self.log(f"📤 {publication.artifact} visible in {publication.destination} "
+                     f"({publication.bytes / (1024 * 1024):.1f} MB in {publication.transfer_s:.1f}s, "
+                     f"{publication.visible_at - publication.queued_at:.1f}s after its manifest)")
+        self.timeline.record(publication.artifact, publication.transfer_s, 'publish', step=publication.step,
+                             start=publication.started_at, exit_code=1 if publication.error else 0,
+                             destination=publication.destination, bytes=publication.bytes,
+                             queued_s=round(publication.queued_s, 3))
+        return publication
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return sum(not future.done() for future in self._futures)
+
+    def drain(self) -> List[Publication]:
+        """Wait for every queued transfer; returns all publications so far."""
+        pending = self.pending
+        if pending:
+            self.log(f"⏳ Waiting for {pending} artifact transfer(s) still in flight")
+        start = time.perf_counter()
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.result()
+        if pending:
+            self.log(f"✅ Artifact transfers finished {time.perf_counter() - start:.1f}s after the last step")
+        return list(self.publications)
+
+    def close(self):
+        self.drain()
+        self._executor.shutdown(wait=True)
+
+    @property
+    def failed(self) -> List[Publication]:
+        return [publication for publication in self.publications if publication.error]
+
+
+def delivery_destinations(settings) -> List[Destination]:
+    """Destinations from the 'publisher.destinations' setting."""
+    destinations = []
+    for entry in settings.get('destinations', []):
+        if isinstance(entry, str):
+            entry = {'path': entry}
+        destinations.append(Destination(entry['path'], entry.get('artifacts'), entry.get('name', '')))
+    return destinations
+
+
+def build_publisher(settings, scan_id, mirror_takes=None, log=print) -> Optional[ArtifactPublisher]:
+    """
+    Publisher for one run (None if there is nowhere to publish).
+
+    Args:
+        settings: publisher_settings(config)
+        mirror_takes: Real takes folder when the run works on a scratch copy
+    """
+    destinations = delivery_destinations(settings)
+    if mirror_takes:
+        destinations.insert(0, Destination(os.path.join(str(mirror_takes), '{scan}'), None, 'takes folder'))
+    if not destinations:
+        return None
+    return ArtifactPublisher(scan_id, destinations, settings.get('workers', DEFAULT_SETTINGS['workers']), log)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish step artifacts to their delivery destinations")
+    parser.add_argument('command', choices=['publish', 'destinations'])
+    parser.add_argument('--takes', help="Takes path (default: from config.json)")
+    parser.add_argument('--scan', help="Scan identifier (publish)")
+    parser.add_argument('--step', help="Step number or name (publish)")
+    parser.add_argument('--mirror', help="Real takes folder when --takes is a scratch copy (outputs + manifest)")
+    parser.add_argument('--environment', '-e', help="Environment for config defaults")
+    args = parser.parse_args()
+
+    try:
+        from config_reader import get_config
+        config = get_config(args.environment)
+        settings = publisher_settings(config)
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    destinations = delivery_destinations(settings)
+    if args.command == 'destinations':
+        for destination in destinations:
+            print(f"{destination.name or '-':<16} {destination.path}  "
+                  f"{', '.join(destination.artifacts) if destination.artifacts else '(all outputs)'}")
+        sys.exit(0 if destinations else 1)
+
+    if not (args.scan and args.step):
+        parser.error("publish needs --scan and --step")
+    from pipeline_runner import STEPS_BY_NAME, STEPS_BY_NUMBER
+    step = STEPS_BY_NUMBER.get(int(args.step)) if args.step.isdigit() else STEPS_BY_NAME.get(args.step)
+    if step is None:
+        parser.error(f"Unknown step '{args.step}'")
+    takes_path = args.takes or config.takes_path
+    publisher = build_publisher(settings, args.scan, args.mirror)
+    if publisher is None:
+        print("No publisher destinations configured")
+        return
+    publisher.bind(pipeline_timeline.for_scan(takes_path, args.scan, step.name))
+    publisher.publish_step(step, Path(takes_path) / args.scan)
+    publisher.close()
+    sys.exit(1 if publisher.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Bounding boxes of recent scans, per scanner rig, and of capture sets already meshed.
+
+groove_mesh_check.py records the prep_usdz bounding box of every scan it meshes
+under the rig that captured it. A rig films people from fixed cameras, so the
+boxes of its recent scans predict the next one well enough for speculative_mesher.py
+to start the final groove-mesher run before the preview mesh exists.
+
+It also stores each box in the capture cache under a key made of the source image set
+(names, sizes and mtimes, or their SHA-256 with `bbox_cache.fingerprint: content`), the
+groove-mesher build and the bounding-box parameters (preview_bbox.bbox_parameters). A
+rerun of step 1 on unchanged images, e.g. a feature_sensitivity sweep, finds its box
+there: generate_mesh.sh skips the preview mesher and groove_mesh_check.py goes straight
+to `--create-final-model`.
+
+Boxes are kept in prep_usdz order (min_x, max_x, min_y, max_y, min_z, max_z) in
+takes/logs/bbox_history.json, the newest `history` entries per rig, and in
+takes/logs/bbox_cache.json, the newest `max_entries` capture sets.
+
+Usage:
+    python3 bbox_cache.py show [--takes /takes] [--rig R]       # recent boxes
+    python3 bbox_cache.py predict [--takes /takes] [--rig R]    # box the next scan is expected to fit
+    python3 bbox_cache.py lookup --source /takes/X/source/ --mesher builds/groove-mesher [--quiet]   # exit 0 on a hit
+    python3 bbox_cache.py cached [--takes /takes]              # capture cache entries
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from artifact_manifest import directory_listing, sha256_file
+from pipeline_timeline import TIMELINE_DIR, percentile
+
+HISTORY_FILENAME = 'bbox_history.json'
+CACHE_FILENAME = 'bbox_cache.json'
+AXES = ('min_x', 'max_x', 'min_y', 'max_y', 'min_z', 'max_z')
+DEFAULT_HISTORY = 20
+DEFAULT_CACHE_SETTINGS = {'enabled': True, 'fingerprint': 'listing', 'max_entries': 500}
+FINGERPRINTS = ('listing', 'content')
+
+Bounds = Tuple[float, float, float, float, float, float]
+
+
+def rig_name(settings=None) -> str:
+    """The rig a scan was captured on: the 'rig' setting, else this machine's name."""
+    return (settings or {}).get('rig') or socket.gethostname().split('.')[0]
+
+
+def history_path(takes_path) -> str:
+    return os.path.join(takes_path, TIMELINE_DIR, HISTORY_FILENAME)
+
+
+def cache_path(takes_path) -> str:
+    return os.path.join(takes_path, TIMELINE_DIR, CACHE_FILENAME)
+
+
+def cache_settings(config=None) -> Dict:
+    """Settings from the 'bbox_cache' section of config.json (defaults if it cannot be read)."""
+    settings = dict(DEFAULT_CACHE_SETTINGS)
+    try:
+        if config is None:
+            from config_reader import get_config
+            config = get_config()
+        settings.update(config.get_section('bbox_cache'))
+    except (ImportError, ValueError, KeyError, FileNotFoundError):
+        pass
+    return settings
+
+
+@contextmanager
+def _locked_json(path, write=False):
+    """The JSON object in path under a shared (write: exclusive) lock; written back atomically on write."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+        try:
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                data = {}
+            yield data
+            if write:
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class BoundsHistory:
+    """
+    Recent bounding boxes per rig, shared by every machine writing to the takes folder.
+
+    Args:
+        path: History file (see history_path)
+        keep: Entries kept per rig
+    """
+
+    def __init__(self, path, keep=DEFAULT_HISTORY):
+        self.path = path
+        self.keep = max(1, int(keep))
+
+    @classmethod
+    def for_takes(cls, takes_path, keep=DEFAULT_HISTORY):
+        return cls(history_path(takes_path), keep)
+
+    def _locked(self, write=False):
+        return _locked_json(self.path, write)
+
+    def record(self, rig, scan_id, bounds: Bounds):
+        """Remember a scan's box (a rerun of the same scan replaces its entry)."""
+        entry = {'scan': scan_id, 'ts': round(time.time(), 3), 'bounds': [round(float(v), 4) for v in bounds]}
+        with self._locked(write=True) as history:
+            entries = [e for e in history.get(rig, []) if e.get('scan') != scan_id]
+            entries.append(entry)
+            history[rig] = entries[-self.keep:]
+
+    def recent(self, rig, limit=None) -> List[Dict]:
+        """Entries of a rig, oldest first."""
+        with self._locked() as history:
+            entries = history.get(rig, [])
+        return entries[-limit:] if limit else entries
+
+    def predict(self, rig, min_samples=5, quantile=0.9, padding=0.0) -> Optional[Bounds]:
+        """
+        Box expected to contain the rig's next scan: per face, the `quantile` of the recent
+        boxes (lower quantile for minimums), grown by `padding`. None with too little history.
+        """
+        boxes = [e['bounds'] for e in self.recent(rig) if len(e.get('bounds', ())) == len(AXES)]
+        if len(boxes) < max(1, min_samples):
+            return None
+        predicted = []
+        for axis in range(len(AXES)):
+            values = sorted(box[axis] for box in boxes)
+            if axis % 2 == 0:
+                predicted.append(percentile(values, 1.0 - quantile) - padding)
+            else:
+                predicted.append(percentile(values, quantile) + padding)
+        return tuple(predicted)
+
+
+def source_fingerprint(source_path, mode='listing') -> Dict:
+    """
+    Fingerprint of a capture's source image set.
+
+    Args:
+        source_path: Source images folder
+        mode: 'listing' (names, sizes, mtimes: cheap, misses copied takes) or 'content' (SHA-256 of every image)
+    """
+    if mode == 'listing':
+        listing = directory_listing(source_path)
+        return {'mode': mode, 'files': listing['files'], 'size': listing['size'], 'digest': listing['listing']}
+    if mode != 'content':
+        raise ValueError(f"unknown bbox_cache.fingerprint '{mode}' (expected one of {', '.join(FINGERPRINTS)})")
+    sha = hashlib.sha256()
+    count = total = 0
+    for root, dirs, files in os.walk(source_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(f for f in files if not f.startswith('.')):
+            file_path = os.path.join(root, name)
+            sha.update(f"{os.path.relpath(file_path, source_path)}\0{sha256_file(file_path)}\n".encode('utf-8'))
+            count += 1
+            total += os.path.getsize(file_path)
+    return {'mode': mode, 'files': count, 'size': total, 'digest': sha.hexdigest()}
+
+
+def capture_key(source_path, mesher_path, parameters: Dict, mode='listing') -> str:
+    """
+    Capture cache key: the source images, the groove-mesher build (size and mtime) and the box parameters.
+
+    Raises:
+        OSError: The source folder cannot be read
+        ValueError: No source images, or an unknown fingerprint mode
+    """
+    source = source_fingerprint(source_path, mode)
+    if not source['files']:
+        raise ValueError(f"no source images in {source_path}")
+    try:
+        stat = os.stat(mesher_path)
+        mesher = [stat.st_size, stat.st_mtime_ns]
+    except (OSError, TypeError):
+        mesher = None
+    material = json.dumps({'source': source, 'mesher': mesher, 'parameters': parameters}, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class CaptureCache:
+    """
+    Bounding boxes (and preview mesh stats) of capture sets, by capture_key.
+
+    The preview.usdz each box was measured on is kept next to the cache file (hard-linked
+    when possible, so it costs no space while the scan's own copy exists): a cache hit
+    restores it, and step 1 still has every output it declares.
+
+    Args:
+        path: Cache file (see cache_path)
+        max_entries: Capture sets kept (the least recently used are dropped)
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_CACHE_SETTINGS['max_entries']):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.preview_dir = os.path.splitext(path)[0]
+
+    @classmethod
+    def for_takes(cls, takes_path, max_entries=DEFAULT_CACHE_SETTINGS['max_entries']):
+        return cls(cache_path(takes_path), max_entries)
+
+    def preview_path(self, key) -> str:
+        return os.path.join(self.preview_dir, f"{key}.usdz")
+
+    def lookup(self, key) -> Optional[Dict]:
+        """The entry stored under key ({'scan', 'ts', 'bounds', 'engine', 'stats', 'preview'}), None on a miss."""
+        with _locked_json(self.path) as cache:
+            entry = cache.get(key)
+        if entry is None or len(entry.get('bounds', ())) != len(AXES):
+            return None
+        return entry
+
+    def store(self, key, scan_id, bounds: Bounds, engine=None, stats: Optional[Dict] = None, preview=None):
+        """Remember the box of a capture set (replaces an earlier entry with the same key), and its preview file."""
+        entry = {'scan': scan_id, 'ts': round(time.time(), 3), 'bounds': [round(float(v), 4) for v in bounds],
+                 'engine': engine, 'stats': stats or {}, 'preview': None}
+        if preview and os.path.isfile(preview):
+            entry['preview'] = self._keep_preview(key, preview)
+        with _locked_json(self.path, write=True) as cache:
+            cache[key] = entry
+            for old_key in sorted(cache, key=lambda k: _last_used(cache[k]))[:-self.max_entries]:
+                del cache[old_key]
+                try:
+                    os.remove(self.preview_path(old_key))
+                except OSError:
+                    pass
+
+    def _keep_preview(self, key, preview) -> Dict:
+        os.makedirs(self.preview_dir, exist_ok=True)
+        kept = self.preview_path(key)
+        tmp_path = f"{kept}.{os.getpid()}.tmp"
+        try:
+            os.link(preview, tmp_path)
+        except OSError:  # another filesystem
+            shutil.copy2(preview, tmp_path)
+        os.replace(tmp_path, kept)
+        stat = os.stat(kept)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def restore_preview(self, key, entry, dest) -> bool:
+        """
+        Copy the entry's preview to dest. False when it was not kept or has changed since
+        (a preview rewritten in place through the hard link no longer matches the box).
+        """
+        kept, recorded = self.preview_path(key), entry.get('preview')
+        try:
+            stat = os.stat(kept)
+        except OSError:
+            return False
+        if not recorded or [stat.st_size, stat.st_mtime_ns] != [recorded.get('size'), recorded.get('mtime_ns')]:
+            return False
+        tmp_path = f"{dest}.{os.getpid()}.tmp"
+        shutil.copy2(kept, tmp_path)
+        os.replace(tmp_path, dest)
+        return True
+
+    def touch(self, key):
+        """Mark an entry as used now (the least recently used go first when the cache is trimmed)."""
+        with _locked_json(self.path, write=True) as cache:
+            if key in cache:
+                cache[key]['used'] = round(time.time(), 3)
+
+    def entries(self) -> List[Tuple[str, Dict]]:
+        """(key, entry) pairs, least recently used first."""
+        with _locked_json(self.path) as cache:
+            return sorted(cache.items(), key=lambda item: _last_used(item[1]))
+
+
+def _last_used(entry) -> float:
+    return entry.get('used') or entry.get('ts', 0)
+
+
+def format_bounds(bounds) -> str:
+    return ', '.join(f"{axis}: {value:.2f}" for axis, value in zip(AXES, bounds))
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Bounding boxes of recent scans per rig and of meshed capture sets")
+    parser.add_argument('command', choices=['show', 'predict', 'lookup', 'cached'])
+    parser.add_argument('--takes', help="Takes path (default: from config.json)")
+    parser.add_argument('--rig', help="Rig name (default: speculative_mesh.rig, else this machine)")
+    parser.add_argument('--source', help="Source images folder (lookup)")
+    parser.add_argument('--mesher', help="groove-mesher executable (lookup)")
+    parser.add_argument('--restore-preview', help="Copy the cached preview.usdz here; a hit needs it (lookup)")
+    parser.add_argument('--quiet', '-q', action='store_true', help="Only set the exit code (lookup)")
+    parser.add_argument('--environment', '-e', help="Environment for config defaults")
+    args = parser.parse_args()
+
+    try:
+        from config_reader import get_config
+        config = get_config(args.environment)
+        settings = config.get_section('speculative_mesh')
+        takes_path = args.takes or config.takes_path
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.command in ('lookup', 'cached'):
+        cached_settings = cache_settings(config)
+        cache = CaptureCache.for_takes(takes_path, cached_settings['max_entries'])
+        if args.command == 'cached':
+            entries = cache.entries()
+            print(f"📦 {len(entries)} capture set(s) in the bounding box cache")
+            for key, entry in entries:
+                print(f"   {time.strftime('%Y-%m-%d %H:%M', time.localtime(_last_used(entry)))}  {key[:12]}  "
+                      f"{entry['scan']:<24} {format_bounds(entry['bounds'])}")
+            return
+        if not args.source:
+            parser.error("lookup needs --source")
+        if not cached_settings.get('enabled', True):
+            sys.exit(1)
+        import preview_bbox
+        try:
+            key = capture_key(args.source, args.mesher, preview_bbox.bbox_parameters(preview_bbox.bbox_settings(config)),
+                              cached_settings['fingerprint'])
+        except (OSError, ValueError) as e:
+            if not args.quiet:
+                print(f"Error: {e}")
+            sys.exit(1)
+        entry = cache.lookup(key)
+        if entry is None:
+            if not args.quiet:
+                print("No cached bounding box for these source images")
+            sys.exit(1)
+        if args.restore_preview:
+            try:
+                restored = cache.restore_preview(key, entry, args.restore_preview)
+            except OSError as e:
+                restored = False
+                if not args.quiet:
+                    print(f"Error: {e}")
+            if not restored:
+                if not args.quiet:
+                    print("Cached bounding box found, but its preview.usdz is gone or changed")
+                sys.exit(1)
+        if not args.quiet:
+            print(f"📦 Cached bounding box (scan {entry['scan']}): {format_bounds(entry['bounds'])}")
+        return
+
+    rig = args.rig or rig_name(settings)
+    history = BoundsHistory.for_takes(takes_path, settings.get('history', DEFAULT_HISTORY))
+    if args.command == 'show':
+        entries = history.recent(rig)
+        print(f"📦 {len(entries)} recent box(es) on rig '{rig}'")
+        for entry in entries:
+            print(f"   {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['ts']))}  {entry['scan']:<24} "
+                  f"{format_bounds(entry['bounds'])}")
+        return
+
+    predicted = history.predict(rig, settings.get('min_samples', 5), settings.get('quantile', 0.9),
+                                settings.get('padding', 0.0))
+    if predicted is None:
+        print(f"Not enough history on rig '{rig}' to predict a bounding box")
+        sys.exit(1)
+    print(format_bounds(predicted))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""
+Persistent Blender worker pool for the scanner mesh processing pipeline.
+
+A worker is a long-lived Blender process started with this script. It listens
+on a localhost socket and runs jobs (a pipeline script's entry point plus its
+command line arguments) against a freshly reset scene, answering with a JSON
+result. This saves the interpreter boot, add-on registration and template
+loading that every `blender -b -P script.py` launch pays for.
+
+Protocol: one newline-terminated JSON request per connection, answered with one
+newline-terminated JSON response.
+
+    {"op": "run", "script": ".../cleanup.py", "argv": ["--scan", "X", ...],
+     "blend_file": null, "entry": "main", "call_args": [], "log_path": null}
+    {"op": "ping"} | {"op": "shutdown"}
+
+Usage:
+    # Inside Blender (production)
+    blender -b --factory-startup -P blender_worker.py -- serve --port 5600
+
+    # Stand-in worker without Blender (protocol/dispatch testing)
+    python3 blender_worker.py serve --stand-in --port 5600
+
+    # Submit a job
+    python3 blender_worker.py submit --address 127.0.0.1:5600 --script cleanup.py --scan X --path /takes
+"""
+
+import argparse
+import json
+import os
+import queue
+import runpy
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_HOST = '127.0.0.1'
+READY_TIMEOUT = 120.0
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+
+def _in_blender():
+    try:
+        import bpy  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ PROTOCOL ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def send_message(sock, message):
+    sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def receive_message(sock):
+    """Read one newline-terminated JSON message, None if the peer closed the connection."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return None
+        newline = chunk.find(b'\n')
+        if newline >= 0:
+            chunks.append(chunk[:newline])
+            return json.loads(b''.join(chunks).decode('utf-8'))
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > MAX_MESSAGE_BYTES:
+            raise ValueError("message too large")
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return (host or DEFAULT_HOST, int(port))
+
+
+def _jsonable(value):
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ WORKER ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def _flush_output():
+    # scripts log through pipeline_log's writer thread; drain it before fd 1 moves
+    pipeline_log = sys.modules.get('pipeline_log')
+    if pipeline_log is not None:
+        pipeline_log.flush()
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+
+@contextmanager
+def _redirect_output(log_path):
+    """Send fd-level stdout/stderr (Python prints and Blender's own output) to log_path."""
+    if not log_path:
+        yield
+        return
+    _flush_output()
+    saved = os.dup(1), os.dup(2)
+    with open(log_path, 'ab') as log_file:
+        os.dup2(log_file.fileno(), 1)
+        os.dup2(log_file.fileno(), 2)
+        try:
+            yield
+        finally:
+            _flush_output()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+
+
+def reset_scene(blend_file=None):
+    """Open blend_file, or start from an empty factory scene (add-ons stay registered)."""
+    import bpy
+    if blend_file:
+        bpy.ops.wm.open_mainfile(filepath=blend_file)
+    else:
+        bpy.ops.wm.read_homefile(use_empty=True, use_factory_startup=True)
+
+
+def run_job(job, stand_in=False):
+    """
+    Run one pipeline script entry point in this process.
+
+    The script is loaded with runpy (so its `if __name__ == "__main__"` block does
+    not run), sys.argv is set up as if Blender had been launched with
+    `-P script -- argv...`, and the entry point is called. SystemExit is turned
+    into an exit code, exceptions into an error result.
+    """
+    script = os.path.abspath(job['script'])
+    argv = [str(arg) for arg in job.get('argv', [])]
+    entry = job.get('entry', 'main')
+    result = {'op': 'run', 'script': script, 'entry': entry, 'status': 'ok', 'exit_code': 0,
+              'result': None, 'error': None, 'traceback': None}
+
+    saved_argv = list(sys.argv)
+    saved_path = list(sys.path)
+    start = time.perf_counter()
+    with _redirect_output(job.get('log_path')):
+        try:
+            if not stand_in:
+                reset_scene(job.get('blend_file'))
+            sys.argv = [sys.executable, '-P', script, '--'] + argv
+            sys.path.insert(0, os.path.dirname(script))
+            module_globals = runpy.run_path(script, run_name='__blender_worker__')
+            entry_point = module_globals.get(entry)
+            if entry_point is None:
+                raise AttributeError(f"{os.path.basename(script)} has no entry point '{entry}'")
+            result['result'] = _jsonable(entry_point(*job.get('call_args', [])))
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            result['exit_code'] = code
+            if code != 0:
+                result['status'] = 'error'
+                result['error'] = f"SystemExit({e.code})"
+        except Exception as e:
+            result['status'] = 'error'
+            result['exit_code'] = 1
+            result['error'] = f"{type(e).__name__}: {e}"
+            result['traceback'] = traceback.format_exc()
+        finally:
+            sys.argv = saved_argv
+            sys.path[:] = saved_path
+    result['duration'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def serve(host=DEFAULT_HOST, port=0, ready_file=None, stand_in=False, max_jobs=0):
+    """
+    Serve jobs until a shutdown request (or max_jobs jobs, 0 = unlimited).
+
+    Jobs run on the main thread one at a time: Blender's Python API is not
+    thread safe, so concurrency comes from running several workers.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(8)
+    bound_port = server.getsockname()[1]
+    mode = 'stand-in' if stand_in else 'blender'
+    print(f"blender_worker: listening on {host}:{bound_port} ({mode}, pid {os.getpid()})", flush=True)
+
+    if ready_file:
+        tmp_path = f"{ready_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'host': host, 'port': bound_port, 'pid': os.getpid()}, f)
+        os.replace(tmp_path, ready_file)
+
+    jobs_done = 0
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                try:
+                    request = receive_message(conn)
+                except (OSError, ValueError) as e:
+                    print(f"blender_worker: bad request: {e}", flush=True)
+                    continue
+                if request is None:
+                    continue
+
+                op = request.get('op', 'run')
+                if op == 'ping':
+                    send_message(conn, {'op': 'ping', 'status': 'ok', 'pid': os.getpid(), 'jobs_done': jobs_done})
+                    continue
+                if op == 'shutdown':
+                    send_message(conn, {'op': 'shutdown', 'status': 'ok'})
+                    break
+
+                result = run_job(request, stand_in=stand_in)
+                jobs_done += 1
+                try:
+                    send_message(conn, result)
+                except OSError:
+                    pass
+                if max_jobs and jobs_done >= max_jobs:
+                    break
+    finally:
+        server.close()
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLIENT ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+class BlenderWorkerClient:
+    """
+    Client for one worker.
+
+    Args:
+        address: (host, port) tuple or 'host:port' string
+        timeout: Socket timeout in seconds (None waits for long jobs)
+    """
+
+    def __init__(self, address, timeout=None):
+        self.address = parse_address(address) if isinstance(address, str) else tuple(address)
+        self.timeout = timeout
+
+    def _request(self, message, timeout=None):
+        with socket.create_connection(self.address, timeout=5.0) as sock:
+            sock.settimeout(timeout if timeout is not None else self.timeout)
+            send_message(sock, message)
+            response = receive_message(sock)
+        if response is None:
+            raise ConnectionError(f"worker {self.address[0]}:{self.address[1]} closed the connection")
+        return response
+
+    def ping(self, timeout=5.0):
+        return self._request({'op': 'ping'}, timeout=timeout)
+
+    def shutdown(self):
+        return self._request({'op': 'shutdown'}, timeout=5.0)
+
+    def run(self, script, argv=(), blend_file=None, entry='main', call_args=(), log_path=None):
+        return self._request({
+            'op': 'run',
+            'script': str(script),
+            'argv': [str(arg) for arg in argv],
+            'blend_file': str(blend_file) if blend_file else None,
+            'entry': entry,
+            'call_args': list(call_args),
+            'log_path': str(log_path) if log_path else None,
+        })
+
+
+class _WorkerProcess:
+    def __init__(self, process, client, ready_file):
+        self.process = process
+        self.client = client
+        self.ready_file = ready_file
+        self.jobs_done = 0
+
+
+class BlenderWorkerPool:
+    """
+    A fixed number of warm Blender workers on localhost.
+
+    Jobs are handed to the next idle worker; a worker that crashed (or served
+    recycle_after jobs, to bound memory growth) is replaced transparently.
+
+    Args:
+        blender_path: Blender executable ('' or None with stand_in=True)
+        size: Number of workers
+        stand_in: Start plain-Python stand-in workers instead of Blender
+        recycle_after: Restart a worker after this many jobs (0 = never)
+        log_dir: Directory for worker process logs
+        threads: Blender render/compute threads per worker (0 = all cores)
+    """
+
+    def __init__(self, blender_path, size=1, stand_in=False, recycle_after=25, log_dir=None, threads=0):
+        self.blender_path = blender_path
+        self.threads = threads
+        self.size = max(1, int(size))
+        self.stand_in = stand_in
+        self.recycle_after = recycle_after
+        self.log_dir = Path(log_dir) if log_dir else Path(tempfile.gettempdir())
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _spawn(self) -> _WorkerProcess:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        ready_file = tempfile.mktemp(prefix='blender_worker_', suffix='.json')
+        worker_args = ['serve', '--port', '0', '--ready-file', ready_file]
+        if self.stand_in:
+            command = [sys.executable, str(Path(__file__).resolve())] + worker_args + ['--stand-in']
+        else:
+            command = [self.blender_path, '-b', '--factory-startup']
+            if self.threads:
+                command += ['-t', str(self.threads)]
+            command += ['-P', str(Path(__file__).resolve()), '--'] + worker_args
+        log_file = open(self.log_dir / f"blender_worker_{os.getpid()}_{len(self._workers)}.log", 'ab')
+        process = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True)
+        log_file.close()
+
+        deadline = time.monotonic() + READY_TIMEOUT
+        while not os.path.exists(ready_file):
+            if process.poll() is not None:
+                raise RuntimeError(f"Blender worker exited during startup with code {process.returncode}")
+            if time.monotonic() > deadline:
+                process.kill()
+                raise TimeoutError("Blender worker did not become ready in time")
+            time.sleep(0.05)
+        with open(ready_file, 'r') as f:
+            info = json.load(f)
+        worker = _WorkerProcess(process, BlenderWorkerClient((info['host'], info['port'])), ready_file)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def start(self):
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def _retire(self, worker):
+        try:
+            if worker.process.poll() is None:
+                worker.client.shutdown()
+                worker.process.wait(timeout=10)
+        except (OSError, ConnectionError, subprocess.TimeoutExpired):
+            worker.process.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if os.path.exists(worker.ready_file):
+            os.remove(worker.ready_file)
+
+    def run(self, script, argv=(), blend_file=None, entry='main', call_args=(), log_path=None):
+        """Run a job on the next idle worker and return its JSON result."""
+        worker = self._idle.get()
+        try:
+            result = worker.client.run(script, argv, blend_file, entry, call_args, log_path)
+            worker.jobs_done += 1
+        except (OSError, ConnectionError, ValueError) as e:
+            # The worker died mid-job (e.g. a Blender segfault): replace it
+            self._retire(worker)
+            self._idle.put(self._spawn())
+            return {'op': 'run', 'script': str(script), 'status': 'error', 'exit_code': -1,
+                    'error': f"worker lost: {e}", 'result': None, 'traceback': None}
+
+        if self.recycle_after and worker.jobs_done >= self.recycle_after:
+            self._retire(worker)
+            worker = self._spawn()
+        self._idle.put(worker)
+        return result
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            self._retire(worker)
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if _in_blender() and '--' in sys.argv else sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Persistent Blender worker for pipeline scripts")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="Run a worker (inside Blender, or --stand-in)")
+    serve_parser.add_argument('--host', default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', type=int, default=0, help="0 picks a free port")
+    serve_parser.add_argument('--ready-file', help="Write the bound address to this JSON file")
+    serve_parser.add_argument('--stand-in', action='store_true', help="Run without Blender (no scene reset)")
+    serve_parser.add_argument('--max-jobs', type=int, default=0, help="Exit after this many jobs")
+
+    submit_parser = subparsers.add_parser('submit', help="Send a job to a worker")
+    submit_parser.add_argument('--address', required=True, help="host:port of the worker")
+    submit_parser.add_argument('--script', required=True, help="Pipeline script to run")
+    submit_parser.add_argument('--blend-file', help="Open this .blend before running")
+    submit_parser.add_argument('--entry', default='main', help="Entry point function (default: main)")
+    submit_parser.add_argument('script_args', nargs=argparse.REMAINDER, help="Arguments passed to the script")
+
+    ping_parser = subparsers.add_parser('ping', help="Check that a worker is alive")
+    ping_parser.add_argument('--address', required=True)
+
+    stop_parser = subparsers.add_parser('shutdown', help="Stop a worker")
+    stop_parser.add_argument('--address', required=True)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        if not args.stand_in and not _in_blender():
+            print("Error: 'serve' must run inside Blender (blender -b -P blender_worker.py -- serve) or use --stand-in")
+            sys.exit(1)
+        serve(args.host, args.port, args.ready_file, args.stand_in, args.max_jobs)
+        return
+
+    client = BlenderWorkerClient(args.address)
+    try:
+        if args.command == 'submit':
+            script_args = [arg for arg in args.script_args if arg != '--']
+            response = client.run(args.script, script_args, args.blend_file, args.entry)
+        elif args.command == 'ping':
+            response = client.ping()
+        else:
+            response = client.shutdown()
+    except (OSError, ConnectionError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(json.dumps(response, indent=2))
+    sys.exit(0 if response.get('status') == 'ok' else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,14 @@ import math
 import numpy
 import time
 import os
+import sys
 from mathutils import Vector, Euler, Matrix, Quaternion
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pipeline_log
+import pipeline_timeline
+import usdz_archive
+
 
 print('\n▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
 print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
@@ -52,7 +58,10 @@ def get_args():
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ DEBUG UTILS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-use_debug = True
+log = pipeline_log.get_logger("cleanup")
+print_decorated, print_enhanced = pipeline_log.print_helpers(log)
+
+use_debug = pipeline_log.enabled(pipeline_log.DEBUG)
 
 def repeat_string(string, amount):
         concatenated_string = string * amount
@@ -67,59 +76,34 @@ def debug_function_execution_with_args(func):
              return func(*args, **kwargs)
         
         start_label = f"\n▬▬▬ {func_name}: START ▬▬▬"        
-        print(start_label)
-        print (repeat_string("▬", len(start_label) - 1))
+        log.debug(start_label)
+        log.debug(repeat_string("▬", len(start_label) - 1))
 
-        print(f"▬▬▬ ARGS")
+        log.debug("▬▬▬ ARGS")
 
         if not args:
-            print ("▬▬▬▬▬▬", None)
+            log.debug("▬▬▬▬▬▬ %s", None)
             
         for arg in args:
-            print ("▬▬▬▬▬▬", arg)
+            log.debug("▬▬▬▬▬▬ %s", arg)
 
-        print(f"▬▬▬ KEYWORD ARGS")
+        log.debug("▬▬▬ KEYWORD ARGS")
         for key, value in kwargs.items():
-            print("▬▬▬▬▬▬", key, ":", value)
+            log.debug("▬▬▬▬▬▬ %s : %s", key, value)
     
-        print(f"▬▬▬ RETURN ◄")
+        log.debug("▬▬▬ RETURN ◄")
         result = func(*args, **kwargs)
 
-        print("▬▬▬▬▬▬", result)
+        log.debug("▬▬▬▬▬▬ %s", result)
 
         end_label = f"▬▬▬ {func_name}: END ▬▬▬"
-        print (repeat_string("▬", len(end_label) - 1))
-        print(end_label)
+        log.debug(repeat_string("▬", len(end_label) - 1))
+        log.debug(end_label)
 
         return result
     return wrapper
 
 
-def print_decorated(message, symbol="▬", padding=0):
-    border = symbol * (len(message) + padding)
-    decorated_message = f"\n{message}\n{border}"
-    print(decorated_message)
-
-
-def print_enhanced(text, text_color="white", label="", label_color="white", prefix="", suffix=""):
-    color_code = {
-        'black': '\033[30m',
-        'red': '\033[31m',
-        'green': '\033[32m',
-        'yellow': '\033[33m',
-        'blue': '\033[34m',
-        'magenta': '\033[35m',
-        'cyan': '\033[36m',
-        'white': '\033[37m',
-        'reset': '\033[0m'
-    }
-
-    if label == "":
-        return print(f"{prefix}{color_code[text_color]}{text}{color_code['reset']}{suffix}")
-    
-    print(f"{prefix}[{color_code[label_color]}{label}{color_code['reset']}] {color_code[text_color]}{text}{color_code['reset']}{suffix}")
-
-
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ USEFUL FUNCTIONS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
@@ -440,9 +424,9 @@ def remove_objects_with_less_vertices(obj_list, remaining_obj_name=None):
     # pop off the last part
     highest_vertices_part = parts.pop()
 
+    print_enhanced(f"Removing {len(parts)} obj(s)", label="LOW VERTICES PARTS", label_color="magenta")
     for part in parts:
-        print_enhanced(f"Removing obj '{part.name}' vertices: {len(part.data.vertices)}", label="LOW VERTICES PART", label_color="magenta")
-        print(part.name, len(part.data.vertices))
+        log.debug("Removing obj '%s' vertices: %d", part.name, len(part.data.vertices))
 
     print_enhanced(f"obj: {highest_vertices_part.name} | vertices: {len(highest_vertices_part.data.vertices)}", label="HIGH VERTICES PART", label_color="green")
 
@@ -780,10 +764,13 @@ def remove_loose_geometry(obj, remove_vertices=True, remove_edges=True, remove_f
         bmesh.ops.delete(bmesh_obj, geom=loose_verts, context='VERTS')
 
     if remove_linked_faces and max_linked_faces is not None:
+        removed_components = 0
         for connected_faces in find_connected_face_components(bmesh_obj):
             if len(connected_faces) < max_linked_faces:
-                print_enhanced(f"removed with {len(connected_faces)} faces", label="LOOSE LINKED FACES", label_color="magenta")
+                log.debug("removed with %d faces", len(connected_faces))
                 bmesh.ops.delete(bmesh_obj, geom=list(connected_faces), context='FACES')
+                removed_components += 1
+        print_enhanced(f"removed {removed_components} with fewer than {max_linked_faces} faces", label="LOOSE LINKED FACES", label_color="magenta")
 
     bmesh_obj.to_mesh(obj.data)
     bmesh_obj.free()
@@ -1804,12 +1791,12 @@ def main():
     # HERE: MAIN VARIABLES
     print_decorated("Main variables")
 
-    texture_path = os.path.join(PATH, str(SCAN), "photogrammetry", "baked_mesh_tex0.png")
+    # baked_mesh.usda + baked_mesh_tex0.png, moved out of final_usdz_files by groove_mesh_check.py
+    import_usd_path, texture_path = usdz_archive.final_model(os.path.join(PATH, str(SCAN), "photogrammetry"))
     material_name = "MAT"
     floor_dimensions = (11, 11, 8)
     extract_floor_threshold = 0.0001
     lower_threshold = 0.2
-    import_usd_path = os.path.join(PATH ,str(SCAN),"photogrammetry","baked_mesh.usda")
 
     print_enhanced(texture_path, label="SCAN TEXTURE PATH", label_color="cyan")
     print_enhanced(material_name, label="MATERIAL NAME", label_color="cyan")
@@ -1818,6 +1805,9 @@ def main():
     print_enhanced(lower_threshold, label="LOWER THRESHOLD", label_color="cyan")
     print_enhanced(import_usd_path, label="IMPORT USD PATH", label_color="cyan")
 
+    pipeline_log.for_scan(PATH, SCAN, step="cleanup")
+    TIMELINE = pipeline_timeline.for_scan(PATH, SCAN, step="cleanup")
+
     # HERE: CLEAN START
     if USE_CLEAN_START == 1:
         initialize_clean_scene()
@@ -1825,7 +1815,8 @@ def main():
     # HERE: SCENE SETUP
     print_decorated("Importing and setting up the mesh")
 
-    scan_obj = import_usda_model(PATH, SCAN, import_usd_path)
+    with TIMELINE.span("usd_import"):
+        scan_obj = import_usda_model(PATH, SCAN, import_usd_path)
 
     if scan_obj is None:
         print_enhanced("CANCELLED", text_color="red", label="ERROR", label_color="red")
@@ -1836,6 +1827,7 @@ def main():
     # HERE: CLEANING 1
     if USE_CLEANING_1 == 1:
         print_decorated("Cleaning 1")
+        span = TIMELINE.begin("cleaning_1")
 
         MIN_X, MAX_X, MIN_Y, MAX_Y, MIN_Z, MAX_Z = get_bounding_box(scan_obj, bboxOffset=0)
         BOUNDS_OFFSET = 0.20
@@ -1856,36 +1848,53 @@ def main():
 
         # updating the variable since g0 may be lost in the previous step
         scan_obj = REMAINING_OBJ
+        TIMELINE.end(span)
 
     # HERE: ORIENTATION
     if USE_ORIENTATION == 1:
         print_decorated("Orientation")
+        span = TIMELINE.begin("orientation")
 
         lower_legs_data = prepare_for_orientation(scan_obj)
         leg_obj = lower_legs_data[2]
 
         re_orient_v1_result = re_orient_v1_using_two_legs(scan_obj, leg_obj, lower_legs_data)
+        orientation_strategy = "v1"
+        orientation_success = re_orient_v1_result == "SUCCESS"
 
         if re_orient_v1_result == "SUCCESS":
             check_orientation_v2_using_more_than_one_leg(scan_obj, leg_obj)
 
         if re_orient_v1_result == "ONLY_ONE":
+            orientation_strategy = "v2"
             re_orient_v2_result = re_orient_v2_using_shoulders(scan_obj, leg_obj)
+            orientation_success = bool(re_orient_v2_result)
             if re_orient_v2_result:
                 check_orientation_v1_using_a_single_leg(scan_obj, leg_obj)
 
         if re_orient_v1_result == "MORE_THAN_ONE":
+            orientation_strategy = "v3"
             re_orient_v3_result = re_orient_v3_using_more_than_two_legs(scan_obj, leg_obj)
+            orientation_success = bool(re_orient_v3_result)
             if re_orient_v3_result:
                 check_orientation_v2_using_more_than_one_leg(scan_obj, leg_obj)
 
+        TIMELINE.end(span)
+        TIMELINE.fact(orientation_strategy=orientation_strategy, orientation_legs=str(re_orient_v1_result),
+                      orientation_success=orientation_success)
+
     # HERE: CLEANING 2
     if USE_CLEANING_2 == 1:
         print_decorated("Cleaning 2")
+        span = TIMELINE.begin("cleaning_2")
 
         remove_loose_geometry(scan_obj, remove_linked_faces=True, max_linked_faces=200)
         close_mesh_holes(scan_obj)
         remove_doubles_bmesh(scan_obj)
+        TIMELINE.end(span)
+
+    TIMELINE.fact(mesh_vertices=len(scan_obj.data.vertices), mesh_faces=len(scan_obj.data.polygons),
+                  mesh_dimensions=[round(d, 4) for d in scan_obj.dimensions])
 
     # HERE: ORGANIZING
     print_decorated("Organizing Scene")
@@ -1921,8 +1930,10 @@ def main():
     # Rendering
     set_scene_resolution(x=OUTPUT_RESOLUTION[0], y=OUTPUT_RESOLUTION[1])
     render_output_path = os.path.join(PATH, str(SCAN), "photogrammetry", f"{SCAN}.png")
-    render(scan_obj, camera, render_output_path)
-    save_file()
+    with TIMELINE.span("render"):
+        render(scan_obj, camera, render_output_path)
+    with TIMELINE.span("save"):
+        save_file()
 
     return SCAN
 
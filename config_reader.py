@@ -72,6 +72,13 @@ class ConfigReader:
         software_path = self.get_path('software_path')
         return os.path.join(software_path, executable_path)
     
+    def get_section(self, section_key, default=None):
+        """Get a top-level settings section (e.g. 'scheduler'), or default if missing."""
+        section = self._config.get(section_key)
+        if section is None:
+            return {} if default is None else default
+        return section
+    
     @property
     def software_path(self):
         """Get software path for current environment."""
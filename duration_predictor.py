@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Per-step duration predictor for the scanner mesh processing pipeline.
+
+Estimates how long each step will take for a scan from its inputs:
+
+    source_images      - number of source photos
+    source_megapixels  - total megapixels of the source photos (sampled image headers)
+    preview_mb         - size of photogrammetry/preview.usdz (stands in for the preview triangle count)
+    high_sensitivity   - 1 for --feature-sensitivity high
+    detail_level       - groove-mesher -d level (preview=0 ... raw=4)
+
+One ridge-regularised least squares model per step is trained on successful step timings
+from the run database (run_store.py), where every run records its scan's features as facts.
+Steps with too little history fall back to their median duration, then to built-in defaults.
+The model is cached in takes/logs/duration_model.json and retrained once it is a day old.
+
+Usage:
+    python3 duration_predictor.py estimate --takes /takes --scan X [--steps 12345]
+    python3 duration_predictor.py train --takes /takes
+    python3 duration_predictor.py features --takes /takes --scan X
+    python3 duration_predictor.py record --takes /takes --scan X     # store features for this run
+"""
+
+import argparse
+import json
+import os
+import statistics
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MODEL_FILENAME = 'duration_model.json'
+MODEL_MAX_AGE_S = 24 * 3600
+MIN_SAMPLES = 8
+RIDGE = 1e-2
+HISTORY_DAYS = 365
+HEADER_SAMPLE = 24
+FEATURE_PREFIX = 'feature_'
+
+DETAIL_LEVELS = {'preview': 0, 'reduced': 1, 'medium': 2, 'full': 3, 'raw': 4}
+DEFAULT_DETAIL = 'full'  # groove_mesh_check runs the final model at -d=full
+FEATURE_NAMES = ('source_images', 'source_megapixels', 'preview_mb', 'high_sensitivity', 'detail_level')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.heic', '.tif', '.tiff')
+
+# Typical processing times (README) used until a step has history
+DEFAULT_DURATIONS = {'generate_mesh': 352.0, 'cleanup': 9.0, 'face_detection': 1.0, 'add_rig': 2.0, 'pose_test': 5.0}
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ FEATURES ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def image_size(path) -> Optional[Tuple[int, int]]:
+    """(width, height) from a JPEG or PNG header without decoding the image (None if unknown)."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(24)
+            if head[:8] == b'\x89PNG\r\n\x1a\n':
+                return struct.unpack('>II', head[16:24])
+            if head[:2] != b'\xff\xd8':
+                return None
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                    continue
+                length = struct.unpack('>H', f.read(2))[0]
+                # SOF0-SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+                if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>xHH', f.read(5))
+                    return width, height
+                f.seek(length - 2, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return None
+
+
+def scan_features(scan_dir, feature_sensitivity='normal', detail=DEFAULT_DETAIL) -> Dict[str, float]:
+    """Predictor inputs for a scan (reads at most HEADER_SAMPLE image headers)."""
+    scan_dir = Path(scan_dir)
+    images = []
+    source_dir = scan_dir / 'source'
+    if source_dir.is_dir():
+        images = sorted(entry.path for entry in os.scandir(source_dir)
+                        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS))
+
+    step = max(1, len(images) // HEADER_SAMPLE)
+    sizes = [size for size in (image_size(path) for path in images[::step][:HEADER_SAMPLE]) if size]
+    mean_megapixels = statistics.mean(w * h / 1e6 for w, h in sizes) if sizes else 0.0
+
+    preview = scan_dir / 'photogrammetry' / 'preview.usdz'
+    return {
+        'source_images': float(len(images)),
+        'source_megapixels': round(mean_megapixels * len(images), 1),
+        'preview_mb': round(preview.stat().st_size / 1e6, 2) if preview.is_file() else 0.0,
+        'high_sensitivity': 1.0 if feature_sensitivity == 'high' else 0.0,
+        'detail_level': float(DETAIL_LEVELS.get(detail, DETAIL_LEVELS[DEFAULT_DETAIL])),
+    }
+
+
+def record_features(timeline, features):
+    """Store a run's features as timeline facts (and so in the run database) for training."""
+    timeline.fact(step='', **{f"{FEATURE_PREFIX}{name}": value for name, value in features.items()})
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MODEL ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def _solve(matrix, vector):
+    """Solve a small dense linear system by Gaussian elimination with partial pivoting."""
+    n = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        if abs(rows[col][col]) < 1e-12:
+            continue
+        for r in range(col + 1, n):
+            factor = rows[r][col] / rows[col][col]
+            for c in range(col, n + 1):
+                rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        if abs(rows[r][r]) < 1e-12:
+            continue
+        solution[r] = (rows[r][n] - sum(rows[r][c] * solution[c] for c in range(r + 1, n))) / rows[r][r]
+    return solution
+
+
+def fit_linear(samples: List[Tuple[Dict[str, float], float]]) -> Dict:
+    """Ridge least squares on standardised features; constant features get a zero weight."""
+    means = {name: statistics.mean(f.get(name, 0.0) for f, _ in samples) for name in FEATURE_NAMES}
+    scales = {name: statistics.pstdev([f.get(name, 0.0) for f, _ in samples]) or 1.0 for name in FEATURE_NAMES}
+    xs = [[1.0] + [(f.get(name, 0.0) - means[name]) / scales[name] for name in FEATURE_NAMES] for f, _ in samples]
+    ys = [y for _, y in samples]
+
+    size = len(FEATURE_NAMES) + 1
+    xtx = [[sum(x[i] * x[j] for x in xs) + (RIDGE * len(xs) if i == j and i else 0.0) for j in range(size)]
+           for i in range(size)]
+    xty = [sum(x[i] * y for x, y in zip(xs, ys)) for i in range(size)]
+    weights = _solve(xtx, xty)
+    residuals = [y - sum(w * v for w, v in zip(weights, x)) for x, y in zip(xs, ys)]
+    return {
+        'kind': 'linear', 'samples': len(samples), 'weights': weights, 'means': means, 'scales': scales,
+        'rmse_s': (sum(r * r for r in residuals) / len(residuals)) ** 0.5,
+        'min_s': min(ys), 'max_s': max(ys),
+    }
+
+
+class DurationPredictor:
+    """
+    Per-step duration models.
+
+    Args:
+        models: Dict of step name -> model dict (see fit_linear); steps without a model
+            use DEFAULT_DURATIONS
+    """
+
+    def __init__(self, models=None, trained_at=0.0):
+        self.models = models or {}
+        self.trained_at = trained_at
+
+    @classmethod
+    def train(cls, rows: Iterable[Tuple[str, Dict[str, float], float]]) -> 'DurationPredictor':
+        """Fit from (step, features, wall seconds) rows."""
+        by_step = {}
+        for step, features, wall_s in rows:
+            by_step.setdefault(step, []).append((features, wall_s))
+        models = {}
+        for step, samples in by_step.items():
+            if len(samples) >= MIN_SAMPLES:
+                models[step] = fit_linear(samples)
+            else:
+                models[step] = {'kind': 'median', 'samples': len(samples),
+                                'value': statistics.median(wall for _, wall in samples)}
+        return cls(models, time.time())
+
+    def predict(self, step_name, features: Dict[str, float]) -> float:
+        model = self.models.get(step_name)
+        if model is None:
+            return DEFAULT_DURATIONS.get(step_name, 0.0)
+        if model['kind'] == 'median':
+            return model['value']
+        x = [1.0] + [(features.get(name, 0.0) - model['means'][name]) / model['scales'][name] for name in FEATURE_NAMES]
+        estimate = sum(w * v for w, v in zip(model['weights'], x))
+        # never extrapolate below the fastest or far beyond the slowest run seen
+        return min(max(estimate, model['min_s']), 2.0 * model['max_s'])
+
+    def describe(self, step_name) -> str:
+        model = self.models.get(step_name)
+        if model is None:
+            return 'default'
+        if model['kind'] == 'median':
+            return f"median of {model['samples']} run(s)"
+        return f"linear, {model['samples']} runs, ±{model['rmse_s']:.0f}s"
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'trained_at': self.trained_at, 'features': FEATURE_NAMES, 'models': self.models}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> 'DurationPredictor':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if tuple(data.get('features', ())) != FEATURE_NAMES:
+            raise ValueError("model was trained with different features")
+        return cls(data.get('models', {}), data.get('trained_at', 0.0))
+
+    @classmethod
+    def for_takes(cls, takes_path, max_age_s=MODEL_MAX_AGE_S) -> 'DurationPredictor':
+        """Cached model for a takes folder, retrained from the run database when stale."""
+        model_path = os.path.join(takes_path, 'logs', MODEL_FILENAME)
+        try:
+            predictor = cls.load(model_path)
+            if time.time() - predictor.trained_at < max_age_s:
+                return predictor
+        except (OSError, ValueError, json.JSONDecodeError):
+            predictor = cls()
+        try:
+            import run_store
+            db_path = run_store.store_path(takes_path)
+            if not os.path.exists(db_path):
+                return predictor
+            with run_store.RunStore(db_path) as store:
+                predictor = cls.train(training_rows(store))
+            predictor.save(model_path)
+        except Exception as e:  # sqlite3.Error, OSError; the defaults are still usable
+            print(f"WARNING: cannot train duration model: {e}", flush=True)
+        return predictor
+
+
+def training_rows(store, since_days=HISTORY_DAYS):
+    """(step, features, wall_s) for successful steps of runs that recorded their features."""
+    since = time.time() - since_days * 86400
+    features = {}
+    for row in store.conn.execute("SELECT run_id, key, value FROM facts WHERE key LIKE ? AND recorded_at >= ?",
+                                  (f"{FEATURE_PREFIX}%", since)):
+        features.setdefault(row['run_id'], {})[row['key'][len(FEATURE_PREFIX):]] = json.loads(row['value'])
+    rows = []
+    for row in store.conn.execute("SELECT run_id, step, wall_s FROM steps "
+                                  "WHERE kind = 'step' AND failed = 0 AND started_at >= ?", (since,)):
+        if row['run_id'] in features and row['step']:
+            rows.append((row['step'], features[row['run_id']], row['wall_s']))
+    return rows
+
+
+def format_duration(seconds) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict pipeline step durations from scan inputs")
+    parser.add_argument('command', choices=['estimate', 'train', 'features', 'record'])
+    parser.add_argument('--takes', help="Takes path")
+    parser.add_argument('--environment', '-e', help="Environment to read takes_path from")
+    parser.add_argument('--scan', help="Scan identifier")
+    parser.add_argument('--steps', default='12345', help="Step numbers to estimate (default: 12345)")
+    parser.add_argument('--feature-sensitivity', default='normal', choices=['normal', 'high'])
+    parser.add_argument('--detail', default=DEFAULT_DETAIL, choices=list(DETAIL_LEVELS),
+                        help="groove-mesher detail level (default: full)")
+    parser.add_argument('--json', action='store_true', help="Print JSON instead of text")
+    args = parser.parse_args()
+
+    try:
+        takes_path = args.takes
+        if not takes_path:
+            from config_reader import get_config
+            takes_path = get_config(args.environment).takes_path
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.command == 'train':
+        predictor = DurationPredictor.for_takes(takes_path, max_age_s=0)
+        for step, model in sorted(predictor.models.items()):
+            print(f"   • {step:<15} {predictor.describe(step)}")
+        if not predictor.models:
+            print("No step history with recorded features yet; using default durations")
+        return
+
+    if not args.scan:
+        parser.error(f"{args.command} needs --scan")
+    features = scan_features(os.path.join(takes_path, args.scan), args.feature_sensitivity, args.detail)
+
+    if args.command == 'features':
+        print(json.dumps(features, indent=2))
+    elif args.command == 'record':
+        import pipeline_timeline
+        record_features(pipeline_timeline.for_scan(takes_path, args.scan), features)
+    elif args.command == 'estimate':
+        from pipeline_runner import STEPS_BY_NUMBER
+        predictor = DurationPredictor.for_takes(takes_path)
+        steps = [STEPS_BY_NUMBER[int(n)] for n in args.steps if n.isdigit() and int(n) in STEPS_BY_NUMBER]
+        estimates = {step.name: predictor.predict(step.name, features) for step in steps}
+        if args.json:
+            print(json.dumps({'features': features, 'estimates': estimates}, indent=2))
+            return
+        print(f"   ⏱️  ESTIMATED DURATION ({int(features['source_images'])} images, "
+              f"{features['source_megapixels']:.0f} MP, detail {args.detail}):")
+        for step in steps:
+            print(f"      Step {step.number}: {step.title:<15} ~{format_duration(estimates[step.name]):>8}"
+                  f"  ({predictor.describe(step.name)})")
+        print(f"      {'Total':<23} ~{format_duration(sum(estimates.values())):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+import bpy
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cleanup
+import add_rig
+import pose_test
+import pipeline_timeline
+from cleanup import print_decorated, print_enhanced
+
+
+print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+print('▬▬▬▬▬▬▬▬▬▬▬▬▬ FUSED SESSION ▬▬▬▬▬▬▬▬▬▬▬')
+print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ 10.18.26 ▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+
+# Runs steps 2-5 in one Blender session: cleanup -> face detection (external) -> add_rig -> pose_test.
+# The scan object, armature and materials stay in memory between the steps instead of being
+# saved to {scan}.blend / {scan}-rig.blend and appended back (three times for the pose test).
+#
+# {scan}.blend and {scan}.png are still written by cleanup: the face detection step renders the
+# camera corners from {scan}.blend and, when no face is found, rotates the mesh and re-saves it.
+# In that case the rotated scan is appended from disk, exactly like add_rig.py does.
+#
+# usage blender -b -P fused_session.py -- --scan SCAN_ID --path TAKES_DIRECTORY --software SOFTWARE_DIRECTORY
+#       --environment_map HDRI_FILEPATH [--python PYTHON_EXECUTABLE] [--checkpoints rig]
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ COMMAND LINE ARGUMENTS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    # get all script args
+    _, all_arguments = parser.parse_known_args()
+    double_dash_index = all_arguments.index('--')
+    script_args = all_arguments[double_dash_index + 1:]
+
+    # add parser rules (cleanup.py, add_rig.py and pose_test.py read the same '--' arguments)
+    parser.add_argument('-n', '--scan', help="scan name")
+    parser.add_argument('-m', '--path', help="directory", default="/Users/administrator/groove-test/takes/")
+    parser.add_argument('-s', '--software', help="software", default="/Users/administrator/groove-test/software/scannermeshprocessing-2023/")
+    parser.add_argument('-py', '--python', help="python executable for the face detection step (default: scanner_env)", default="")
+    parser.add_argument('-ck', '--checkpoints', help="intermediate files to write: 'none' or 'rig' ({scan}-rig.blend)", default="none")
+    parser.add_argument('-sf', '--skip_face_detection', help="reuse an existing {scan}_results.txt", default=0)
+    parsed_script_args, _ = parser.parse_known_args(script_args)
+    return parsed_script_args
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ USEFUL FUNCTIONS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def file_signature(filepath):
+    """changes whenever the file is rewritten or replaced"""
+    if not os.path.exists(filepath):
+        return None
+    stat = os.stat(filepath)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def find_scanner_python(software_path):
+    python_path = os.path.join(software_path, "scanner_env", "bin", "python3")
+    return python_path if os.path.exists(python_path) else "python3"
+
+
+def find_scan_object():
+    collection = bpy.data.collections.get("geo")
+    if collection is None:
+        return None
+    for obj in collection.objects:
+        if obj.type == 'MESH':
+            return obj
+    return None
+
+
+def run_face_detection(scan, path, software_path, python_path):
+    face_detector_script = os.path.join(software_path, "pose_gen_package", "face_detector.py")
+    rotate_mesh_script = os.path.join(software_path, "rotate_mesh.py")
+    command = [python_path, face_detector_script, "--", "--scan", scan, "--path", path, "--software", software_path,
+               "--blender", bpy.app.binary_path, "--rotmesh", rotate_mesh_script]
+    print_enhanced(" ".join(command), label="RUN COMMAND", label_color="yellow")
+    return subprocess.run(command).returncode
+
+
+def prepare_scene_for_rigging(scan_obj):
+    """leaves only the scan object in the scene, as add_rig.py's clean start + append would"""
+    for obj in list(bpy.context.scene.objects):
+        if obj != scan_obj:
+            bpy.data.objects.remove(obj, do_unlink=True)
+
+    collection = bpy.data.collections.get("Collection")
+    if collection is not None and not collection.objects:
+        bpy.data.collections.remove(collection)
+
+
+def write_checkpoint(filepath, collection_names):
+    """writes only the given collections (and what they use) to filepath"""
+    datablocks = {bpy.data.collections[name] for name in collection_names if bpy.data.collections.get(name)}
+    if not datablocks:
+        print_enhanced(f"write_checkpoint failed | none of {collection_names} found", text_color="red", label="ERROR", label_color="red")
+        return False
+
+    add_rig.pack_textures()
+    tmp_filepath = f"{os.path.splitext(filepath)[0]}.tmp.blend"
+    try:
+        bpy.data.libraries.write(tmp_filepath, datablocks, fake_user=True)
+        os.replace(tmp_filepath, filepath)
+    except Exception as e:
+        print_enhanced(f"write_checkpoint failed | ERROR: {e}", text_color="red", label="ERROR", label_color="red")
+        return False
+
+    print_enhanced(filepath, label="CHECKPOINT", label_color="green")
+    return True
+
+
+def load_pose_test_template(template_filepath):
+    """appends the pose test template scene and makes it the active scene, the rig collections are linked into it"""
+    if bpy.context.window is None:
+        return None
+
+    previous_scene = bpy.context.scene
+    with bpy.data.libraries.load(template_filepath, link=False) as (data_from, data_to):
+        data_to.scenes = data_from.scenes[:1]
+
+    if not data_to.scenes or data_to.scenes[0] is None:
+        return None
+
+    template_scene = data_to.scenes[0]
+    bpy.context.window.scene = template_scene
+
+    for collection in list(previous_scene.collection.children):
+        if collection.name == "rig":
+            template_scene.collection.children.link(collection)
+    bpy.data.scenes.remove(previous_scene)
+
+    print_enhanced(f"{template_scene.name} from {template_filepath}", label="POSE TEST TEMPLATE", label_color="green")
+    return template_scene
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MAIN ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    print_decorated("MAIN VARIABLES")
+    args = get_args()
+    scan = str(args.scan)
+    path = str(args.path)
+    software_path = str(args.software)
+    python_path = str(args.python) or find_scanner_python(software_path)
+    checkpoints = str(args.checkpoints)
+    skip_face_detection = int(args.skip_face_detection)
+
+    photogrammetry_path = os.path.join(path, scan, "photogrammetry")
+    scan_obj_filepath = os.path.join(photogrammetry_path, f"{scan}.blend")
+    results_filepath = os.path.join(photogrammetry_path, f"{scan}_results.txt")
+    rig_filepath = os.path.join(photogrammetry_path, f"{scan}-rig.blend")
+    armature_filepath = os.path.join(software_path, "skeleton_template.blend")
+    pose_test_template_filepath = os.path.join(software_path, "pose_test_render.blend")
+    pose_test_rig_filepath = os.path.join(software_path, "pose_test_rig.blend")
+    pose_test_blender_filepath = os.path.join(photogrammetry_path, f"{scan}-pose_test.blend")
+    fake_bones_render_filepath = os.path.join(photogrammetry_path, f"{scan}-pose_test_bones.png")
+    pose_test_render_filepath = os.path.join(photogrammetry_path, f"{scan}-pose_test.png")
+
+    print_enhanced(path, label="PATH", label_color="cyan")
+    print_enhanced(scan, label="SCAN", label_color="cyan")
+    print_enhanced(software_path, label="SOFTWARE", label_color="cyan")
+    print_enhanced(python_path, label="PYTHON", label_color="cyan")
+    print_enhanced(checkpoints, label="CHECKPOINTS", label_color="cyan")
+
+    timings = {}
+
+    # STEP 2: CLEANUP
+    step_start = time.perf_counter()
+    cleanup.main()
+    scan_obj = find_scan_object()
+    if scan_obj is None:
+        print_enhanced("cleanup failed | scan object not found in 'geo'", text_color="red", label="ERROR", label_color="red")
+        sys.exit(1)
+    cleaned_signature = file_signature(scan_obj_filepath)
+    timings["cleanup"] = time.perf_counter() - step_start
+
+    # STEP 3: FACE DETECTION (external python environment)
+    step_start = time.perf_counter()
+    if not skip_face_detection:
+        print_decorated("FACE DETECTION")
+        exit_code = run_face_detection(scan, path, software_path, python_path)
+        if exit_code != 0:
+            print_enhanced(f"face detection failed | exit code {exit_code}", text_color="red", label="ERROR", label_color="red")
+            sys.exit(exit_code)
+    if not os.path.exists(results_filepath):
+        print_enhanced(f"face detection failed | missing {results_filepath}", text_color="red", label="ERROR", label_color="red")
+        sys.exit(1)
+    timings["face_detection"] = time.perf_counter() - step_start
+
+    # STEP 4: ADD RIG
+    step_start = time.perf_counter()
+    if file_signature(scan_obj_filepath) != cleaned_signature:
+        # the face detection step rotated the mesh and re-saved it
+        print_enhanced(f"{scan}.blend changed during face detection, appending the rotated scan", label="INFO", label_color="yellow")
+        add_rig.scene_clean_start()
+        scan_obj = add_rig.append_scan_object(scan_obj_filepath)
+        if scan_obj is None:
+            print_enhanced("scan_obj is None", text_color="red", label="ERROR", label_color="red")
+            sys.exit(1)
+    else:
+        prepare_scene_for_rigging(scan_obj)
+
+    add_rig.rig_scan_object(scan_obj, results_filepath, armature_filepath, pipeline_timeline.for_scan(path, scan, step="add_rig"))
+    if checkpoints == "rig":
+        write_checkpoint(rig_filepath, ["rig", "keypoints", "keypoints_front"])
+    timings["add_rig"] = time.perf_counter() - step_start
+
+    # STEP 5: POSE TEST
+    step_start = time.perf_counter()
+    print_decorated("POSE TEST")
+    if load_pose_test_template(pose_test_template_filepath) is not None:
+        rig_collection = bpy.data.collections.get("rig")
+        for suffix in (".001", ".002"):
+            bpy.context.scene.collection.children.link(pose_test.duplicate_collection(rig_collection, suffix))
+        scan_rigs = pose_test.find_scan_rigs()
+    else:
+        # no window to switch scenes with: fall back to the on-disk hand-off
+        print_enhanced("cannot switch scenes, using the on-disk rig hand-off", label="INFO", label_color="yellow")
+        if checkpoints != "rig":
+            write_checkpoint(rig_filepath, ["rig", "keypoints", "keypoints_front"])
+        bpy.ops.wm.open_mainfile(filepath=pose_test_template_filepath)
+        scan_rigs = pose_test.append_scans(rig_filepath)
+
+    test_rigs = pose_test.append_test_rigs(pose_test_rig_filepath)
+    pose_test.run_pose_test(scan_rigs, test_rigs, fake_bones_render_filepath, pose_test_render_filepath,
+                            pipeline_timeline.for_scan(path, scan, step="pose_test"))
+    pose_test.save_as(pose_test_blender_filepath)
+    timings["pose_test"] = time.perf_counter() - step_start
+
+    print_decorated("TIMINGS")
+    for step_name, duration in timings.items():
+        print_enhanced(f"{duration:.2f}s", label=step_name.upper(), label_color="cyan")
+
+
+if __name__ == '__main__':
+    IT = time.perf_counter()
+    main()
+    print_enhanced(f"{time.perf_counter() - IT:.2f}s", label="FUSED SESSION", label_color="green")
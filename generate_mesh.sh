@@ -9,14 +9,16 @@ scan_id="$1"
 software_path="${2:-$DEFAULT_SOFTWARE_PATH}"
 base_path="${3:-$DEFAULT_TAKES_PATH}"
 feature_sensitivity="${4:-normal}"
+detail_level="${5:-full}"
 
 # Check if scan ID is provided
 if [ -z "$scan_id" ]; then
-    echo "Usage: $0 <scan_id> [software_path] [takes_path] [feature_sensitivity]"
+    echo "Usage: $0 <scan_id> [software_path] [takes_path] [feature_sensitivity] [detail_level]"
     echo "  scan_id: Required scan identifier"
     echo "  software_path: Optional path to software directory (default: $DEFAULT_SOFTWARE_PATH)"
     echo "  takes_path: Optional path to takes directory (default: $DEFAULT_TAKES_PATH)"
     echo "  feature_sensitivity: Optional feature sensitivity (default: normal)"
+    echo "  detail_level: Optional final model detail (preview|reduced|medium|full|raw, default: full)"
     exit 1
 fi
 
@@ -67,6 +69,7 @@ echo "   • Base path: '$base_path'"
 echo "   • Source folder: '$input_folder'"
 echo "   • Output folder: '$output_folder'"
 echo "   • Feature sensitivity: '$feature_sensitivity'"
+echo "   • Detail level: '$detail_level'"
 echo ""
 
 # Set up tool paths using the configurable software path
@@ -74,6 +77,7 @@ blender="/Applications/Blender.app/Contents/MacOS/Blender"
 grooveMesher="$software_path/scannermeshprocessing-2023/builds/groove-mesher"
 grooveMeshCheck="$software_path/scannermeshprocessing-2023/groove_mesh_check.py"
 prepUSDZ="$software_path/scannermeshprocessing-2023/prep_usdz.py"
+previewBbox="$software_path/scannermeshprocessing-2023/preview_bbox.py"
 
 echo "🔍 Tool paths:"
 echo "   • Blender: '$blender'"
@@ -149,8 +153,52 @@ echo "🎯 PHASE 1: Generating preview mesh"
 echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
 echo "Command: \"$grooveMesher\" \"$input_folder\" \"$output_folder\" --create-preview"
 echo ""
-"$grooveMesher" "$input_folder" "$output_folder" --create-preview # --create-final-model --no-bounds -d medium
-MESHER_EXIT=$?
+mesherRunner="$software_path/scannermeshprocessing-2023/mesher_runner.py"
+manifestScript="$software_path/scannermeshprocessing-2023/artifact_manifest.py"
+speculativeMesher="$software_path/scannermeshprocessing-2023/speculative_mesher.py"
+bboxCache="$software_path/scannermeshprocessing-2023/bbox_cache.py"
+BBOX_CACHED=0
+if [ -f "$bboxCache" ] && python3 "$bboxCache" lookup --takes "$base_path" --source "$input_folder" --mesher "$grooveMesher" \
+        --restore-preview "$output_folder/preview.usdz"; then
+    # same source images, mesher build and bbox settings as an earlier run: its bounding box is
+    # cached (and its preview.usdz restored), so groove_mesh_check goes straight to the final model
+    BBOX_CACHED=1
+fi
+if [ $BBOX_CACHED -eq 1 ]; then
+    echo "⏭️  Bounding box cached for these source images, skipping the preview mesher"
+    log_message "generate_mesh.sh: Bounding box cache hit, skipping the preview mesher"
+    MESHER_EXIT=0
+elif [ -f "$manifestScript" ] && python3 "$manifestScript" verify --takes "$base_path" --scan "$scan_id" --step preview_mesh --quiet; then
+    # an interrupted run already produced a verified preview from the same source images
+    echo "⏭️  preview.usdz is complete (artifact manifest verified), skipping the preview mesher"
+    log_message "generate_mesh.sh: Reusing verified preview.usdz"
+    MESHER_EXIT=0
+else
+    [ -f "$manifestScript" ] && python3 "$manifestScript" clear --takes "$base_path" --scan "$scan_id" --step preview_mesh
+    if [ -f "$speculativeMesher" ]; then
+        # start the final model now with predicted bounds (config.json speculative_mesh);
+        # groove_mesh_check confirms or cancels it once the real bounding box is known
+        trap 'python3 "$speculativeMesher" cancel --output "$output_folder" --quiet' EXIT
+        python3 "$speculativeMesher" start --takes "$base_path" --scan "$scan_id" --mesher "$grooveMesher" \
+            --source "$input_folder" --output "$output_folder" --sensitivity "$feature_sensitivity" --detail "$detail_level"
+    fi
+    PREVIEW_START=$(date +%s)
+    if [ -f "$mesherRunner" ]; then
+        # wall-clock/stall watchdog with retries (groove_mesher_preview policy in config.json "supervisor"),
+        # plus stage/percent/ETA events for the status server and timeline
+        python3 "$mesherRunner" exec --takes "$base_path" --scan "$scan_id" --step generate_mesh --name groove_mesher_preview --kind substep \
+            --save-output "$output_folder/groove_mesher_preview.out" -- \
+            "$grooveMesher" "$input_folder" "$output_folder" --create-preview
+    else
+        "$grooveMesher" "$input_folder" "$output_folder" --create-preview # --create-final-model --no-bounds -d medium
+    fi
+    MESHER_EXIT=$?
+    if [ $MESHER_EXIT -eq 0 ] && [ -f "$manifestScript" ]; then
+        python3 "$manifestScript" record --takes "$base_path" --scan "$scan_id" --step preview_mesh --quiet \
+            --outputs photogrammetry/preview.usdz --inputs source --scripts builds/groove-mesher \
+            --duration $(( $(date +%s) - PREVIEW_START ))
+    fi
+fi
 echo ""
 echo "✅ grooveMesher completed with exit code: $MESHER_EXIT"
 echo ""
@@ -179,9 +227,17 @@ echo ""
 log_message "generate_mesh.sh: Starting Phase 2 - groove_mesh_check execution"
 echo "🔍 PHASE 2: Mesh analysis and processing"
 echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-echo "Command: \"$blender\" -b -P \"$grooveMeshCheck\" -- \"$scan_id\" \"$preview_file\" \"$prepUSDZ\" \"$grooveMesher\" \"$input_folder\" \"$output_folder\" \"$feature_sensitivity\""
-echo ""
-"$blender" -b -P "$grooveMeshCheck" -- "$scan_id" "$preview_file" "$prepUSDZ" "$grooveMesher" "$input_folder" "$output_folder" "$feature_sensitivity"
+# The bounding box is cached or computed with NumPy when preview_bbox.py is enabled, so Blender is only
+# launched (by groove_mesh_check.py, for prep_usdz.py) when the NumPy path cannot read the preview
+if [ $BBOX_CACHED -eq 1 ] || { [ -f "$previewBbox" ] && python3 "$previewBbox" available; }; then
+    echo "Command: python3 \"$grooveMeshCheck\" -- \"$scan_id\" \"$preview_file\" \"$prepUSDZ\" \"$grooveMesher\" \"$input_folder\" \"$output_folder\" \"$feature_sensitivity\" \"$detail_level\" --blender \"$blender\""
+    echo ""
+    python3 "$grooveMeshCheck" -- "$scan_id" "$preview_file" "$prepUSDZ" "$grooveMesher" "$input_folder" "$output_folder" "$feature_sensitivity" "$detail_level" --blender "$blender"
+else
+    echo "Command: \"$blender\" -b -P \"$grooveMeshCheck\" -- \"$scan_id\" \"$preview_file\" \"$prepUSDZ\" \"$grooveMesher\" \"$input_folder\" \"$output_folder\" \"$feature_sensitivity\" \"$detail_level\""
+    echo ""
+    "$blender" -b -P "$grooveMeshCheck" -- "$scan_id" "$preview_file" "$prepUSDZ" "$grooveMesher" "$input_folder" "$output_folder" "$feature_sensitivity" "$detail_level"
+fi
 BLENDER_EXIT=$?
 echo ""
 echo "✅ grooveMeshCheck completed with exit code: $BLENDER_EXIT"
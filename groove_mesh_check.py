@@ -1,295 +1,294 @@
 import os
-import re
-import subprocess
-import bpy
 import argparse
+import json
 import sys
-import shutil
 import shlex
-import select
-import pty
-
-def print_flush(*args, **kwargs):
-    """
-    Print function wrapper that automatically includes flush=True.
-    
-    Args:
-        *args: Arguments to pass to print()
-        **kwargs: Keyword arguments to pass to print()
-    """
-    kwargs['flush'] = True
-    print(*args, **kwargs)
-
-print_flush('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
-print_flush('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
-print_flush('▬▬▬▬▬▬▬▬▬ groove_mesh_check ▬▬▬▬▬▬▬▬▬▬▬')
-print_flush('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ 9.22.23 ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
-print_flush('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
-print_flush('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
-
-def run_command_with_realtime_output(command: str, shell: bool = True) -> int:
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bbox_cache
+import mesher_runner
+import pipeline_log
+import pipeline_timeline
+import preview_bbox
+import speculative_mesher
+import step_supervisor
+import usdz_archive
+
+SUPERVISOR_OVERRIDES = step_supervisor.config_overrides()
+DETAIL_LEVELS = ['preview', 'reduced', 'medium', 'full', 'raw']
+
+log = pipeline_log.get_logger("groove_mesh_check")
+
+log.info('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+log.info('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+log.info('▬▬▬▬▬▬▬▬▬ groove_mesh_check ▬▬▬▬▬▬▬▬▬▬▬')
+log.info('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ 9.22.23 ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+log.info('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+log.info('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
+
+def run_command_with_realtime_output(command: str, shell: bool = True, policy_name: str = None) -> int:
     """
     Run a subprocess command with real-time output display on macOS.
-    Uses multiple approaches to handle stubborn applications like groove-mesher.
+    Uses a pseudo-terminal so stubborn applications like groove-mesher flush their progress,
+    and runs under the step supervisor's wall-clock/stall timeouts for policy_name.
     
     Args:
         command (str): The command to execute
         shell (bool): Whether to run the command through shell
+        policy_name (str): Supervisor policy to apply (None: no timeouts)
     
     Returns:
-        int: Return code from the subprocess
+        int: Return code from the subprocess (124 when the watchdog killed it)
     """
-    print_flush(f"Executing command: {command}")
-    return _run_with_pty(command)
+    log.info(f"Executing command: {command}")
+    policy = step_supervisor.policy_for(policy_name, SUPERVISOR_OVERRIDES) if policy_name else step_supervisor.DEFAULT_POLICY
+    return mesher_runner.run(mesher_runner.supervise(
+        command, policy['wall_timeout'], policy['stall_timeout'], echo=log.info, shell=shell,
+        kill_grace=policy['kill_grace'], tail_lines=policy['tail_lines'])).exit_code
 
-def _run_with_pty(command: str) -> int:
-    """Run command with pseudo-terminal for real-time output on macOS."""
-    try:
-        # Create pseudo-terminal
-        master, slave = pty.openpty()
-        
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=slave,
-            stderr=slave,
-            stdin=slave,
-            close_fds=True
-        )
-        
-        # Close slave end in parent process
-        os.close(slave)
-        
-        # Read output in real-time
-        output_buffer = ""
-        while True:
-            try:
-                # Check if data is available to read
-                ready, _, _ = select.select([master], [], [], 0.1)
-                if ready:
-                    data = os.read(master, 1024)
-                    if data:
-                        # Decode and handle partial lines, unify carriage returns
-                        text = data.decode('utf-8', errors='ignore').replace('\r', '\n')
-                        output_buffer += text
-                        
-                        # Process complete lines
-                        while '\n' in output_buffer:
-                            line, output_buffer = output_buffer.split('\n', 1)
-                            if line.strip():
-                                print_flush(line.strip())
-                    else:
-                        break
-                
-                # Check if process is still running
-                if process.poll() is not None:
-                    # Process finished, read any remaining output
-                    try:
-                        remaining = os.read(master, 1024)
-                        if remaining:
-                            text = remaining.decode('utf-8', errors='ignore').replace('\r', '\n')
-                            output_buffer += text
-                            # Print any remaining lines
-                            for line in output_buffer.split('\n'):
-                                if line.strip():
-                                    print_flush(line.strip())
-                    except:
-                        pass
-                    break
-                    
-            except OSError:
-                break
-        
-        os.close(master)
-        return process.wait()
-        
-    except Exception as e:
-        print_flush(f"PTY setup failed: {e}")
-        raise
-
-def _run_with_popen(command: str, shell: bool = True) -> int:
-    """Standard Popen approach with environment tweaks."""
-    # Set environment variables that might help with buffering
-    env = os.environ.copy()
-    env['PYTHONUNBUFFERED'] = '1'
-    env['TERM'] = 'dumb'  # Some apps behave differently with different TERM values
-    
-    process = subprocess.Popen(
-        command,
-        shell=shell,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True,
-        bufsize=0,  # Try unbuffered
-        env=env
-    )
-    
-    # Read and print output line by line
-    while True:
-        output = process.stdout.readline()
-        if output == '' and process.poll() is not None:
-            break
-        if output:
-            print_flush(output.strip())
-    
-    return process.wait()
+def move_final_model(final_usdz_dir, output_path):
+    # drop groove-mesher's random ids (baked_mesh_XXXXXX.usda -> baked_mesh.usda) while moving
+    usdz_archive.publish_final_model(final_usdz_dir, output_path, log=log.info)
 
-def _run_with_script_command(command: str) -> int:
+def use_speculative_run(output_path, bounds, feature_sensitivity, detail_level, settings, timeline):
     """
-    Use macOS script command to force TTY behavior.
-    The script command tricks applications into thinking they're running in a real terminal.
+    Confirm or cancel the speculative final run generate_mesh.sh started (speculative_mesher.py).
+
+    Returns:
+        bool: True when it built the final model with bounds close enough to the real ones
+    """
+    speculation = speculative_mesher.Speculation(output_path)
+    if not speculation.exists:
+        return False
+    fits, reason = speculative_mesher.check_bounds(speculation.bounds, bounds, settings['tolerance'])
+    if fits and not speculation.matches(feature_sensitivity, detail_level):
+        fits, reason = False, "started with other mesher settings"
+    if not fits:
+        log.info(f"🔮 Speculative final run rejected: {reason}")
+        speculation.cancel(log=log.info)
+        timeline.fact(speculation='rejected', speculation_reason=reason)
+        return False
+
+    source = speculation.state['source']
+    log.info(f"🔮 Speculative final run confirmed ({reason}), waiting for it (output: {speculation.log_path})")
+    with timeline.span("speculative_wait") as span:
+        exit_code = span['attrs']['exit_code'] = speculation.wait(log=log.info)
+    if exit_code != 0:
+        log.warning(f"Speculative final run failed with exit code {exit_code}; meshing again with the real bounds")
+        speculation.cancel(log=log.info)
+        timeline.fact(speculation='failed', speculation_source=source)
+        return False
+    speculation.discard()
+    timeline.fact(speculation='confirmed', speculation_source=source, mesh_detail=detail_level)
+    return True
+
+def cached_bounds(takes_path, source_images_path, groove_mesher_path):
+    """
+    Look the source images up in the capture cache (bbox_cache.py).
+
+    Returns:
+        tuple: (cache, key, entry); entry is None on a miss, cache and key are None when
+        the cache is disabled or the source images cannot be fingerprinted
     """
-    import select, os
-    # Start the process under script
-    process = subprocess.Popen(
-        command,
-        shell=True,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        bufsize=0,  # Unbuffered at Python level
-        universal_newlines=True
-    )
-    fd = process.stdout.fileno()
-    buffer = ""
-    # Read raw chunks and normalize both CR and LF into true lines
-    while True:
-        ready, _, _ = select.select([fd], [], [], 0.1)
-        if ready:
-            chunk = os.read(fd, 1024)
-            if not chunk:
-                break
-            text = chunk.decode('utf-8', errors='ignore').replace('\r', '\n')
-            buffer += text
-            # Emit each complete line
-            while '\n' in buffer:
-                line, buffer = buffer.split('\n', 1)
-                if line.strip():
-                    print_flush(line.strip())
-        elif process.poll() is not None:
-            # Final flush of remaining data
-            remaining = os.read(fd, 1024).decode('utf-8', errors='ignore').replace('\r', '\n')
-            buffer += remaining
-            for line in buffer.split('\n'):
-                if line.strip():
-                    print_flush(line.strip())
-            break
-    return process.wait()
-
-def rename_files_to_correct_format(usdz_folder):
-    pattern = r'_[a-f0-9]+(?=\.|_)'
-
-    [os.rename(os.path.join(usdz_folder, f), os.path.join(usdz_folder, re.sub(pattern, '', f))) for f in os.listdir(usdz_folder) if re.search(pattern, f)]
-    print_flush("All files renamed successfully!")
-
-def main(scan_ID, usdz_path, prep_usdz_script_path, groove_mesher_path, source_images_path, output_path, feature_sensitivity):
+    settings = bbox_cache.cache_settings()
+    if not settings.get('enabled', True):
+        return None, None, None
+    try:
+        key = bbox_cache.capture_key(source_images_path, groove_mesher_path, preview_bbox.bbox_parameters(),
+                                     settings['fingerprint'])
+        cache = bbox_cache.CaptureCache.for_takes(takes_path, settings['max_entries'])
+        return cache, key, cache.lookup(key)
+    except (OSError, ValueError) as e:
+        log.warning(f"bounding box cache unavailable: {e}")
+        return None, None, None
+
+def preview_bounds(scan_ID, output_path, usdc_path, prep_usdz_script_path, blender_path, span, stats=None):
+    """
+    Bounding box of the scanned person in the preview: NumPy (preview_bbox.py) when it is
+    enabled and can read the preview, else prep_usdz.py in Blender.
+
+    Args:
+        scan_ID / output_path / usdc_path: As passed to prep_usdz.main
+        prep_usdz_script_path: Path to prep_usdz.py
+        blender_path: Blender executable, for running prep_usdz.py when this is not inside Blender
+        span: Timeline span whose attrs record the engine used
+        stats: Optional dict filled with preview mesh stats (NumPy only)
+
+    Returns:
+        tuple: (min_x, max_x, min_y, max_y, min_z, max_z), or None when no bounds were found
+    """
+    settings = preview_bbox.bbox_settings()
+    if preview_bbox.available(settings):
+        try:
+            bounds = preview_bbox.bounding_box(usdc_path, float(settings['offset']), log=log.info, stats=stats)
+            span['attrs']['engine'] = 'numpy'
+            return bounds
+        except preview_bbox.PreviewBboxError as e:
+            log.warning(f"NumPy bounding box failed ({e}); falling back to prep_usdz.py in Blender")
+
+    span['attrs']['engine'] = 'blender'
+    try:
+        import bpy  # noqa: F401 - running inside Blender
+    except ImportError:
+        bpy = None
+    if bpy is not None:
+        sys.path.append(os.path.dirname(prep_usdz_script_path))
+        import prep_usdz
+        return prep_usdz.main(scan_ID, output_path, usdc_path)
+
+    if not blender_path:
+        log.error("Not running inside Blender and no --blender executable given; cannot run prep_usdz.py")
+        return None
+    bounds_json = os.path.join(output_path, f"{scan_ID}_bounding_box.json")
+    if os.path.exists(bounds_json):
+        os.remove(bounds_json)  # never read a previous run's box
+    command = (f"{shlex.quote(blender_path)} -b -P {shlex.quote(prep_usdz_script_path)} -- "
+               f"-n {shlex.quote(scan_ID)} -m {shlex.quote(output_path)} -l 1 -j {shlex.quote(bounds_json)}")
+    exit_code = run_command_with_realtime_output(command, policy_name="prep_usdz_bbox")
+    span['attrs']['exit_code'] = exit_code
+    try:
+        with open(bounds_json) as f:
+            return tuple(json.load(f))
+    except (OSError, ValueError) as e:
+        log.error(f"prep_usdz.py (exit code {exit_code}) wrote no bounding box: {e}")
+        return None
+
+def main(scan_ID, usdz_path, prep_usdz_script_path, groove_mesher_path, source_images_path, output_path, feature_sensitivity, detail_level='full', blender_path=None):
     
-    print_flush(f"\nscan id: {scan_ID}")
-    print_flush(f"usdz_path: {usdz_path}")
-    print_flush(f"prep_usdz_script_path: {prep_usdz_script_path}")
-    print_flush(f"groove_mesher_path: {groove_mesher_path}")
-    print_flush(f"source_images_path: {source_images_path}")
-    print_flush(f"output_path: {output_path}")
-    print_flush(f"feature_sensitivity: {feature_sensitivity}\n")
-
-
-    # 1. Rename a file from preview.usdz to preview.zip
-    usdz_folder = os.path.dirname(usdz_path)
-    usdz_filename = os.path.basename(usdz_path)
-    zip_path = os.path.join(usdz_folder, 'preview.zip')
-
-    print_flush("Copying and renaming the USDZ file to a ZIP file...")
-    shutil.copy(usdz_path, zip_path)  # Use shutil.copy() instead of os.rename()
-
-    # 2. Unzip the file
-    print_flush("Unzipping the file...")
-    run_command_with_realtime_output(f'unzip -o "{zip_path}" -d "{usdz_folder}"')
- 
-    # M4 Specific
-    # the file is saved as baked_mesh_XXXXXX.usdc, we need to rename it to baked_mesh.usdc, XXXXXX is a random number
-    for root, dirs, files in os.walk(usdz_folder):
-        for file in files:
-            if file.startswith('baked_mesh_') and file.endswith('.usdc'):
-                usdc_path = os.path.join(root, file)
-                new_usdc_path = os.path.join(root, 'baked_mesh.usdc')
-                print_flush(f"Renaming {usdc_path} to {new_usdc_path}")
-                os.rename(usdc_path, new_usdc_path)
-                usdc_path = new_usdc_path
-                break
-
-    # doing th same for the tex0.png in 0 folder
-    for root, dirs, files in os.walk(os.path.join(usdz_folder, '0')):
-        for file in files:
-            if file.startswith('baked_mesh') and file.endswith('tex0.png'):
-                tex0_path = os.path.join(root, file)
-                new_tex0_path = os.path.join(root, 'baked_mesh_tex0.png')
-                print_flush(f"Renaming {tex0_path} to {new_tex0_path}")
-                os.rename(tex0_path, new_tex0_path)
-                break
-
-
-    # 3. Find the baked_mesh.usdc file
-    # for root, dirs, files in os.walk(usdz_folder):
-    #     for file in files:
-    #         if file == 'baked_mesh.usdc':
-    #             usdc_path = os.path.join(root, file)
-    #             break
-
-    # file = 'baked_mesh.usda'
-    file = 'preview.usdz'
-    usdc_path = os.path.join(usdz_folder, file)
-
-    print_flush(usdc_path)
+    log.info(f"\nscan id: {scan_ID}")
+    log.info(f"usdz_path: {usdz_path}")
+    log.info(f"prep_usdz_script_path: {prep_usdz_script_path}")
+    log.info(f"groove_mesher_path: {groove_mesher_path}")
+    log.info(f"source_images_path: {source_images_path}")
+    log.info(f"output_path: {output_path}")
+    log.info(f"feature_sensitivity: {feature_sensitivity}")
+    log.info(f"detail_level: {detail_level}\n")
+
+
+    # output_path is <takes>/<scan>/photogrammetry/
+    takes_path = os.path.dirname(os.path.dirname(os.path.normpath(output_path)))
+    pipeline_log.for_scan(takes_path, scan_ID, step="generate_mesh")
+    timeline = pipeline_timeline.for_scan(takes_path, scan_ID, step="generate_mesh")
 
     final_usdz_dir = os.path.join(output_path, "final_usdz_files")
 
-    # 5. Run the Blender Python script called prep_usdz.py
-    print_flush("Running the prep_usdz.py script...")
-    sys.path.append(os.path.dirname(prep_usdz_script_path))
-    import prep_usdz
-    result = prep_usdz.main(scan_ID, output_path, usdc_path)
+    # A rerun on unchanged source images (e.g. a feature_sensitivity sweep) finds its box in the
+    # capture cache and goes straight to the final model; generate_mesh.sh skipped the preview mesher then
+    cache, cache_key, cached = cached_bounds(takes_path, source_images_path, groove_mesher_path)
+    if cached is not None:
+        result, engine = tuple(cached['bounds']), 'cache'
+        log.info(f"📦 Bounding box cached from scan {cached['scan']} for these source images; skipping the preview")
+        timeline.fact(bbox_cache='hit', bbox_cache_scan=cached['scan'])
+        try:
+            cache.touch(cache_key)
+        except OSError as e:
+            log.warning(f"cannot update the capture cache: {e}")
+    else:
+        # 1. Extract the preview's mesh layer and texture straight from the package, under their
+        # canonical names (baked_mesh_XXXXXX.usdc -> baked_mesh.usdc, 0/baked_mesh_XXXXXX_tex0.png -> 0/baked_mesh_tex0.png)
+        usdz_folder = os.path.dirname(usdz_path)
+        log.info("Extracting the preview mesh and texture...")
+        with timeline.span("unzip") as span:
+            try:
+                with usdz_archive.UsdzArchive(usdz_path) as archive:
+                    extracted = archive.extract_canonical(usdz_folder)
+                span['attrs'].update(exit_code=0, members=len(extracted))
+                for name in extracted:
+                    log.debug(f"Extracted {name}")
+            except (OSError, zipfile.BadZipFile, ValueError) as e:
+                log.error(f"Cannot extract {usdz_path}: {e}")
+                span['attrs']['exit_code'] = 1
+
+
+        # 3. Find the baked_mesh.usdc file
+        # for root, dirs, files in os.walk(usdz_folder):
+        #     for file in files:
+        #         if file == 'baked_mesh.usdc':
+        #             usdc_path = os.path.join(root, file)
+        #             break
+
+        # file = 'baked_mesh.usda'
+        file = 'preview.usdz'
+        usdc_path = os.path.join(usdz_folder, file)
+
+        log.info(usdc_path)
+
+        # 5. Find the bounding box of the scanned person (NumPy, or prep_usdz.py in Blender)
+        log.info("Computing the preview bounding box...")
+        with timeline.span("prep_usdz_bbox") as span:
+            stats = {}
+            result = preview_bounds(scan_ID, output_path, usdc_path, prep_usdz_script_path, blender_path, span, stats)
+        engine = span['attrs']['engine']
+        if result and cache is not None:
+            try:
+                cache.store(cache_key, scan_ID, result, engine, dict(stats, preview_bytes=os.path.getsize(usdz_path)),
+                            preview=usdz_path)
+            except OSError as e:
+                log.warning(f"cannot store the bounding box in the capture cache: {e}")
+        if cache is not None:
+            timeline.fact(bbox_cache='miss')
 
     if result:
         min_x, max_x, min_y, max_y, min_z, max_z = result
-        print_flush("Bounding box values received from prep_usdz.py script.")
-        print_flush(f"min_x: {min_x}, max_x: {max_x}, min_y: {min_y}, max_y: {max_y}, min_z: {min_z}, max_z: {max_z}")
+        log.info(f"Bounding box values received ({engine}).")
+        log.info(f"min_x: {min_x}, max_x: {max_x}, min_y: {min_y}, max_y: {max_y}, min_z: {min_z}, max_z: {max_z}")
+
+        bounds = tuple(result)
+        speculation_settings = speculative_mesher.speculation_settings()
+        try:
+            bbox_cache.BoundsHistory.for_takes(takes_path, speculation_settings['history']).record(
+                bbox_cache.rig_name(speculation_settings), scan_ID, bounds)
+        except OSError as e:
+            log.warning(f"cannot record the bounding box history: {e}")
+
+        if use_speculative_run(output_path, bounds, feature_sensitivity, detail_level, speculation_settings, timeline):
+            move_final_model(final_usdz_dir, output_path)
+            return
 
         # 6. Run the groove-mesher app with the bounding box values
-        print_flush("Running groove-mesher...")
-        newMinY = abs(min_y)
-        newMaxY = -(abs(max_y))
-        command_list = [
-            f'"{groove_mesher_path}"',
-            f'"{source_images_path}"',
-            f'"{final_usdz_dir}"',
-            "--create-final-model",
-            # "--enable-object-masking",
-            "--feature-sensitivity="+feature_sensitivity,
-            "-d=full",
-            f"--minX={min_x:.2f}",
-            f"--maxX={max_x:.2f}",
-            f"--minY={min_z:.2f}",
-            f"--maxY={max_z:.2f}",
-            f"--minZ={newMaxY:.2f}",
-            f"--maxZ={newMinY:.2f}"
-        ]
-
-        command_str = ' '.join(command_list)
-        run_command_with_realtime_output(command_str)
-
-        rename_files_to_correct_format(final_usdz_dir)
-        #move files from final_usdz_dir to output_path
-        for file in os.listdir(final_usdz_dir):
-            src_file = os.path.join(final_usdz_dir, file)
-            dest_file = os.path.join(output_path, file)
-            print_flush(f"Moving {src_file} to {dest_file}")
-            shutil.move(src_file, dest_file)
+        log.info("Running groove-mesher...")
+        def command_for(attempt, degraded_detail):
+            command_str = speculative_mesher.final_model_command(
+                groove_mesher_path, source_images_path, final_usdz_dir, feature_sensitivity,
+                degraded_detail or detail_level, bounds)
+            log.info(f"Executing command: {command_str}")
+            return command_str
+
+        # Degraded retries only step down from the requested detail level
+        policy = step_supervisor.policy_for("groove_mesher_final", SUPERVISOR_OVERRIDES)
+        requested = DETAIL_LEVELS.index(detail_level)
+        policy['degrade'] = [d for d in policy['degrade'] if DETAIL_LEVELS.index(d) < requested]
+        with timeline.span("groove_mesher_final") as span:
+            mesher = mesher_runner.run(mesher_runner.run_with_policy(
+                command_for, policy, "groove-mesher", log=log.info, shell=True, echo=log.info,
+                on_event=mesher_runner.fan_out(
+                    mesher_runner.status_sink(scan_ID, 'generate_mesh', "groove_mesher_final"),
+                    mesher_runner.event_logger(log.info))))
+            span['attrs'].update(exit_code=mesher.exit_code, attempts=mesher.attempts,
+                                 detail=mesher.setting or detail_level, stages=mesher.stages)
+            if mesher.reason in ('wall', 'stall'):
+                span['attrs']['timeout'] = mesher.reason
+        if not mesher.ok:
+            log.error(f"groove-mesher failed after {mesher.attempts} attempt(s); giving up on {scan_ID}.")
+            if mesher.output is not None:
+                try:
+                    log.error(f"Raw output of the last attempt: {mesher.output.save(os.path.join(output_path, 'groove_mesher_final.out'))}")
+                except OSError as e:
+                    log.warning(f"cannot save the groove-mesher output: {e}")
+            sys.exit(mesher.exit_code)
+        if mesher.setting:
+            log.warning(f"Final model was built at degraded detail '{mesher.setting}' (requested '{detail_level}').")
+        timeline.fact(mesh_detail=mesher.setting or detail_level)
+
+        move_final_model(final_usdz_dir, output_path)
 
     else:
-        print_flush("Bounding box values not received from prep_usdz.py script. Skipping groove-mesher execution.")
+        log.info("Bounding box values not received. Skipping groove-mesher execution.")
 
 def get_args():
-    # Remove Blender specific arguments
-    argv = sys.argv[sys.argv.index("--") + 1:]
+    # Remove Blender specific arguments (run with plain python3, everything after the script is ours)
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
 
     parser = argparse.ArgumentParser(description='Process USDZ file and run a Blender script.')
     parser.add_argument('scan_id', type=str, help='Scan ID')
@@ -299,12 +298,14 @@ def get_args():
     parser.add_argument('source_images_path', type=str, help='Path to the scanner source images.')
     parser.add_argument('output_path', type=str, help='Path to the photogrammetry output.')
     parser.add_argument('feature_sensitivity', type=str, choices=['normal', 'high'], default='normal', help='Feature sensitivity for groove-mesher (default: normal).')
+    parser.add_argument('detail_level', type=str, nargs='?', choices=DETAIL_LEVELS, default='full', help='Detail level for the final groove-mesher model (default: full).')
+    parser.add_argument('--blender', type=str, help='Blender executable for the prep_usdz.py fallback when not run inside Blender.')
 
     return parser.parse_args(argv)
 
 if __name__ == "__main__":
     args = get_args()
-    main(args.scan_id, args.usdz_path, args.prep_usdz_script_path, args.groove_mesher_path, args.source_images_path, args.output_path, args.feature_sensitivity)
+    main(args.scan_id, args.usdz_path, args.prep_usdz_script_path, args.groove_mesher_path, args.source_images_path, args.output_path, args.feature_sensitivity, args.detail_level, args.blender)
 
 
 # previous working version
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Hot-folder ingestion daemon for the scanner mesh processing pipeline.
+
+Watches takes_path for new `<scan>/source/` folders, waits until a take is
+complete (a marker file, or a stable file count and size for `settle_seconds`)
+and enqueues the scan into a ScanScheduler.
+
+Only the top level of takes_path and the folders of takes still being copied
+are watched; the historical scans below takes_path are never re-walked. On
+Linux changes arrive via inotify, elsewhere (macOS) via a cheap poll of the
+watched directories' modification times.
+
+Usage:
+    python3 hot_folder_daemon.py --local
+    python3 hot_folder_daemon.py --takes /path/to/takes --settle 60 --dry-run
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import signal
+import struct
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from config_reader import get_config
+from job_queue import parse_priority
+from scan_scheduler import add_scheduler_arguments, build_scheduler
+
+DEFAULT_SETTINGS = {
+    'settle_seconds': 30,
+    'poll_interval': 2.0,
+    'min_files': 1,
+    'marker_files': ['.complete', 'DONE'],
+    'default_priority': 0,
+    'lookback_hours': 24,
+    'ignore': ['logs', '_pose_test'],
+}
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ WATCHERS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+class PollingWatcher:
+    """
+    Reports watched directories whose modification time changed.
+
+    A directory's mtime changes when entries are created, removed or renamed,
+    so one stat per watched directory per tick is enough to notice new takes.
+    """
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._mtimes = {}
+
+    def add(self, path):
+        path = str(path)
+        try:
+            self._mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            self._mtimes[path] = None
+
+    def remove(self, path):
+        self._mtimes.pop(str(path), None)
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        changed = set()
+        for path, mtime in list(self._mtimes.items()):
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                self._mtimes[path] = current
+                changed.add(path)
+        return changed
+
+    def close(self):
+        self._mtimes.clear()
+
+
+class InotifyWatcher:
+    """Linux inotify via ctypes; reports the watched directories that saw events."""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._paths_by_wd = {}
+        self._wds_by_path = {}
+
+    @classmethod
+    def available(cls):
+        return sys.platform.startswith('linux') and ctypes.util.find_library('c') is not None
+
+    def add(self, path):
+        path = str(path)
+        if path in self._wds_by_path:
+            return
+        wd = self._add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self._paths_by_wd[wd] = path
+        self._wds_by_path[path] = wd
+
+    def remove(self, path):
+        wd = self._wds_by_path.pop(str(path), None)
+        if wd is not None:
+            self._paths_by_wd.pop(wd, None)
+            self._rm_watch(self.fd, wd)
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size + name_length
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were dropped: report every watched directory
+                changed.update(self._wds_by_path)
+            elif wd in self._paths_by_wd:
+                changed.add(self._paths_by_wd[wd])
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(poll_interval, use_polling=False):
+    if not use_polling and InotifyWatcher.available():
+        try:
+            return InotifyWatcher()
+        except OSError as e:
+            print(f"⚠️  inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(poll_interval)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ DAEMON ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+@dataclass
+class PendingTake:
+    """A take that appeared but is not known to be complete yet."""
+    scan_id: str
+    scan_dir: Path
+    first_seen: float
+    last_change: float
+    snapshot: Optional[tuple] = None
+    watched: set = field(default_factory=set)
+
+    @property
+    def source_dir(self) -> Path:
+        return self.scan_dir / 'source'
+
+
+def source_snapshot(source_dir):
+    """(file count, total size, newest mtime) of a source folder, None if it does not exist."""
+    count = total_size = newest = 0
+    try:
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                count += 1
+                total_size += stat.st_size
+                newest = max(newest, stat.st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    return (count, total_size, newest)
+
+
+class HotFolderDaemon:
+    """
+    Turns new takes below takes_path into scheduler jobs.
+
+    Args:
+        takes_path: Folder that receives `<scan>/source/` takes
+        enqueue: Callable(scan_id, priority) -> bool (False if already queued/running)
+        settings: Hot-folder settings (see DEFAULT_SETTINGS)
+        watcher: PollingWatcher or InotifyWatcher
+    """
+
+    def __init__(self, takes_path, enqueue, settings=None, watcher=None):
+        self.takes_path = Path(takes_path)
+        self.enqueue = enqueue
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings or {})
+        self.watcher = watcher or create_watcher(self.settings['poll_interval'])
+        self.known = set()
+        self.pending = {}
+        self.enqueued = {}
+        self._running = False
+
+    def _print(self, message):
+        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+    def _ignored(self, name):
+        return name.startswith('.') or name in self.settings['ignore']
+
+    # DISCOVERY
+    def bootstrap(self):
+        """
+        Record the existing takes without enqueuing them.
+
+        Takes modified within `lookback_hours` that were never processed (no
+        pipeline state yet) are picked up, so takes that arrived while the
+        daemon was down are not lost.
+        """
+        self.watcher.add(self.takes_path)
+        cutoff = time.time() - float(self.settings['lookback_hours']) * 3600
+        with os.scandir(self.takes_path) as entries:
+            for entry in entries:
+                if self._ignored(entry.name) or not entry.is_dir(follow_symlinks=False):
+                    continue
+                self.known.add(entry.name)
+                scan_dir = Path(entry.path)
+                recent = entry.stat(follow_symlinks=False).st_mtime >= cutoff
+                if recent and not (scan_dir / 'photogrammetry' / '.pipeline_state.json').exists():
+                    self._track(entry.name, scan_dir)
+        self._print(f"👀 Watching {self.takes_path} ({len(self.known)} existing takes, "
+                    f"{len(self.pending)} pending, {type(self.watcher).__name__})")
+
+    def _scan_top_level(self):
+        """One directory listing of takes_path: new names become pending takes."""
+        try:
+            with os.scandir(self.takes_path) as entries:
+                names = {entry.name for entry in entries
+                         if not self._ignored(entry.name) and entry.is_dir(follow_symlinks=False)}
+        except OSError as e:
+            self._print(f"❌ Cannot list {self.takes_path}: {e}")
+            return
+        for name in sorted(names - self.known):
+            self.known.add(name)
+            self._track(name, self.takes_path / name)
+        self.known &= names
+
+    def _track(self, scan_id, scan_dir):
+        now = time.monotonic()
+        take = PendingTake(scan_id, scan_dir, now, now)
+        self.pending[scan_id] = take
+        self._watch_take(take)
+        self._print(f"🆕 New take: {scan_id}")
+
+    def _watch_take(self, take):
+        for path in (take.scan_dir, take.source_dir):
+            if path not in take.watched and path.is_dir():
+                try:
+                    self.watcher.add(path)
+                    take.watched.add(path)
+                except OSError as e:
+                    self._print(f"⚠️  Cannot watch {path}: {e}")
+
+    def _untrack(self, take):
+        for path in take.watched:
+            self.watcher.remove(path)
+        self.pending.pop(take.scan_id, None)
+
+    # COMPLETION
+    def marker_priority(self, take) -> Optional[int]:
+        """Priority from a marker file (its content may be an integer or rush/high/normal/low), None without marker."""
+        for directory in (take.source_dir, take.scan_dir):
+            for marker in self.settings['marker_files']:
+                marker_path = directory / marker
+                if marker_path.is_file():
+                    try:
+                        return parse_priority(marker_path.read_text().strip() or self.settings['default_priority'])
+                    except (OSError, ValueError):
+                        return parse_priority(self.settings['default_priority'])
+        return None
+
+    def check_pending(self):
+        now = time.monotonic()
+        for take in list(self.pending.values()):
+            self._watch_take(take)
+            if not take.scan_dir.exists():
+                self._untrack(take)
+                continue
+
+            priority = self.marker_priority(take)
+            snapshot = source_snapshot(take.source_dir)
+            if priority is None:
+                if snapshot != take.snapshot:
+                    take.snapshot = snapshot
+                    take.last_change = now
+                    continue
+                if snapshot is None or snapshot[0] < int(self.settings['min_files']):
+                    continue
+                if now - take.last_change < float(self.settings['settle_seconds']):
+                    continue
+                priority = parse_priority(self.settings['default_priority'])
+            elif snapshot is None:
+                continue
+
+            self._untrack(take)
+            if self.enqueue(take.scan_id, priority):
+                self.enqueued[take.scan_id] = time.time()
+                self._print(f"📥 Enqueued {take.scan_id} (priority {priority}, {snapshot[0]} files)")
+            else:
+                self._print(f"⏭️  {take.scan_id} is already queued or running")
+
+    def handle_changes(self, changed):
+        if str(self.takes_path) in changed:
+            self._scan_top_level()
+        now = time.monotonic()
+        for take in self.pending.values():
+            if str(take.scan_dir) in changed or str(take.source_dir) in changed:
+                take.last_change = now
+
+    # LOOP
+    def run(self):
+        self._running = True
+        self.bootstrap()
+        tick = float(self.settings['poll_interval'])
+        last_check = 0.0
+        while self._running:
+            changed = self.watcher.wait(tick)
+            self.handle_changes(changed)
+            # inotify wakes up on every write of a copy in progress; check completion once per tick
+            if time.monotonic() - last_check >= tick:
+                self.check_pending()
+                last_check = time.monotonic()
+        self.watcher.close()
+
+    def stop(self, *_):
+        self._running = False
+
+
+def hot_folder_settings(config):
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get_section('hot_folder'))
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the takes folder and enqueue completed takes")
+    add_scheduler_arguments(parser)
+    parser.add_argument('--local', action='store_true', help="Shorthand for --environment local")
+    parser.add_argument('--settle', type=float, help="Seconds a take must stay unchanged before it is enqueued")
+    parser.add_argument('--poll-interval', type=float, help="Seconds between checks")
+    parser.add_argument('--priority', type=parse_priority,
+                        help="Priority of takes without a priority marker (integer or rush/high/normal/low)")
+    parser.add_argument('--polling', action='store_true', help="Use polling even where inotify is available")
+    parser.add_argument('--dry-run', action='store_true', help="Only report takes that would be enqueued")
+    args = parser.parse_args()
+
+    try:
+        config = get_config('local' if args.local else args.environment)
+        scheduler, blender_pool = (None, None) if args.dry_run else build_scheduler(config, args)
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    settings = hot_folder_settings(config)
+    if args.settle is not None:
+        settings['settle_seconds'] = args.settle
+    if args.poll_interval is not None:
+        settings['poll_interval'] = args.poll_interval
+    if args.priority is not None:
+        settings['default_priority'] = args.priority
+
+    takes_path = args.takes or config.takes_path
+    if not os.path.isdir(takes_path):
+        print(f"Error: takes path does not exist: {takes_path}")
+        sys.exit(1)
+
+    if scheduler is None:
+        enqueue = lambda scan_id, priority: True
+    else:
+        enqueue = scheduler.enqueue
+    daemon = HotFolderDaemon(takes_path, enqueue, settings,
+                             create_watcher(settings['poll_interval'], use_polling=args.polling))
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+
+    try:
+        if blender_pool:
+            blender_pool.start()
+        if scheduler:
+            scheduler.start()
+        daemon.run()
+    finally:
+        if scheduler:
+            print("⏳ Waiting for active scans to finish...")
+            scheduler.stop(wait=True)
+        if blender_pool:
+            blender_pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Persistent priority queue of pipeline jobs for the scanner mesh processing pipeline.
+
+Jobs live in an SQLite database, takes/logs/jobs.sqlite3 (override with $SCANNER_JOB_QUEUE),
+so a queue of takes survives a restart of the scheduler or hot-folder daemon and can be
+managed from another terminal while scans are running.
+
+    priority  - rush=100, high=10, normal=0, low=-10 (or any integer)
+    fairness  - a queued job gains one priority point per `aging_minutes` it waits, so a
+                steady stream of high priority takes cannot starve older normal ones
+    preempt   - when every scan slot is busy and a queued job outranks a running one by
+                `preempt_margin` (base priorities), the running job is asked to yield. It
+                stops at its next step boundary (never inside the mesher), goes back to the
+                queue with its original age and later resumes from its last completed step
+                (the artifact manifests tell the runner which steps are done).
+
+Pausing or cancelling a running job also takes effect at its next step boundary.
+
+Jobs handed to other machines by work_coordinator.py carry a lease that their worker
+renews with heartbeats; a job whose lease expires is requeued (or failed after
+`max_attempts`).
+
+Usage:
+    python3 job_queue.py list --takes /takes [--all]
+    python3 job_queue.py submit --takes /takes --scan X [--priority rush]
+    python3 job_queue.py priority --takes /takes --scan X --priority high
+    python3 job_queue.py bump --takes /takes --scan X         # move to the front of the queue
+    python3 job_queue.py pause|resume|cancel|retry --takes /takes --scan X
+    python3 job_queue.py purge --takes /takes --older-than-days 30
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import time
+
+QUEUE_ENV = 'SCANNER_JOB_QUEUE'
+QUEUE_FILENAME = 'jobs.sqlite3'
+SCHEMA_VERSION = 2
+BUSY_TIMEOUT_S = 30.0
+
+PRIORITY_LEVELS = {'rush': 100, 'high': 10, 'normal': 0, 'low': -10}
+DEFAULT_SETTINGS = {
+    'aging_minutes': 10,
+    'preempt_margin': 50,
+    'poll_interval': 2.0,
+}
+
+# queued -> running -> done | failed | queued (preempted) | paused | cancelled
+OPEN_STATES = ('queued', 'running', 'paused')
+FINAL_STATES = ('done', 'failed', 'cancelled')
+# Requests a running job acts on at its next step boundary, and the state it ends in
+INTERRUPTS = {'preempt': 'queued', 'pause': 'paused', 'cancel': 'cancelled'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scan_id TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    interrupt TEXT,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    predicted_s REAL NOT NULL DEFAULT 0,
+    owner TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    preemptions INTEGER NOT NULL DEFAULT 0,
+    note TEXT,
+    lease_expires REAL,
+    progress TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_open_scan ON jobs (scan_id) WHERE state IN ('queued', 'running', 'paused');
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, priority);
+"""
+# Statements that bring a database of the previous schema version up to date
+MIGRATIONS = {
+    2: ["ALTER TABLE jobs ADD COLUMN lease_expires REAL", "ALTER TABLE jobs ADD COLUMN progress TEXT"],
+}
+
+
+def queue_path(takes_path) -> str:
+    return os.environ.get(QUEUE_ENV) or os.path.join(takes_path, 'logs', QUEUE_FILENAME)
+
+
+def queue_settings(config):
+    """Queue settings from the 'queue' section of config.json."""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get_section('queue'))
+    return settings
+
+
+def parse_priority(value) -> int:
+    """'rush'/'high'/'normal'/'low' or an integer."""
+    if isinstance(value, int):
+        return value
+    value = str(value).strip().lower()
+    if value in PRIORITY_LEVELS:
+        return PRIORITY_LEVELS[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Unknown priority '{value}'. Use an integer or one of: {', '.join(PRIORITY_LEVELS)}")
+
+
+def owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobQueue:
+    """
+    Connection to the job queue (one per thread/process; sqlite3 connections are not shared).
+
+    Args:
+        path: Database file (see queue_path)
+        aging_minutes: Minutes of waiting that add one priority point
+    """
+
+    def __init__(self, path, aging_minutes=DEFAULT_SETTINGS['aging_minutes']):
+        self.path = str(path)
+        self.aging_s = max(1.0, float(aging_minutes) * 60)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+                if version == 0:
+                    for statement in SCHEMA.split(';'):
+                        if statement.strip():
+                            self.conn.execute(statement)
+                    version = SCHEMA_VERSION
+                for target in range(version + 1, SCHEMA_VERSION + 1):
+                    for statement in MIGRATIONS.get(target, []):
+                        self.conn.execute(statement)
+                self.conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ORDER
+    def _effective(self, now):
+        """Base priority plus one point per whole aging period waited (so equal priorities tie)."""
+        return f"priority + CAST(({float(now)} - enqueued_at) / {self.aging_s} AS INTEGER)"
+
+    def _order_by(self, now):
+        """Effective priority (base plus aging) first, then the longest predicted mesher run, then FIFO."""
+        return f"ORDER BY {self._effective(now)} DESC, predicted_s DESC, job_id"
+
+    def jobs(self, states=OPEN_STATES):
+        now = time.time()
+        marks = ', '.join('?' * len(states))
+        return self.conn.execute(
+            f"SELECT *, {self._effective(now)} AS effective FROM jobs WHERE state IN ({marks}) "
+            f"ORDER BY state = 'running' DESC, state = 'queued' DESC, {self._effective(now)} DESC, "
+            f"predicted_s DESC, job_id", states).fetchall()
+
+    def head(self):
+        """Next job to be claimed (None if nothing is queued)."""
+        return self.conn.execute(f"SELECT * FROM jobs WHERE state = 'queued' {self._order_by(time.time())} LIMIT 1"
+                                 ).fetchone()
+
+    def open_job(self, scan_id):
+        return self.conn.execute(f"SELECT * FROM jobs WHERE scan_id = ? AND state IN {OPEN_STATES}",
+                                 (scan_id,)).fetchone()
+
+    def queued_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+
+    # WORKER SIDE
+    def submit(self, scan_id, priority=0, predicted_s=0.0, note=None):
+        """Queue a scan. Returns the job id, or None if the scan already has a queued/running/paused job."""
+        try:
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (scan_id, priority, enqueued_at, predicted_s, note) VALUES (?, ?, ?, ?, ?)",
+                (scan_id, parse_priority(priority), time.time(), float(predicted_s or 0.0), note))
+        except sqlite3.IntegrityError:
+            return None
+        return cursor.lastrowid
+
+    def claim(self, owner=None, lease_s=None):
+        """
+        Mark the next queued job running for owner and return it (None if nothing is queued).
+
+        Args:
+            lease_s: Seconds the owner holds the job without renewing it (None = no lease, the
+                owner is a local process that recover() checks instead)
+        """
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            job = self.conn.execute(f"SELECT * FROM jobs WHERE state = 'queued' {self._order_by(time.time())} LIMIT 1"
+                                    ).fetchone()
+            if job is not None:
+                now = time.time()
+                self.conn.execute("UPDATE jobs SET state = 'running', interrupt = NULL, owner = ?, started_at = ?, "
+                                  "lease_expires = ?, progress = NULL, attempts = attempts + 1 WHERE job_id = ?",
+                                  (owner or owner_id(), now, now + lease_s if lease_s else None, job['job_id']))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return job
+
+    def set_progress(self, job_id, progress):
+        self.conn.execute("UPDATE jobs SET progress = ? WHERE job_id = ?", (progress, job_id))
+
+    def interrupt_requested(self, job_id) -> str:
+        """'preempt', 'pause' or 'cancel' if the job was asked to stop at its next step boundary."""
+        row = self.conn.execute("SELECT interrupt FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return (row['interrupt'] or '') if row else 'cancel'
+
+    def renew(self, job_id, owner, lease_s, progress=None):
+        """
+        Extend a job's lease (a worker heartbeat).
+
+        Returns:
+            The pending interrupt ('' if none), or None if owner no longer holds the job
+            (its lease expired and the job was requeued or handed to another worker)
+        """
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_expires = ?, progress = COALESCE(?, progress) "
+            "WHERE job_id = ? AND owner = ? AND state = 'running'",
+            (time.time() + lease_s, progress, job_id, owner))
+        return self.interrupt_requested(job_id) if cursor.rowcount else None
+
+    def finish(self, job_id, outcome, owner=None) -> bool:
+        """
+        Close a running job. Returns False if it is not running (for owner, when given).
+
+        Args:
+            outcome: 'done', 'failed', or an interrupt ('preempt', 'pause', 'cancel') it obeyed
+        """
+        owned = "state = 'running'" + (" AND owner = ?" if owner else "")
+        params = (job_id, owner) if owner else (job_id,)
+        if outcome == 'preempt':
+            # back to the queue with its original enqueued_at, so it keeps the age it earned
+            cursor = self.conn.execute("UPDATE jobs SET state = 'queued', interrupt = NULL, owner = NULL, "
+                                       f"lease_expires = NULL, preemptions = preemptions + 1 WHERE job_id = ? AND {owned}",
+                                       params)
+            return cursor.rowcount > 0
+        state = INTERRUPTS.get(outcome, outcome)
+        cursor = self.conn.execute(f"UPDATE jobs SET state = ?, interrupt = NULL, lease_expires = NULL, finished_at = ? "
+                                   f"WHERE job_id = ? AND {owned}",
+                                   (state, time.time() if state in FINAL_STATES else None, *params))
+        return cursor.rowcount > 0
+
+    def requeue_expired(self, max_attempts=0):
+        """
+        Requeue running jobs whose lease expired (their worker died or lost the network).
+
+        Returns:
+            List of (scan_id, owner, new state); a job out of attempts is failed instead
+        """
+        expired = self.conn.execute("SELECT job_id, scan_id, owner, attempts FROM jobs "
+                                    "WHERE state = 'running' AND lease_expires < ?", (time.time(),)).fetchall()
+        requeued = []
+        for job in expired:
+            state = 'failed' if max_attempts and job['attempts'] >= max_attempts else 'queued'
+            cursor = self.conn.execute(
+                "UPDATE jobs SET state = ?, owner = NULL, interrupt = NULL, lease_expires = NULL, "
+                "finished_at = ?, note = ? WHERE job_id = ? AND state = 'running' AND lease_expires < ?",
+                (state, time.time() if state == 'failed' else None, f"lease expired on {job['owner']}",
+                 job['job_id'], time.time()))
+            if cursor.rowcount:
+                requeued.append((job['scan_id'], job['owner'], state))
+        return requeued
+
+    def recover(self):
+        """Requeue jobs left running by a process on this host that no longer exists (crash/reboot)."""
+        host = socket.gethostname()
+        recovered = []
+        for job in self.conn.execute("SELECT job_id, scan_id, owner FROM jobs WHERE state = 'running'").fetchall():
+            owner_host, _, pid = (job['owner'] or '').rpartition(':')
+            if owner_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                self.conn.execute("UPDATE jobs SET state = 'queued', interrupt = NULL, owner = NULL "
+                                  "WHERE job_id = ? AND state = 'running'", (job['job_id'],))
+                recovered.append(job['scan_id'])
+        return recovered
+
+    # ADMIN SIDE
+    def _require_open(self, scan_id):
+        job = self.open_job(scan_id)
+        if job is None:
+            raise KeyError(f"no queued, running or paused job for scan '{scan_id}'")
+        return job
+
+    def request_interrupt(self, job_id, action):
+        self.conn.execute("UPDATE jobs SET interrupt = ? WHERE job_id = ? AND state = 'running'", (action, job_id))
+
+    def set_priority(self, scan_id, priority):
+        job = self._require_open(scan_id)
+        self.conn.execute("UPDATE jobs SET priority = ? WHERE job_id = ?", (parse_priority(priority), job['job_id']))
+
+    def bump(self, scan_id) -> int:
+        """Give a job the highest base priority in the queue plus one; returns the new priority."""
+        job = self._require_open(scan_id)
+        top = self.conn.execute("SELECT MAX(priority) FROM jobs WHERE state IN ('queued', 'running')").fetchone()[0]
+        priority = max(job['priority'], (top if top is not None else 0) + 1)
+        self.conn.execute("UPDATE jobs SET priority = ? WHERE job_id = ?", (priority, job['job_id']))
+        return priority
+
+    def pause(self, scan_id) -> str:
+        """Pause a queued job now, or a running one at its next step boundary."""
+        job = self._require_open(scan_id)
+        if job['state'] == 'running':
+            self.request_interrupt(job['job_id'], 'pause')
+            return 'pausing'
+        self.conn.execute("UPDATE jobs SET state = 'paused' WHERE job_id = ?", (job['job_id'],))
+        return 'paused'
+
+    def resume(self, scan_id) -> str:
+        job = self._require_open(scan_id)
+        if job['state'] == 'running':
+            self.conn.execute("UPDATE jobs SET interrupt = NULL WHERE job_id = ? AND interrupt = 'pause'",
+                              (job['job_id'],))
+            return 'running'
+        self.conn.execute("UPDATE jobs SET state = 'queued' WHERE job_id = ?", (job['job_id'],))
+        return 'queued'
+
+    def cancel(self, scan_id) -> str:
+        """Cancel a queued/paused job now, or a running one at its next step boundary."""
+        job = self._require_open(scan_id)
+        if job['state'] == 'running':
+            self.request_interrupt(job['job_id'], 'cancel')
+            return 'cancelling'
+        self.conn.execute("UPDATE jobs SET state = 'cancelled', finished_at = ? WHERE job_id = ?",
+                          (time.time(), job['job_id']))
+        return 'cancelled'
+
+    def retry(self, scan_id, priority=None):
+        """Queue a new job for a scan whose last job failed or was cancelled."""
+        last = self.conn.execute("SELECT * FROM jobs WHERE scan_id = ? ORDER BY job_id DESC LIMIT 1",
+                                 (scan_id,)).fetchone()
+        if last is None:
+            raise KeyError(f"no job for scan '{scan_id}'")
+        return self.submit(scan_id, last['priority'] if priority is None else priority, last['predicted_s'])
+
+    def purge(self, older_than_days) -> int:
+        cutoff = time.time() - older_than_days * 86400
+        return self.conn.execute(f"DELETE FROM jobs WHERE state IN {FINAL_STATES} AND finished_at < ?",
+                                 (cutoff,)).rowcount
+
+
+def _when(ts):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(ts)) if ts else '-'
+
+
+def print_jobs(jobs, as_json):
+    jobs = [dict(job) for job in jobs]
+    if as_json:
+        print(json.dumps(jobs, indent=2))
+        return
+    if not jobs:
+        print("Queue is empty")
+        return
+    icons = {'queued': '⏳', 'running': '▶️ ', 'paused': '⏸️ ', 'done': '✅', 'failed': '❌', 'cancelled': '🚫'}
+    for position, job in enumerate(jobs, 1):
+        extra = f" → {job['interrupt']}" if job['interrupt'] else ''
+        if job['preemptions']:
+            extra += f" (preempted {job['preemptions']}x)"
+        status = job['state'].upper() + extra
+        print(f"{position:>3}. {icons.get(job['state'], '•')} {job['scan_id']:<30} {status:<26}"
+              f" priority {job['priority']:>4} (effective {job['effective']})"
+              f"  queued {_when(job['enqueued_at'])}  mesher ~{job['predicted_s'] / 60:.0f}m")
+        if job['state'] == 'running' and job['owner']:
+            print(f"       on {job['owner']}{'  ' + job['progress'] if job['progress'] else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent pipeline job queue")
+    parser.add_argument('command', choices=['list', 'submit', 'priority', 'bump', 'pause', 'resume', 'cancel', 'retry',
+                                            'purge'])
+    parser.add_argument('--takes', help="Takes path (queue in takes/logs)")
+    parser.add_argument('--environment', '-e', help="Environment to read takes_path from")
+    parser.add_argument('--db', help=f"Queue file (default: ${QUEUE_ENV} or takes/logs/{QUEUE_FILENAME})")
+    parser.add_argument('--scan', help="Scan identifier")
+    parser.add_argument('--priority', help=f"Priority: integer or {'/'.join(PRIORITY_LEVELS)}")
+    parser.add_argument('--all', action='store_true', help="list: include finished jobs")
+    parser.add_argument('--older-than-days', type=float, default=30, help="purge: delete finished jobs older than this")
+    parser.add_argument('--json', action='store_true', help="Print JSON instead of text")
+    args = parser.parse_args()
+
+    try:
+        settings = dict(DEFAULT_SETTINGS)
+        takes_path = args.takes
+        if not args.db:
+            from config_reader import get_config
+            config = get_config(args.environment)
+            settings = queue_settings(config)
+            takes_path = takes_path or config.takes_path
+        queue = JobQueue(args.db or queue_path(takes_path), settings['aging_minutes'])
+    except (KeyError, ValueError, FileNotFoundError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.command not in ('list', 'purge') and not args.scan:
+        parser.error(f"{args.command} needs --scan")
+    if args.command == 'priority' and args.priority is None:
+        parser.error("priority needs --priority")
+
+    try:
+        with queue:
+            if args.command == 'list':
+                print_jobs(queue.jobs(OPEN_STATES + FINAL_STATES if args.all else OPEN_STATES), args.json)
+            elif args.command == 'submit':
+                job_id = queue.submit(args.scan, args.priority or 0)
+                print(f"📥 Queued {args.scan} (job {job_id})" if job_id else f"⚠️  {args.scan} is already queued")
+            elif args.command == 'priority':
+                queue.set_priority(args.scan, args.priority)
+                print(f"🔀 {args.scan} priority {parse_priority(args.priority)}")
+            elif args.command == 'bump':
+                print(f"⏫ {args.scan} priority {queue.bump(args.scan)}")
+            elif args.command == 'pause':
+                print(f"⏸️  {args.scan} {queue.pause(args.scan)}")
+            elif args.command == 'resume':
+                print(f"▶️  {args.scan} {queue.resume(args.scan)}")
+            elif args.command == 'cancel':
+                print(f"🚫 {args.scan} {queue.cancel(args.scan)}")
+            elif args.command == 'retry':
+                job_id = queue.retry(args.scan, args.priority)
+                print(f"🔁 Requeued {args.scan} (job {job_id})" if job_id else f"⚠️  {args.scan} is already queued")
+            elif args.command == 'purge':
+                print(f"🧹 Deleted {queue.purge(args.older_than_days)} finished jobs")
+    except (KeyError, ValueError) as e:
+        print(f"Error: {e.args[0] if e.args else e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+Asynchronous groove-mesher runner with structured progress events.
+
+One asyncio event loop supervises any number of groove-mesher runs. Each run gets a
+pseudo-terminal (the mesher only flushes its progress to a tty) that the loop reads in
+READ_SIZE chunks when it is readable: no thread per run and no polling of quiet ones.
+Output lines are parsed into MesherEvents:
+
+    stage      the mesher entered a processing stage ("Processing stage: meshGeneration")
+    progress   a new whole percent, with an ETA: the mesher's own estimate when it prints
+               one ("Estimated remaining time: 95s"), else extrapolated from the progress rate
+
+Events go to callbacks: status_sink() reports them to the status server, event_logger()
+logs stage changes and every tenth percent. Each run also totals the seconds spent per
+stage, for its timeline span. Progress lines are not echoed line by line; the raw output
+goes to an OutputRing of zlib-compressed blocks (the oldest dropped past `ring_kb`), from
+which the failure report takes its last lines and a failed run's output can be saved.
+
+Wall/stall timeouts, process-group kills and degraded retries follow step_supervisor's
+policies, and results are step_supervisor.Supervised (with stages, percent and output).
+
+Usage:
+    python3 mesher_runner.py exec --takes /takes --scan X --step generate_mesh --name groove_mesher_preview -- groove-mesher ...
+    python3 mesher_runner.py parse mesher_output.txt     # events a captured output produces
+"""
+
+import argparse
+import asyncio
+import codecs
+import errno
+import json
+import os
+import re
+import selectors
+import signal
+import subprocess
+import sys
+import time
+import zlib
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import status_server
+import step_supervisor
+
+READ_SIZE = 256 * 1024
+RING_BLOCK = 64 * 1024  # raw bytes per compressed block
+DEFAULT_RING_KB = 1024  # compressed output kept per run
+LOG_EVERY_PERCENT = 10
+ETA_MIN_PERCENT = 1.0  # progress needed before the rate is worth extrapolating
+ETA_STALE_S = 60.0  # the mesher's own estimate is used this long after it printed it
+
+# "Processing stage: meshGeneration", "stage = .textureMapping"
+STAGE_PATTERN = re.compile(r'\bstage\b\s*[:=]\s*\.?([A-Za-z][\w-]*(?:\s+[A-Za-z][\w-]*)*)\s*$', re.IGNORECASE)
+# "ETA 1:35", "Estimated remaining time: 95s", "time left = 2.5 min"
+ETA_PATTERN = re.compile(r'\b(?:eta|remaining(?:\s+time)?|time\s+left)\b\W*(\d+(?::\d{2}){0,2}(?:\.\d+)?)\s*'
+                         r'(s|secs?|seconds?|m|mins?|minutes?)?\b', re.IGNORECASE)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ EVENTS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+@dataclass
+class MesherEvent:
+    kind: str  # 'stage' or 'progress'
+    elapsed_s: float
+    stage: Optional[str] = None
+    percent: Optional[float] = None
+    eta_s: Optional[float] = None
+
+
+def parse_stage(line) -> Optional[str]:
+    """Processing stage named on a line of groove-mesher output, None if there is none."""
+    match = STAGE_PATTERN.search(line)
+    return match.group(1) if match else None
+
+
+def parse_eta(line) -> Optional[float]:
+    """Remaining seconds the groove-mesher estimates on a line of its output, None if there is none."""
+    match = ETA_PATTERN.search(line)
+    if match is None:
+        return None
+    value, unit = match.groups()
+    if ':' in value:
+        seconds = 0.0
+        for part in value.split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    return float(value) * (60 if unit and unit[0].lower() == 'm' else 1)
+
+
+class ProgressParser:
+    """
+    Turns output lines into MesherEvents (a stage change, or a new whole percent).
+
+    Args:
+        emit: Callable(MesherEvent), or None to only track state
+        clock: Monotonic clock (for tests/replays)
+    """
+
+    def __init__(self, emit: Optional[Callable[[MesherEvent], None]] = None, clock=time.monotonic):
+        self.emit = emit
+        self.clock = clock
+        self.began = clock()
+        self.stage = None
+        self.percent = None
+        self.stages: Dict[str, float] = {}
+        self._stage_started = self.began
+        self._first = None  # (time, percent) of the first progress line
+        self._eta = None  # (time, seconds) of the mesher's last own estimate
+
+    def feed(self, line) -> bool:
+        """Parse one line; True when it was a progress/stage line."""
+        now = self.clock()
+        stage, percent, eta = parse_stage(line), status_server.parse_progress(line), parse_eta(line)
+        if eta is not None:
+            self._eta = (now, eta)
+        if stage is not None and stage != self.stage:
+            self._close_stage(now)
+            self.stage = stage
+            self._send(MesherEvent('stage', round(now - self.began, 1), stage, self.percent, self.eta(now)))
+        if percent is not None:
+            if self._first is None:
+                self._first = (now, percent)
+            if self.percent is None or int(percent) != int(self.percent):
+                self.percent = percent
+                self._send(MesherEvent('progress', round(now - self.began, 1), self.stage, round(percent, 1),
+                                       self.eta(now)))
+            self.percent = percent
+        return stage is not None or percent is not None or eta is not None
+
+    def eta(self, now=None) -> Optional[float]:
+        """Seconds left: the mesher's recent estimate, else extrapolated from the progress so far."""
+        now = self.clock() if now is None else now
+        if self._eta is not None and now - self._eta[0] <= ETA_STALE_S:
+            return round(max(0.0, self._eta[1] - (now - self._eta[0])), 1)
+        if self._first is None or self.percent is None:
+            return None
+        done = self.percent - self._first[1]
+        if done < ETA_MIN_PERCENT:
+            return None
+        return round((now - self._first[0]) * (100.0 - self.percent) / done, 1)
+
+    def finish(self):
+        """Close the running stage (its seconds go into stages)."""
+        self._close_stage(self.clock())
+        self.stage = None
+
+    def _close_stage(self, now):
+        if self.stage is not None:
+            self.stages[self.stage] = round(self.stages.get(self.stage, 0.0) + now - self._stage_started, 3)
+        self._stage_started = now
+
+    def _send(self, event):
+        if self.emit is not None:
+            self.emit(event)
+
+
+def status_sink(scan_id, step, name) -> Callable[[MesherEvent], None]:
+    """Event callback reporting stage/percent/ETA to the status server."""
+    def send(event: MesherEvent):
+        status_server.notify({'event': 'progress', 'scan': scan_id, 'step': step, 'name': name,
+                              'percent': event.percent, 'stage': event.stage, 'eta_s': event.eta_s})
+    return send
+
+
+def event_logger(log=print, label="groove-mesher", every=LOG_EVERY_PERCENT) -> Callable[[MesherEvent], None]:
+    """Event callback logging stage changes and every `every` percent."""
+    logged = {'step': None}
+
+    def write(event: MesherEvent):
+        eta = f"~{_duration(event.eta_s)} left" if event.eta_s is not None else None
+        if event.kind == 'stage':
+            log(f"🧩 {label} stage: {event.stage} (after {_duration(event.elapsed_s)})")
+        elif event.percent is not None and int(event.percent // every) != logged['step']:
+            logged['step'] = int(event.percent // every)
+            details = ", ".join(part for part in (event.stage, eta) if part)
+            log(f"⏳ {label} {event.percent:.0f}%" + (f" ({details})" if details else ""))
+    return write
+
+
+def fan_out(*callbacks) -> Callable[[MesherEvent], None]:
+    """One event callback calling each of callbacks (None entries are skipped)."""
+    callbacks = [callback for callback in callbacks if callback is not None]
+
+    def send(event: MesherEvent):
+        for callback in callbacks:
+            callback(event)
+    return send
+
+
+def _duration(seconds) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 60}m{seconds % 60:02d}s" if seconds >= 60 else f"{seconds}s"
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ OUTPUT ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+class OutputRing:
+    """
+    Raw output kept as zlib-compressed blocks; past `limit` compressed bytes the oldest blocks are dropped.
+
+    Args:
+        limit: Compressed bytes to keep
+        block: Raw bytes per compressed block
+    """
+
+    def __init__(self, limit=DEFAULT_RING_KB * 1024, block=RING_BLOCK):
+        self.limit = limit
+        self.block = block
+        self.total = 0  # raw bytes written
+        self.dropped = 0  # raw bytes dropped
+        self._blocks = deque()  # (compressed, raw size)
+        self._size = 0
+        self._pending = bytearray()
+
+    def write(self, data: bytes):
+        self._pending += data
+        self.total += len(data)
+        if len(self._pending) >= self.block:
+            self._seal()
+
+    def _seal(self):
+        if not self._pending:
+            return
+        packed = zlib.compress(bytes(self._pending), 1)
+        self._blocks.append((packed, len(self._pending)))
+        self._size += len(packed)
+        self._pending.clear()
+        while self._size > self.limit and len(self._blocks) > 1:
+            packed, raw_size = self._blocks.popleft()
+            self._size -= len(packed)
+            self.dropped += raw_size
+
+    @property
+    def compressed_size(self) -> int:
+        return self._size + len(self._pending)
+
+    def getvalue(self) -> bytes:
+        """The output kept (everything but the dropped head)."""
+        return b''.join(zlib.decompress(packed) for packed, _ in self._blocks) + bytes(self._pending)
+
+    def tail(self, lines=40) -> List[str]:
+        """Last non-empty lines (carriage returns count as line breaks), decompressing only the blocks needed."""
+        data = bytes(self._pending)
+        for packed, _ in reversed(self._blocks):
+            if data.count(b'\n') + data.count(b'\r') > lines:
+                break
+            data = zlib.decompress(packed) + data
+        text = data.decode('utf-8', errors='replace').replace('\r', '\n')
+        return [line.strip() for line in text.split('\n') if line.strip()][-lines:]
+
+    def save(self, path) -> str:
+        """Write the output kept to path (with a note when its head was dropped)."""
+        with open(path, 'wb') as f:
+            if self.dropped:
+                f.write(f"[... first {self.dropped} bytes of output dropped ...]\n".encode())
+            f.write(self.getvalue())
+        return path
+
+
+@dataclass
+class MesherRun(step_supervisor.Supervised):
+    stages: Dict[str, float] = field(default_factory=dict)  # seconds per processing stage
+    percent: Optional[float] = None  # last progress reported
+    output: Optional[OutputRing] = field(default=None, repr=False)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ RUN ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+async def _drive(steps, perform):
+    """step_supervisor.drive with an awaited perform (the loop keeps reading the other runs)."""
+    try:
+        request = next(steps)
+        while True:
+            request = steps.send(await perform(request))
+    except StopIteration as done:
+        return done.value
+
+
+async def _terminate(pid, grace):
+    return await _drive(step_supervisor.terminate_steps(pid, grace), asyncio.sleep)
+
+
+async def supervise(command, wall_timeout=0, stall_timeout=0, stdout=None, echo=None, on_event=None,
+                    env=None, cwd=None, shell=False, kill_grace=10, tail_lines=40,
+                    ring_kb=DEFAULT_RING_KB) -> MesherRun:
+    """
+    Run a command on a pseudo-terminal under the watchdog, parsing its progress.
+
+    Args:
+        command: Argument list (or string with shell=True)
+        wall_timeout / stall_timeout: Limits in seconds (0 = unlimited)
+        stdout: Stream the raw output is copied to (None to discard)
+        echo: Optional callable(line) for every output line that is not a progress/stage line
+        on_event: Optional callable(MesherEvent)
+        kill_grace: Seconds between SIGTERM and SIGKILL
+        tail_lines: Lines of output kept for the failure report
+        ring_kb: Compressed output kept in the result's OutputRing
+
+    Returns:
+        MesherRun: exit code/reason as step_supervisor.supervise, plus stages, percent and output
+    """
+    import pty
+    loop = asyncio.get_running_loop()
+    ring = OutputRing(ring_kb * 1024)
+    sink = step_supervisor._binary_sink(stdout)
+    parser = ProgressParser(on_event)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    start, began = time.time(), time.monotonic()
+    master, slave = pty.openpty()
+    try:
+        process = subprocess.Popen(command, shell=shell, stdin=slave, stdout=slave, stderr=slave, env=env,
+                                   cwd=cwd, close_fds=True, start_new_session=True)
+    except OSError as e:
+        os.close(master)
+        os.close(slave)
+        return MesherRun(127, 'error', 0.0, start,
+                         [f"cannot start {command if isinstance(command, str) else command[0]}: {e}"], output=ring)
+    os.close(slave)
+    os.set_blocking(master, False)
+
+    pid = process.pid  # start_new_session: the child leads its own process group
+    state = {'partial': '', 'last_output': began}
+    eof = loop.create_future()
+
+    def lines(text):
+        text = (state['partial'] + text).replace('\r', '\n').split('\n')
+        state['partial'] = text.pop()
+        for line in text:
+            line = line.strip()
+            if line and not parser.feed(line) and echo is not None:
+                echo(line)
+
+    def readable():
+        try:
+            data = os.read(master, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:  # EIO: pty closed after the command exited (macOS/Linux)
+            if e.errno != errno.EIO:
+                raise
+            data = b''
+        if not data:
+            loop.remove_reader(master)
+            if not eof.done():
+                eof.set_result(None)
+            return
+        state['last_output'] = time.monotonic()
+        ring.write(data)
+        if sink is not None:
+            sink.write(data)
+            sink.flush()
+        lines(decoder.decode(data))
+
+    loop.add_reader(master, readable)
+    status = usage = exited_at = None
+    reason = ''
+    try:
+        while True:
+            now = time.monotonic()
+            if status is None:
+                if wall_timeout and now - began >= wall_timeout:
+                    reason = 'wall'
+                    break
+                if stall_timeout and now - state['last_output'] >= stall_timeout:
+                    reason = 'stall'
+                    break
+                waited, wait_status, wait_usage = os.wait4(pid, os.WNOHANG)
+                if waited == pid:
+                    status, usage, exited_at = wait_status, wait_usage, now
+            if status is not None and (eof.done() or now - exited_at >= step_supervisor.EXIT_DRAIN_SECONDS):
+                break
+
+            wait_s = step_supervisor.POLL_INTERVAL
+            if status is not None:
+                wait_s = step_supervisor.EXIT_DRAIN_SECONDS - (now - exited_at)
+            if wall_timeout:
+                wait_s = min(wait_s, wall_timeout - (now - began))
+            if stall_timeout:
+                wait_s = min(wait_s, stall_timeout - (now - state['last_output']))
+            wait_s = max(wait_s, 0.0)
+            if eof.done():  # output closed; only the exit is left to see
+                await asyncio.sleep(min(wait_s, 0.1))
+            else:
+                await asyncio.wait([eof], timeout=wait_s)
+    finally:
+        loop.remove_reader(master)
+        if status is None:
+            status, usage = await _terminate(pid, kill_grace)
+        else:
+            # stragglers of a finished command (daemonized helpers holding the output open)
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        os.close(master)
+        lines(decoder.decode(b'', final=True) + '\n')
+        parser.finish()
+
+    exit_code = os.waitstatus_to_exitcode(status)
+    process.returncode = exit_code
+    if reason:
+        exit_code = step_supervisor.TIMEOUT_EXIT_CODE
+    elif exit_code < 0:
+        reason = 'signal'
+    elif exit_code:
+        reason = 'exit'
+    return MesherRun(exit_code, reason, time.monotonic() - began, start, ring.tail(tail_lines), {
+        'child_cpu': usage.ru_utime + usage.ru_stime,
+        'child_peak_rss_mb': usage.ru_maxrss * step_supervisor._RSS_TO_MB,
+    }, stages=dict(parser.stages), percent=parser.percent, output=ring)
+
+
+async def run_with_policy(command_for: Callable[[int, Optional[str]], list], policy, label, log=print,
+                          **supervise_kwargs) -> MesherRun:
+    """step_supervisor.run_with_policy for supervise() above (the backoff sleeps do not block the loop)."""
+    limits = step_supervisor.policy_limits(policy)
+
+    async def perform(request):
+        action, value = request
+        if action == 'sleep':
+            return await asyncio.sleep(value)
+        return await supervise(value, **limits, **supervise_kwargs)
+
+    return await _drive(step_supervisor.policy_attempts(command_for, policy, label, log), perform)
+
+
+def run(coroutine):
+    """
+    Run a coroutine (one supervise/run_with_policy, or several under asyncio.gather) to completion.
+
+    macOS's kqueue does not watch pseudo-terminals, so the loop selects with select() there.
+    On SIGTERM/KeyboardInterrupt the runs are cancelled, which kills their process groups.
+    """
+    if sys.platform != 'darwin':
+        return asyncio.run(coroutine)
+    loop = asyncio.SelectorEventLoop(selectors.SelectSelector())
+    task = loop.create_task(coroutine)
+    try:
+        return loop.run_until_complete(task)
+    except BaseException:
+        task.cancel()
+        loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+        raise
+    finally:
+        loop.close()
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Run groove-mesher with structured progress events")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    exec_parser = subparsers.add_parser('exec', help="Run a mesher command under its step's policy")
+    exec_parser.add_argument('--takes', help="Takes path (records a timeline span when given with --scan)")
+    exec_parser.add_argument('--scan', help="Scan identifier (progress goes to the status server)")
+    exec_parser.add_argument('--step', help="Pipeline step name")
+    exec_parser.add_argument('--name', help="Policy/span name (default: the step name)")
+    exec_parser.add_argument('--kind', default='substep', choices=['step', 'substep'])
+    exec_parser.add_argument('--environment', '-e', help="Environment whose config.json supervisor section applies")
+    exec_parser.add_argument('--save-output', help="Write the kept raw output here when the command fails")
+    exec_parser.add_argument('cmd', nargs=argparse.REMAINDER, help="-- command and arguments")
+
+    parse_parser = subparsers.add_parser('parse', help="Print the events a captured mesher output produces")
+    parse_parser.add_argument('output', help="File with groove-mesher output ('-': stdin)")
+    args = parser.parse_args()
+
+    if args.command == 'parse':
+        stream = sys.stdin.buffer if args.output == '-' else open(args.output, 'rb')
+        with stream:
+            text = stream.read().decode('utf-8', errors='replace').replace('\r', '\n')
+        progress = ProgressParser(lambda event: print(json.dumps(asdict(event))))
+        for line in text.split('\n'):
+            if line.strip():
+                progress.feed(line.strip())
+        progress.finish()
+        print(json.dumps({'stages': progress.stages, 'percent': progress.percent}))
+        return
+
+    command = args.cmd[1:] if args.cmd and args.cmd[0] == '--' else args.cmd
+    if not command:
+        parser.error("exec needs a command after --")
+    name = args.name or args.step or os.path.basename(command[0])
+    policy = step_supervisor.policy_for(name, step_supervisor.config_overrides(args.environment))
+
+    timeline = None
+    if args.takes and args.scan:
+        import pipeline_timeline
+        timeline = pipeline_timeline.for_scan(args.takes, args.scan, args.step)
+        timeline.started(name, args.kind, args.step)
+    say = lambda message: print(message, flush=True)
+    on_event = fan_out(status_sink(args.scan, args.step, name) if args.scan else None,
+                       event_logger(say, os.path.basename(command[0])))
+    result = run(run_with_policy(lambda attempt, setting: command, policy, name, log=say, echo=say,
+                                 on_event=on_event))
+    if timeline is not None:
+        timeline.record(name, result.duration, args.kind, step=args.step, start=result.start,
+                        exit_code=result.exit_code, usage=result.usage, attempts=result.attempts,
+                        stages=result.stages,
+                        **({'timeout': result.reason} if result.reason in ('wall', 'stall') else {}))
+    if not result.ok and args.save_output and result.output is not None:
+        say(f"   Raw output of the last attempt: {result.output.save(args.save_output)}")
+    sys.exit(result.exit_code)
+
+
+if __name__ == "__main__":
+    main()
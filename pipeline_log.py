@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Shared logging for the pipeline scripts.
+
+Every script logs through one leveled logger instead of its own print_enhanced /
+print_decorated copy. Each message is written twice:
+
+    [LABEL] text     on stdout, colored as before (runScriptAutomated.sh tees it into the run log)
+    one JSON line    in takes/logs/<scan>.log.jsonl, once the script calls for_scan
+
+Messages are queued and written by a background thread in batches, one flush per batch,
+so a script never waits on a slow terminal, tee pipe or network takes folder; ERROR
+messages wait until they are written. Messages below the level (config.json
+"logging.level", overridden by $SCANNER_LOG_LEVEL) are dropped before formatting, so
+debug messages that pass their values as arguments cost nothing at the default level.
+
+Usage:
+    log = pipeline_log.get_logger("cleanup")
+    print_decorated, print_enhanced = pipeline_log.print_helpers(log)   # the old helpers, leveled
+    pipeline_log.for_scan(takes_path, scan_id, step="cleanup")          # adds the JSON log
+
+    log.info("Removing %d parts", len(parts))
+    log.debug("%s: %d vertices", part.name, len(part.data.vertices))    # not even formatted at 'info'
+    log.info("frame %d", frame, extra=pipeline_log.every(2.0))          # at most every 2s per call site
+
+    SCANNER_LOG_LEVEL=debug ./runScriptAutomated.sh scan_id              # one verbose run
+
+    python3 pipeline_log.py show --takes /takes --scan X [--level warning] [--step cleanup]
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler
+from typing import Dict, Optional
+
+from pipeline_timeline import RUN_ID_ENV, TIMELINE_DIR
+
+LEVEL_ENV = 'SCANNER_LOG_LEVEL'
+LOG_SUFFIX = '.log.jsonl'
+ROOT_LOGGER = 'scanner'
+DEFAULT_SETTINGS = {'level': 'info', 'json': True, 'color': True}
+
+DEBUG, INFO, WARNING, ERROR = logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR
+
+COLOR_CODES = {
+    'black': '\033[30m',
+    'red': '\033[31m',
+    'green': '\033[32m',
+    'yellow': '\033[33m',
+    'blue': '\033[34m',
+    'magenta': '\033[35m',
+    'cyan': '\033[36m',
+    'white': '\033[37m',
+    'reset': '\033[0m'
+}
+# label and color for messages logged without one
+LEVEL_LABELS = {DEBUG: ('DEBUG', 'blue'), WARNING: ('WARNING', 'yellow'), ERROR: ('ERROR', 'red'),
+                logging.CRITICAL: ('CRITICAL', 'red')}
+
+
+def log_path(takes_path, scan_id):
+    return os.path.join(takes_path, TIMELINE_DIR, f"{scan_id}{LOG_SUFFIX}")
+
+
+def logging_settings(config=None) -> Dict:
+    """Settings from the 'logging' section of config.json (defaults if it cannot be read)."""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        if config is None:
+            from config_reader import get_config
+            config = get_config()
+        settings.update(config.get_section('logging'))
+    except (ImportError, ValueError, KeyError, FileNotFoundError):
+        pass
+    return settings
+
+
+def parse_level(value) -> int:
+    """'debug' / 'INFO' / 10 -> logging level (INFO when unknown)."""
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value).strip().upper())
+    return level if isinstance(level, int) else INFO
+
+
+def every(seconds, key=None) -> Dict:
+    """
+    `extra` for a message in a hot loop: emitted at most once per `seconds` per call site
+    (or per key), with the number of messages dropped in between.
+    """
+    return {'throttle': seconds, 'throttle_key': key}
+
+
+class _Throttle(logging.Filter):
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._last = {}
+        self._dropped = {}
+
+    def filter(self, record):
+        interval = getattr(record, 'throttle', None)
+        if not interval:
+            return True
+        key = getattr(record, 'throttle_key', None) or (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < interval:
+                self._dropped[key] = self._dropped.get(key, 0) + 1
+                return False
+            self._last[key] = now
+            dropped = self._dropped.pop(key, 0)
+        if dropped:
+            record.msg, record.args = f"{record.getMessage()} (+{dropped} similar)", None
+        return True
+
+
+class _Writer(threading.Thread):
+    """Drains the queue, writing everything pending as one batch per destination."""
+
+    def __init__(self, stream, color=True):
+        super().__init__(name='pipeline-log', daemon=True)
+        self.queue = queue.SimpleQueue()
+        self.stream = stream
+        self.color = color
+        self.context = {'scan': None, 'step': None, 'run_id': os.environ.get(RUN_ID_ENV, '')}
+        self.json_path = None
+        self._json_warned = False
+        self._host = socket.gethostname()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [item for item in batch if isinstance(item, logging.LogRecord)]
+            if records:
+                self._write(records)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                return
+
+    def _write(self, records):
+        try:
+            self.stream.write(''.join(self.human(record) + '\n' for record in records))
+            self.stream.flush()
+        except (OSError, ValueError):  # closed or broken stdout: keep the JSON log going
+            pass
+        if not self.json_path:
+            return
+        try:
+            with open(self.json_path, 'a') as f:
+                f.write(''.join(json.dumps(self.structured(record), separators=(',', ':')) + '\n'
+                                for record in records))
+        except OSError as e:
+            if not self._json_warned:
+                self.stream.write(f"WARNING: cannot write log {self.json_path}: {e}\n")
+                self._json_warned = True
+
+    def _paint(self, text, color):
+        if not self.color or color not in COLOR_CODES:
+            return text
+        return f"{COLOR_CODES[color]}{text}{COLOR_CODES['reset']}"
+
+    def human(self, record) -> str:
+        text = record.getMessage()
+        section = getattr(record, 'section', None)
+        if section:
+            return f"\n{text}\n{section}"
+        label = getattr(record, 'label', None)
+        label_color = getattr(record, 'label_color', 'white')
+        if label is None and record.levelno in LEVEL_LABELS:
+            label, label_color = LEVEL_LABELS[record.levelno]
+        text_color = getattr(record, 'text_color', None)
+        text = self._paint(text, text_color) if text_color else text
+        if label:
+            text = f"[{self._paint(label, label_color)}] {text}"
+        return f"{getattr(record, 'prefix', '')}{text}{getattr(record, 'suffix', '')}"
+
+    def structured(self, record) -> Dict:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'scan': self.context['scan'],
+            'run_id': self.context['run_id'],
+            'step': self.context['step'] or record.name.rpartition('.')[2],
+            'logger': record.name.rpartition('.')[2],
+            'msg': record.getMessage(),
+            'pid': record.process,
+            'host': self._host,
+        }
+        label = getattr(record, 'label', None)
+        if label:
+            entry['label'] = label
+        return entry
+
+
+class _Handler(QueueHandler):
+    """Hands records to the writer; the message is formatted here, on the logging thread."""
+
+    def __init__(self, writer: _Writer):
+        super().__init__(writer.queue)
+        self.writer = writer
+
+    def emit(self, record):
+        super().emit(record)
+        if record.levelno >= ERROR:
+            flush()
+
+
+_lock = threading.Lock()
+_writer: Optional[_Writer] = None
+_settings: Dict = {}
+
+
+def _setup():
+    global _writer, _settings
+    with _lock:
+        if _writer is not None:
+            return
+        _settings = logging_settings()
+        color = bool(_settings.get('color', True)) and 'NO_COLOR' not in os.environ
+        _writer = _Writer(sys.stdout, color)
+        _writer.start()
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(parse_level(os.environ.get(LEVEL_ENV) or _settings.get('level', 'info')))
+        handler = _Handler(_writer)
+        handler.addFilter(_Throttle())
+        root.addHandler(handler)
+        root.propagate = False
+        atexit.register(shutdown)
+
+
+def get_logger(name) -> logging.Logger:
+    """The logger of one script (or tool); all of them share the level and the writer."""
+    _setup()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def for_scan(takes_path, scan_id, step=None) -> logging.Logger:
+    """Tag further messages with the scan and step and also write them to the scan's JSON log."""
+    _setup()
+    _writer.context.update({'scan': scan_id, 'step': step})
+    if _settings.get('json', True) and takes_path and scan_id:
+        path = log_path(takes_path, scan_id)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _writer.json_path = path
+        except OSError as e:
+            print(f"WARNING: cannot write log {path}: {e}", flush=True)
+    return get_logger(step or 'pipeline')
+
+
+def enabled(level=DEBUG) -> bool:
+    """Whether messages at `level` are written (guard expensive debug-only work with it)."""
+    _setup()
+    return logging.getLogger(ROOT_LOGGER).isEnabledFor(level)
+
+
+def flush(timeout=5.0):
+    """Wait until everything logged so far has been written."""
+    if _writer is None or not _writer.is_alive() or threading.current_thread() is _writer:
+        return
+    done = threading.Event()
+    _writer.queue.put(done)
+    done.wait(timeout)
+
+
+def shutdown(timeout=5.0):
+    """Write what is pending and stop the writer (registered with atexit)."""
+    if _writer is None or not _writer.is_alive():
+        return
+    flush(timeout)
+    _writer.queue.put(None)
+    _writer.join(timeout)
+
+
+def print_helpers(log: logging.Logger):
+    """
+    print_decorated and print_enhanced bound to a logger, with the signatures the scripts
+    have always used. print_enhanced logs red messages as errors; pass level= to change it
+    (level=pipeline_log.DEBUG for per-part/per-item chatter).
+    """
+
+    def print_decorated(message, symbol="▬", padding=0, level=INFO):
+        log.log(level, message, extra={'section': symbol * (len(message) + padding)})
+
+    def print_enhanced(text, text_color="white", label="", label_color="white", prefix="", suffix="", level=None):
+        if level is None:
+            level = ERROR if 'red' in (text_color, label_color) else INFO
+        if not log.isEnabledFor(level):
+            return
+        log.log(level, "%s", text, extra={'label': label, 'label_color': label_color, 'text_color': text_color,
+                                          'prefix': prefix, 'suffix': suffix})
+
+    return print_decorated, print_enhanced
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Read a scan's structured log")
+    parser.add_argument('command', choices=['show'])
+    parser.add_argument('--takes', help="Takes path (default: from config.json)")
+    parser.add_argument('--scan', required=True, help="Scan ID")
+    parser.add_argument('--level', default='debug', help="Lowest level shown (default: everything)")
+    parser.add_argument('--step', help="Only this step")
+    parser.add_argument('--run-id', help="Only this run (default: all runs)")
+    parser.add_argument('--environment', '-e', help="Environment for config defaults")
+    args = parser.parse_args()
+
+    try:
+        takes_path = args.takes
+        if not takes_path:
+            from config_reader import get_config
+            takes_path = get_config(args.environment).takes_path
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    path = log_path(takes_path, args.scan)
+    if not os.path.exists(path):
+        print(f"Error: no log for {args.scan} at {path}")
+        sys.exit(1)
+
+    lowest = parse_level(args.level)
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if parse_level(entry.get('level', 'info')) < lowest:
+                continue
+            if (args.step and entry.get('step') != args.step) or (args.run_id and entry.get('run_id') != args.run_id):
+                continue
+            label = f"[{entry['label']}] " if entry.get('label') else ''
+            print(f"{time.strftime('%H:%M:%S', time.localtime(entry['ts']))} {entry['level'].upper():<7} "
+                  f"{entry.get('step') or '-':<16} {label}{entry['msg']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,876 @@
+#!/usr/bin/env python3
+"""
+Incremental pipeline runner for the scanner mesh processing pipeline.
+
+Models the five pipeline steps as a DAG. Every step declares its input files,
+the scripts/assets that implement it and its arguments; these are content-hashed
+into a step key and a step is skipped when its key matches the one recorded by
+its last successful run and its artifact manifest (artifact_manifest.py) still
+verifies, so an interrupted run resumes at the first incomplete step.
+
+Steps run against a staging copy of the scan (step_staging.py) and their outputs
+are published atomically once the step succeeded; the replaced files are kept as
+versions under photogrammetry/.versions/ for rollback.
+
+--dry-run estimates each planned step's duration (duration_predictor.py).
+
+Committed artifacts are copied to the takes folder (scratch runs) and configured
+delivery folders in the background while later steps run (artifact_publisher.py).
+
+With --scratch (or "scratch.enabled") the scan runs against a local-disk working
+set and changed outputs are synced back afterwards (scan_staging.py).
+
+Step commands run under the hang watchdog (step_supervisor.py): per-step
+wall-clock and output-stall timeouts, process-group kill and bounded retries.
+
+--capture records the exact inputs of the steps that run as replay bundles
+(replay_bundle.py) for offline benchmarking of a single step.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sys
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import artifact_manifest
+import artifact_publisher
+import duration_predictor
+import pipeline_timeline
+import replay_bundle
+import run_store
+import scan_staging
+import status_server
+import step_staging
+import step_supervisor
+from config_reader import get_config
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+STATE_FILENAME = ".pipeline_state.json"
+STATE_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ HASHING ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+class HashCache:
+    """
+    Content hashes keyed by path and invalidated by size/mtime.
+
+    Source image folders hold hundreds of large files, so a file is only
+    re-read when its size or modification time changed since it was hashed.
+    """
+
+    def __init__(self, entries=None):
+        self._entries = dict(entries or {})
+
+    def to_dict(self):
+        return dict(self._entries)
+
+    def file_digest(self, path) -> str:
+        path = str(path)
+        stat = os.stat(path)
+        cached = self._entries.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        self._entries[path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def directory_digest(self, path) -> str:
+        """Hash of every file below path (relative names and contents)."""
+        sha = hashlib.sha256()
+        root = Path(path)
+        for file_path in sorted(p for p in root.rglob('*') if p.is_file() and not p.name.startswith('.')):
+            sha.update(str(file_path.relative_to(root)).encode('utf-8'))
+            sha.update(self.file_digest(file_path).encode('ascii'))
+        return sha.hexdigest()
+
+    def digest(self, path) -> Optional[str]:
+        """Digest of a file or directory, None if it does not exist."""
+        path = Path(path)
+        if path.is_dir():
+            return self.directory_digest(path)
+        if path.is_file():
+            return self.file_digest(path)
+        return None
+
+
+# Script and asset digests are shared by every scan of a batch
+_SHARED_HASH_CACHE = HashCache()
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ STEP CONTEXT ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+@dataclass
+class ScanContext:
+    """Paths and settings needed to run the pipeline for one scan."""
+    scan_id: str
+    takes_path: str
+    software_path: str
+    blender_path: str
+    scripts_dir: str = str(SCRIPT_DIR)
+    python_path: str = sys.executable
+    feature_sensitivity: str = 'normal'
+    detail_level: str = duration_predictor.DEFAULT_DETAIL
+    hdri_path: str = ''
+    blender_threads: int = 0  # 0 lets Blender use every core
+    ml_threads: int = 0  # 0 lets TensorFlow/OpenMP pick their defaults
+    keep_versions: int = step_staging.DEFAULT_KEEP_VERSIONS
+    environment: str = ''
+    supervision: Dict = field(default_factory=dict)  # config.json "supervisor" section
+
+    @property
+    def scan_dir(self) -> Path:
+        return Path(self.takes_path) / self.scan_id
+
+    @property
+    def photogrammetry_dir(self) -> Path:
+        return self.scan_dir / 'photogrammetry'
+
+    @property
+    def state_path(self) -> Path:
+        return self.photogrammetry_dir / STATE_FILENAME
+
+    def scan_file(self, pattern: str) -> Path:
+        """Resolve a scan-relative pattern such as 'photogrammetry/{scan}.blend'."""
+        return self.scan_dir / pattern.format(scan=self.scan_id)
+
+    def script_file(self, relative_path: str) -> Path:
+        return Path(self.scripts_dir) / relative_path
+
+
+def find_python(scripts_dir) -> str:
+    """Prefer the scanner_env virtual environment used by the face detection step."""
+    for candidate in (Path(scripts_dir) / 'scanner_env', Path.cwd() / 'scanner_env'):
+        python = candidate / 'bin' / 'python3'
+        if python.exists():
+            return str(python)
+    return sys.executable
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ STEPS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+@dataclass(frozen=True)
+class Step:
+    """
+    One node of the pipeline DAG.
+
+    Args:
+        number: Step number used by runScriptAutomated.sh (1-5)
+        name: Stable identifier used in the state file
+        title: Human readable name
+        scripts: Scripts and assets implementing the step, relative to the scripts dir
+        inputs: Scan-relative files/folders the step reads
+        outputs: Scan-relative files the step produces
+        rewrites: Scan-relative inputs the step modifies in place
+        depends_on: Names of upstream steps
+        resource_class: Scheduler resource class ('mesher', 'blender' or 'ml')
+        build_command: Callable returning the command line for a ScanContext
+        arguments: Callable returning the settings that change the step's result
+        blender_job: Callable returning (script, argv, blend_file) so a warm Blender
+            worker can run the step instead of a fresh Blender process
+    """
+    number: int
+    name: str
+    title: str
+    scripts: Tuple[str, ...]
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    depends_on: Tuple[str, ...]
+    resource_class: str
+    build_command: Callable[[ScanContext], List[str]] = field(compare=False)
+    arguments: Callable[[ScanContext], Dict] = field(compare=False, default=lambda ctx: {})
+    blender_job: Optional[Callable[[ScanContext], Tuple[str, List[str], Optional[str]]]] = field(
+        compare=False, default=None)
+    rewrites: Tuple[str, ...] = ()
+
+
+def _blender_base(ctx: ScanContext) -> List[str]:
+    command = [ctx.blender_path, '-b']
+    if ctx.blender_threads:
+        command += ['-t', str(ctx.blender_threads)]
+    return command
+
+
+def _generate_mesh_command(ctx: ScanContext) -> List[str]:
+    return [str(ctx.script_file('generate_mesh.sh')), ctx.scan_id, ctx.software_path, ctx.takes_path,
+            ctx.feature_sensitivity, ctx.detail_level]
+
+
+def _cleanup_job(ctx: ScanContext):
+    return (str(ctx.script_file('cleanup.py')),
+            ['--scan', ctx.scan_id, '--path', ctx.takes_path, '--facing', '0.5',
+             '--environment_map', ctx.hdri_path], None)
+
+
+def _cleanup_command(ctx: ScanContext) -> List[str]:
+    script, argv, _ = _cleanup_job(ctx)
+    return _blender_base(ctx) + ['-P', script, '--'] + argv
+
+
+def _face_detection_command(ctx: ScanContext) -> List[str]:
+    return [ctx.python_path, str(ctx.script_file('pose_gen_package/face_detector.py')), '--',
+            '--scan', ctx.scan_id, '--path', ctx.takes_path, '--software', ctx.scripts_dir,
+            '--blender', ctx.blender_path, '--rotmesh', str(ctx.script_file('rotate_mesh.py'))]
+
+
+def _add_rig_job(ctx: ScanContext):
+    return (str(ctx.script_file('add_rig.py')),
+            ['--scan', ctx.scan_id, '--path', ctx.takes_path, '--software', ctx.scripts_dir], None)
+
+
+def _add_rig_command(ctx: ScanContext) -> List[str]:
+    script, argv, _ = _add_rig_job(ctx)
+    return _blender_base(ctx) + ['-P', script, '--'] + argv
+
+
+def _pose_test_job(ctx: ScanContext):
+    return (str(ctx.script_file('pose_test.py')),
+            ['--scan', ctx.scan_id, '--path', ctx.takes_path, '--software', ctx.scripts_dir],
+            str(ctx.script_file('pose_test_render.blend')))
+
+
+def _pose_test_command(ctx: ScanContext) -> List[str]:
+    script, argv, blend_file = _pose_test_job(ctx)
+    return _blender_base(ctx) + [blend_file, '-P', script, '--'] + argv
+
+
+PIPELINE_STEPS: Tuple[Step, ...] = (
+    Step(
+        number=1,
+        name='generate_mesh',
+        title='Generate Mesh',
+        scripts=('generate_mesh.sh', 'groove_mesh_check.py', 'prep_usdz.py', 'builds/groove-mesher'),
+        inputs=('source',),
+        outputs=('photogrammetry/preview.usdz', 'photogrammetry/baked_mesh.usda',
+                 'photogrammetry/baked_mesh_tex0.png'),
+        depends_on=(),
+        resource_class='mesher',
+        build_command=_generate_mesh_command,
+        arguments=lambda ctx: {'feature_sensitivity': ctx.feature_sensitivity, 'detail_level': ctx.detail_level},
+    ),
+    Step(
+        number=2,
+        name='cleanup',
+        title='Clean Up',
+        scripts=('cleanup.py',),
+        inputs=('photogrammetry/baked_mesh.usda', 'photogrammetry/baked_mesh_tex0.png'),
+        outputs=('photogrammetry/{scan}.blend', 'photogrammetry/{scan}.png'),
+        depends_on=('generate_mesh',),
+        resource_class='blender',
+        build_command=_cleanup_command,
+        blender_job=_cleanup_job,
+        arguments=lambda ctx: {'facing': '0.5', 'environment_map': os.path.basename(ctx.hdri_path)},
+    ),
+    Step(
+        number=3,
+        name='face_detection',
+        title='Face Detection',
+        scripts=('pose_gen_package/face_detector.py', 'pose_gen_package/pose_generator.py',
+                 'pose_gen_package/get_camera_corners.py', 'rotate_mesh.py'),
+        inputs=('photogrammetry/{scan}.png', 'photogrammetry/{scan}.blend'),
+        outputs=('photogrammetry/{scan}_results.txt',),
+        depends_on=('cleanup',),
+        resource_class='ml',
+        build_command=_face_detection_command,
+        rewrites=('photogrammetry/{scan}.blend', 'photogrammetry/{scan}.png'),
+    ),
+    Step(
+        number=4,
+        name='add_rig',
+        title='Add Rig',
+        scripts=('add_rig.py', 'skeleton_template.blend'),
+        inputs=('photogrammetry/{scan}.blend', 'photogrammetry/{scan}_results.txt'),
+        outputs=('photogrammetry/{scan}-rig.blend',),
+        depends_on=('face_detection',),
+        resource_class='blender',
+        build_command=_add_rig_command,
+        blender_job=_add_rig_job,
+    ),
+    Step(
+        number=5,
+        name='pose_test',
+        title='Pose Test',
+        scripts=('pose_test.py', 'pose_test_render.blend', 'pose_test_rig.blend'),
+        inputs=('photogrammetry/{scan}-rig.blend',),
+        outputs=('photogrammetry/{scan}-pose_test.png', 'photogrammetry/{scan}-pose_test.blend'),
+        depends_on=('add_rig',),
+        resource_class='blender',
+        build_command=_pose_test_command,
+        blender_job=_pose_test_job,
+    ),
+)
+
+STEPS_BY_NAME = {step.name: step for step in PIPELINE_STEPS}
+STEPS_BY_NUMBER = {step.number: step for step in PIPELINE_STEPS}
+
+
+def resolve_steps(selection: str) -> List[Step]:
+    """Parse a comma separated list of step numbers or names ('all' for every step)."""
+    if not selection or selection == 'all':
+        return list(PIPELINE_STEPS)
+
+    steps = []
+    for token in selection.split(','):
+        token = token.strip()
+        step = STEPS_BY_NUMBER.get(int(token)) if token.isdigit() else STEPS_BY_NAME.get(token)
+        if step is None:
+            raise ValueError(f"Unknown step '{token}'. Use 1-5 or one of: {', '.join(STEPS_BY_NAME)}")
+        steps.append(step)
+    return sorted(set(steps), key=lambda s: s.number)
+
+
+def downstream_of(step_name: str) -> List[Step]:
+    """All steps that transitively depend on step_name."""
+    found = []
+    frontier = {step_name}
+    for step in PIPELINE_STEPS:
+        if frontier.intersection(step.depends_on):
+            found.append(step)
+            frontier.add(step.name)
+    return found
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ STEP STATE ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+class PipelineState:
+    """Step keys and file hashes recorded in photogrammetry/.pipeline_state.json."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.steps = {}
+        self.hash_cache = HashCache()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"WARNING: Ignoring unreadable pipeline state {self.path}: {e}")
+            return
+        if data.get('version') != STATE_VERSION:
+            return
+        self.steps = data.get('steps', {})
+        self.hash_cache = HashCache(data.get('hash_cache'))
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': STATE_VERSION, 'steps': self.steps,
+                       'hash_cache': self.hash_cache.to_dict()}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def recorded_key(self, step_name) -> Optional[str]:
+        return self.steps.get(step_name, {}).get('key')
+
+    def record(self, step_name, key, duration):
+        self.steps[step_name] = {'key': key, 'duration': round(duration, 3),
+                                 'completed_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    def invalidate(self, step_name):
+        self.steps.pop(step_name, None)
+
+
+def compute_step_key(step: Step, ctx: ScanContext, state: PipelineState) -> Tuple[Optional[str], List[str]]:
+    """
+    Hash everything a step depends on.
+
+    Returns:
+        (key, missing) where missing lists inputs that do not exist yet (key is None then)
+    """
+    missing = []
+    inputs = {}
+    for pattern in step.inputs:
+        digest = state.hash_cache.digest(ctx.scan_file(pattern))
+        if digest is None:
+            missing.append(pattern.format(scan=ctx.scan_id))
+        inputs[pattern] = digest
+
+    scripts = {}
+    for relative_path in step.scripts:
+        scripts[relative_path] = _SHARED_HASH_CACHE.digest(ctx.script_file(relative_path))
+
+    if missing:
+        return None, missing
+
+    payload = {
+        'step': step.name,
+        'scripts': scripts,
+        'inputs': inputs,
+        'arguments': step.arguments(ctx),
+    }
+    key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+    return key, missing
+
+
+def outputs_present(step: Step, ctx: ScanContext) -> bool:
+    return all(ctx.scan_file(pattern).exists() for pattern in step.outputs)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ RUNNER ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+@dataclass
+class StepResult:
+    step: Step
+    status: str  # 'ran', 'skipped', 'failed', 'blocked', 'excluded', 'planned', 'interrupted'
+    reason: str = ''
+    exit_code: int = 0
+    duration: float = 0.0
+    estimate: float = 0.0  # predicted seconds for planned steps
+
+
+class PipelineRunner:
+    """
+    Runs the pipeline steps of one scan in dependency order, skipping up-to-date steps.
+
+    Args:
+        ctx: ScanContext for the scan
+        selected: Steps allowed to run (others are only checked, never executed)
+        forced: Steps that run even when their key is unchanged
+        step_gate: Optional callable returning a context manager held while a step
+            executes (the scheduler uses it to acquire resource slots)
+        log_path: Append step output to this file instead of the console
+        blender_pool: Optional BlenderWorkerPool; Blender steps are sent to a warm
+            worker instead of launching Blender for each step
+        tag: Staging area the steps write into (takes/<scan>/.staging/<tag>/)
+        publish: Publish staged outputs into photogrammetry/ (False keeps them in staging
+            for comparison, e.g. an A/B rerun under another tag)
+        interrupt: Optional callable(step) -> reason, asked before each step executes; a
+            non-empty reason ends the run at that step boundary (the job queue uses it to
+            preempt, pause or cancel a scan without stopping a step halfway)
+        publisher: Optional artifact_publisher.ArtifactPublisher; each committed step's
+            artifacts are handed to it and copied in the background while later steps run
+        capture: Optional replay_bundle.Capture; the inputs of each step it selects are
+            recorded as a replay bundle right before the step executes
+    """
+
+    def __init__(self, ctx: ScanContext, selected=None, forced=None, step_gate=None, log_path=None,
+                 blender_pool=None, tag=step_staging.DEFAULT_TAG, publish=True, interrupt=None, publisher=None,
+                 capture=None):
+        self.ctx = ctx
+        self.capture = capture
+        self.publisher = publisher
+        self.interrupt = interrupt
+        self.interrupted = ''
+        self.staging = step_staging.StagingArea(ctx.takes_path, ctx.scan_id, tag)
+        self.publish = publish
+        self.blender_pool = blender_pool
+        self.selected = {step.name for step in (selected or PIPELINE_STEPS)}
+        self.forced = {step.name for step in (forced or [])}
+        self.step_gate = step_gate or (lambda step: nullcontext())
+        self.log_path = log_path
+        self.state = PipelineState(ctx.state_path)
+        self.timeline = pipeline_timeline.Timeline(
+            pipeline_timeline.timeline_path(ctx.takes_path, ctx.scan_id), ctx.scan_id,
+            run_id=f"{ctx.scan_id}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+        if publisher is not None:
+            publisher.bind(self.timeline, self._print)
+
+    def _print(self, message):
+        if self.log_path:
+            print(f"[{self.ctx.scan_id}] {message.strip()}", flush=True)
+            with open(self.log_path, 'a') as log_file:
+                log_file.write(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
+        else:
+            print(message, flush=True)
+
+    def step_env(self, step: Step) -> Dict[str, str]:
+        env = os.environ.copy()
+        env[pipeline_timeline.RUN_ID_ENV] = self.timeline.run_id
+        if step.resource_class == 'ml' and self.ctx.ml_threads:
+            threads = str(self.ctx.ml_threads)
+            env.update({'OMP_NUM_THREADS': threads, 'TF_NUM_INTRAOP_THREADS': threads,
+                        'TF_NUM_INTEROP_THREADS': '1'})
+        return env
+
+    def plan(self) -> List[StepResult]:
+        """Decide which steps would run without executing anything."""
+        results = []
+        will_run = set()
+        for step in PIPELINE_STEPS:
+            upstream_runs = will_run.intersection(step.depends_on)
+            if step.name not in self.selected:
+                results.append(StepResult(step, 'excluded', 'not selected'))
+                continue
+            if step.name in self.forced:
+                reason = 'forced'
+            elif upstream_runs:
+                reason = f"upstream {', '.join(sorted(upstream_runs))} will run"
+            else:
+                reason = self._stale_reason(step)
+            if reason:
+                will_run.add(step.name)
+                results.append(StepResult(step, 'planned', reason))
+            else:
+                results.append(StepResult(step, 'skipped', 'up to date'))
+        estimates = self.estimate_durations()
+        for result in results:
+            if result.status == 'planned':
+                result.estimate = estimates[result.step.name]
+        return results
+
+    def estimate_durations(self) -> Dict[str, float]:
+        return estimate_durations(self.ctx)
+
+    def _stale_reason(self, step: Step) -> str:
+        key, missing = compute_step_key(step, self.ctx, self.state)
+        if missing:
+            return f"missing inputs: {', '.join(missing)}"
+        if key != self.state.recorded_key(step.name):
+            return 'inputs, scripts or arguments changed'
+        return self._incomplete_reason(step)
+
+    def _incomplete_reason(self, step: Step) -> str:
+        """Why the step's artifact manifest does not prove it completed ('' if it does)."""
+        ok, reason = artifact_manifest.verify_step(step, self.ctx.scan_dir, self.ctx.scan_id)
+        return '' if ok else f"incomplete ({reason})"
+
+    def _record_run(self, status=None):
+        """Start (status None) or finish this run in the run database; steps are added by the timeline."""
+        try:
+            with run_store.RunStore(run_store.store_path(self.ctx.takes_path)) as store:
+                if status is None:
+                    store.start_run(self.timeline.run_id, self.ctx.scan_id, self.ctx.environment or None, {
+                        'selected': sorted(self.selected), 'forced': sorted(self.forced),
+                        'feature_sensitivity': self.ctx.feature_sensitivity, 'detail_level': self.ctx.detail_level,
+                        'blender_threads': self.ctx.blender_threads,
+                        'ml_threads': self.ctx.ml_threads, 'tag': self.staging.tag, 'publish': self.publish,
+                        'warm_blender': self.blender_pool is not None})
+                else:
+                    store.finish_run(self.timeline.run_id, status)
+        except (run_store.sqlite3.Error, OSError) as e:
+            self._print(f"WARNING: cannot update run database: {e}")
+        status_server.notify({'event': 'run', 'scan': self.ctx.scan_id, 'run_id': self.timeline.run_id,
+                              'status': status or 'running', 'takes': self.ctx.takes_path,
+                              'host': socket.gethostname()})
+
+    def run(self) -> List[StepResult]:
+        self._record_run()
+        duration_predictor.record_features(
+            self.timeline, duration_predictor.scan_features(self.ctx.scan_dir, self.ctx.feature_sensitivity,
+                                                          self.ctx.detail_level))
+        results = self._run_steps()
+        if self.publisher is not None and self.publisher.drain() and self.publisher.failed:
+            self._print(f"⚠️  {len(self.publisher.failed)} artifact(s) could not be published "
+                        f"(see: artifact_publisher.py publish)")
+        if any(result.status == 'failed' for result in results):
+            self._record_run('failed')
+        else:
+            self._record_run('interrupted' if self.interrupted else 'success')
+        return results
+
+    def _run_steps(self) -> List[StepResult]:
+        results = []
+        failed = set()
+        for step in PIPELINE_STEPS:
+            if self.interrupted:
+                results.append(StepResult(step, 'interrupted' if step.name in self.selected else 'excluded',
+                                          self.interrupted))
+                continue
+
+            blocked_by = failed.intersection(step.depends_on)
+            if blocked_by:
+                failed.add(step.name)
+                results.append(StepResult(step, 'blocked', f"upstream {', '.join(sorted(blocked_by))} failed"))
+                continue
+
+            if step.name not in self.selected:
+                results.append(StepResult(step, 'excluded', 'not selected'))
+                continue
+
+            key, missing = compute_step_key(step, self.ctx, self.state)
+            if missing:
+                failed.add(step.name)
+                self._print(f"❌ Step {step.number} ({step.title}) is missing inputs: {', '.join(missing)}")
+                results.append(StepResult(step, 'failed', f"missing inputs: {', '.join(missing)}", exit_code=1))
+                continue
+
+            if (step.name not in self.forced and key == self.state.recorded_key(step.name)
+                    and not self._incomplete_reason(step)):
+                self._print(f"⏭️  Step {step.number} ({step.title}) is up to date")
+                results.append(StepResult(step, 'skipped', 'up to date'))
+                continue
+
+            reason = self.interrupt(step) if self.interrupt else ''
+            if reason:
+                self.interrupted = reason
+                self._print(f"⏸️  Stopping before step {step.number} ({step.title}): {reason}")
+                results.append(StepResult(step, 'interrupted', reason))
+                continue
+
+            bundle = None
+            if self.capture is not None:
+                bundle = self.capture.capture_step(step, self.ctx, self.timeline.run_id, log=self._print)
+
+            # The step writes into staging; published outputs and their manifest stay intact until
+            # publishing swaps them, and a crash in between fails manifest verification
+            with self.step_gate(step):
+                result = self._execute(step)
+            if not self.publish:
+                results.append(result)
+                if result.status == 'failed':
+                    failed.add(step.name)
+                continue
+            if result.status != 'failed':
+                try:
+                    artifact_manifest.record_step(step, self.ctx.scan_dir, self.ctx.scan_id, self.ctx.scripts_dir,
+                                                  result.duration)
+                except FileNotFoundError as e:
+                    self._print(f"❌ Step {step.number} ({step.title}) manifest: {e}")
+                    result = StepResult(step, 'failed', str(e), 1, result.duration)
+                else:
+                    if self.publisher is not None:
+                        self.publisher.publish_step(step, self.ctx.scan_dir)
+                    if bundle is not None:
+                        self.capture.step_finished(bundle, step, self.ctx, result.duration, log=self._print)
+            results.append(result)
+            if result.status == 'failed':
+                failed.add(step.name)
+                self.state.invalidate(step.name)
+            else:
+                # Hash inputs again: face detection may rotate and re-save {scan}.blend/png
+                post_key, _ = compute_step_key(step, self.ctx, self.state)
+                self.state.record(step.name, post_key or key, result.duration)
+            self.state.save()
+        return results
+
+    def _run_in_worker(self, step: Step, ctx: ScanContext) -> int:
+        script, argv, blend_file = step.blender_job(ctx)
+        response = self.blender_pool.run(script, argv, blend_file=blend_file, log_path=self.log_path)
+        if response.get('status') != 'ok':
+            self._print(f"Blender worker error: {response.get('error')}")
+            if response.get('traceback'):
+                self._print(response['traceback'])
+        return 0 if response.get('status') == 'ok' else (response.get('exit_code') or 1)
+
+    def _execute(self, step: Step) -> StepResult:
+        with self.staging.lock():
+            staged_root = self.staging.prepare(
+                [p.format(scan=self.ctx.scan_id) for p in step.inputs],
+                [p.format(scan=self.ctx.scan_id) for p in step.outputs],
+                [p.format(scan=self.ctx.scan_id) for p in step.rewrites], chained=not self.publish)
+            return self._execute_staged(step, replace(self.ctx, takes_path=str(staged_root)))
+
+    def _run_supervised(self, step: Step, command: List[str], output) -> int:
+        """Run a step command under its watchdog policy (retrying hangs/crashes) and record its span."""
+        policy = step_supervisor.policy_for(step.name, self.ctx.supervision)
+        if output is not sys.stdout:
+            output.flush()
+        self.timeline.started(step.name, 'step', step.name)
+        result = step_supervisor.run_with_policy(lambda attempt, setting: command, policy, f"step {step.name}",
+                                                 log=self._print, stdout=output, env=self.step_env(step))
+        attrs = {'timeout': result.reason} if result.reason in ('wall', 'stall') else {}
+        self.timeline.record(step.name, result.duration, 'step', step=step.name, start=result.start,
+                             exit_code=result.exit_code, usage=result.usage, attempts=result.attempts, **attrs)
+        return result.exit_code
+
+    def _execute_staged(self, step: Step, ctx: ScanContext) -> StepResult:
+        use_worker = self.blender_pool is not None and step.blender_job is not None
+        command = step.build_command(ctx)
+        self._print("")
+        self._print(f"🔧 STEP {step.number}: {step.title}")
+        self._print("━" * 80)
+        self._print(f"{'Worker job' if use_worker else 'Command'}: {' '.join(command)}")
+
+        start = time.perf_counter()
+        if use_worker:
+            with self.timeline.span(step.name, kind='step', step=step.name, worker=True) as span:
+                exit_code = self._run_in_worker(step, ctx)
+                span['attrs']['exit_code'] = exit_code
+        elif self.log_path:
+            with open(self.log_path, 'a') as log_file:
+                exit_code = self._run_supervised(step, command, log_file)
+        else:
+            exit_code = self._run_supervised(step, command, sys.stdout)
+        duration = time.perf_counter() - start
+
+        if exit_code == step_supervisor.TIMEOUT_EXIT_CODE:
+            self._print(f"❌ Step {step.number} ({step.title}) hung and was killed by the watchdog")
+            return StepResult(step, 'failed', "timed out", exit_code, duration)
+        if exit_code != 0:
+            self._print(f"❌ Step {step.number} ({step.title}) failed with exit code {exit_code}")
+            return StepResult(step, 'failed', f"exit code {exit_code}", exit_code, duration)
+
+        if not outputs_present(step, ctx):
+            absent = [p.format(scan=ctx.scan_id) for p in step.outputs if not ctx.scan_file(p).exists()]
+            self._print(f"❌ Step {step.number} ({step.title}) did not produce: {', '.join(absent)}")
+            return StepResult(step, 'failed', f"missing outputs: {', '.join(absent)}", 1, duration)
+
+        if not self.publish:
+            self._print(f"✅ Step {step.number} ({step.title}) completed in {duration:.1f}s, "
+                        f"outputs kept in {ctx.photogrammetry_dir}")
+            return StepResult(step, 'ran', 'not published', exit_code, duration)
+        try:
+            version_id = self.staging.publish(
+                step.name, [p.format(scan=ctx.scan_id) for p in step.outputs],
+                [p.format(scan=ctx.scan_id) for p in step.rewrites], self.ctx.keep_versions)
+        except OSError as e:
+            self._print(f"❌ Step {step.number} ({step.title}) could not publish its outputs: {e}")
+            return StepResult(step, 'failed', f"publish failed: {e}", 1, duration)
+        if version_id:
+            self._print(f"📦 Previous outputs kept as version {version_id}")
+        self._print(f"✅ Step {step.number} ({step.title}) completed in {duration:.1f}s")
+        return StepResult(step, 'ran', '', exit_code, duration)
+
+
+def estimate_durations(ctx: ScanContext, predictor=None) -> Dict[str, float]:
+    """Predicted seconds for every pipeline step of a scan."""
+    predictor = predictor or duration_predictor.DurationPredictor.for_takes(ctx.takes_path)
+    features = duration_predictor.scan_features(ctx.scan_dir, ctx.feature_sensitivity, ctx.detail_level)
+    return {step.name: predictor.predict(step.name, features) for step in PIPELINE_STEPS}
+
+
+def run_scan(ctx: ScanContext, scratch=None, publisher_settings=None, log=print, **runner_kwargs):
+    """
+    Run one scan, on a local scratch working set when scratch (scan_staging.ScratchCache) is
+    given, publishing committed artifacts in the background.
+
+    Returns:
+        (runner, results)
+    """
+    with scan_staging.checked_out(scratch, ctx, log=log) as work_ctx:
+        publisher = artifact_publisher.build_publisher(
+            publisher_settings or artifact_publisher.DEFAULT_SETTINGS, ctx.scan_id,
+            mirror_takes=ctx.takes_path if work_ctx is not ctx else None, log=log)
+        runner = PipelineRunner(work_ctx, publisher=publisher, **runner_kwargs)
+        try:
+            results = runner.run()
+        finally:
+            if publisher is not None:
+                publisher.close()
+    return runner, results
+
+
+def print_results(scan_id, results: List[StepResult]):
+    icons = {'ran': '✅', 'skipped': '⏭️ ', 'failed': '❌', 'blocked': '⛔', 'excluded': '➖', 'planned': '▶️ ',
+             'interrupted': '⏸️ '}
+    print("")
+    print(f"📋 {scan_id}")
+    for result in results:
+        line = f"   {icons[result.status]} Step {result.step.number}: {result.step.title:<15} {result.status.upper()}"
+        if result.reason:
+            line += f" ({result.reason})"
+        if result.status == 'ran':
+            line += f" [{result.duration:.1f}s]"
+        elif result.status == 'planned':
+            line += f" [~{duration_predictor.format_duration(result.estimate)}]"
+        print(line)
+    planned = [result.estimate for result in results if result.status == 'planned']
+    if planned:
+        print(f"   ⏱️  Estimated total: ~{duration_predictor.format_duration(sum(planned))}")
+
+
+def build_context(scan_id, config, software_path=None, takes_path=None, feature_sensitivity='normal',
+                  detail_level=duration_predictor.DEFAULT_DETAIL) -> ScanContext:
+    if software_path:
+        scripts_dir = os.path.join(software_path, 'scannermeshprocessing-2023')
+    else:
+        software_path = config.software_path
+        scripts_dir = config.scannermeshprocessing_path
+    if not os.path.isdir(scripts_dir):
+        scripts_dir = str(SCRIPT_DIR)
+    hdri_filename = os.path.basename(config.get_asset_path('hdri_environment'))
+    return ScanContext(
+        scan_id=scan_id,
+        takes_path=takes_path or config.takes_path,
+        software_path=software_path,
+        blender_path=config.blender_path,
+        scripts_dir=scripts_dir,
+        python_path=find_python(scripts_dir),
+        feature_sensitivity=feature_sensitivity,
+        detail_level=detail_level,
+        hdri_path=os.path.join(scripts_dir, hdri_filename),
+        keep_versions=int(config.get_section('versions').get('keep', step_staging.DEFAULT_KEEP_VERSIONS)),
+        environment=config.environment,
+        supervision=config.get_section('supervisor'),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental scanner pipeline runner (skips up-to-date steps)")
+    parser.add_argument('scan_ids', nargs='+', help="Scan identifier(s)")
+    parser.add_argument('--environment', '-e', help="Environment to use (server, local)")
+    parser.add_argument('--software', '-s', help="Override software path")
+    parser.add_argument('--takes', '-t', help="Override takes path")
+    parser.add_argument('--feature-sensitivity', default='normal', choices=['normal', 'high'],
+                        help="groove-mesher feature sensitivity (default: normal)")
+    parser.add_argument('--detail', default=duration_predictor.DEFAULT_DETAIL,
+                        choices=list(duration_predictor.DETAIL_LEVELS),
+                        help="groove-mesher final model detail; lower levels are retried if it hangs (default: full)")
+    parser.add_argument('--steps', default='all', help="Steps allowed to run, e.g. 2,3 or cleanup,add_rig")
+    parser.add_argument('--force', default='', help="Steps to rerun even if up to date ('all' for every step)")
+    parser.add_argument('--dry-run', action='store_true', help="Show which steps would run and why")
+    parser.add_argument('--tag', default=step_staging.DEFAULT_TAG,
+                        help="Staging area to run in; use a different tag for concurrent A/B reruns")
+    parser.add_argument('--no-publish', action='store_true',
+                        help="Leave outputs in takes/<scan>/.staging/<tag>/ instead of publishing them")
+    parser.add_argument('--scratch', action='store_true',
+                        help="Run against a local-disk copy of the scan and sync changed outputs back "
+                             "(always on with config 'scratch.enabled')")
+    parser.add_argument('--capture', nargs='?', const='all', default='',
+                        help="Record replay bundles of the steps that run (optionally only these, e.g. 2,5)")
+    args = parser.parse_args()
+
+    try:
+        config = get_config(args.environment)
+        selected = resolve_steps(args.steps)
+        forced = resolve_steps(args.force) if args.force else []
+        capture = None
+        if args.capture:
+            captured = None if args.capture == 'all' else [step.name for step in resolve_steps(args.capture)]
+            capture = replay_bundle.capture_from_config(config, captured)
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    # unpublished A/B results live in the staging area, which is not synced back
+    scratch = None if args.no_publish else scan_staging.cache_from_config(config, force=args.scratch)
+    publisher_settings = artifact_publisher.publisher_settings(config)
+
+    exit_code = 0
+    for scan_id in args.scan_ids:
+        ctx = build_context(scan_id, config, args.software, args.takes, args.feature_sensitivity, args.detail)
+        if args.dry_run:
+            results = PipelineRunner(ctx, selected, forced, tag=args.tag, publish=not args.no_publish).plan()
+        else:
+            try:
+                _, results = run_scan(ctx, scratch, publisher_settings, selected=selected, forced=forced,
+                                      tag=args.tag, publish=not args.no_publish, capture=capture)
+            except OSError as e:
+                print(f"Error: {e}")
+                exit_code = 1
+                continue
+        print_results(scan_id, results)
+        if any(result.status == 'failed' for result in results):
+            exit_code = 1
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
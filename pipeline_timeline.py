@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Structured performance timeline for the scanner mesh processing pipeline.
+
+Every step and substep appends one JSON line to takes/logs/<scan>.timeline.jsonl:
+
+    {"ts": 1760000000.12, "scan": "X", "run_id": "...", "step": "cleanup", "name": "orientation",
+     "kind": "substep", "wall_s": 1.84, "cpu_s": 1.79, "child_cpu_s": 0.0,
+     "peak_rss_mb": 812.4, "child_peak_rss_mb": 0.0, "exit_code": null, "pid": 4242}
+
+Usage:
+    # inside a script
+    timeline = pipeline_timeline.for_scan(takes_path, scan_id, step="cleanup")
+    with timeline.span("render"):
+        ...
+    span = timeline.begin("orientation")   # same, without re-indenting long blocks
+    ...
+    timeline.end(span)
+
+    # wrap a command (used by runScriptAutomated.sh / generate_mesh.sh)
+    python3 pipeline_timeline.py exec --takes /takes --scan X --step cleanup -- blender -b -P cleanup.py -- ...
+
+    # percentiles across scans
+    python3 pipeline_timeline.py report --takes /takes [--since-days 7] [--scan X]
+
+Records are also mirrored into the run database (run_store.py) when sqlite3 is available;
+timeline.fact(key=value) stores per-run outcomes such as the orientation strategy. The start
+and end of every step and substep are also sent to the live status server (status_server.py).
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+RUN_ID_ENV = 'SCANNER_RUN_ID'
+TIMELINE_DIR = 'logs'
+TIMELINE_SUFFIX = '.timeline.jsonl'
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+_RSS_TO_MB = 1.0 / (1024 * 1024) if sys.platform == 'darwin' else 1.0 / 1024
+
+
+def timeline_path(takes_path, scan_id):
+    return os.path.join(takes_path, TIMELINE_DIR, f"{scan_id}{TIMELINE_SUFFIX}")
+
+
+def _usage():
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        'cpu': self_usage.ru_utime + self_usage.ru_stime,
+        'child_cpu': child_usage.ru_utime + child_usage.ru_stime,
+        'peak_rss_mb': self_usage.ru_maxrss * _RSS_TO_MB,
+        'child_peak_rss_mb': child_usage.ru_maxrss * _RSS_TO_MB,
+    }
+
+
+class Timeline:
+    """
+    Appends span records for one scan to its timeline file.
+
+    Writing never raises: a timeline that cannot be written only prints one warning.
+
+    Args:
+        path: Timeline file (see timeline_path)
+        scan_id: Scan identifier stored in every record
+        step: Pipeline step name stored in every record
+        run_id: Groups the records of one pipeline run (default: $SCANNER_RUN_ID)
+    """
+
+    def __init__(self, path, scan_id, step=None, run_id=None):
+        self.path = path
+        self.scan_id = scan_id
+        self.step = step
+        self.run_id = run_id or os.environ.get(RUN_ID_ENV, '')
+        self._lock = threading.Lock()
+        self._warned = False
+        self._store_warned = False
+        self._notify_failed = False
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write(line)
+            except OSError as e:
+                if not self._warned:
+                    print(f"WARNING: cannot write timeline {self.path}: {e}", flush=True)
+                    self._warned = True
+            self._store(record)
+        if record.get('kind') in ('step', 'substep'):
+            self._notify({'event': 'end', 'step': record.get('step'), 'name': record.get('name'),
+                          'kind': record.get('kind'), 'wall_s': record.get('wall_s'),
+                          'exit_code': record.get('exit_code')})
+
+    def _store(self, record):
+        if self._store_warned:
+            return
+        try:
+            import run_store
+            run_store.record_timeline(self.path, record)
+        except Exception as e:  # ImportError (no sqlite3 in this Python), sqlite3.Error, OSError
+            print(f"WARNING: run database disabled for this process: {e}", flush=True)
+            self._store_warned = True
+
+    def _notify(self, event):
+        if self._notify_failed or not self.scan_id:
+            return
+        event.update({'scan': self.scan_id, 'run_id': self.run_id, 'host': socket.gethostname(),
+                      'takes': os.path.dirname(os.path.dirname(self.path))})
+        try:
+            import status_server
+            status_server.notify(event)
+        except Exception:  # live status is best effort; the timeline record is what counts
+            self._notify_failed = True
+
+    def started(self, name, kind='substep', step=None):
+        """Tell the status server a span started (begin/span/run do this themselves)."""
+        self._notify({'event': 'start', 'step': step or self.step, 'name': name, 'kind': kind})
+
+    def record(self, name, wall_s, kind='substep', step=None, start=None, exit_code=None, usage=None, **attrs):
+        usage = usage or {}
+        record = {
+            'ts': round(start if start is not None else time.time() - wall_s, 3),
+            'scan': self.scan_id,
+            'run_id': self.run_id,
+            'step': step or self.step,
+            'name': name,
+            'kind': kind,
+            'wall_s': round(wall_s, 3),
+            'cpu_s': round(usage.get('cpu', 0.0), 3),
+            'child_cpu_s': round(usage.get('child_cpu', 0.0), 3),
+            'peak_rss_mb': round(usage.get('peak_rss_mb', 0.0), 1),
+            'child_peak_rss_mb': round(usage.get('child_peak_rss_mb', 0.0), 1),
+            'exit_code': exit_code,
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+        }
+        record.update(attrs)
+        self.write(record)
+        return record
+
+    def fact(self, step=None, **values):
+        """Record outcomes of this run (e.g. orientation_strategy='v2'); stored as a 'fact' record."""
+        record = {'ts': round(time.time(), 3), 'scan': self.scan_id, 'run_id': self.run_id,
+                  'step': step or self.step, 'name': 'fact', 'kind': 'fact', 'host': socket.gethostname()}
+        record.update(values)
+        self.write(record)
+        return record
+
+    def begin(self, name, kind='substep', **attrs):
+        self.started(name, kind, attrs.get('step'))
+        return {'name': name, 'kind': kind, 'attrs': attrs, 'start': time.time(),
+                'perf': time.perf_counter(), 'usage': _usage()}
+
+    def end(self, span, exit_code=None):
+        """Close a span from begin(). CPU is the delta of this process and its reaped children."""
+        wall_s = time.perf_counter() - span['perf']
+        before, after = span['usage'], _usage()
+        usage = {
+            'cpu': after['cpu'] - before['cpu'],
+            'child_cpu': after['child_cpu'] - before['child_cpu'],
+            'peak_rss_mb': after['peak_rss_mb'],
+            'child_peak_rss_mb': after['child_peak_rss_mb'],
+        }
+        exit_code = span['attrs'].pop('exit_code', exit_code)
+        return self.record(span['name'], wall_s, span['kind'], start=span['start'], exit_code=exit_code,
+                           usage=usage, **span['attrs'])
+
+    @contextmanager
+    def span(self, name, kind='substep', **attrs):
+        """Time a block; set span['attrs']['exit_code'] inside it to record a child's exit code."""
+        span = self.begin(name, kind, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span['attrs'].setdefault('error', type(e).__name__)
+            raise
+        finally:
+            self.end(span)
+
+    def run(self, name, command, kind='substep', step=None, **popen_kwargs) -> int:
+        """Run a command and record its exact resource usage (os.wait4 on its pid)."""
+        self.started(name, kind, step)
+        start, perf = time.time(), time.perf_counter()
+        process = subprocess.Popen(command, **popen_kwargs)
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except KeyboardInterrupt:
+            process.kill()
+            raise
+        process.returncode = os.waitstatus_to_exitcode(status)
+        self.record(name, time.perf_counter() - perf, kind, step=step, start=start, exit_code=process.returncode, usage={
+            'child_cpu': usage.ru_utime + usage.ru_stime,
+            'child_peak_rss_mb': usage.ru_maxrss * _RSS_TO_MB,
+        })
+        return process.returncode
+
+
+class NullTimeline(Timeline):
+    """Timeline that records nothing (no scan/takes path known)."""
+
+    def __init__(self):
+        super().__init__(os.devnull, '', None, '')
+
+    def write(self, record):
+        pass
+
+
+def for_scan(takes_path, scan_id, step=None) -> Timeline:
+    if not takes_path or not scan_id:
+        return NullTimeline()
+    return Timeline(timeline_path(takes_path, scan_id), scan_id, step)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ REPORT ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def read_records(paths, since=None):
+    for path in paths:
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if since is None or record.get('ts', 0) >= since:
+                        yield record
+        except OSError as e:
+            print(f"WARNING: cannot read {path}: {e}")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(records):
+    """Group records by (step, name) and compute wall/CPU/RSS statistics."""
+    groups = {}
+    for record in records:
+        if record.get('kind') == 'fact':
+            continue
+        key = (record.get('step') or '', record.get('name') or '', record.get('kind') or '')
+        groups.setdefault(key, []).append(record)
+
+    rows = []
+    for (step, name, kind), group in groups.items():
+        walls = sorted(r.get('wall_s', 0.0) for r in group)
+        cpus = sorted(r.get('cpu_s', 0.0) + r.get('child_cpu_s', 0.0) for r in group)
+        rss = sorted(max(r.get('peak_rss_mb', 0.0), r.get('child_peak_rss_mb', 0.0)) for r in group)
+        failures = sum(1 for r in group if r.get('exit_code') not in (None, 0) or r.get('error'))
+        rows.append({
+            'step': step, 'name': name, 'kind': kind, 'count': len(group),
+            'scans': len({r.get('scan') for r in group}), 'failures': failures,
+            'total_s': sum(walls), 'p50_s': percentile(walls, 0.5), 'p90_s': percentile(walls, 0.9),
+            'p99_s': percentile(walls, 0.99), 'max_s': walls[-1],
+            'cpu_p50_s': percentile(cpus, 0.5), 'rss_p90_mb': percentile(rss, 0.9),
+        })
+    rows.sort(key=lambda row: (row['kind'] != 'step', -row['total_s']))
+    return rows
+
+
+def print_report(rows):
+    header = (f"{'KIND':<8} {'STEP':<15} {'NAME':<24} {'N':>5} {'FAIL':>4} {'TOTAL':>9} "
+              f"{'P50':>8} {'P90':>8} {'P99':>8} {'MAX':>8} {'CPU50':>8} {'RSS90MB':>8}")
+    print(header)
+    print("━" * len(header))
+    for row in rows:
+        print(f"{row['kind']:<8} {row['step'][:15]:<15} {row['name'][:24]:<24} {row['count']:>5} {row['failures']:>4} "
+              f"{row['total_s']:>8.1f}s {row['p50_s']:>7.2f}s {row['p90_s']:>7.2f}s {row['p99_s']:>7.2f}s "
+              f"{row['max_s']:>7.2f}s {row['cpu_p50_s']:>7.2f}s {row['rss_p90_mb']:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline performance timeline")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    exec_parser = subparsers.add_parser('exec', help="Run a command and record it as a timeline span")
+    exec_parser.add_argument('--takes', required=True, help="Takes path (timeline goes to takes/logs)")
+    exec_parser.add_argument('--scan', required=True, help="Scan identifier")
+    exec_parser.add_argument('--step', required=True, help="Pipeline step name")
+    exec_parser.add_argument('--name', help="Span name (default: the step name)")
+    exec_parser.add_argument('--kind', default='step', choices=['step', 'substep'])
+    exec_parser.add_argument('cmd', nargs=argparse.REMAINDER, help="-- command and arguments")
+
+    report_parser = subparsers.add_parser('report', help="Percentiles across scans")
+    report_parser.add_argument('files', nargs='*', help="Timeline files (default: every timeline in takes/logs)")
+    report_parser.add_argument('--takes', help="Takes path")
+    report_parser.add_argument('--environment', '-e', help="Environment to read takes_path from")
+    report_parser.add_argument('--scan', help="Only this scan")
+    report_parser.add_argument('--step', help="Only this step")
+    report_parser.add_argument('--since-days', type=float, help="Only records from the last N days")
+    report_parser.add_argument('--json', action='store_true', help="Print JSON instead of a table")
+
+    args = parser.parse_args()
+
+    if args.command == 'exec':
+        command = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+        if not command:
+            parser.error("exec needs a command after --")
+        timeline = for_scan(args.takes, args.scan, args.step)
+        try:
+            exit_code = timeline.run(args.name or args.step, command, kind=args.kind)
+        except OSError as e:
+            print(f"Error: cannot run {command[0]}: {e}")
+            sys.exit(127)
+        sys.exit(exit_code)
+
+    files = list(args.files)
+    if not files:
+        takes_path = args.takes
+        if not takes_path:
+            from config_reader import get_config
+            takes_path = get_config(args.environment).takes_path
+        pattern = f"{args.scan}{TIMELINE_SUFFIX}" if args.scan else f"*{TIMELINE_SUFFIX}"
+        files = sorted(glob.glob(os.path.join(takes_path, TIMELINE_DIR, pattern)))
+    if not files:
+        print("No timeline files found")
+        sys.exit(1)
+
+    since = time.time() - args.since_days * 86400 if args.since_days else None
+    records = (r for r in read_records(files, since)
+               if (not args.scan or r.get('scan') == args.scan) and (not args.step or r.get('step') == args.step))
+    rows = summarize(records)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(f"📊 {len(files)} timeline file(s)")
+        print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
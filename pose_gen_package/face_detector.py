@@ -1,13 +1,16 @@
 import os
+import sys
 import cv2
 import time
 import shutil
 import socket
 import argparse
-import subprocess
 from mtcnn import MTCNN
-from colorama import init, Fore, Style
-init(autoreset=True)  # initializes colorama
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pipeline_log
+import pipeline_timeline
+from substep_executor import Substep, run_substeps
 
 
 print('\n▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
@@ -39,23 +42,8 @@ def get_args():
     return parsed_script_args
 
 
-def print_enhanced(text, text_color="white", label="", label_color="white", prefix="", suffix=""):
-    color_code = {
-        'black': Fore.BLACK,
-        'red': Fore.RED,
-        'green': Fore.GREEN,
-        'yellow': Fore.YELLOW,
-        'blue': Fore.BLUE,
-        'magenta': Fore.MAGENTA,
-        'cyan': Fore.CYAN,
-        'white': Fore.WHITE,
-        'reset': Style.RESET_ALL
-    }
-
-    if label == "":
-        return print(f"{prefix}{color_code[text_color]}{text}{suffix}")
-
-    print(f"{prefix}[{color_code[label_color]}{label}{Style.RESET_ALL}] {color_code[text_color]}{text}{suffix}")
+log = pipeline_log.get_logger("face_detection")
+print_decorated, print_enhanced = pipeline_log.print_helpers(log)
 
 
 def write_unified_log(scan, path, message):
@@ -87,9 +75,9 @@ def write_log(scan, path, message):
 def copy_assets_to_local(server_directory, local_directory, scan):
     server_scan_directory = os.path.join(server_directory, scan)
     local_scan_directory = os.path.join(local_directory, scan)
-    print('_______________________________________________________________________')
-    print(f"Copying assets from {server_scan_directory} to {local_scan_directory}")
-    print('_______________________________________________________________________')
+    log.info('_______________________________________________________________________')
+    log.info(f"Copying assets from {server_scan_directory} to {local_scan_directory}")
+    log.info('_______________________________________________________________________')
 
     if not os.path.exists(local_scan_directory):
         os.makedirs(local_scan_directory)
@@ -112,9 +100,9 @@ def copy_results_to_server(server_directory, local_directory, scan):
     server_scan_directory = os.path.join(server_directory, scan)
     local_scan_directory = os.path.join(local_directory, scan)
 
-    print('_______________________________________________________________________')
-    print(f"Copying results from {local_scan_directory} to {server_scan_directory}")
-    print('_______________________________________________________________________')
+    log.info('_______________________________________________________________________')
+    log.info(f"Copying results from {local_scan_directory} to {server_scan_directory}")
+    log.info('_______________________________________________________________________')
 
     start_time = time.time()
 
@@ -136,36 +124,57 @@ def copy_results_to_server(server_directory, local_directory, scan):
             shutil.copy(local_path, server_path)
 
     elapsed_time = time.time() - start_time
-    print(f"Copying process took {elapsed_time:.2f} seconds")
+    log.info(f"Copying process took {elapsed_time:.2f} seconds")
 
     shutil.rmtree(local_scan_directory)
 
 
-def detect_faces(image_path):
-    # Create the detector, using default weights
-    detector = MTCNN()
+def detect_faces(image_path, timeline=pipeline_timeline.NullTimeline()):
+    with timeline.span("mtcnn"):
+        # Create the detector, using default weights
+        detector = MTCNN()
 
-    # Read the image
-    img = cv2.cvtColor(cv2.imread(image_path), cv2.COLOR_BGR2RGB)
+        # Read the image
+        img = cv2.cvtColor(cv2.imread(image_path), cv2.COLOR_BGR2RGB)
 
-    # Detect faces
-    faces = detector.detect_faces(img)
+        # Detect faces
+        faces = detector.detect_faces(img)
 
     # Return a list of faces or faces=[]
     return faces
 
-def pose_generator(image_path, software, blender, blend_file, use_save_landmarks_image="0"):
+def camera_corners_command(software, blender, blend_file):
     get_camera_corners_script = os.path.join(software, "pose_gen_package", "get_camera_corners.py")
-    if os.path.exists(get_camera_corners_script):
-        # print_enhanced(f"\n{blender} -b {blend_file} -P {get_camera_corners_script}\n", label="RUN COMMAND", label_color="yellow")
-        subprocess.run([blender, "-b", blend_file, "-P", get_camera_corners_script])
+    if not os.path.exists(get_camera_corners_script):
+        return None
+    return [blender, "-b", blend_file, "-P", get_camera_corners_script]
+
+def detect_faces_and_corners(image_path, software, blender, blend_file, timeline=pipeline_timeline.NullTimeline()):
+    # MTCNN only reads the png and get_camera_corners.py only reads the blend, so the Blender
+    # launch overlaps the detection. If no face is found the corners are discarded: the mesh is
+    # rotated and both run again on the rotated files.
+    substeps = [Substep("mtcnn", func=lambda: detect_faces(image_path))]
+    command = camera_corners_command(software, blender, blend_file)
+    if command:
+        substeps.append(Substep("get_camera_corners", command=command))
+    pipeline_log.flush()  # children write straight to stdout: keep our queued messages ahead of theirs
+    results = run_substeps(substeps, timeline)
+    return results["mtcnn"].result()
+
+def pose_generator(image_path, software, blender, blend_file, use_save_landmarks_image="0", timeline=pipeline_timeline.NullTimeline(), camera_corners=True):
+    pipeline_log.flush()
+    command = camera_corners_command(software, blender, blend_file)
+    if camera_corners and command:
+        # print_enhanced(f"\n{' '.join(command)}\n", label="RUN COMMAND", label_color="yellow")
+        timeline.run("get_camera_corners", command)
 
     pose_gen_script = os.path.join(software, "pose_gen_package", "pose_generator.py")
-    subprocess.run(["python", pose_gen_script, "-i", image_path, "-s", use_save_landmarks_image])
+    timeline.run("mediapipe", ["python", pose_gen_script, "-i", image_path, "-s", use_save_landmarks_image])
 
-def rotate_mesh(scan, path, blender, rotmesh, new_blend_file):
+def rotate_mesh(scan, path, blender, rotmesh, new_blend_file, timeline=pipeline_timeline.NullTimeline()):
     # print_enhanced(f"{blender} -b {new_blend_file} -P {rotmesh} -- --scan {scan} --path {path}", label="RUN COMMAND", label_color="yellow")
-    subprocess.run([blender, "-b", new_blend_file, "-P", rotmesh, "--", "--scan", scan, "--path", path])
+    pipeline_log.flush()
+    timeline.run("rotate_mesh", [blender, "-b", new_blend_file, "-P", rotmesh, "--", "--scan", scan, "--path", path])
 
 def copy_and_rename_files(src, dst):
     if os.path.exists(src):
@@ -192,29 +201,34 @@ def main():
     # LOAD THE IMAGE
     IMAGE_PATH = os.path.join(SCAN_DIR, SCAN, "photogrammetry", f"{SCAN}.png")
 
+    pipeline_log.for_scan(SCAN_DIR, SCAN, step="face_detection")
+    TIMELINE = pipeline_timeline.for_scan(SCAN_DIR, SCAN, step="face_detection")
+
     if BYPASS_FACE_DETECTION == 1:
         print_enhanced("BYPASSING FACE DETECTION", text_color="yellow", label="INFO", label_color="yellow")
 
         log_message = "Face detection: BYPASSED"
         write_log(SCAN, SCAN_DIR, log_message)
+        TIMELINE.fact(face_detection='bypassed')
 
         # CALL POSE GENERATOR
         print_enhanced("Calling pose_generator.py", label="INFO", label_color="yellow")
-        pose_generator(IMAGE_PATH, SOFTWARE, BLENDER_EXE, BLEND_FILEPATH, USE_SAVE_LANDMARKS_IMAGE)
+        pose_generator(IMAGE_PATH, SOFTWARE, BLENDER_EXE, BLEND_FILEPATH, USE_SAVE_LANDMARKS_IMAGE, TIMELINE)
 
         return
 
-    faceFound = detect_faces(IMAGE_PATH)
+    faceFound = detect_faces_and_corners(IMAGE_PATH, SOFTWARE, BLENDER_EXE, BLEND_FILEPATH, TIMELINE)
 
     if faceFound:
         print_enhanced("SUCCESS", text_color="green", label="DETECT FACE", label_color="green")
 
         log_message = "Face detection: SUCCESS"
         write_log(SCAN, SCAN_DIR, log_message)
+        TIMELINE.fact(face_detection='success')
 
         # CALL POSE GENERATOR
         print_enhanced("Calling pose_generator.py", label="INFO", label_color="yellow")
-        pose_generator(IMAGE_PATH, SOFTWARE, BLENDER_EXE, BLEND_FILEPATH, USE_SAVE_LANDMARKS_IMAGE)
+        pose_generator(IMAGE_PATH, SOFTWARE, BLENDER_EXE, BLEND_FILEPATH, USE_SAVE_LANDMARKS_IMAGE, TIMELINE, camera_corners=False)
 
         return
 
@@ -232,25 +246,27 @@ def main():
 
     # LAUNCH BLENDER TO ROTATE MESH
     print_enhanced("Calling rotate_mesh.py", label="INFO", label_color="yellow")
-    rotate_mesh(SCAN, SCAN_DIR, BLENDER_EXE, ROTATE_MESH_SCRIPT, new_blend_file)
+    rotate_mesh(SCAN, SCAN_DIR, BLENDER_EXE, ROTATE_MESH_SCRIPT, new_blend_file, TIMELINE)
 
     print_enhanced("Running Face Detection again", label="INFO", label_color="yellow")
-    faceFound = detect_faces(IMAGE_PATH)
+    faceFound = detect_faces_and_corners(IMAGE_PATH, SOFTWARE, BLENDER_EXE, BLEND_FILEPATH, TIMELINE)
 
     if faceFound:
         print_enhanced("SUCCESS after rotation", text_color="green", label="DETECT FACE", label_color="green")
         log_message = "Face detection after rotation: SUCCESS"
         write_log(SCAN, SCAN_DIR, log_message)
+        TIMELINE.fact(face_detection='success_after_rotation')
         
         # CALL POSE GENERATOR
         print_enhanced("Calling pose_generator.py", label="INFO", label_color="yellow")
-        pose_generator(IMAGE_PATH, SOFTWARE, BLENDER_EXE, BLEND_FILEPATH, USE_SAVE_LANDMARKS_IMAGE)
+        pose_generator(IMAGE_PATH, SOFTWARE, BLENDER_EXE, BLEND_FILEPATH, USE_SAVE_LANDMARKS_IMAGE, TIMELINE, camera_corners=False)
 
         return
 
     print_enhanced("FAILED after rotation", text_color="red", label="DETECT FACE", label_color="red")
     log_message = "Face detection after rotation: FAILED"
     write_log(SCAN, SCAN_DIR, log_message)
+    TIMELINE.fact(face_detection='failed')
     #write_unified_log(scan, path, log_message)
 
 if __name__ == '__main__':
@@ -4,8 +4,9 @@ import sys
 import argparse
 import numpy as np
 import mediapipe as mp
-from colorama import init, Fore, Style
-init(autoreset=True)  # initializes colorama
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pipeline_log
 
 
 print('\n▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
@@ -32,29 +33,8 @@ def argument_parser():
     return parser.parse_args()
 
 
-def print_decorated(message, symbol="▬", padding=0):
-    border = symbol * (len(message) + padding)
-    decorated_message = f"\n{message}\n{border}"
-    print(decorated_message)
-
-
-def print_enhanced(text, text_color="white", label="", label_color="white", prefix="", suffix=""):
-    color_code = {
-        'black': Fore.BLACK,
-        'red': Fore.RED,
-        'green': Fore.GREEN,
-        'yellow': Fore.YELLOW,
-        'blue': Fore.BLUE,
-        'magenta': Fore.MAGENTA,
-        'cyan': Fore.CYAN,
-        'white': Fore.WHITE,
-        'reset': Style.RESET_ALL
-    }
-
-    if label == "":
-        return print(f"{prefix}{color_code[text_color]}{text}{suffix}")
-
-    print(f"{prefix}[{color_code[label_color]}{label}{Style.RESET_ALL}] {color_code[text_color]}{text}{suffix}")
+log = pipeline_log.get_logger("pose_generator")
+print_decorated, print_enhanced = pipeline_log.print_helpers(log)
 
 
 def save_landmarks_image(mp_pose, in_img, image, results):
@@ -122,10 +102,11 @@ def run_pose_estimation(in_img, out_txt, cam_corners=None, use_save_landmarks_im
             for ID in MP_POSE.PoseLandmark:
                 x = (RESULTS.pose_landmarks.landmark[ID].x * SCALING_FACTOR[0]) + top_left[0]
                 y = ((1-RESULTS.pose_landmarks.landmark[ID].y) * SCALING_FACTOR[1]) + bottom_right[1]
-                print_enhanced(f"x: {x} | y: {y}", label=f"{ID.name}", label_color="cyan")
+                log.debug("%s x: %s | y: %s", ID.name, x, y)
 
                 result_line = f"{ID.name} {x} {y}\n"
                 results_file.write(result_line)
+        print_enhanced(f"{len(MP_POSE.PoseLandmark)} landmarks", label="OUTPUT TXT", label_color="cyan")
 
 
 def main():
@@ -7,6 +7,10 @@ import sys
 from mathutils import Vector
 from typing import NamedTuple
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pipeline_log
+import pipeline_timeline
+
 print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
 print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
 print('▬▬▬▬▬▬▬▬▬▬▬ pose_test.py ▬▬▬▬▬▬▬▬▬▬▬▬▬')
@@ -42,29 +46,8 @@ def get_args():
 use_debug = True
 
 
-def print_decorated(message, symbol="▬", padding=0):
-    border = symbol * (len(message) + padding)
-    decorated_message = f"\n{message}\n{border}"
-    print(decorated_message)
-
-
-def print_enhanced(text, text_color="white", label="", label_color="white", prefix="", suffix=""):
-    color_code = {
-        'black': '\033[30m',
-        'red': '\033[31m',
-        'green': '\033[32m',
-        'yellow': '\033[33m',
-        'blue': '\033[34m',
-        'magenta': '\033[35m',
-        'cyan': '\033[36m',
-        'white': '\033[37m',
-        'reset': '\033[0m'
-    }
-
-    if label == "":
-        return print(f"{prefix}{color_code[text_color]}{text}{color_code['reset']}{suffix}")
-    
-    print(f"{prefix}[{color_code[label_color]}{label}{color_code['reset']}] {color_code[text_color]}{text}{color_code['reset']}{suffix}")
+log = pipeline_log.get_logger("pose_test")
+print_decorated, print_enhanced = pipeline_log.print_helpers(log)
 
 
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
@@ -159,7 +142,7 @@ def create_fake_bones(armature_name, bones_thickness=0.005, sphere_radius=0.0125
     # Get the armature
     armature = bpy.data.objects.get(armature_name)
     if not armature or armature.type != 'ARMATURE':
-        print(f"No armature named '{armature_name}' found in the scene.")
+        log.warning(f"No armature named '{armature_name}' found in the scene.")
         return
     
     # Create a temporary cylinder
@@ -314,6 +297,39 @@ def append_scans(filepath):
     append_collection(filepath, "rig")
     append_collection(filepath, "rig")
     append_collection(filepath, "rig")
+    return find_scan_rigs()
+
+
+def duplicate_collection(collection, suffix):
+    """copies a collection in memory (what appending it again from disk would give); mesh data stays shared"""
+    new_collection = bpy.data.collections.new(f"{collection.name}{suffix}")
+    copies = {}
+    for obj in collection.objects:
+        new_obj = obj.copy()
+        if obj.type == 'ARMATURE':
+            new_obj.data = obj.data.copy()
+        new_obj.name = f"{obj.name}{suffix}"
+        new_collection.objects.link(new_obj)
+        copies[obj] = new_obj
+
+    # point parents, modifiers and constraints at the copies
+    for new_obj in copies.values():
+        if new_obj.parent in copies:
+            new_obj.parent = copies[new_obj.parent]
+        for modifier in new_obj.modifiers:
+            if getattr(modifier, "object", None) in copies:
+                modifier.object = copies[modifier.object]
+        if new_obj.pose:
+            for pose_bone in new_obj.pose.bones:
+                for constraint in pose_bone.constraints:
+                    if getattr(constraint, "target", None) in copies:
+                        constraint.target = copies[constraint.target]
+
+    print_enhanced(f"'{collection.name}' -> '{new_collection.name}'", label="DUPLICATE COLLECTION", label_color="green")
+    return new_collection
+
+
+def find_scan_rigs():
     scan_rig_0 = bpy.context.scene.objects.get("Armature")
     scan_rig_1 = bpy.context.scene.objects.get("Armature.001")
     scan_rig_2 = bpy.context.scene.objects.get("Armature.002")
@@ -321,11 +337,11 @@ def append_scans(filepath):
     scan_rigs = ScanRigs(scan_rig_0, scan_rig_1, scan_rig_2)
 
     if scan_rigs.rig_0 is None or scan_rigs.rig_1 is None or scan_rigs.rig_2 is None:
-        print_enhanced(f"append_scans failed | Missing one or more scan rigs", text_color="red", label="ERROR", label_color="red")
+        print_enhanced(f"find_scan_rigs failed | Missing one or more scan rigs", text_color="red", label="ERROR", label_color="red")
         return None
 
     if scan_rigs.rig_0.type != 'ARMATURE' or scan_rigs.rig_1.type != 'ARMATURE' or scan_rigs.rig_2.type != 'ARMATURE':
-        print_enhanced(f"append_scans failed | One or more scan rigs are not type ARMATURE", text_color="red", label="ERROR", label_color="red")
+        print_enhanced(f"find_scan_rigs failed | One or more scan rigs are not type ARMATURE", text_color="red", label="ERROR", label_color="red")
         return None
 
     print_enhanced(f"{scan_rigs}", label="FOUND SCAN RIGS", label_color="cyan", suffix="\n")
@@ -436,35 +452,9 @@ def retarget_target_bones(target_armature, bones_to_retarget):
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MAIN ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 
-def main():
-
-    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MAIN VARIABLES ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-    print_decorated("MAIN VARIABLES")
-
-    args = get_args()
-    path = str(args.path)
-    scan_ID = str(args.scan)
-    use_clean_start = int(args.clean_start)
-    software_path = str(args.software)
-    
-    rig_filepath = os.path.join(path, scan_ID, "photogrammetry", f"{scan_ID}-rig.blend")
-    pose_test_rig_filename = "pose_test_rig.blend"
-    pose_test_rig_filepath = os.path.join(software_path, pose_test_rig_filename)
-
-    pose_test_blender_filepath = os.path.join(path, scan_ID, "photogrammetry", f"{scan_ID}-pose_test.blend")
-    fake_bones_render_filepath = os.path.join(path, scan_ID, "photogrammetry", f"{scan_ID}-pose_test_bones.png")
-    pose_test_render_filepath = os.path.join(path, scan_ID, "photogrammetry", f"{scan_ID}-pose_test.png")
-    _pose_test_render_filepath = os.path.join(path, "_pose_test", f"{scan_ID}-pose_test.png")
-
-    print_enhanced(f"{path}", label="PATH", label_color="cyan")
-    print_enhanced(f"{scan_ID}", label="SCAN", label_color="cyan")
-    print_enhanced(f"{use_clean_start}", label="USE CLEAN START", label_color="cyan")
-    print_enhanced(f"{software_path}", label="SOFTWARE PATH", label_color="cyan")
-    print_enhanced(f"{rig_filepath}", label="RIG FILEPATH", label_color="cyan")
-    print_enhanced(f"{pose_test_rig_filepath}", label="TEST RIG FILEPATH", label_color="cyan")
-
+def run_pose_test(scan_rigs, test_rigs, fake_bones_render_filepath, pose_test_render_filepath, timeline=None):
+    """expects the pose test template scene with the three scan rigs and the test rigs in it"""
+    timeline = timeline or pipeline_timeline.NullTimeline()
     bones_to_retarget_names = [
     "mixamorig:RightArm",
     "mixamorig:LeftArm",
@@ -483,17 +473,6 @@ def main():
     "mixamorig:Spine2",  
     ]
 
-    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MAIN STEPS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
-    print_decorated("MAIN STEPS")
-
-    if use_clean_start:
-        scene_clean_start()
-
-    scan_rigs = append_scans(rig_filepath)
-    test_rigs = append_test_rigs(pose_test_rig_filepath)
-
     if scan_rigs is None:
         print_enhanced("Main Failed | scan_rigs is None", text_color="red", label="ERROR", label_color="red")
         sys.exit(1)
@@ -559,7 +538,8 @@ def main():
     
     bpy.context.scene.node_tree.nodes["Alpha Over"].inputs[0].default_value = 0
 
-    render_still(camera, fake_bones_render_filepath)
+    with timeline.span("render_bones"):
+        render_still(camera, fake_bones_render_filepath)
 
     if bpy.data.images.get("bones_image"):
         bpy.data.images['bones_image'].filepath = fake_bones_render_filepath
@@ -571,9 +551,56 @@ def main():
 
     bpy.context.scene.node_tree.nodes["Alpha Over"].inputs[0].default_value = 0.75
 
-    render_still(camera, pose_test_render_filepath)
+    with timeline.span("render_pose_test"):
+        render_still(camera, pose_test_render_filepath)
+
+
+def main():
+
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MAIN VARIABLES ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+    print_decorated("MAIN VARIABLES")
+
+    args = get_args()
+    path = str(args.path)
+    scan_ID = str(args.scan)
+    use_clean_start = int(args.clean_start)
+    software_path = str(args.software)
+    pipeline_log.for_scan(path, scan_ID, step="pose_test")
+    
+    rig_filepath = os.path.join(path, scan_ID, "photogrammetry", f"{scan_ID}-rig.blend")
+    pose_test_rig_filename = "pose_test_rig.blend"
+    pose_test_rig_filepath = os.path.join(software_path, pose_test_rig_filename)
+
+    pose_test_blender_filepath = os.path.join(path, scan_ID, "photogrammetry", f"{scan_ID}-pose_test.blend")
+    fake_bones_render_filepath = os.path.join(path, scan_ID, "photogrammetry", f"{scan_ID}-pose_test_bones.png")
+    pose_test_render_filepath = os.path.join(path, scan_ID, "photogrammetry", f"{scan_ID}-pose_test.png")
+    _pose_test_render_filepath = os.path.join(path, "_pose_test", f"{scan_ID}-pose_test.png")
+
+    print_enhanced(f"{path}", label="PATH", label_color="cyan")
+    print_enhanced(f"{scan_ID}", label="SCAN", label_color="cyan")
+    print_enhanced(f"{use_clean_start}", label="USE CLEAN START", label_color="cyan")
+    print_enhanced(f"{software_path}", label="SOFTWARE PATH", label_color="cyan")
+    print_enhanced(f"{rig_filepath}", label="RIG FILEPATH", label_color="cyan")
+    print_enhanced(f"{pose_test_rig_filepath}", label="TEST RIG FILEPATH", label_color="cyan")
+
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MAIN STEPS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+    print_decorated("MAIN STEPS")
+
+    if use_clean_start:
+        scene_clean_start()
+
+    scan_rigs = append_scans(rig_filepath)
+    test_rigs = append_test_rigs(pose_test_rig_filepath)
+
+    timeline = pipeline_timeline.for_scan(path, scan_ID, step="pose_test")
+    run_pose_test(scan_rigs, test_rigs, fake_bones_render_filepath, pose_test_render_filepath, timeline)
     #copy_file(pose_test_render_filepath, _pose_test_render_filepath)
-    save_as(pose_test_blender_filepath)
+    with timeline.span("save"):
+        save_as(pose_test_blender_filepath)
 
 
 if __name__ == '__main__':
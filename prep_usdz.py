@@ -1,12 +1,16 @@
 import os
 import bpy
 import sys
+import json
 import math
 import bmesh
 import argparse
 from mathutils import Vector
 from typing import NamedTuple
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pipeline_log
+
 
 print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
 print('▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬')
@@ -43,6 +47,7 @@ def get_args():
     parser.add_argument('-n', '--scan', help="scan name")
     parser.add_argument('-m', '--path', help="directory", default="/Users/administrator/groove-test/takes/")
     parser.add_argument('-l', '--use_locally', help="1: use command line arguments 0: use in grooveMeshCheck", default="0") 
+    parser.add_argument('-j', '--bounds_json', help="write the bounding box to this JSON file (with -l 1)", default=None)
     parsed_script_args, _ = parser.parse_known_args(script_args)
     return parsed_script_args
 
@@ -51,29 +56,8 @@ def get_args():
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ DEBUG UTILS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
 
-def print_decorated(message, symbol="▬", padding=0):
-    border = symbol * (len(message) + padding)
-    decorated_message = f"\n{message}\n{border}"
-    print(decorated_message)
-
-
-def print_enhanced(text, text_color="white", label="", label_color="white", prefix="", suffix=""):
-    color_code = {
-        'black': '\033[30m',
-        'red': '\033[31m',
-        'green': '\033[32m',
-        'yellow': '\033[33m',
-        'blue': '\033[34m',
-        'magenta': '\033[35m',
-        'cyan': '\033[36m',
-        'white': '\033[37m',
-        'reset': '\033[0m'
-    }
-
-    if label == "":
-        return print(f"{prefix}{color_code[text_color]}{text}{color_code['reset']}{suffix}")
-    
-    print(f"{prefix}[{color_code[label_color]}{label}{color_code['reset']}] {color_code[text_color]}{text}{color_code['reset']}{suffix}")
+log = pipeline_log.get_logger("prep_usdz")
+print_decorated, print_enhanced = pipeline_log.print_helpers(log)
 
 
 # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
@@ -195,7 +179,7 @@ def save_as(filepath):
     try:
         bpy.ops.wm.save_as_mainfile(filepath=filepath)
     except Exception as e:
-        print(f"save_as failed | ERROR: {e}")
+        log.error(f"save_as failed | ERROR: {e}")
 
 
 def mesh_delete_selection(obj, type='VERT'):
@@ -591,4 +575,8 @@ def main(scan_ID=None, output_path=None, usdc_path=None):
     return (min_x, max_x, min_y, max_y, min_z, max_z)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    bounds = main()
+    bounds_json = get_args().bounds_json
+    if bounds_json:
+        with open(bounds_json, 'w') as f:
+            json.dump(list(bounds), f)
@@ -0,0 +1,752 @@
+#!/usr/bin/env python3
+"""
+Bounding box of the scanned person in the preview mesh, without Blender.
+
+prep_usdz.py finds the bounds of the final groove-mesher run by importing preview.usdz
+into a Blender scene. This computes the same six numbers with NumPy, on the mesh read
+straight out of the package (usdz_archive.MappedUsdz). Phase 2 of generate_mesh.sh then
+needs no Blender launch between the two mesher passes:
+
+    1. world-space points of the first Mesh prim: xformOps applied, Y-up turned Z-up
+       and metersPerUnit applied, as Blender's USD import does
+    2. ceiling: vertices within CEILING_CUT of the top are deleted with their faces
+    3. floor: faces facing up (at least FLOOR_ANGLE degrees away from -Z) are deleted
+    4. loose parts: the remaining faces split into pieces connected through shared vertices
+    5. person: of the parts with more than MIN_PERSON_FACES faces, the one with a vertex
+       closest to the origin; its bounds grown by `offset` and rounded to centimeters
+
+The mesh is read with pxr (usd-core) when it is installed, else with the minimal readers
+below: USD crate (.usdc) and text (.usda) layers, Mesh prims and xformOps only, no
+composition. A preview they cannot read raises PreviewBboxError and groove_mesh_check.py
+falls back to prep_usdz.py in Blender (which also saves {scan}_bounding_box.blend).
+
+Usage:
+    python3 preview_bbox.py compute photogrammetry/preview.usdz [--offset 0.4] [--json]
+    python3 preview_bbox.py available [-e ENV]     # exit 0 when the NumPy engine is enabled and usable
+"""
+
+import argparse
+import json
+import math
+import re
+import struct
+import sys
+from array import array
+from typing import Dict, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # the Blender fallback (prep_usdz.py) still works
+    np = None
+
+import usdz_archive
+
+DEFAULT_SETTINGS = {'engine': 'numpy', 'offset': 0.4}
+ENGINES = ('numpy', 'blender')
+
+# prep_usdz.py's constants
+CEILING_CUT = 0.1
+FLOOR_ANGLE = 175.0
+MIN_PERSON_FACES = 800
+
+MESH_ATTRIBUTES = ('points', 'faceVertexCounts', 'faceVertexIndices', 'orientation')
+
+Bounds = Tuple[float, float, float, float, float, float]
+
+
+class PreviewBboxError(Exception):
+    """The preview cannot be read or has no part that looks like the scanned person."""
+
+
+def bbox_settings(config=None) -> Dict:
+    """Settings from the 'preview_bbox' section of config.json (defaults if it cannot be read)."""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        if config is None:
+            from config_reader import get_config
+            config = get_config()
+        settings.update(config.get_section('preview_bbox'))
+    except (ImportError, ValueError, KeyError, FileNotFoundError):
+        pass
+    return settings
+
+
+def bbox_parameters(settings=None) -> Dict:
+    """Everything besides the preview mesh that decides the box (part of bbox_cache's capture key)."""
+    settings = settings or bbox_settings()
+    return {'offset': float(settings['offset']), 'ceiling_cut': CEILING_CUT, 'floor_angle': FLOOR_ANGLE,
+            'min_person_faces': MIN_PERSON_FACES}
+
+
+def available(settings=None) -> bool:
+    """Whether the NumPy engine is enabled and NumPy can be imported."""
+    return np is not None and (settings or bbox_settings()).get('engine') == 'numpy'
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ USD CRATE ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+CRATE_MAGIC = b'PXR-USDC'
+SPEC_ATTRIBUTE, SPEC_PRIM, SPEC_PSEUDO_ROOT = 1, 6, 7
+MIN_COMPRESSED_ARRAY = 16
+
+# crate value types (ValueRep bits 48-55)
+TYPE_INT, TYPE_HALF, TYPE_FLOAT, TYPE_DOUBLE, TYPE_TOKEN = 3, 7, 8, 9, 11
+TYPE_MATRIX4D, TYPE_QUATD, TYPE_QUATF = 15, 16, 17
+TYPE_VEC3D, TYPE_VEC3F, TYPE_VEC3H = 23, 24, 25
+TYPE_TOKEN_VECTOR = 41
+VEC3_FORMATS = {TYPE_VEC3D: 'd', TYPE_VEC3F: 'f', TYPE_VEC3H: 'e'}
+
+
+def _lz4_block(src) -> bytearray:
+    """Decompress one LZ4 block."""
+    src = bytes(src)
+    out = bytearray()
+    i, end = 0, len(src)
+    while i < end:
+        token = src[i]
+        i += 1
+        length = token >> 4
+        if length == 15:
+            while True:
+                extra = src[i]
+                i += 1
+                length += extra
+                if extra != 255:
+                    break
+        out += src[i:i + length]
+        i += length
+        if i >= end:
+            break
+        offset = src[i] | (src[i + 1] << 8)
+        i += 2
+        length = token & 15
+        if length == 15:
+            while True:
+                extra = src[i]
+                i += 1
+                length += extra
+                if extra != 255:
+                    break
+        length += 4
+        start = len(out) - offset
+        if offset <= 0 or start < 0:
+            raise PreviewBboxError("corrupt LZ4 block")
+        if offset >= length:
+            out += out[start:start + length]
+        else:  # overlapping match: the last `offset` bytes repeat
+            out += (out[start:] * (length // offset + 1))[:length]
+    return out
+
+
+def _decompress(buffer) -> bytes:
+    """TfFastCompression: a chunk count byte, then one LZ4 block (0) or size-prefixed chunks."""
+    chunks = buffer[0]
+    if chunks == 0:
+        return bytes(_lz4_block(buffer[1:]))
+    out = bytearray()
+    i = 1
+    for _ in range(chunks):
+        size, = struct.unpack_from('<i', buffer, i)
+        out += _lz4_block(buffer[i + 4:i + 4 + size])
+        i += 4 + size
+    return bytes(out)
+
+
+_INT_CODECS = {
+    False: (struct.Struct('<i'), (None, struct.Struct('<b'), struct.Struct('<h'), struct.Struct('<i'))),
+    True: (struct.Struct('<q'), (None, struct.Struct('<h'), struct.Struct('<i'), struct.Struct('<q'))),
+}
+
+
+def _decode_ints(raw, count, wide=False) -> List[int]:
+    """USD integer compression: a common delta, 2-bit codes, then the other deltas as 8/16/32-bit ints."""
+    common_struct, code_structs = _INT_CODECS[wide]
+    common, = common_struct.unpack_from(raw, 0)
+    codes = common_struct.size
+    position = codes + (count * 2 + 7) // 8
+    values = [0] * count
+    previous = 0
+    for i in range(count):
+        code = (raw[codes + (i >> 2)] >> ((i & 3) << 1)) & 3
+        if code == 0:
+            previous += common
+        else:
+            delta_struct = code_structs[code]
+            previous += delta_struct.unpack_from(raw, position)[0]
+            position += delta_struct.size
+        values[i] = previous
+    return values
+
+
+class CrateLayer:
+    """
+    Prims and the mesh/xform attributes of a USD crate (.usdc) layer.
+
+    Args:
+        data: The layer's bytes (a memoryview into the package is fine)
+    """
+
+    def __init__(self, data):
+        self.data = data
+        if bytes(data[:8]) != CRATE_MAGIC:
+            raise PreviewBboxError("not a USD crate file")
+        self.version = tuple(data[8:11])
+        if self.version < (0, 4, 0):
+            raise PreviewBboxError(f"crate version {'.'.join(map(str, self.version))} is not supported")
+        toc, = struct.unpack_from('<q', data, 16)
+        count, = struct.unpack_from('<Q', data, toc)
+        sections = {}
+        for i in range(count):
+            name, start, _ = struct.unpack_from('<16sqq', data, toc + 8 + i * 32)
+            sections[name.split(b'\0', 1)[0].decode()] = start
+        missing = {'TOKENS', 'FIELDS', 'FIELDSETS', 'PATHS', 'SPECS'} - set(sections)
+        if missing:
+            raise PreviewBboxError(f"crate sections missing: {', '.join(sorted(missing))}")
+        self.tokens = self._read_tokens(sections['TOKENS'])
+        self._read_fields(sections['FIELDS'])
+        self.fieldsets, _ = self._read_ints(sections['FIELDSETS'] + 8, self._u64(sections['FIELDSETS']))
+        self.paths = self._read_paths(sections['PATHS'])
+        self.metadata, self.prims = self._read_specs(sections['SPECS'])
+
+    def _u64(self, position) -> int:
+        return struct.unpack_from('<Q', self.data, position)[0]
+
+    def _read_ints(self, position, count, wide=False) -> Tuple[List[int], int]:
+        """Compressed integers at position: (values, position after them)."""
+        size = self._u64(position)
+        raw = _decompress(self.data[position + 8:position + 8 + size]) if count else b''
+        return (_decode_ints(raw, count, wide) if count else []), position + 8 + size
+
+    def _read_tokens(self, position) -> List[str]:
+        count, _, size = struct.unpack_from('<QQQ', self.data, position)
+        raw = _decompress(self.data[position + 24:position + 24 + size])
+        return [token.decode('utf-8') for token in raw.split(b'\0')[:count]]
+
+    def _read_fields(self, position):
+        count = self._u64(position)
+        self.field_tokens, position = self._read_ints(position + 8, count)
+        size = self._u64(position)
+        raw = _decompress(self.data[position + 8:position + 8 + size])
+        self.field_reps = struct.unpack_from(f'<{count}Q', raw)
+
+    def _read_paths(self, position) -> List[str]:
+        paths = [''] * self._u64(position)
+        count = self._u64(position + 8)
+        path_indexes, position = self._read_ints(position + 16, count)
+        element_tokens, position = self._read_ints(position, count)
+        jumps, _ = self._read_ints(position, count)
+        # Depth-first tree: a jump > 0 is the distance to the next sibling, -1 child only, -2 leaf
+        pending = [(0, '')]
+        while pending:
+            index, parent = pending.pop()
+            while True:
+                if not parent:
+                    path = '/'
+                else:
+                    token = self.tokens[abs(element_tokens[index])]
+                    path = f"{parent}.{token}" if element_tokens[index] < 0 else f"{parent.rstrip('/')}/{token}"
+                paths[path_indexes[index]] = path
+                jump = jumps[index]
+                has_child, has_sibling = jump > 0 or jump == -1, jump >= 0
+                if has_child:
+                    if has_sibling:
+                        pending.append((index + jump, parent))
+                    parent = path
+                elif not has_sibling:
+                    break
+                index += 1
+        return paths
+
+    def _read_specs(self, position):
+        count = self._u64(position)
+        path_indexes, position = self._read_ints(position + 8, count)
+        fieldset_indexes, position = self._read_ints(position, count)
+        spec_types, _ = self._read_ints(position, count)
+        metadata, prims = {}, {}
+        for path_index, fieldset, spec_type in zip(path_indexes, fieldset_indexes, spec_types):
+            path = self.paths[path_index]
+            if spec_type == SPEC_PSEUDO_ROOT:
+                fields = self._fields(fieldset)
+                metadata = {key: self.value(fields[key]) for key in ('upAxis', 'metersPerUnit') if key in fields}
+            elif spec_type == SPEC_PRIM:
+                fields = self._fields(fieldset)
+                prim = prims.setdefault(path, {'attrs': {}})
+                prim['type'] = self.value(fields['typeName']) if 'typeName' in fields else ''
+            elif spec_type == SPEC_ATTRIBUTE:
+                prim_path, name = _split_property(path)
+                if name in MESH_ATTRIBUTES or name == 'xformOpOrder' or name.startswith('xformOp:'):
+                    fields = self._fields(fieldset)
+                    if 'default' in fields:
+                        prims.setdefault(prim_path, {'type': '', 'attrs': {}})['attrs'][name] = \
+                            self.value(fields['default'])
+        return metadata, prims
+
+    def _fields(self, fieldset) -> Dict[str, int]:
+        fields = {}
+        while self.fieldsets[fieldset] != -1:
+            field = self.fieldsets[fieldset]
+            fields[self.tokens[self.field_tokens[field]]] = self.field_reps[field]
+            fieldset += 1
+        return fields
+
+    def value(self, rep):
+        """Decode a ValueRep (the types used by mesh points/faces, xformOps and layer metadata)."""
+        kind = (rep >> 48) & 0xFF
+        payload = rep & 0xFFFFFFFFFFFF
+        if rep >> 63:
+            return self._array(kind, payload, bool((rep >> 61) & 1))
+        if (rep >> 62) & 1:
+            raw = struct.pack('<Q', payload)
+            if kind == TYPE_TOKEN:
+                return self.tokens[payload]
+            if kind == TYPE_INT:
+                return struct.unpack_from('<i', raw)[0]
+            if kind in (TYPE_FLOAT, TYPE_DOUBLE):  # doubles are inlined when they fit a float
+                return struct.unpack_from('<f', raw)[0]
+            if kind == TYPE_HALF:
+                return struct.unpack_from('<e', raw)[0]
+            if kind in VEC3_FORMATS:  # integral components that fit an int8
+                return list(struct.unpack_from('<3b', raw))
+            if kind == TYPE_MATRIX4D:  # diagonal matrix with int8 entries
+                diagonal = struct.unpack_from('<4b', raw)
+                return [float(diagonal[row]) if row == col else 0.0 for row in range(4) for col in range(4)]
+        else:
+            if kind == TYPE_DOUBLE:
+                return struct.unpack_from('<d', self.data, payload)[0]
+            if kind in VEC3_FORMATS:
+                return list(struct.unpack_from('<3' + VEC3_FORMATS[kind], self.data, payload))
+            if kind == TYPE_MATRIX4D:
+                return list(struct.unpack_from('<16d', self.data, payload))
+            if kind in (TYPE_QUATF, TYPE_QUATD):  # imaginary part first, real last
+                return list(struct.unpack_from('<4' + ('f' if kind == TYPE_QUATF else 'd'), self.data, payload))
+            if kind == TYPE_TOKEN_VECTOR:
+                count = self._u64(payload)
+                return [self.tokens[i] for i in struct.unpack_from(f'<{count}I', self.data, payload + 8)]
+        raise PreviewBboxError(f"unsupported crate value type {kind}")
+
+    def _array(self, kind, position, compressed):
+        if position == 0:
+            return []
+        if self.version < (0, 5, 0):
+            position += 4  # shape rank, unused
+        if self.version < (0, 7, 0):
+            count, = struct.unpack_from('<I', self.data, position)
+            position += 4
+        else:
+            count = self._u64(position)
+            position += 8
+        if kind in VEC3_FORMATS:
+            code = VEC3_FORMATS[kind]
+            if code == 'e':  # array has no half-float type
+                return list(struct.unpack_from(f'<{3 * count}e', self.data, position))
+            values = array(code)
+            values.frombytes(self.data[position:position + 3 * count * values.itemsize])
+            return values
+        if kind == TYPE_INT:
+            if compressed and count >= MIN_COMPRESSED_ARRAY:
+                return self._read_ints(position, count)[0]
+            values = array('i')
+            values.frombytes(self.data[position:position + 4 * count])
+            return values
+        if kind == TYPE_TOKEN:
+            return [self.tokens[i] for i in struct.unpack_from(f'<{count}I', self.data, position)]
+        raise PreviewBboxError(f"unsupported crate array type {kind}")
+
+
+def _split_property(path) -> Tuple[str, str]:
+    dot = path.find('.', path.rfind('/'))
+    return (path[:dot], path[dot + 1:]) if dot >= 0 else (path, '')
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ USD TEXT ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+USDA_SCAN = re.compile(
+    r'"""|"|#|@|\{|\}|\b(?:def|over|class)\b'
+    r'|^[ \t]*(?:(?:uniform|custom|varying)\s+)*[\w\[\]]+\s+'
+    r'(?P<attr>points|faceVertexCounts|faceVertexIndices|orientation|xformOpOrder|xformOp:[\w:]+)\s*=',
+    re.MULTILINE)
+USDA_PRIM = re.compile(r'(?:def|over|class)\s+(?:(\w+)\s+)?"([^"]*)"')
+USDA_GROUP = re.compile(r'"(?:[^"\\\n]|\\.)*"|[()\[\]{}]')
+USDA_METADATA = {'upAxis': re.compile(r'\bupAxis\s*=\s*"(\w+)"'),
+                 'metersPerUnit': re.compile(r'\bmetersPerUnit\s*=\s*([-+\d.eE]+)')}
+NUMBER_SEPARATORS = str.maketrans('()[],', '     ')
+
+
+def _group_end(text, position) -> int:
+    """Index just past the bracket group opening at text[position] (strings are skipped)."""
+    depth = 0
+    for match in USDA_GROUP.finditer(text, position):
+        token = match.group()
+        if token[0] == '"':
+            continue
+        depth += 1 if token in '([{' else -1
+        if depth == 0:
+            return match.end()
+    raise PreviewBboxError("unbalanced brackets in .usda layer")
+
+
+def _skip_space(text, position) -> int:
+    while position < len(text) and text[position].isspace():
+        position += 1
+    return position
+
+
+def _parse_value(raw):
+    raw = raw.strip()
+    if raw.startswith('"'):
+        return raw.strip('"')
+    if raw.startswith('[') and '"' in raw:
+        return re.findall(r'"([^"]*)"', raw)
+    numbers = raw.translate(NUMBER_SEPARATORS).split()
+    if raw.startswith(('[', '(')):
+        return [float(n) for n in numbers]
+    return float(numbers[0]) if numbers else raw
+
+
+class UsdaLayer:
+    """
+    Prims and the mesh/xform attributes of a USD text (.usda) layer.
+
+    Args:
+        text: The layer's text
+    """
+
+    def __init__(self, text):
+        if not text.startswith('#usda'):
+            raise PreviewBboxError("not a USD text file")
+        self.metadata, self.prims = {}, {}
+        position = _skip_space(text, text.find('\n') + 1)
+        if text.startswith('(', position):
+            end = _group_end(text, position)
+            for key, pattern in USDA_METADATA.items():
+                match = pattern.search(text, position, end)
+                if match:
+                    self.metadata[key] = match.group(1) if key == 'upAxis' else float(match.group(1))
+            position = end
+        self._parse(text, position)
+
+    def _parse(self, text, position):
+        stack = ['']
+        while True:
+            match = USDA_SCAN.search(text, position)
+            if match is None:
+                return
+            token = match.group()
+            if match.group('attr'):
+                start = _skip_space(text, match.end())
+                if text.startswith('[', start):
+                    end = text.index(']', start) + 1
+                elif text.startswith('(', start):
+                    end = _group_end(text, start)
+                elif text.startswith('"', start):
+                    end = text.index('"', start + 1) + 1
+                else:
+                    end = start + len(text[start:].split(None, 1)[0])
+                prim = self.prims.setdefault(stack[-1], {'type': '', 'attrs': {}})
+                prim['attrs'][match.group('attr')] = _parse_value(text[start:end])
+                position = end
+            elif token in ('"', '"""'):
+                position = text.index(token, match.end()) + len(token)
+            elif token == '#':
+                newline = text.find('\n', match.end())
+                position = newline if newline >= 0 else len(text)
+            elif token == '@':
+                position = text.index('@', match.end()) + 1
+            elif token == '}':
+                if len(stack) == 1:
+                    raise PreviewBboxError("unbalanced braces in .usda layer")
+                stack.pop()
+                position = match.end()
+            elif token == '{':  # dictionary, timeSamples or variant set: not a prim body
+                position = _group_end(text, match.start())
+            else:
+                prim_match = USDA_PRIM.match(text, match.start())
+                if prim_match is None:
+                    position = match.end()
+                    continue
+                path = f"{stack[-1]}/{prim_match.group(2)}"
+                self.prims.setdefault(path, {'attrs': {}})['type'] = prim_match.group(1) or ''
+                position = _skip_space(text, prim_match.end())
+                if text.startswith('(', position):
+                    position = _skip_space(text, _group_end(text, position))
+                if not text.startswith('{', position):
+                    raise PreviewBboxError(f"prim {path} has no body")
+                stack.append(path)
+                position += 1
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ MESH ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def _rotation(axis, degrees):
+    c, s = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    matrix = np.eye(4)
+    i, j = [(1, 2), (2, 0), (0, 1)][axis]
+    matrix[i, i], matrix[i, j], matrix[j, i], matrix[j, j] = c, -s, s, c
+    return matrix
+
+
+def _xform_op(name, value):
+    """4x4 matrix (column vectors) of one xformOp."""
+    kind = name.split(':')[1]
+    matrix = np.eye(4)
+    if kind == 'translate':
+        matrix[:3, 3] = value
+    elif kind == 'scale':
+        matrix[0, 0], matrix[1, 1], matrix[2, 2] = value
+    elif kind in ('rotateX', 'rotateY', 'rotateZ'):
+        matrix = _rotation('XYZ'.index(kind[-1]), float(value))
+    elif kind.startswith('rotate') and len(kind) == 9:  # rotateXYZ, rotateZXY, ...: first axis applied first
+        for axis in kind[6:]:
+            matrix = _rotation('XYZ'.index(axis), value['XYZ'.index(axis)]) @ matrix
+    elif kind == 'orient':
+        x, y, z, w = np.asarray(value, dtype=float) / (np.linalg.norm(value) or 1.0)
+        matrix[:3, :3] = [[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                          [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                          [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]]
+    elif kind == 'transform':  # USD matrices are row-vector, translation in the last row
+        matrix = np.asarray(value, dtype=float).reshape(4, 4).T
+    else:
+        raise PreviewBboxError(f"unsupported xformOp {name}")
+    return matrix
+
+
+def _world_matrix(prims, path):
+    """Local-to-world matrix of a prim from the xformOps of it and its ancestors."""
+    matrix = np.eye(4)
+    parts = path.strip('/').split('/')
+    for depth in range(len(parts)):
+        attrs = prims.get('/' + '/'.join(parts[:depth + 1]), {}).get('attrs', {})
+        local = np.eye(4)
+        for op in attrs.get('xformOpOrder') or []:
+            if op == '!resetXformStack!':
+                matrix, local = np.eye(4), np.eye(4)
+                continue
+            name = op[len('!invert!'):] if op.startswith('!invert!') else op
+            if name not in attrs:
+                raise PreviewBboxError(f"xformOp {name} has no value")
+            op_matrix = _xform_op(name, attrs[name])
+            local = local @ (np.linalg.inv(op_matrix) if op != name else op_matrix)
+        matrix = matrix @ local
+    return matrix
+
+
+def _read_layer(path):
+    """(metadata, prims) of the root layer of a .usdz, or of a .usdc/.usda file."""
+    if path.lower().endswith('.usdz'):
+        with usdz_archive.UsdzArchive(path) as archive:
+            root = archive.root_layer()
+        if root is None:
+            raise PreviewBboxError(f"{path} has no USD layer")
+        with usdz_archive.MappedUsdz(path) as package:
+            data = package.member(root.filename)
+            try:
+                layer = CrateLayer(data) if bytes(data[:8]) == CRATE_MAGIC else UsdaLayer(bytes(data).decode('utf-8'))
+            finally:
+                data.release()
+    else:
+        with open(path, 'rb') as f:
+            data = f.read()
+        layer = CrateLayer(data) if data[:8] == CRATE_MAGIC else UsdaLayer(data.decode('utf-8'))
+    return layer.metadata, layer.prims
+
+
+def _read_with_pxr(path):
+    """(points, counts, indices, matrix, left_handed, metadata) through usd-core, None if it is not installed."""
+    try:
+        from pxr import Usd, UsdGeom
+    except ImportError:
+        return None
+    stage = Usd.Stage.Open(path)
+    if stage is None:
+        raise PreviewBboxError(f"usd-core cannot open {path}")
+    mesh = next((UsdGeom.Mesh(prim) for prim in stage.Traverse() if prim.IsA(UsdGeom.Mesh)), None)
+    if mesh is None:
+        raise PreviewBboxError(f"{path} has no Mesh prim")
+    metadata = {'upAxis': UsdGeom.GetStageUpAxis(stage)}
+    if stage.HasAuthoredMetadata('metersPerUnit'):
+        metadata['metersPerUnit'] = UsdGeom.GetStageMetersPerUnit(stage)
+    matrix = np.array(mesh.ComputeLocalToWorldTransform(Usd.TimeCode.Default()), dtype=float).T
+    return (np.array(mesh.GetPointsAttr().Get(), dtype=float), np.array(mesh.GetFaceVertexCountsAttr().Get()),
+            np.array(mesh.GetFaceVertexIndicesAttr().Get()), matrix,
+            mesh.GetOrientationAttr().Get() == UsdGeom.Tokens.leftHanded, metadata)
+
+
+def read_preview_mesh(path):
+    """
+    The preview's first mesh in Blender's world space (what prep_usdz.py gets after its import).
+
+    Returns:
+        tuple: (points Nx3, face vertex counts, face vertex indices, normals_flipped)
+    """
+    if np is None:
+        raise PreviewBboxError("NumPy is not installed")
+    read = _read_with_pxr(path)
+    if read is None:
+        metadata, prims = _read_layer(path)
+        mesh_path = next((p for p, prim in prims.items() if prim.get('type') == 'Mesh'
+                          and 'points' in prim['attrs']), None)
+        if mesh_path is None:
+            raise PreviewBboxError(f"{path} has no Mesh prim with points (composed layers are not read)")
+        attrs = prims[mesh_path]['attrs']
+        read = (np.asarray(attrs['points'], dtype=float), np.asarray(attrs.get('faceVertexCounts', [])),
+                np.asarray(attrs.get('faceVertexIndices', [])), _world_matrix(prims, mesh_path),
+                attrs.get('orientation') == 'leftHanded', metadata)
+    points, counts, indices, matrix, left_handed, metadata = read
+    points = points.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+    if str(metadata.get('upAxis', 'Y')).upper() == 'Y':  # Blender turns Y-up stages Z-up
+        points = np.column_stack((points[:, 0], -points[:, 2], points[:, 1]))
+    points *= float(metadata.get('metersPerUnit', 1.0))
+    # Blender keeps normals outward: it reverses left-handed faces, and faces mirrored by the transform
+    flipped = left_handed != (np.linalg.det(matrix[:3, :3]) < 0)
+    return points, counts.astype(np.int64), indices.astype(np.int64), flipped
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ BOUNDS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def _connected(count, a, b):
+    """Root vertex of every vertex's connected piece for edges a-b (hooking + pointer jumping)."""
+    parent = np.arange(count)
+    while True:
+        root_a, root_b = parent[a], parent[b]
+        differ = root_a != root_b
+        if not differ.any():
+            return parent
+        np.minimum.at(parent, np.maximum(root_a, root_b)[differ], np.minimum(root_a, root_b)[differ])
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+def person_bounds(points, counts, indices, flipped=False, offset=DEFAULT_SETTINGS['offset'], log=None,
+                  stats=None) -> Bounds:
+    """
+    prep_usdz.py's ceiling cut, floor removal, loose parts and person choice, on arrays.
+
+    Args:
+        points / counts / indices: The mesh in Blender's world space (see read_preview_mesh)
+        flipped: Face winding is reversed (normals point inward)
+        offset: Margin added around the person's box
+        log: Optional callable(message) for a summary line
+        stats: Optional dict filled with mesh/part counts (bbox_cache stores them with the box)
+
+    Returns:
+        tuple: (min_x, max_x, min_y, max_y, min_z, max_z), as prep_usdz.get_bounding_box
+    """
+    if not len(points) or not len(counts):
+        raise PreviewBboxError("the preview mesh is empty")
+    if counts.sum() != len(indices) or counts.min() < 3 or indices.min() < 0 or indices.max() >= len(points):
+        raise PreviewBboxError("inconsistent face data in the preview mesh")
+    starts = np.cumsum(counts) - counts
+    face_of = np.repeat(np.arange(len(counts)), counts)
+
+    # Ceiling: delete the vertices within CEILING_CUT of the top, and every face using one
+    below = points[:, 2] <= points[:, 2].max() - CEILING_CUT
+    keep = np.logical_and.reduceat(below[indices], starts)
+
+    # Floor: delete faces whose normal is at least FLOOR_ANGLE degrees away from straight down
+    corner = np.arange(len(indices))
+    local = corner - starts[face_of]
+    fan = corner[(local >= 1) & (local <= counts[face_of] - 2)]
+    origin = points[indices[starts[face_of[fan]]]]
+    cross = np.cross(points[indices[fan]] - origin, points[indices[fan + 1]] - origin)
+    normal_z = np.bincount(face_of[fan], cross[:, 2], minlength=len(counts))
+    length = np.sqrt(sum(np.bincount(face_of[fan], cross[:, axis], minlength=len(counts)) ** 2 for axis in range(3)))
+    if flipped:
+        normal_z = -normal_z
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cosine = np.where(length > 0, -normal_z / length, 0.0)
+    keep &= ~(np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0))) >= FLOOR_ANGLE)
+    if not keep.any():
+        raise PreviewBboxError("no faces left after the ceiling and floor cuts")
+
+    # Loose parts of the remaining faces
+    kept_corner = keep[face_of]
+    kept_indices = indices[kept_corner]
+    parent = _connected(len(points), indices[starts][face_of][kept_corner], kept_indices)
+    roots, face_counts = np.unique(parent[indices[starts[keep]]], return_counts=True)
+    used = np.unique(kept_indices)
+    used_root = parent[used]
+    closest = np.full(len(points), np.inf)
+    np.minimum.at(closest, used_root, np.linalg.norm(points[used], axis=1))
+
+    # Person: of the parts over MIN_PERSON_FACES faces, the closest to the origin (ties as sorted by prep_usdz)
+    candidates = [(int(faces), float(closest[root]), root) for root, faces in zip(roots, face_counts)
+                  if faces > MIN_PERSON_FACES]
+    if not candidates:
+        raise PreviewBboxError(f"no loose part with more than {MIN_PERSON_FACES} faces")
+    candidates.sort(key=lambda part: (-part[0] / (part[1] + 1e-6), part[1]))
+    faces, distance, root = min(candidates, key=lambda part: part[1])
+    person = points[used[used_root == root]]
+    low, high = person.min(axis=0), person.max(axis=0)
+    if stats is not None:
+        stats.update(vertices=len(points), faces=len(counts), kept_faces=int(keep.sum()), parts=len(roots),
+                     person_faces=faces, person_distance=round(distance, 4))
+    if log:
+        log(f"🧍 Person: {faces} of {int(keep.sum())} faces ({len(roots)} loose parts, "
+            f"{len(candidates)} over {MIN_PERSON_FACES} faces), {distance:.2f} from the origin")
+    return (round(float(low[0]) - offset, 2), round(float(high[0]) + offset, 2),
+            round(float(low[1]) - offset, 2), round(float(high[1]) + offset, 2),
+            round(float(low[2]) - offset, 2), round(float(high[2]) + offset, 2))
+
+
+def bounding_box(usdz_path, offset=DEFAULT_SETTINGS['offset'], log=None, stats=None) -> Bounds:
+    """Bounds of the scanned person in a preview (.usdz, .usdc or .usda); raises PreviewBboxError."""
+    try:
+        points, counts, indices, flipped = read_preview_mesh(usdz_path)
+    except (OSError, ValueError, KeyError, IndexError, struct.error) as e:
+        raise PreviewBboxError(f"cannot read {usdz_path}: {e}") from e
+    return person_bounds(points, counts, indices, flipped, offset, log, stats)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Blender-free preview bounding box")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compute_parser = subparsers.add_parser('compute', help="Bounds of the scanned person in a preview")
+    compute_parser.add_argument('preview', help="preview.usdz (or a .usdc/.usda layer)")
+    compute_parser.add_argument('--offset', type=float, help="Margin around the person (default: preview_bbox.offset)")
+    compute_parser.add_argument('--json', action='store_true', help="Print the bounds as a JSON list")
+
+    available_parser = subparsers.add_parser('available', help="Exit 0 when the NumPy engine is enabled and usable")
+    for sub in (compute_parser, available_parser):
+        sub.add_argument('--environment', '-e', help="Environment for config defaults")
+    args = parser.parse_args()
+
+    try:
+        from config_reader import get_config
+        settings = bbox_settings(get_config(args.environment))
+    except (ImportError, ValueError, KeyError, FileNotFoundError):
+        settings = bbox_settings()
+
+    if args.command == 'available':
+        sys.exit(0 if available(settings) else 1)
+
+    offset = args.offset if args.offset is not None else float(settings['offset'])
+    try:
+        bounds = bounding_box(args.preview, offset, log=None if args.json else print)
+    except PreviewBboxError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(list(bounds)))
+    else:
+        for axis, value in zip(('min_x', 'max_x', 'min_y', 'max_y', 'min_z', 'max_z'), bounds):
+            print(f"   {axis}: {value}")
+
+
+if __name__ == "__main__":
+    main()
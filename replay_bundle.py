@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+"""
+Replay bundles: one pipeline step's exact inputs, captured from a production scan.
+
+A bundle records everything a step run depended on: its input files, the scripts
+and assets implementing it, its arguments, the pipeline settings and a snapshot of
+config.json; after a successful run also the step's outputs as reference. Files are
+stored once in a content-addressed object store (objects/<sha256>, compressed when
+that pays off), so a corpus of many captures of the same rig shares its scripts,
+templates and unchanged inputs.
+
+A replay re-runs that step alone in a throwaway takes folder built from the bundle,
+optionally several times, and reports wall time, CPU, peak memory and the substeps
+the scripts recorded in their timeline, plus whether the outputs still match the
+captured ones. By default the current scripts run, which is what benchmarking an
+optimization of cleanup.py, add_rig.py or pose_test.py needs; --captured-scripts
+runs the versions the bundle was captured with.
+
+Capture while running:
+    python3 pipeline_runner.py scan_id --capture                 # every step that runs
+    python3 pipeline_runner.py scan_id --capture cleanup,pose_test --force cleanup,pose_test
+
+Usage:
+    python3 replay_bundle.py capture --scan X --step cleanup [--takes /takes]   # inputs as they are now
+    python3 replay_bundle.py list [--step cleanup]
+    python3 replay_bundle.py replay BUNDLE_ID [BUNDLE_ID ...] [--runs 5] [--json results.json]
+    python3 replay_bundle.py replay --step cleanup --runs 3          # every captured cleanup: a benchmark corpus
+    python3 replay_bundle.py drop BUNDLE_ID
+    python3 replay_bundle.py gc                                      # delete objects no bundle uses
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pipeline_timeline
+import step_supervisor
+
+BUNDLE_VERSION = 1
+OBJECTS_DIRNAME = 'objects'
+BUNDLES_DIRNAME = 'bundles'
+COMPRESSED_SUFFIX = '.z'
+CHUNK_SIZE = 1024 * 1024
+COMPRESSION_LEVEL = 6
+COMPRESSION_MIN_SAVING = 0.1  # store raw unless a sample shrinks by at least this share (jpg, png, usdz)
+SCRIPTS_COPY_IGNORE = ('scanner_env', '.git', '__pycache__', '_ARCHIVE', '*.pyc')
+SOFTWARE_DIRNAME = 'scannermeshprocessing-2023'  # generate_mesh.sh finds its tools below software_path
+
+DEFAULT_SETTINGS = {
+    'store': '~/scanner_replay',
+}
+
+
+def replay_settings(config) -> Dict:
+    """Settings from the 'replay' section of config.json."""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get_section('replay'))
+    return settings
+
+
+def _sha256(path) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _worth_compressing(path) -> bool:
+    with open(path, 'rb') as f:
+        sample = f.read(CHUNK_SIZE)
+    if not sample:
+        return False
+    return len(zlib.compress(sample, 1)) <= len(sample) * (1 - COMPRESSION_MIN_SAVING)
+
+
+def _expand(root: Path, relative_paths: Iterable[str]) -> List[str]:
+    """Scan-relative files for files and folders (hidden files skipped, as in the step keys)."""
+    files = []
+    for relative_path in relative_paths:
+        path = root / relative_path
+        if path.is_dir():
+            files.extend(str(p.relative_to(root)) for p in sorted(path.rglob('*'))
+                         if p.is_file() and not p.name.startswith('.'))
+        elif path.is_file():
+            files.append(relative_path)
+    return files
+
+
+class BundleStore:
+    """
+    Content-addressed object store plus bundle manifests.
+
+    Args:
+        root: Store folder (objects/ and bundles/ are created below it)
+    """
+
+    def __init__(self, root):
+        self.root = Path(os.path.expanduser(str(root)))
+        self.objects = self.root / OBJECTS_DIRNAME
+        self.bundles = self.root / BUNDLES_DIRNAME
+
+    def _object_path(self, digest, compressed) -> Path:
+        return self.objects / digest[:2] / (digest + (COMPRESSED_SUFFIX if compressed else ''))
+
+    def find_object(self, digest) -> Optional[Path]:
+        for compressed in (False, True):
+            path = self._object_path(digest, compressed)
+            if path.exists():
+                return path
+        return None
+
+    def put(self, path) -> Dict:
+        """Store a file (once per content); returns its manifest entry."""
+        path = Path(path)
+        stat = path.stat()
+        digest = _sha256(path)
+        entry = {'sha256': digest, 'size': stat.st_size, 'mode': stat.st_mode & 0o777}
+        if self.find_object(digest) is not None:
+            return entry
+        compressed = _worth_compressing(path)
+        target = self._object_path(digest, compressed)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        try:
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                if compressed:
+                    compressor = zlib.compressobj(COMPRESSION_LEVEL)
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                        dst.write(compressor.compress(chunk))
+                    dst.write(compressor.flush())
+                else:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(tmp_path, target)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        return entry
+
+    def materialize(self, entry: Dict, target):
+        """Write a stored file to target (a private copy: steps rewrite some inputs in place)."""
+        source = self.find_object(entry['sha256'])
+        if source is None:
+            raise FileNotFoundError(f"object {entry['sha256'][:12]} is missing from {self.objects}")
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            if source.name.endswith(COMPRESSED_SUFFIX):
+                decompressor = zlib.decompressobj()
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    dst.write(decompressor.decompress(chunk))
+                dst.write(decompressor.flush())
+            else:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        os.chmod(target, entry.get('mode', 0o644))
+
+    def save(self, bundle: Dict):
+        self.bundles.mkdir(parents=True, exist_ok=True)
+        path = self.bundles / f"{bundle['id']}.json"
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(bundle, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def load(self, bundle_id) -> Dict:
+        path = self.bundles / f"{bundle_id}.json"
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"no bundle '{bundle_id}' in {self.bundles}") from None
+
+    def list(self, step=None) -> List[Dict]:
+        bundles = []
+        for path in sorted(self.bundles.glob('*.json')):
+            try:
+                with open(path, 'r') as f:
+                    bundle = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if step is None or bundle.get('step') == step:
+                bundles.append(bundle)
+        return bundles
+
+    def drop(self, bundle_id):
+        (self.bundles / f"{bundle_id}.json").unlink()
+
+    def gc(self) -> int:
+        """Delete objects no bundle refers to; returns the bytes freed."""
+        used = set()
+        for bundle in self.list():
+            for section in ('inputs', 'scripts', 'assets', 'outputs'):
+                used.update(entry['sha256'] for entry in bundle.get(section, {}).values())
+        freed = 0
+        for path in self.objects.glob('*/*'):
+            if path.name.split('.')[0] not in used:
+                freed += path.stat().st_size
+                path.unlink()
+        return freed
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CAPTURE ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def _software_revision(scripts_dir) -> str:
+    try:
+        return subprocess.run(['git', '-C', str(scripts_dir), 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def capture_bundle(store: BundleStore, step, ctx, config_snapshot=None, run_id='') -> Dict:
+    """
+    Record a step's inputs as they are in ctx's scan folder right now.
+
+    Args:
+        step: pipeline_runner.Step
+        ctx: pipeline_runner.ScanContext
+        config_snapshot: Parsed config.json at capture time
+    """
+    scan_dir = ctx.scan_dir
+    inputs = {path: store.put(scan_dir / path)
+              for path in _expand(scan_dir, [p.format(scan=ctx.scan_id) for p in step.inputs])}
+    scripts = {path: store.put(ctx.script_file(path)) for path in step.scripts if ctx.script_file(path).is_file()}
+    assets = {}
+    if ctx.hdri_path and os.path.isfile(ctx.hdri_path):
+        assets['hdri'] = dict(store.put(ctx.hdri_path), name=os.path.basename(ctx.hdri_path))
+
+    bundle = {
+        'version': BUNDLE_VERSION,
+        'id': f"{ctx.scan_id}-{step.name}-{time.strftime('%Y%m%d_%H%M%S')}",
+        'scan': ctx.scan_id,
+        'step': step.name,
+        'captured_at': round(time.time(), 3),
+        'host': socket.gethostname(),
+        'run_id': run_id,
+        'software': _software_revision(ctx.scripts_dir),
+        'command': step.build_command(ctx),
+        'arguments': step.arguments(ctx),
+        'context': {
+            'feature_sensitivity': ctx.feature_sensitivity,
+            'detail_level': ctx.detail_level,
+            'blender_threads': ctx.blender_threads,
+            'ml_threads': ctx.ml_threads,
+            'environment': ctx.environment,
+        },
+        'config': config_snapshot or {},
+        'inputs': inputs,
+        'scripts': scripts,
+        'assets': assets,
+        'outputs': {},
+        'reference': {},
+    }
+    store.save(bundle)
+    return bundle
+
+
+def record_outputs(store: BundleStore, bundle: Dict, step, ctx, duration=0.0):
+    """Attach the outputs of the captured run as reference for replays."""
+    scan_dir = ctx.scan_dir
+    paths = _expand(scan_dir, [p.format(scan=ctx.scan_id) for p in tuple(step.outputs) + tuple(step.rewrites)])
+    bundle['outputs'] = {path: store.put(scan_dir / path) for path in paths}
+    bundle['reference'] = {'duration': round(duration, 3), 'host': socket.gethostname()}
+    store.save(bundle)
+
+
+@dataclass
+class Capture:
+    """
+    Captures bundles for the steps a pipeline run executes (PipelineRunner's capture argument).
+
+    Args:
+        store: BundleStore
+        steps: Step names to capture (None: every step that runs)
+        config_snapshot: Parsed config.json stored in every bundle
+    """
+    store: BundleStore
+    steps: Optional[set] = None
+    config_snapshot: Dict = field(default_factory=dict)
+
+    def capture_step(self, step, ctx, run_id='', log=print) -> Optional[Dict]:
+        if self.steps is not None and step.name not in self.steps:
+            return None
+        start = time.perf_counter()
+        try:
+            bundle = capture_bundle(self.store, step, ctx, self.config_snapshot, run_id)
+        except OSError as e:
+            log(f"⚠️  Could not capture a replay bundle of {step.name}: {e}")
+            return None
+        log(f"📼 Captured {len(bundle['inputs'])} input file(s) of {step.name} as bundle {bundle['id']} "
+            f"({time.perf_counter() - start:.1f}s)")
+        return bundle
+
+    def step_finished(self, bundle, step, ctx, duration, log=print):
+        try:
+            record_outputs(self.store, bundle, step, ctx, duration)
+        except OSError as e:
+            log(f"⚠️  Could not store the reference outputs of bundle {bundle['id']}: {e}")
+
+
+def capture_from_config(config, steps=None) -> Capture:
+    """Capture into the 'replay.store' of config.json; steps is an iterable of names or None for all."""
+    try:
+        with open(config.config_file, 'r') as f:
+            snapshot = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        snapshot = {}
+    return Capture(BundleStore(replay_settings(config)['store']), set(steps) if steps is not None else None,
+                   snapshot)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ REPLAY ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+@dataclass
+class ReplayRun:
+    bundle: str
+    run: int
+    exit_code: int
+    wall_s: float
+    cpu_s: float
+    peak_rss_mb: float
+    outputs: Dict[str, str]  # path -> 'same', 'differs' or 'missing'
+    substeps: Dict[str, float]  # name -> seconds, from the replayed scripts' timeline
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0 and 'missing' not in self.outputs.values()
+
+
+def _prepare_scripts(store: BundleStore, bundle: Dict, work: Path, captured: bool) -> Path:
+    """Scripts folder for the replay: the current scripts, or a copy with the captured versions laid over it."""
+    from pipeline_runner import SCRIPT_DIR
+    if not captured:
+        return SCRIPT_DIR
+    scripts_dir = work / 'scripts'
+    shutil.copytree(SCRIPT_DIR, scripts_dir, symlinks=True, ignore=shutil.ignore_patterns(*SCRIPTS_COPY_IGNORE))
+    if (SCRIPT_DIR / 'scanner_env').exists():
+        (scripts_dir / 'scanner_env').symlink_to(SCRIPT_DIR / 'scanner_env')
+    for relative_path, entry in bundle['scripts'].items():
+        store.materialize(entry, scripts_dir / relative_path)
+    return scripts_dir
+
+
+def _replay_context(bundle: Dict, takes_path: Path, scripts_dir: Path, software_path: Path, hdri_path, blender_path):
+    from pipeline_runner import ScanContext, find_python
+    context = bundle['context']
+    return ScanContext(
+        scan_id=bundle['scan'],
+        takes_path=str(takes_path),
+        software_path=str(software_path),
+        blender_path=blender_path,
+        scripts_dir=str(scripts_dir),
+        python_path=find_python(scripts_dir),
+        feature_sensitivity=context['feature_sensitivity'],
+        detail_level=context['detail_level'],
+        hdri_path=str(hdri_path or ''),
+        blender_threads=context.get('blender_threads', 0),
+        ml_threads=context.get('ml_threads', 0),
+        environment=context.get('environment', ''),
+    )
+
+
+def _substep_seconds(takes_path: Path, scan_id, run_id) -> Dict[str, float]:
+    path = pipeline_timeline.timeline_path(str(takes_path), scan_id)
+    seconds = {}
+    if not os.path.exists(path):  # the step's scripts record no substeps
+        return seconds
+    for record in pipeline_timeline.read_records([path]):
+        if record.get('run_id') == run_id and record.get('kind') == 'substep':
+            seconds[record['name']] = seconds.get(record['name'], 0.0) + record.get('wall_s', 0.0)
+    return seconds
+
+
+def replay(store: BundleStore, bundle_id, runs=1, blender_path=None, captured_scripts=False, workdir=None,
+           keep=False, verbose=False, wall_timeout=0, log=print) -> List[ReplayRun]:
+    """
+    Re-run a bundle's step `runs` times, each time in a fresh takes folder built from the bundle.
+
+    Args:
+        blender_path: Blender executable (default: the one in the bundle's config snapshot)
+        captured_scripts: Run the captured script versions instead of the current ones
+        workdir: Parent folder for the throwaway takes folders (default: system temp)
+        keep: Keep the takes folders (for inspecting outputs)
+        verbose: Show the step's output instead of writing it to run-N.log
+        wall_timeout: Kill a run after this many seconds (0 = unlimited)
+    """
+    from pipeline_runner import STEPS_BY_NAME
+    bundle = store.load(bundle_id)
+    step = STEPS_BY_NAME.get(bundle['step'])
+    if step is None:
+        raise ValueError(f"bundle {bundle_id} is for unknown step '{bundle['step']}'")
+    if blender_path is None:
+        environments = bundle['config'].get('environments', {})
+        environment = bundle['context'].get('environment') or bundle['config'].get('default_environment', '')
+        blender_path = environments.get(environment, {}).get('blender_path') or 'blender'
+
+    work = Path(tempfile.mkdtemp(prefix=f"replay-{bundle_id}-", dir=workdir))
+    scripts_dir = _prepare_scripts(store, bundle, work, captured_scripts)
+    software_path = work / 'software'
+    software_path.mkdir()
+    (software_path / SOFTWARE_DIRNAME).symlink_to(Path(scripts_dir).resolve())
+    log(f"▶️  Replaying {bundle_id} ({bundle['step']}, {len(bundle['inputs'])} input file(s)) "
+        f"with {'captured' if captured_scripts else 'current'} scripts, {runs} run(s) in {work}")
+
+    results = []
+    try:
+        for run in range(1, runs + 1):
+            takes_path = work / f"run-{run}" / 'takes'
+            for relative_path, entry in bundle['inputs'].items():
+                store.materialize(entry, takes_path / bundle['scan'] / relative_path)
+            (takes_path / bundle['scan'] / 'photogrammetry').mkdir(parents=True, exist_ok=True)
+            hdri_path = None
+            if 'hdri' in bundle['assets']:
+                hdri_path = work / f"run-{run}" / bundle['assets']['hdri']['name']
+                store.materialize(bundle['assets']['hdri'], hdri_path)
+            ctx = _replay_context(bundle, takes_path, scripts_dir, software_path, hdri_path, blender_path)
+
+            run_id = f"replay-{bundle_id}-{run}"
+            env = dict(os.environ, **{pipeline_timeline.RUN_ID_ENV: run_id})
+            command = step.build_command(ctx)
+            if verbose:
+                result = step_supervisor.supervise(command, wall_timeout, env=env)
+            else:
+                with open(work / f"run-{run}.log", 'wb') as output:
+                    result = step_supervisor.supervise(command, wall_timeout, stdout=output, env=env)
+
+            outputs = {}
+            for relative_path, entry in bundle['outputs'].items():
+                path = ctx.scan_dir / relative_path
+                if not path.is_file():
+                    outputs[relative_path] = 'missing'
+                else:
+                    outputs[relative_path] = 'same' if _sha256(path) == entry['sha256'] else 'differs'
+            for pattern in step.outputs:
+                relative_path = pattern.format(scan=bundle['scan'])
+                if relative_path not in outputs and not ctx.scan_file(pattern).exists():
+                    outputs[relative_path] = 'missing'
+
+            replayed = ReplayRun(bundle_id, run, result.exit_code, result.duration, result.usage.get('child_cpu', 0.0),
+                                 result.usage.get('child_peak_rss_mb', 0.0), outputs,
+                                 _substep_seconds(takes_path, bundle['scan'], run_id))
+            results.append(replayed)
+            differs = sum(state != 'same' for state in outputs.values())
+            log(f"   {'✅' if replayed.ok else '❌'} run {run}: {replayed.wall_s:.1f}s wall, {replayed.cpu_s:.1f}s CPU, "
+                f"{replayed.peak_rss_mb:.0f} MB, exit code {replayed.exit_code}"
+                + (f", {differs}/{len(outputs)} output(s) differ from the capture" if differs else ""))
+            if not keep:
+                shutil.rmtree(work / f"run-{run}", ignore_errors=True)
+    finally:
+        if not keep:
+            shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def summarize(runs: List[ReplayRun], reference=None) -> Dict:
+    """Wall/CPU/RSS statistics of a bundle's replays, and the median of every substep."""
+    walls = sorted(run.wall_s for run in runs)
+    substeps = {}
+    for run in runs:
+        for name, seconds in run.substeps.items():
+            substeps.setdefault(name, []).append(seconds)
+    return {
+        'runs': len(runs),
+        'failures': sum(not run.ok for run in runs),
+        'min_s': walls[0] if walls else 0.0,
+        'p50_s': pipeline_timeline.percentile(walls, 0.5),
+        'p90_s': pipeline_timeline.percentile(walls, 0.9),
+        'cpu_p50_s': pipeline_timeline.percentile(sorted(run.cpu_s for run in runs), 0.5),
+        'rss_max_mb': max((run.peak_rss_mb for run in runs), default=0.0),
+        'reference_s': (reference or {}).get('duration'),
+        'substeps_p50_s': {name: pipeline_timeline.percentile(sorted(values), 0.5) for name, values in substeps.items()},
+    }
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture and replay single pipeline steps")
+    parser.add_argument('command', choices=['capture', 'list', 'replay', 'drop', 'gc'])
+    parser.add_argument('bundles', nargs='*', help="Bundle id(s) (replay, drop)")
+    parser.add_argument('--store', help="Bundle store (default: config.json replay.store)")
+    parser.add_argument('--environment', '-e', help="Environment for config defaults")
+    parser.add_argument('--takes', help="Takes path (capture; default: from config.json)")
+    parser.add_argument('--scan', help="Scan identifier (capture)")
+    parser.add_argument('--step', help="Step name or number (capture; list/replay: only this step's bundles)")
+    parser.add_argument('--runs', type=int, default=1, help="Replays per bundle (replay)")
+    parser.add_argument('--blender', help="Blender executable (replay; default: from the bundle's config)")
+    parser.add_argument('--captured-scripts', action='store_true', help="Replay the captured script versions")
+    parser.add_argument('--workdir', help="Folder for the throwaway takes folders (replay)")
+    parser.add_argument('--keep', action='store_true', help="Keep the replay takes folders")
+    parser.add_argument('--verbose', '-v', action='store_true', help="Show the step's output while replaying")
+    parser.add_argument('--wall', type=float, default=0, help="Kill a replay after this many seconds")
+    parser.add_argument('--json', help="Write the replay results to this file")
+    args = parser.parse_args()
+
+    try:
+        from config_reader import get_config
+        config = get_config(args.environment)
+        store = BundleStore(args.store or replay_settings(config)['store'])
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    step_name = args.step
+    if step_name and step_name.isdigit():
+        from pipeline_runner import STEPS_BY_NUMBER
+        step_name = STEPS_BY_NUMBER[int(step_name)].name if int(step_name) in STEPS_BY_NUMBER else step_name
+
+    if args.command == 'capture':
+        if not (args.scan and step_name):
+            parser.error("capture needs --scan and --step")
+        from pipeline_runner import STEPS_BY_NAME, build_context
+        step = STEPS_BY_NAME.get(step_name)
+        if step is None:
+            parser.error(f"Unknown step '{args.step}'")
+        ctx = build_context(args.scan, config, takes_path=args.takes)
+        import artifact_manifest
+        if step.rewrites and artifact_manifest.verify_step(step, ctx.scan_dir, ctx.scan_id, adopt=False)[0]:
+            print(f"⚠️  {step.name} already ran on {args.scan} and rewrites "
+                  f"{', '.join(p.format(scan=args.scan) for p in step.rewrites)}; the captured inputs are its results. "
+                  f"Use pipeline_runner.py --capture for exact inputs.")
+        capture = capture_from_config(config, [step.name])
+        capture.store = store
+        bundle = capture.capture_step(step, ctx)
+        sys.exit(0 if bundle else 1)
+
+    if args.command == 'list':
+        bundles = store.list(step_name)
+        print(f"📼 {len(bundles)} bundle(s) in {store.root}")
+        for bundle in bundles:
+            size = sum(entry['size'] for entry in bundle['inputs'].values())
+            reference = bundle.get('reference', {}).get('duration')
+            print(f"   {bundle['id']:<48} {len(bundle['inputs']):>5} file(s) {size / (1024 * 1024):>9.1f} MB"
+                  + (f"  captured run {reference:.1f}s" if reference else ""))
+        return
+
+    if args.command == 'gc':
+        print(f"🧹 Freed {store.gc() / (1024 * 1024):.1f} MB")
+        return
+
+    bundle_ids = list(args.bundles)
+    if args.command == 'replay' and not bundle_ids and step_name:
+        bundle_ids = [bundle['id'] for bundle in store.list(step_name)]
+    if not bundle_ids:
+        parser.error(f"{args.command} needs bundle ids" + (" or --step" if args.command == 'replay' else ""))
+
+    if args.command == 'drop':
+        for bundle_id in bundle_ids:
+            try:
+                store.drop(bundle_id)
+            except FileNotFoundError:
+                print(f"Error: no bundle '{bundle_id}'")
+                sys.exit(1)
+        print(f"Dropped {len(bundle_ids)} bundle(s); run 'gc' to free their objects")
+        return
+
+    report = {}
+    failed = False
+    for bundle_id in bundle_ids:
+        try:
+            runs = replay(store, bundle_id, args.runs, args.blender, args.captured_scripts, args.workdir, args.keep,
+                          args.verbose, args.wall)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            failed = True
+            continue
+        summary = summarize(runs, store.load(bundle_id).get('reference'))
+        failed = failed or summary['failures'] > 0
+        report[bundle_id] = {'summary': summary, 'runs': [run.__dict__ for run in runs]}
+        reference = f", captured run {summary['reference_s']:.1f}s" if summary['reference_s'] else ""
+        print(f"📊 {bundle_id}: p50 {summary['p50_s']:.1f}s, min {summary['min_s']:.1f}s, "
+              f"p90 {summary['p90_s']:.1f}s, CPU p50 {summary['cpu_p50_s']:.1f}s, "
+              f"peak {summary['rss_max_mb']:.0f} MB{reference}")
+        for name, seconds in sorted(summary['substeps_p50_s'].items(), key=lambda item: -item[1]):
+            print(f"      {name:<28} {seconds:>8.2f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -40,6 +40,8 @@ fi
 # Default to server environment
 ENVIRONMENT="server"
 CLEANUP_OUTPUT=true  # Default to cleaning existing output
+RESUME=false         # Start at the first step without a valid artifact manifest
+USE_SCRATCH=false    # Run on a local-disk copy of the scan (also enabled by config "scratch.enabled")
 
 # Step control variables (default: run all steps)
 RUN_STEP1=true
@@ -87,6 +89,15 @@ while [[ $# -gt 0 ]]; do
             CLEANUP_OUTPUT=false
             shift
             ;;
+        --resume)
+            RESUME=true
+            CLEANUP_OUTPUT=false
+            shift
+            ;;
+        --scratch)
+            USE_SCRATCH=true
+            shift
+            ;;
         --local)
             ENVIRONMENT="local"
             shift
@@ -138,6 +149,8 @@ while [[ $# -gt 0 ]]; do
             echo "  --software, -s PATH     Override software path"
             echo "  --takes, -t PATH        Override takes path"
             echo "  --no-cleanup            Keep existing output files"
+            echo "  --resume                Resume at the first incomplete step (implies --no-cleanup)"
+            echo "  --scratch               Work on a local-disk copy of the scan, sync changed outputs back"
             echo ""
             echo "Step Control Options:"
             echo "  --options, -o           Interactive step selection"
@@ -162,6 +175,7 @@ while [[ $# -gt 0 ]]; do
             echo "  $0 scan123 --local --start-step=3  # Start from face detection"
             echo "  $0 scan123 --local --steps=1,4,5   # Run only steps 1, 4, and 5"
             echo "  $0 scan123 --local --dry-run       # Preview execution plan"
+            echo "  $0 scan123 --local --resume        # Continue after a crash or reboot"
             exit 0
             ;;
         -*)
@@ -240,6 +254,22 @@ fi
 SOFTWARE_PATH=${SOFTWARE_PATH_OVERRIDE:-$SOFTWARE_PATH}
 TAKES_PATH=${TAKES_PATH_OVERRIDE:-$TAKES_PATH}
 
+# Artifact manifests (photogrammetry/.manifests) record which steps completed
+MANIFEST_SCRIPT="$SOFTWARE_PATH/scannermeshprocessing-2023/artifact_manifest.py"
+# Steps write into takes/<scan>/.staging/default/ and their outputs are published atomically
+STAGING_SCRIPT="$SOFTWARE_PATH/scannermeshprocessing-2023/step_staging.py"
+# Per-step duration estimates trained on the run database
+PREDICTOR_SCRIPT="$SOFTWARE_PATH/scannermeshprocessing-2023/duration_predictor.py"
+
+# Function to check that a step completed (its artifact manifest verifies)
+step_complete() {
+    if [ -f "$MANIFEST_SCRIPT" ]; then
+        python3 "$MANIFEST_SCRIPT" verify --takes "$TAKES_PATH" --scan "$SCAN_ID" --step "$1" --no-script-check --quiet
+    else
+        return 1
+    fi
+}
+
 # Function to apply step control flags
 apply_step_flags() {
     # Apply start-step flag
@@ -429,34 +459,35 @@ validate_dependencies() {
     
     echo "🔍 Validating step dependencies..."
     
+    # A skipped prerequisite must have a verified artifact manifest (outputs intact, not half-written)
     # Check Step 2 dependencies
     if [ "$RUN_STEP2" = true ] && [ "$RUN_STEP1" = false ]; then
-        if [ ! -f "$photogrammetry_dir/preview.usdz" ]; then
-            echo "⚠️  Step 2 requires 'preview.usdz' from Step 1"
+        if ! step_complete 1; then
+            echo "⚠️  Step 2 requires a completed Step 1 (preview.usdz, baked_mesh.usda, baked_mesh_tex0.png)"
             issues=true
         fi
     fi
     
     # Check Step 3 dependencies
     if [ "$RUN_STEP3" = true ] && [ "$RUN_STEP2" = false ]; then
-        if [ ! -f "$photogrammetry_dir/$SCAN_ID.png" ] || [ ! -f "$photogrammetry_dir/$SCAN_ID.blend" ]; then
-            echo "⚠️  Step 3 requires '.png' and '.blend' files from Step 2"
+        if ! step_complete 2; then
+            echo "⚠️  Step 3 requires '.png' and '.blend' files from a completed Step 2"
             issues=true
         fi
     fi
     
     # Check Step 4 dependencies
     if [ "$RUN_STEP4" = true ] && [ "$RUN_STEP3" = false ]; then
-        if [ ! -f "$photogrammetry_dir/${SCAN_ID}_results.txt" ]; then
-            echo "⚠️  Step 4 requires '${SCAN_ID}_results.txt' from Step 3"
+        if ! step_complete 3; then
+            echo "⚠️  Step 4 requires '${SCAN_ID}_results.txt' from a completed Step 3"
             issues=true
         fi
     fi
     
     # Check Step 5 dependencies
     if [ "$RUN_STEP5" = true ] && [ "$RUN_STEP4" = false ]; then
-        if [ ! -f "$photogrammetry_dir/$SCAN_ID-rig.blend" ]; then
-            echo "⚠️  Step 5 requires '$SCAN_ID-rig.blend' from Step 4"
+        if ! step_complete 4; then
+            echo "⚠️  Step 5 requires '$SCAN_ID-rig.blend' from a completed Step 4"
             issues=true
         fi
     fi
@@ -492,6 +523,17 @@ show_execution_plan() {
     [ "$RUN_STEP4" = true ] && echo "   ✅ Step 4: Add Rig" || echo "   ⏭️  Step 4: Add Rig (SKIPPED)"
     [ "$RUN_STEP5" = true ] && echo "   ✅ Step 5: Pose Test" || echo "   ⏭️  Step 5: Pose Test (SKIPPED)"
     echo ""
+
+    if [ -f "$PREDICTOR_SCRIPT" ]; then
+        PLANNED_STEPS=""
+        for n in 1 2 3 4 5; do
+            if eval "[ \"\$RUN_STEP$n\" = true ]"; then PLANNED_STEPS="$PLANNED_STEPS$n"; fi
+        done
+        if [ -n "$PLANNED_STEPS" ]; then
+            python3 "$PREDICTOR_SCRIPT" estimate --takes "$TAKES_PATH" --scan "$SCAN_ID" --steps "$PLANNED_STEPS" || true
+            echo ""
+        fi
+    fi
     
     if [ "$DRY_RUN" = true ]; then
         echo "🧪 DRY RUN MODE - No steps will be executed"
@@ -539,6 +581,23 @@ fi
 # Apply step control flags
 apply_step_flags
 
+# Resume at the first step without a valid artifact manifest
+if [ "$RESUME" = true ]; then
+    if [ -f "$MANIFEST_SCRIPT" ]; then
+        RESUME_STEP=$(python3 "$MANIFEST_SCRIPT" resume --takes "$TAKES_PATH" --scan "$SCAN_ID" || echo 1)
+        RESUME_STEP=${RESUME_STEP:-1}
+        if [ "$RESUME_STEP" -gt 5 ]; then
+            echo "✅ All steps of '$SCAN_ID' are complete (artifact manifests verified), nothing to resume"
+            exit 0
+        fi
+        echo "🔁 Resuming '$SCAN_ID' at step $RESUME_STEP"
+        START_STEP=$RESUME_STEP
+        apply_step_flags
+    else
+        echo "⚠️  artifact_manifest.py not found, cannot resume; running the selected steps"
+    fi
+fi
+
 # Show interactive options menu if requested
 if [ "$SHOW_OPTIONS" = true ]; then
     show_options_menu
@@ -564,6 +623,119 @@ log_message() {
 # Redirect all output to both console and log file
 exec > >(tee -a "$LOG_FILE") 2>&1
 
+# Per-step performance timeline: every step appends wall/CPU/RSS/exit code to $TAKES_PATH/logs/$SCAN_ID.timeline.jsonl
+export SCANNER_RUN_ID="${SCAN_ID}_$(date '+%Y%m%d_%H%M%S')_$$"
+TIMELINE_SCRIPT="$SOFTWARE_PATH/scannermeshprocessing-2023/pipeline_timeline.py"
+# Hang watchdog: per-step wall-clock/stall timeouts and retries from config.json "supervisor" (records the same span)
+SUPERVISOR_SCRIPT="$SOFTWARE_PATH/scannermeshprocessing-2023/step_supervisor.py"
+timeline_exec() {
+    local step="$1"
+    shift
+    if [ -f "$SUPERVISOR_SCRIPT" ]; then
+        python3 "$SUPERVISOR_SCRIPT" exec --environment "$ENVIRONMENT" --takes "$TAKES_PATH" --scan "$SCAN_ID" --step "$step" -- "$@"
+    elif [ -f "$TIMELINE_SCRIPT" ]; then
+        python3 "$TIMELINE_SCRIPT" exec --takes "$TAKES_PATH" --scan "$SCAN_ID" --step "$step" -- "$@"
+    else
+        "$@"
+    fi
+}
+
+# Run database: the timeline mirrors every step into $TAKES_PATH/logs/runs.sqlite3; the run itself
+# is opened here and closed with its final status whenever the script exits (including step failures)
+RUN_STORE_SCRIPT="$SOFTWARE_PATH/scannermeshprocessing-2023/run_store.py"
+SCAN_STAGING_SCRIPT="$SOFTWARE_PATH/scannermeshprocessing-2023/scan_staging.py"
+# Live status: run start/end for the status server (see: status_server.py show); a no-op when none runs
+STATUS_SCRIPT="$SOFTWARE_PATH/scannermeshprocessing-2023/status_server.py"
+RUN_TAKES_PATH="$TAKES_PATH"
+REMOTE_TAKES_PATH=""
+on_exit() {
+    local exit_code=$?
+    for pid in $PUBLISH_PIDS; do
+        wait "$pid" || true
+    done
+    if [ -n "$REMOTE_TAKES_PATH" ]; then
+        python3 "$SCAN_STAGING_SCRIPT" sync --takes "$REMOTE_TAKES_PATH" --scan "$SCAN_ID" ${ENVIRONMENT:+-e "$ENVIRONMENT"} || exit_code=1
+    fi
+    if [ -f "$RUN_STORE_SCRIPT" ]; then
+        python3 "$RUN_STORE_SCRIPT" finish-run --takes "$TAKES_PATH" --status "$([ $exit_code -eq 0 ] && echo success || echo failed)" || true
+    fi
+    if [ -f "$STATUS_SCRIPT" ]; then
+        python3 "$STATUS_SCRIPT" notify --scan "$SCAN_ID" --event run --takes "$RUN_TAKES_PATH" ${ENVIRONMENT:+-e "$ENVIRONMENT"} \
+            --status "$([ $exit_code -eq 0 ] && echo success || echo failed)" || true
+    fi
+    exit $exit_code
+}
+if [ -f "$RUN_STORE_SCRIPT" ]; then
+    SELECTED_STEPS=""
+    for n in 1 2 3 4 5; do
+        if eval "[ \"\$RUN_STEP$n\" = true ]"; then SELECTED_STEPS="$SELECTED_STEPS$n"; fi
+    done
+    python3 "$RUN_STORE_SCRIPT" start-run --takes "$TAKES_PATH" --scan "$SCAN_ID" ${ENVIRONMENT:+-e "$ENVIRONMENT"} \
+        --arguments "{\"steps\": \"$SELECTED_STEPS\", \"resume\": $RESUME, \"cleanup_output\": $CLEANUP_OUTPUT}" || true
+    if [ -f "$PREDICTOR_SCRIPT" ]; then
+        # Source image count/resolution etc. for this run, used to train the duration model
+        python3 "$PREDICTOR_SCRIPT" record --takes "$TAKES_PATH" --scan "$SCAN_ID" || true
+    fi
+fi
+if [ -f "$STATUS_SCRIPT" ]; then
+    python3 "$STATUS_SCRIPT" notify --scan "$SCAN_ID" --event run --status running --takes "$TAKES_PATH" ${ENVIRONMENT:+-e "$ENVIRONMENT"} || true
+fi
+trap on_exit EXIT
+
+# Local scratch: the scan's working set is copied to local disk (parallel copies, least recently used
+# working sets evicted at the quota), every step below runs there and on exit only the changed
+# outputs are synced back to the takes folder (see: scan_staging.py list)
+if [ -f "$SCAN_STAGING_SCRIPT" ] && { [ "$USE_SCRATCH" = true ] || python3 "$SCAN_STAGING_SCRIPT" enabled ${ENVIRONMENT:+-e "$ENVIRONMENT"}; }; then
+    if LOCAL_TAKES=$(python3 "$SCAN_STAGING_SCRIPT" checkout --takes "$TAKES_PATH" --scan "$SCAN_ID" ${ENVIRONMENT:+-e "$ENVIRONMENT"}); then
+        REMOTE_TAKES_PATH="$TAKES_PATH"
+        TAKES_PATH="$LOCAL_TAKES"
+        echo "💽 Working on a local copy of the scan: $TAKES_PATH/$SCAN_ID"
+    else
+        echo "⚠️  Local scratch checkout failed, working on the takes folder directly"
+    fi
+fi
+
+# Staging: a step runs against STAGE_TAKES (takes/<scan>/.staging/default) and only touches the
+# published photogrammetry files once it succeeded. Without step_staging.py the step writes in
+# place, so its manifest is cleared first and a crash leaves the step incomplete.
+stage_step() {
+    STEP_START=$(date +%s)
+    STAGE_TAKES="$TAKES_PATH"
+    if [ -f "$STAGING_SCRIPT" ]; then
+        STAGE_TAKES=$(python3 "$STAGING_SCRIPT" stage --takes "$TAKES_PATH" --scan "$SCAN_ID" --step "$1") || STAGE_TAKES="$TAKES_PATH"
+    fi
+    if [ "$STAGE_TAKES" = "$TAKES_PATH" ] && [ -f "$MANIFEST_SCRIPT" ]; then
+        python3 "$MANIFEST_SCRIPT" clear --takes "$TAKES_PATH" --scan "$SCAN_ID" --step "$1" || true
+    fi
+}
+
+# Publish the staged outputs (previous ones become a version), then write the artifact manifest
+publish_step() {
+    if [ "$STAGE_TAKES" != "$TAKES_PATH" ]; then
+        python3 "$STAGING_SCRIPT" publish --takes "$TAKES_PATH" --scan "$SCAN_ID" --step "$1"${ENVIRONMENT:+ -e "$ENVIRONMENT"} || return 1
+    fi
+    [ -f "$MANIFEST_SCRIPT" ] || return 0
+    python3 "$MANIFEST_SCRIPT" record --takes "$TAKES_PATH" --scan "$SCAN_ID" --step "$1" --duration $(( $(date +%s) - STEP_START )) || return 1
+    publish_artifacts "$1"
+}
+
+# Copy the committed step's artifacts to the takes folder (scratch runs) and the configured delivery
+# folders in the background while the next step runs; the script waits for them before exiting
+ARTIFACT_PUBLISHER_SCRIPT="$SOFTWARE_PATH/scannermeshprocessing-2023/artifact_publisher.py"
+HAS_DELIVERIES=false
+if [ -f "$ARTIFACT_PUBLISHER_SCRIPT" ] && python3 "$ARTIFACT_PUBLISHER_SCRIPT" destinations ${ENVIRONMENT:+-e "$ENVIRONMENT"} >/dev/null 2>&1; then
+    HAS_DELIVERIES=true
+fi
+PUBLISH_PIDS=""
+publish_artifacts() {
+    if [ -f "$ARTIFACT_PUBLISHER_SCRIPT" ] && { [ -n "$REMOTE_TAKES_PATH" ] || [ "$HAS_DELIVERIES" = true ]; }; then
+        python3 "$ARTIFACT_PUBLISHER_SCRIPT" publish --takes "$TAKES_PATH" --scan "$SCAN_ID" --step "$1" \
+            ${REMOTE_TAKES_PATH:+--mirror "$REMOTE_TAKES_PATH"} ${ENVIRONMENT:+-e "$ENVIRONMENT"} &
+        PUBLISH_PIDS="$PUBLISH_PIDS $!"
+    fi
+    return 0
+}
+
 # Log script start
 log_message "=== SCANNER PROCESSING PIPELINE STARTED ==="
 log_message "Script: $0"
@@ -601,15 +773,22 @@ if [ "$CLEANUP_OUTPUT" = true ]; then
     PHOTOGRAMMETRY_DIR="$TAKES_PATH/$SCAN_ID/photogrammetry"
     if [ -d "$PHOTOGRAMMETRY_DIR" ]; then
         log_message "Cleaning existing photogrammetry output directory"
-        echo "🧹 CLEANUP: Removing existing output files to prevent conflicts..."
+        echo "🧹 CLEANUP: Moving existing output files aside to prevent conflicts..."
         echo "   📁 Cleaning directory: '$PHOTOGRAMMETRY_DIR'"
         
-        # Remove specific files that cause conflicts
-        rm -f "$PHOTOGRAMMETRY_DIR/preview.usdz" 2>/dev/null || true
-        rm -rf "$PHOTOGRAMMETRY_DIR/final_usdz_files/" 2>/dev/null || true
-        rm -f "$PHOTOGRAMMETRY_DIR/baked_mesh"* 2>/dev/null || true
-        rm -f "$PHOTOGRAMMETRY_DIR/"*.blend 2>/dev/null || true
-        rm -f "$PHOTOGRAMMETRY_DIR/"*.png 2>/dev/null || true
+        if [ -f "$STAGING_SCRIPT" ]; then
+            # Previous outputs become a version in photogrammetry/.versions (see: step_staging.py versions)
+            python3 "$STAGING_SCRIPT" archive --takes "$TAKES_PATH" --scan "$SCAN_ID"${ENVIRONMENT:+ -e "$ENVIRONMENT"} || true
+            python3 "$STAGING_SCRIPT" discard --takes "$TAKES_PATH" --scan "$SCAN_ID" || true
+        else
+            # Remove specific files that cause conflicts
+            rm -f "$PHOTOGRAMMETRY_DIR/preview.usdz" 2>/dev/null || true
+            rm -rf "$PHOTOGRAMMETRY_DIR/final_usdz_files/" 2>/dev/null || true
+            rm -f "$PHOTOGRAMMETRY_DIR/baked_mesh"* 2>/dev/null || true
+            rm -f "$PHOTOGRAMMETRY_DIR/"*.blend 2>/dev/null || true
+            rm -f "$PHOTOGRAMMETRY_DIR/"*.png 2>/dev/null || true
+            rm -rf "$PHOTOGRAMMETRY_DIR/.manifests" 2>/dev/null || true
+        fi
         
         echo "   ✅ Cleanup completed"
         log_message "Cleanup completed successfully"
@@ -625,8 +804,10 @@ if [ "$RUN_STEP1" = true ]; then
     log_message "Starting Step 1: Generate Mesh"
     echo "🔧 STEP 1: Generating Mesh"
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-    "$SOFTWARE_PATH/scannermeshprocessing-2023/generate_mesh.sh" "$SCAN_ID" "$SOFTWARE_PATH" "$TAKES_PATH"
+    stage_step 1
+    timeline_exec generate_mesh "$SOFTWARE_PATH/scannermeshprocessing-2023/generate_mesh.sh" "$SCAN_ID" "$SOFTWARE_PATH" "$STAGE_TAKES"
     STEP1_EXIT=$?
+    [ $STEP1_EXIT -eq 0 ] && { publish_step 1 || STEP1_EXIT=1; }
     echo ""
     echo "✅ Step 1 completed with exit code: $STEP1_EXIT"
     echo ""
@@ -651,10 +832,12 @@ if [ "$RUN_STEP2" = true ]; then
     log_message "Starting Step 2: Clean Up"
     echo "🧹 STEP 2: Running CleanUp"
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-    echo "Command: /Applications/Blender.app/Contents/MacOS/Blender -b -P \"$SOFTWARE_PATH/scannermeshprocessing-2023/cleanup.py\" -- --scan \"$SCAN_ID\" --path \"$TAKES_PATH\" --facing 0.5 --environment_map \"$SOFTWARE_PATH/scannermeshprocessing-2023/kloofendal_48d_partly_cloudy_4k.hdr\""
+    stage_step 2
+    echo "Command: /Applications/Blender.app/Contents/MacOS/Blender -b -P \"$SOFTWARE_PATH/scannermeshprocessing-2023/cleanup.py\" -- --scan \"$SCAN_ID\" --path \"$STAGE_TAKES\" --facing 0.5 --environment_map \"$SOFTWARE_PATH/scannermeshprocessing-2023/kloofendal_48d_partly_cloudy_4k.hdr\""
     echo ""
-    /Applications/Blender.app/Contents/MacOS/Blender -b -P "$SOFTWARE_PATH/scannermeshprocessing-2023/cleanup.py" -- --scan "$SCAN_ID" --path "$TAKES_PATH" --facing 0.5 --environment_map "$SOFTWARE_PATH/scannermeshprocessing-2023/kloofendal_48d_partly_cloudy_4k.hdr"
+    timeline_exec cleanup /Applications/Blender.app/Contents/MacOS/Blender -b -P "$SOFTWARE_PATH/scannermeshprocessing-2023/cleanup.py" -- --scan "$SCAN_ID" --path "$STAGE_TAKES" --facing 0.5 --environment_map "$SOFTWARE_PATH/scannermeshprocessing-2023/kloofendal_48d_partly_cloudy_4k.hdr"
     STEP2_EXIT=$?
+    [ $STEP2_EXIT -eq 0 ] && { publish_step 2 || STEP2_EXIT=1; }
     echo ""
     echo "✅ Step 2 completed with exit code: $STEP2_EXIT"
     echo ""
@@ -679,6 +862,7 @@ if [ "$RUN_STEP3" = true ]; then
     log_message "Starting Step 3: Face Detection"
     echo "👤 STEP 3: Running Face Detection"
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
+    stage_step 3
 
     # Check if required files exist before face detection
     PNG_FILE="$TAKES_PATH/$SCAN_ID/photogrammetry/$SCAN_ID.png"
@@ -711,20 +895,21 @@ if [ "$RUN_STEP3" = true ]; then
     # Choose Python command based on virtual environment availability
     if [ -d "scanner_env" ]; then
         PYTHON_CMD="source scanner_env/bin/activate && python3"
-        echo "Command: source scanner_env/bin/activate && python3 \"$SOFTWARE_PATH/scannermeshprocessing-2023/pose_gen_package/face_detector.py\" -- --scan \"$SCAN_ID\" --path \"$TAKES_PATH\" --software \"$SOFTWARE_PATH/scannermeshprocessing-2023\" --rotmesh \"$SOFTWARE_PATH/scannermeshprocessing-2023/rotate_mesh.py\""
+        echo "Command: source scanner_env/bin/activate && python3 \"$SOFTWARE_PATH/scannermeshprocessing-2023/pose_gen_package/face_detector.py\" -- --scan \"$SCAN_ID\" --path \"$STAGE_TAKES\" --software \"$SOFTWARE_PATH/scannermeshprocessing-2023\" --rotmesh \"$SOFTWARE_PATH/scannermeshprocessing-2023/rotate_mesh.py\""
     else
         PYTHON_CMD="python3"
-        echo "Command: python3 \"$SOFTWARE_PATH/scannermeshprocessing-2023/pose_gen_package/face_detector.py\" -- --scan \"$SCAN_ID\" --path \"$TAKES_PATH\" --software \"$SOFTWARE_PATH/scannermeshprocessing-2023\" --rotmesh \"$SOFTWARE_PATH/scannermeshprocessing-2023/rotate_mesh.py\""
+        echo "Command: python3 \"$SOFTWARE_PATH/scannermeshprocessing-2023/pose_gen_package/face_detector.py\" -- --scan \"$SCAN_ID\" --path \"$STAGE_TAKES\" --software \"$SOFTWARE_PATH/scannermeshprocessing-2023\" --rotmesh \"$SOFTWARE_PATH/scannermeshprocessing-2023/rotate_mesh.py\""
     fi
     echo ""
 
     # Execute the face detection command
     if [ -d "scanner_env" ]; then
-        source scanner_env/bin/activate && python3 "$SOFTWARE_PATH/scannermeshprocessing-2023/pose_gen_package/face_detector.py" -- --scan "$SCAN_ID" --path "$TAKES_PATH" --software "$SOFTWARE_PATH/scannermeshprocessing-2023" --rotmesh "$SOFTWARE_PATH/scannermeshprocessing-2023/rotate_mesh.py"
+        source scanner_env/bin/activate && timeline_exec face_detection python3 "$SOFTWARE_PATH/scannermeshprocessing-2023/pose_gen_package/face_detector.py" -- --scan "$SCAN_ID" --path "$STAGE_TAKES" --software "$SOFTWARE_PATH/scannermeshprocessing-2023" --rotmesh "$SOFTWARE_PATH/scannermeshprocessing-2023/rotate_mesh.py"
     else
-        python3 "$SOFTWARE_PATH/scannermeshprocessing-2023/pose_gen_package/face_detector.py" -- --scan "$SCAN_ID" --path "$TAKES_PATH" --software "$SOFTWARE_PATH/scannermeshprocessing-2023" --rotmesh "$SOFTWARE_PATH/scannermeshprocessing-2023/rotate_mesh.py"
+        timeline_exec face_detection python3 "$SOFTWARE_PATH/scannermeshprocessing-2023/pose_gen_package/face_detector.py" -- --scan "$SCAN_ID" --path "$STAGE_TAKES" --software "$SOFTWARE_PATH/scannermeshprocessing-2023" --rotmesh "$SOFTWARE_PATH/scannermeshprocessing-2023/rotate_mesh.py"
     fi
     STEP3_EXIT=$?
+    [ $STEP3_EXIT -eq 0 ] && { publish_step 3 || STEP3_EXIT=1; }
     echo ""
     echo "✅ Step 3 completed with exit code: $STEP3_EXIT"
     echo ""
@@ -749,10 +934,12 @@ if [ "$RUN_STEP4" = true ]; then
     log_message "Starting Step 4: Add Rig"
     echo "🦴 STEP 4: Adding Rig"
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-    echo "Command: /Applications/Blender.app/Contents/MacOS/Blender -b -P \"$SOFTWARE_PATH/scannermeshprocessing-2023/add_rig.py\" -- --scan \"$SCAN_ID\" --path \"$TAKES_PATH\" --software \"$SOFTWARE_PATH/scannermeshprocessing-2023\""
+    stage_step 4
+    echo "Command: /Applications/Blender.app/Contents/MacOS/Blender -b -P \"$SOFTWARE_PATH/scannermeshprocessing-2023/add_rig.py\" -- --scan \"$SCAN_ID\" --path \"$STAGE_TAKES\" --software \"$SOFTWARE_PATH/scannermeshprocessing-2023\""
     echo ""
-    /Applications/Blender.app/Contents/MacOS/Blender -b -P "$SOFTWARE_PATH/scannermeshprocessing-2023/add_rig.py" -- --scan "$SCAN_ID" --path "$TAKES_PATH" --software "$SOFTWARE_PATH/scannermeshprocessing-2023"
+    timeline_exec add_rig /Applications/Blender.app/Contents/MacOS/Blender -b -P "$SOFTWARE_PATH/scannermeshprocessing-2023/add_rig.py" -- --scan "$SCAN_ID" --path "$STAGE_TAKES" --software "$SOFTWARE_PATH/scannermeshprocessing-2023"
     STEP4_EXIT=$?
+    [ $STEP4_EXIT -eq 0 ] && { publish_step 4 || STEP4_EXIT=1; }
     echo ""
     echo "✅ Step 4 completed with exit code: $STEP4_EXIT"
     echo ""
@@ -777,10 +964,12 @@ if [ "$RUN_STEP5" = true ]; then
     log_message "Starting Step 5: Pose Test"
     echo "🎭 STEP 5: Running Pose Test"
     echo "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"
-    echo "Command: /Applications/Blender.app/Contents/MacOS/Blender -b \"$SOFTWARE_PATH/scannermeshprocessing-2023/pose_test_render.blend\" -P \"$SOFTWARE_PATH/scannermeshprocessing-2023/pose_test.py\" -- --scan \"$SCAN_ID\" --path \"$TAKES_PATH\" --software \"$SOFTWARE_PATH/scannermeshprocessing-2023\""
+    stage_step 5
+    echo "Command: /Applications/Blender.app/Contents/MacOS/Blender -b \"$SOFTWARE_PATH/scannermeshprocessing-2023/pose_test_render.blend\" -P \"$SOFTWARE_PATH/scannermeshprocessing-2023/pose_test.py\" -- --scan \"$SCAN_ID\" --path \"$STAGE_TAKES\" --software \"$SOFTWARE_PATH/scannermeshprocessing-2023\""
     echo ""
-    /Applications/Blender.app/Contents/MacOS/Blender -b "$SOFTWARE_PATH/scannermeshprocessing-2023/pose_test_render.blend" -P "$SOFTWARE_PATH/scannermeshprocessing-2023/pose_test.py" -- --scan "$SCAN_ID" --path "$TAKES_PATH" --software "$SOFTWARE_PATH/scannermeshprocessing-2023"
+    timeline_exec pose_test /Applications/Blender.app/Contents/MacOS/Blender -b "$SOFTWARE_PATH/scannermeshprocessing-2023/pose_test_render.blend" -P "$SOFTWARE_PATH/scannermeshprocessing-2023/pose_test.py" -- --scan "$SCAN_ID" --path "$STAGE_TAKES" --software "$SOFTWARE_PATH/scannermeshprocessing-2023"
     STEP5_EXIT=$?
+    [ $STEP5_EXIT -eq 0 ] && { publish_step 5 || STEP5_EXIT=1; }
     echo ""
     echo "✅ Step 5 completed with exit code: $STEP5_EXIT"
     echo ""
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Historical run database for the scanner mesh processing pipeline.
+
+Every timeline record (pipeline_timeline.py) is mirrored into an embedded SQLite database,
+takes/logs/runs.sqlite3 (override with $SCANNER_RUN_STORE), next to the timeline files:
+
+    runs   - one row per pipeline run: scan, machine, environment, arguments, start/end, status
+    steps  - one row per step/substep span: timings, CPU, RSS, exit code, script version, attrs
+    facts  - per-run outcomes: mesh stats, face detection outcome, orientation strategy (v1/v2/v3)
+
+The database runs in WAL mode with a busy timeout, so the scheduler's concurrent steps and
+several pipelines can write at once while reports read. Queries are indexed by step and time
+and `prune` bounds the history.
+
+Usage:
+    python3 run_store.py slowest --takes /takes [--step cleanup] [--since-days 30] [--limit 20]
+    python3 run_store.py failures --takes /takes [--since-days 30]
+    python3 run_store.py regressions --takes /takes [--step cleanup] [--threshold 1.2]
+    python3 run_store.py facts --takes /takes --key orientation_strategy
+    python3 run_store.py show --takes /takes --scan X
+    python3 run_store.py import --takes /takes                  # backfill from the timeline files
+    python3 run_store.py prune --takes /takes --older-than-days 365
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+STORE_ENV = 'SCANNER_RUN_STORE'
+STORE_FILENAME = 'runs.sqlite3'
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT_S = 30.0
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    scan_id TEXT NOT NULL,
+    host TEXT,
+    environment TEXT,
+    arguments TEXT,
+    started_at REAL,
+    finished_at REAL,
+    status TEXT NOT NULL DEFAULT 'running'
+);
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT,
+    scan_id TEXT NOT NULL,
+    step TEXT,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    wall_s REAL NOT NULL,
+    cpu_s REAL,
+    peak_rss_mb REAL,
+    exit_code INTEGER,
+    failed INTEGER NOT NULL DEFAULT 0,
+    scripts_version TEXT,
+    host TEXT,
+    attrs TEXT
+);
+CREATE TABLE IF NOT EXISTS facts (
+    run_id TEXT NOT NULL,
+    scan_id TEXT NOT NULL,
+    step TEXT NOT NULL DEFAULT '',
+    key TEXT NOT NULL,
+    value TEXT,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (run_id, scan_id, step, key)
+);
+CREATE TABLE IF NOT EXISTS script_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS steps_unique ON steps (run_id, kind, name, started_at);
+CREATE INDEX IF NOT EXISTS steps_kind_step_time ON steps (kind, step, started_at);
+CREATE INDEX IF NOT EXISTS steps_scan ON steps (scan_id, started_at);
+CREATE INDEX IF NOT EXISTS steps_run ON steps (run_id);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_scan ON runs (scan_id);
+CREATE INDEX IF NOT EXISTS facts_key ON facts (key, recorded_at);
+"""
+
+# Timeline record fields stored in their own columns (the rest goes to steps.attrs)
+_COLUMN_FIELDS = {'ts', 'scan', 'run_id', 'step', 'name', 'kind', 'wall_s', 'cpu_s', 'child_cpu_s', 'peak_rss_mb',
+                  'child_peak_rss_mb', 'exit_code', 'pid', 'host'}
+
+
+def store_path(takes_path) -> str:
+    return os.environ.get(STORE_ENV) or os.path.join(takes_path, 'logs', STORE_FILENAME)
+
+
+class RunStore:
+    """
+    Connection to the run database (one per thread/process; sqlite3 connections are not shared).
+
+    Args:
+        path: Database file (see store_path)
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # autocommit; every write below is a single short statement or explicit transaction
+        self.conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        if self.conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            self.conn.executescript(SCHEMA)
+            self.conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    def close(self):
+        try:
+            self.conn.execute('PRAGMA optimize')
+        except sqlite3.Error:
+            pass
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ WRITES ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+    def start_run(self, run_id, scan_id, environment=None, arguments=None, started_at=None):
+        self.conn.execute(
+            "INSERT INTO runs (run_id, scan_id, host, environment, arguments, started_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(run_id) DO UPDATE SET environment = COALESCE(excluded.environment, environment), "
+            "arguments = COALESCE(excluded.arguments, arguments), "
+            "started_at = MIN(COALESCE(started_at, excluded.started_at), excluded.started_at)",
+            (run_id, scan_id, socket.gethostname(), environment, json.dumps(arguments) if arguments else None,
+             started_at or time.time()))
+
+    def finish_run(self, run_id, status, finished_at=None):
+        self.conn.execute("UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?",
+                          (status, finished_at or time.time(), run_id))
+
+    def record(self, record):
+        """Store one timeline record (a step/substep span or a 'fact' record)."""
+        run_id = record.get('run_id') or f"{record.get('scan')}_{int(record.get('ts', 0))}"
+        scan_id = record.get('scan') or ''
+        ts = record.get('ts') or time.time()
+        attrs = {key: value for key, value in record.items() if key not in _COLUMN_FIELDS}
+
+        if record.get('kind') == 'fact':
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO facts (run_id, scan_id, step, key, value, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, scan_id, record.get('step') or '', key, json.dumps(value), ts)
+                 for key, value in attrs.items()])
+            return
+
+        exit_code = record.get('exit_code')
+        failed = int(exit_code not in (None, 0) or 'error' in attrs)
+        scripts_version = self.scripts_version(record.get('step')) if record.get('kind') == 'step' else None
+        end = ts + (record.get('wall_s') or 0.0)
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO steps (run_id, scan_id, step, name, kind, started_at, wall_s, cpu_s, peak_rss_mb, "
+                "exit_code, failed, scripts_version, host, attrs) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, scan_id, record.get('step'), record.get('name'), record.get('kind') or 'substep', ts,
+                 record.get('wall_s') or 0.0, (record.get('cpu_s') or 0.0) + (record.get('child_cpu_s') or 0.0),
+                 max(record.get('peak_rss_mb') or 0.0, record.get('child_peak_rss_mb') or 0.0), exit_code, failed,
+                 scripts_version, record.get('host'), json.dumps(attrs) if attrs else None))
+            status = 'failed' if failed and record.get('kind') == 'step' else 'running'
+            self.conn.execute(
+                "INSERT INTO runs (run_id, scan_id, host, started_at, finished_at, status) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET started_at = MIN(COALESCE(started_at, excluded.started_at), "
+                "excluded.started_at), finished_at = MAX(COALESCE(finished_at, 0), excluded.finished_at), "
+                "status = CASE WHEN excluded.status = 'failed' THEN 'failed' ELSE status END",
+                (run_id, scan_id, record.get('host'), ts, end, status))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+
+    def scripts_version(self, step_name):
+        """Short hash of the scripts/assets implementing a step (changes when any of them changes)."""
+        try:
+            from pipeline_runner import STEPS_BY_NAME
+        except ImportError:
+            return None
+        step = STEPS_BY_NAME.get(step_name)
+        if step is None:
+            return None
+        digest = hashlib.sha256()
+        for relative_path in step.scripts:
+            digest.update(f"{relative_path}:{self._file_hash(SCRIPT_DIR / relative_path)}\n".encode('utf-8'))
+        return digest.hexdigest()[:12]
+
+    def _file_hash(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 'missing'
+        row = self.conn.execute("SELECT size, mtime_ns, sha256 FROM script_hashes WHERE path = ?",
+                                (str(path),)).fetchone()
+        if row and row['size'] == stat.st_size and row['mtime_ns'] == stat.st_mtime_ns:
+            return row['sha256']
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        self.conn.execute("INSERT OR REPLACE INTO script_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                          (str(path), stat.st_size, stat.st_mtime_ns, digest.hexdigest()))
+        return digest.hexdigest()
+
+    def prune(self, older_than_days):
+        cutoff = time.time() - older_than_days * 86400
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            counts = [self.conn.execute(sql, (cutoff,)).rowcount for sql in (
+                "DELETE FROM steps WHERE started_at < ?",
+                "DELETE FROM facts WHERE recorded_at < ?",
+                "DELETE FROM runs WHERE COALESCE(finished_at, started_at) < ?")]
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return sum(counts)
+
+    # ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ QUERIES ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+    def slowest(self, step=None, since=0.0, limit=20):
+        """Slowest successful step executions (whole runs when step is None)."""
+        if step:
+            return self.conn.execute(
+                "SELECT scan_id, run_id, step, wall_s, cpu_s, peak_rss_mb, host, started_at FROM steps "
+                "WHERE kind = 'step' AND step = ? AND started_at >= ? AND failed = 0 ORDER BY wall_s DESC LIMIT ?",
+                (step, since, limit)).fetchall()
+        return self.conn.execute(
+            "SELECT scan_id, run_id, SUM(wall_s) AS wall_s, SUM(cpu_s) AS cpu_s, MAX(peak_rss_mb) AS peak_rss_mb, "
+            "MAX(host) AS host, MIN(started_at) AS started_at, COUNT(*) AS steps FROM steps "
+            "WHERE kind = 'step' AND started_at >= ? GROUP BY run_id HAVING SUM(failed) = 0 "
+            "ORDER BY wall_s DESC LIMIT ?", (since, limit)).fetchall()
+
+    def failure_rates(self, since=0.0):
+        return self.conn.execute(
+            "SELECT step, COUNT(*) AS runs, SUM(failed) AS failures, "
+            "ROUND(100.0 * SUM(failed) / COUNT(*), 1) AS failure_pct, COUNT(DISTINCT scan_id) AS scans "
+            "FROM steps WHERE kind = 'step' AND started_at >= ? GROUP BY step ORDER BY failure_pct DESC",
+            (since,)).fetchall()
+
+    def regressions(self, step=None, since=0.0, min_runs=3, threshold=1.2):
+        """
+        Compare each script version of a step with the version before it.
+
+        Returns one row per version change with the median wall time and failure rate on
+        both sides; 'regressed' is set when the median grew by more than threshold.
+        """
+        query = ("SELECT step, scripts_version, wall_s, failed, started_at FROM steps "
+                 "WHERE kind = 'step' AND scripts_version IS NOT NULL AND started_at >= ?")
+        params = [since]
+        if step:
+            query += " AND step = ?"
+            params.append(step)
+        versions = {}
+        for row in self.conn.execute(query + " ORDER BY started_at", params):
+            per_step = versions.setdefault(row['step'], {})
+            entry = per_step.setdefault(row['scripts_version'], {'first_seen': row['started_at'], 'walls': [],
+                                                                  'runs': 0, 'failures': 0})
+            entry['runs'] += 1
+            entry['failures'] += row['failed']
+            if not row['failed']:
+                entry['walls'].append(row['wall_s'])
+
+        rows = []
+        for step_name, per_step in versions.items():
+            ordered = sorted(per_step.items(), key=lambda item: item[1]['first_seen'])
+            for (old_version, old), (new_version, new) in zip(ordered, ordered[1:]):
+                if len(old['walls']) < min_runs or len(new['walls']) < min_runs:
+                    continue
+                old_median, new_median = statistics.median(old['walls']), statistics.median(new['walls'])
+                ratio = new_median / old_median if old_median else 0.0
+                rows.append({
+                    'step': step_name, 'old_version': old_version, 'new_version': new_version,
+                    'changed_at': new['first_seen'], 'old_median_s': old_median, 'new_median_s': new_median,
+                    'ratio': ratio, 'old_failure_pct': 100.0 * old['failures'] / old['runs'],
+                    'new_failure_pct': 100.0 * new['failures'] / new['runs'],
+                    'regressed': ratio > threshold or new['failures'] / new['runs'] > old['failures'] / old['runs'],
+                })
+        return rows
+
+    def fact_counts(self, key, since=0.0):
+        return self.conn.execute(
+            "SELECT value, COUNT(*) AS count, COUNT(DISTINCT scan_id) AS scans FROM facts "
+            "WHERE key = ? AND recorded_at >= ? GROUP BY value ORDER BY count DESC", (key, since)).fetchall()
+
+    def scan_history(self, scan_id, limit=20):
+        runs = self.conn.execute(
+            "SELECT * FROM runs WHERE scan_id = ? ORDER BY started_at DESC LIMIT ?", (scan_id, limit)).fetchall()
+        history = []
+        for run in runs:
+            steps = self.conn.execute(
+                "SELECT step, name, wall_s, exit_code, failed, scripts_version FROM steps "
+                "WHERE run_id = ? AND kind = 'step' ORDER BY started_at", (run['run_id'],)).fetchall()
+            facts = self.conn.execute("SELECT step, key, value FROM facts WHERE run_id = ? ORDER BY step, key",
+                                      (run['run_id'],)).fetchall()
+            history.append((run, steps, facts))
+        return history
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ TIMELINE SINK ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+_local = threading.local()
+
+
+def record_timeline(timeline_file, record):
+    """Mirror a timeline record into the store next to the timeline file (one connection per thread)."""
+    path = os.environ.get(STORE_ENV) or os.path.join(os.path.dirname(timeline_file), STORE_FILENAME)
+    stores = getattr(_local, 'stores', None)
+    if stores is None:
+        stores = _local.stores = {}
+    store = stores.get(path)
+    if store is None:
+        store = stores[path] = RunStore(path)
+    store.record(record)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def _when(ts):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(ts)) if ts else '-'
+
+
+def _print_rows(rows, as_json, columns):
+    rows = [dict(row) for row in rows]
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print("No matching runs")
+        return
+    widths = {column: max(len(column), *(len(str(formatter(row))) for row in rows))
+              for column, formatter in columns.items()}
+    print("  ".join(column.upper().ljust(widths[column]) for column in columns))
+    print("━" * (sum(widths.values()) + 2 * (len(columns) - 1)))
+    for row in rows:
+        print("  ".join(str(formatter(row)).ljust(widths[column]) for column, formatter in columns.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historical pipeline run database")
+    parser.add_argument('command', choices=['slowest', 'failures', 'regressions', 'facts', 'show', 'import', 'prune',
+                                            'start-run', 'finish-run'])
+    parser.add_argument('files', nargs='*', help="Timeline files to import (default: every timeline in takes/logs)")
+    parser.add_argument('--takes', help="Takes path (database in takes/logs)")
+    parser.add_argument('--environment', '-e', help="Environment to read takes_path from")
+    parser.add_argument('--db', help=f"Database file (default: ${STORE_ENV} or takes/logs/{STORE_FILENAME})")
+    parser.add_argument('--scan', help="Scan identifier (show, start-run)")
+    parser.add_argument('--step', help="Only this step")
+    parser.add_argument('--since-days', type=float, help="Only runs from the last N days")
+    parser.add_argument('--limit', type=int, default=20, help="Rows to show (default: 20)")
+    parser.add_argument('--key', default='orientation_strategy', help="Fact to count (facts)")
+    parser.add_argument('--threshold', type=float, default=1.2, help="Median slowdown flagged as regression")
+    parser.add_argument('--min-runs', type=int, default=3, help="Runs needed on both sides of a script change")
+    parser.add_argument('--older-than-days', type=float, default=365, help="prune: delete history older than this")
+    parser.add_argument('--run-id', help="Run identifier (start-run, finish-run; default: $SCANNER_RUN_ID)")
+    parser.add_argument('--status', default='success', help="finish-run: final status")
+    parser.add_argument('--arguments', help="start-run: JSON object of run arguments")
+    parser.add_argument('--json', action='store_true', help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    try:
+        takes_path = args.takes
+        if not takes_path and not args.db:
+            from config_reader import get_config
+            takes_path = get_config(args.environment).takes_path
+        path = args.db or store_path(takes_path)
+        if args.command not in ('import', 'start-run', 'finish-run') and not os.path.exists(path):
+            print(f"No run database at {path}")
+            sys.exit(1)
+        store = RunStore(path)
+    except (KeyError, FileNotFoundError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    since = time.time() - args.since_days * 86400 if args.since_days else 0.0
+    run_id = args.run_id or os.environ.get('SCANNER_RUN_ID', '')
+    with store:
+        if args.command == 'slowest':
+            columns = {'scan': lambda r: r['scan_id'], 'wall': lambda r: f"{r['wall_s']:.1f}s",
+                       'cpu': lambda r: f"{r['cpu_s']:.1f}s", 'rss_mb': lambda r: f"{r['peak_rss_mb']:.0f}",
+                       'host': lambda r: r['host'] or '-', 'started': lambda r: _when(r['started_at'])}
+            _print_rows(store.slowest(args.step, since, args.limit), args.json, columns)
+        elif args.command == 'failures':
+            columns = {'step': lambda r: r['step'], 'runs': lambda r: r['runs'], 'failures': lambda r: r['failures'],
+                       'rate': lambda r: f"{r['failure_pct']:.1f}%", 'scans': lambda r: r['scans']}
+            _print_rows(store.failure_rates(since), args.json, columns)
+        elif args.command == 'regressions':
+            rows = store.regressions(args.step, since, args.min_runs, args.threshold)
+            columns = {'step': lambda r: r['step'], 'change': lambda r: f"{r['old_version']} → {r['new_version']}",
+                       'at': lambda r: _when(r['changed_at']),
+                       'median': lambda r: f"{r['old_median_s']:.1f}s → {r['new_median_s']:.1f}s ({r['ratio']:.2f}x)",
+                       'failures': lambda r: f"{r['old_failure_pct']:.0f}% → {r['new_failure_pct']:.0f}%",
+                       'flag': lambda r: '⚠️  REGRESSION' if r['regressed'] else ''}
+            _print_rows(rows, args.json, columns)
+        elif args.command == 'facts':
+            columns = {args.key: lambda r: json.loads(r['value']) if r['value'] else '-',
+                       'count': lambda r: r['count'], 'scans': lambda r: r['scans']}
+            _print_rows(store.fact_counts(args.key, since), args.json, columns)
+        elif args.command == 'show':
+            if not args.scan:
+                parser.error("show needs --scan")
+            for run, steps, facts in store.scan_history(args.scan, args.limit):
+                print(f"📋 {run['run_id']}  {run['status'].upper()}  {_when(run['started_at'])}  host={run['host']}"
+                      f"  env={run['environment'] or '-'}")
+                for step in steps:
+                    icon = '❌' if step['failed'] else '✅'
+                    print(f"   {icon} {step['step'] or step['name']:<15} {step['wall_s']:>8.1f}s  exit={step['exit_code']}"
+                          f"  scripts={step['scripts_version'] or '-'}")
+                for fact in facts:
+                    print(f"   • {fact['step'] + '.' if fact['step'] else ''}{fact['key']} = {json.loads(fact['value'])}")
+        elif args.command == 'import':
+            import pipeline_timeline
+            if not args.files and not takes_path:
+                parser.error("import needs timeline files or --takes")
+            files = args.files or sorted(glob.glob(os.path.join(
+                takes_path, pipeline_timeline.TIMELINE_DIR, f"*{pipeline_timeline.TIMELINE_SUFFIX}")))
+            count = 0
+            for record in pipeline_timeline.read_records(files, since or None):
+                store.record(record)
+                count += 1
+            print(f"📥 Imported {count} records from {len(files)} timeline file(s) into {path}")
+        elif args.command == 'prune':
+            print(f"🧹 Deleted {store.prune(args.older_than_days)} rows older than {args.older_than_days:g} days")
+            store.conn.execute('VACUUM')
+        elif args.command == 'start-run':
+            if not args.scan or not run_id:
+                parser.error("start-run needs --scan and --run-id (or $SCANNER_RUN_ID)")
+            store.start_run(run_id, args.scan, args.environment,
+                            json.loads(args.arguments) if args.arguments else None)
+        elif args.command == 'finish-run':
+            if not run_id:
+                parser.error("finish-run needs --run-id (or $SCANNER_RUN_ID)")
+            store.finish_run(run_id, args.status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+Concurrent multi-scan scheduler for the scanner mesh processing pipeline.
+
+Takes a queue of scan IDs and pipelines them: every scan still runs its steps
+in order, but steps of different scans overlap, limited per resource class
+(mesher = groove-mesher, blender = Blender steps, ml = face detection).
+
+Predicted step durations (duration_predictor.py) order the work: within a
+priority the scan with the longest mesher run starts first, and a free
+blender/ml slot goes to the shortest waiting step so quick steps fill the
+gaps around long meshing runs.
+
+With --queue (or queue.enabled in config.json) the queue is the persistent job
+queue (job_queue.py): it survives restarts, can be managed with job_queue.py
+while scans run, and a rush scan preempts lower priority scans at their next
+step boundary when every scan slot is busy.
+"""
+
+import argparse
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from blender_worker import BlenderWorkerPool
+from config_reader import get_config
+import artifact_manifest
+import artifact_publisher
+import job_queue
+import scan_staging
+import status_server
+from pipeline_runner import (STEPS_BY_NAME, build_context, estimate_durations, print_results, resolve_steps,
+                             run_scan)
+
+DEFAULT_RESOURCE_LIMITS = {'mesher': 1, 'blender': 2, 'ml': 1}
+# Job queue interrupt -> reason the pipeline runner reports when it stops at a step boundary
+INTERRUPT_REASONS = {'preempt': 'preempted by a higher priority scan', 'pause': 'paused', 'cancel': 'cancelled'}
+
+
+class ResourcePool:
+    """
+    Counting slots per resource class, handed out in order rather than first come first served.
+
+    Args:
+        limits: Dict of resource class -> maximum concurrent steps
+    """
+
+    def __init__(self, limits):
+        self.limits = dict(DEFAULT_RESOURCE_LIMITS)
+        self.limits.update(limits or {})
+        self._condition = threading.Condition()
+        self._waiting = {name: [] for name in self.limits}
+        self._tickets = itertools.count()
+        self.in_use = {name: 0 for name in self.limits}
+
+    @contextmanager
+    def acquire(self, resource_class, order=0.0):
+        """Hold a slot; when slots are contended the waiter with the lowest order gets the next one."""
+        waiting = self._waiting[resource_class]
+        limit = max(1, int(self.limits[resource_class]))
+        with self._condition:
+            ticket = (order, next(self._tickets))
+            heapq.heappush(waiting, ticket)
+            while waiting[0] != ticket or self.in_use[resource_class] >= limit:
+                self._condition.wait()
+            heapq.heappop(waiting)
+            self.in_use[resource_class] += 1
+            self._condition.notify_all()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_use[resource_class] -= 1
+                self._condition.notify_all()
+
+
+class ScanScheduler:
+    """
+    Runs the pipeline for many scans concurrently.
+
+    Scans are dequeued by priority (higher first; longest predicted mesher run,
+    then FIFO, within a priority) and a scan that is already queued or running is
+    not enqueued twice. Each active scan runs in its own thread; a step only starts
+    once a slot of its resource class is free, so scan B's mesher run overlaps scan
+    A's Blender steps. Contended slots go to the highest priority scan, then to the
+    longest waiting mesher run or the shortest waiting blender/ml step.
+
+    With a job queue the scans come from the persistent queue instead of memory;
+    other processes may add, reorder, pause or cancel jobs, which is picked up
+    every poll_interval seconds.
+
+    Args:
+        context_factory: Callable(scan_id) -> ScanContext
+        resource_limits: Dict of resource class -> concurrency limit
+        max_active_scans: Maximum number of scans in flight
+        selected: Steps allowed to run (default: all)
+        forced: Steps rerun even if up to date
+        log_dir: Directory for per-scan logs (step output is not interleaved on the console)
+        blender_pool: Optional BlenderWorkerPool shared by the Blender steps of every scan
+        estimate: Optional callable(scan_id) -> {step name: predicted seconds}
+        queue_path: Optional job queue database (job_queue.queue_path) to use instead of memory
+        queue_settings: Settings for the job queue (job_queue.DEFAULT_SETTINGS)
+        queue_factory: Optional callable() -> job queue connection, replacing queue_path (a
+            work_coordinator.CoordinatorClient makes this scheduler a worker node)
+        scratch: Optional scan_staging.ScratchCache; scans then run against local-disk
+            working sets that are synced back when they finish
+        publisher_settings: Settings for artifact_publisher (delivery destinations, workers)
+    """
+
+    def __init__(self, context_factory, resource_limits=None, max_active_scans=None,
+                 selected=None, forced=None, log_dir=None, blender_pool=None, estimate=None,
+                 queue_path=None, queue_settings=None, queue_factory=None, scratch=None, publisher_settings=None):
+        self.context_factory = context_factory
+        self.scratch = scratch
+        self.publisher_settings = publisher_settings
+        self.resources = ResourcePool(resource_limits)
+        self.max_active_scans = max_active_scans or sum(self.resources.limits.values()) + 1
+        self.selected = selected
+        self.forced = forced
+        self.log_dir = Path(log_dir) if log_dir else None
+        self.blender_pool = blender_pool
+        self.estimate = estimate
+        self.queue_path = queue_path
+        self.queue_factory = queue_factory
+        self.queue_settings = dict(job_queue.DEFAULT_SETTINGS)
+        self.queue_settings.update(queue_settings or {})
+        self.owner = job_queue.owner_id()
+
+        self._estimates = {}
+        self._jobs = {}
+        self._depth = 0  # queued jobs as last read from the job queue (for status events)
+        self._queue = []
+        self._counter = itertools.count()
+        self._queued = set()
+        self._active = {}
+        self._results = {}
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._dispatcher = None
+
+    # QUEUE
+    @property
+    def uses_job_queue(self) -> bool:
+        return bool(self.queue_path or self.queue_factory)
+
+    def _job_queue(self):
+        """A connection to the job queue for the calling thread."""
+        if self.queue_factory:
+            return self.queue_factory()
+        return job_queue.JobQueue(self.queue_path, self.queue_settings['aging_minutes'])
+
+    def enqueue(self, scan_id, priority=0) -> bool:
+        """Add a scan to the queue. Returns False if it is already queued or running."""
+        if self.uses_job_queue:
+            estimates = self._estimate(scan_id)
+            with self._job_queue() as jobs:
+                job_id = jobs.submit(scan_id, priority, estimates.get('generate_mesh', 0.0))
+                self._depth = jobs.queued_count()
+            with self._condition:
+                self._condition.notify_all()
+            self._notify_queue()
+            return job_id is not None
+        with self._condition:
+            if scan_id in self._queued or scan_id in self._active:
+                return False
+        estimates = self._estimate(scan_id)
+        with self._condition:
+            if scan_id in self._queued or scan_id in self._active:
+                return False
+            self._estimates[scan_id] = estimates
+            heapq.heappush(self._queue, (-priority, -estimates.get('generate_mesh', 0.0), next(self._counter), scan_id))
+            self._queued.add(scan_id)
+            self._condition.notify_all()
+        self._notify_queue()
+        return True
+
+    def _estimate(self, scan_id):
+        """Predicted step durations; the mesher counts as 0 when it will not run."""
+        if self.estimate is None:
+            return {}
+        try:
+            estimates = dict(self.estimate(scan_id))
+        except Exception as e:
+            print(f"WARNING: [{scan_id}] cannot estimate durations: {e}", flush=True)
+            return {}
+        mesh = STEPS_BY_NAME['generate_mesh']
+        if self.selected is not None and mesh not in self.selected:
+            estimates['generate_mesh'] = 0.0
+        elif not self.forced or mesh not in self.forced:
+            ctx = self.context_factory(scan_id)
+            if artifact_manifest.verify_step(mesh, ctx.scan_dir, scan_id)[0]:
+                estimates['generate_mesh'] = 0.0
+        return estimates
+
+    def _gate(self, step, priority, estimates):
+        seconds = estimates.get(step.name, 0.0)
+        return self.resources.acquire(step.resource_class,
+                                      (-priority, -seconds if step.resource_class == 'mesher' else seconds))
+
+    def queue_depth(self) -> int:
+        if self.uses_job_queue:
+            with self._job_queue() as jobs:
+                return jobs.queued_count()
+        with self._condition:
+            return len(self._queue)
+
+    def active_scans(self):
+        with self._condition:
+            return list(self._active)
+
+    def _notify_queue(self):
+        """Report queue depth (the last one read, no new queue connection) and running scans to the status server."""
+        with self._condition:
+            depth = self._depth if self.uses_job_queue else len(self._queue)
+            active = list(self._active)
+        status_server.notify({'event': 'queue', 'depth': depth, 'active': active})
+
+    @property
+    def results(self):
+        return dict(self._results)
+
+    # EXECUTION
+    def start(self):
+        """Start dispatching in the background (used by long-running daemons)."""
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="scan-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def stop(self, wait=True):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if wait and self._dispatcher is not None:
+            self._dispatcher.join()
+
+    def run_until_empty(self):
+        """Process the queue until no scans are queued or active."""
+        self.start()
+        if self.uses_job_queue:
+            with self._job_queue() as jobs:
+                while True:
+                    queued = jobs.queued_count()  # outside the lock: SQLite may wait for another process
+                    with self._condition:
+                        if not queued and not self._active:
+                            break
+                        self._condition.wait(self.queue_settings['poll_interval'])
+        else:
+            with self._condition:
+                while self._queue or self._active:
+                    self._condition.wait()
+        self.stop()
+        return self.results
+
+    def _dispatch_loop(self):
+        jobs = self._job_queue() if self.uses_job_queue else None
+        if jobs is not None:
+            for scan_id in jobs.recover():
+                print(f"♻️  [{scan_id}] requeued (its scheduler exited while it was running)", flush=True)
+        while True:
+            with self._condition:
+                if self._stopping:
+                    break
+                free = len(self._active) < self.max_active_scans
+                if jobs is None:
+                    entry = self._next_scan(None) if free else None
+                    if entry is None:
+                        self._condition.wait()
+                        continue
+            if jobs is not None:
+                # claim and preemption run outside the lock: another scheduler process may hold
+                # the queue's write lock, and finishing scans must not wait for it
+                entry = self._next_scan(jobs) if free else None
+                if not free:
+                    self._preempt_for_head(jobs)
+                self._depth = jobs.queued_count()
+                if entry is None:
+                    with self._condition:
+                        if not self._stopping:
+                            self._condition.wait(self.queue_settings['poll_interval'])
+                    continue
+            scan_id, priority, job = entry
+            worker = threading.Thread(target=self._run_scan, args=(scan_id, priority, job),
+                                      name=f"scan-{scan_id}", daemon=True)
+            with self._condition:
+                self._active[scan_id] = worker
+                if job is not None:
+                    self._jobs[scan_id] = job
+            worker.start()
+            self._notify_queue()
+        for worker in list(self._active.values()):
+            worker.join()
+        if jobs is not None:
+            jobs.close()
+
+    def _next_scan(self, jobs):
+        """(scan_id, priority, job row or None) to start next, None if nothing is queued."""
+        if jobs is not None:
+            job = jobs.claim(self.owner)
+            return (job['scan_id'], job['priority'], job) if job else None
+        if not self._queue:
+            return None
+        entry = heapq.heappop(self._queue)
+        self._queued.discard(entry[-1])
+        return entry[-1], -entry[0], None
+
+    def _preempt_for_head(self, jobs):
+        """Ask the lowest priority running scan to yield when the next queued job clearly outranks it."""
+        head = jobs.head()
+        if head is None:
+            return
+        with self._condition:
+            scan_ids = list(self._jobs)
+        running = [job for job in (jobs.open_job(scan_id) for scan_id in scan_ids) if job and job['state'] == 'running']
+        if any(job['interrupt'] for job in running):
+            return  # one interrupt at a time; its slot goes to the head once it yields
+        margin = self.queue_settings['preempt_margin']
+        victims = [job for job in running if job['priority'] + margin <= head['priority']]
+        if victims:
+            victim = min(victims, key=lambda job: (job['priority'], -job['started_at']))
+            jobs.request_interrupt(victim['job_id'], 'preempt')
+            print(f"⏸️  [{victim['scan_id']}] preempting for {head['scan_id']} (priority {head['priority']}); "
+                  f"it stops at its next step boundary", flush=True)
+
+    def _run_scan(self, scan_id, priority=0, job=None):
+        start = time.perf_counter()
+        print(f"🚀 [{scan_id}] started", flush=True)
+        jobs = self._job_queue() if job is not None else None
+
+        def _check_interrupt(step):
+            reason = INTERRUPT_REASONS.get(jobs.interrupt_requested(job['job_id']), '')
+            if not reason:
+                jobs.set_progress(job['job_id'], f"step {step.number}: {step.name}")
+            return reason
+
+        runner = None
+        try:
+            ctx = self.context_factory(scan_id)
+            log_path = None
+            if self.log_dir:
+                self.log_dir.mkdir(parents=True, exist_ok=True)
+                log_path = self.log_dir / f"scanner_processing_{scan_id}_{time.strftime('%Y%m%d_%H%M%S')}.log"
+            estimates = self._estimates.get(scan_id) or self._estimate(scan_id)
+            log = lambda message: print(f"[{scan_id}] {message}", flush=True)
+            runner, results = run_scan(ctx, self.scratch, self.publisher_settings, log=log,
+                                       selected=self.selected, forced=self.forced,
+                                       step_gate=lambda step: self._gate(step, priority, estimates),
+                                       log_path=log_path, blender_pool=self.blender_pool,
+                                       interrupt=_check_interrupt if jobs is not None else None)
+        except Exception as e:
+            print(f"❌ [{scan_id}] scheduler error: {e}", flush=True)
+            results = []
+        elapsed = time.perf_counter() - start
+
+        ok = results and not any(r.status in ('failed', 'blocked') for r in results)
+        if runner is not None and runner.interrupted:
+            print(f"⏸️  [{scan_id}] {runner.interrupted} after {elapsed:.1f}s", flush=True)
+        else:
+            print(f"{'✅' if ok else '❌'} [{scan_id}] finished in {elapsed:.1f}s", flush=True)
+        if jobs is not None:
+            action = next((action for action, reason in INTERRUPT_REASONS.items()
+                           if runner is not None and runner.interrupted == reason), None)
+            jobs.finish(job['job_id'], action or ('done' if ok else 'failed'))
+            self._depth = jobs.queued_count()
+            jobs.close()
+        with self._condition:
+            self._results[scan_id] = results
+            self._active.pop(scan_id, None)
+            self._jobs.pop(scan_id, None)
+            self._estimates.pop(scan_id, None)
+            self._condition.notify_all()
+        self._notify_queue()
+
+
+def scheduler_settings(config):
+    """Scheduler settings from the 'scheduler' section of config.json."""
+    settings = config.get_section('scheduler')
+    return {
+        'resource_limits': settings.get('resource_limits', DEFAULT_RESOURCE_LIMITS),
+        'max_active_scans': settings.get('max_active_scans'),
+        'blender_threads': int(settings.get('blender_threads', 0)),
+        'ml_threads': int(settings.get('ml_threads', 0)),
+        'warm_blender': bool(settings.get('warm_blender', False)),
+        'worker_recycle_after': int(settings.get('worker_recycle_after', 25)),
+    }
+
+
+def make_context_factory(config, software_path=None, takes_path=None, feature_sensitivity='normal',
+                         blender_threads=0, ml_threads=0, detail_level='full'):
+    def factory(scan_id):
+        ctx = build_context(scan_id, config, software_path, takes_path, feature_sensitivity, detail_level)
+        ctx.blender_threads = blender_threads
+        ctx.ml_threads = ml_threads
+        return ctx
+    return factory
+
+
+def read_scan_list(path):
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def add_scheduler_arguments(parser):
+    """Options shared by every command that builds a ScanScheduler."""
+    parser.add_argument('--environment', '-e', help="Environment to use (server, local)")
+    parser.add_argument('--software', '-s', help="Override software path")
+    parser.add_argument('--takes', '-t', help="Override takes path")
+    parser.add_argument('--feature-sensitivity', default='normal', choices=['normal', 'high'])
+    parser.add_argument('--detail', default='full', choices=['preview', 'reduced', 'medium', 'full', 'raw'],
+                        help="groove-mesher final model detail (default: full)")
+    parser.add_argument('--steps', default='all', help="Steps allowed to run, e.g. 2,3 or cleanup,add_rig")
+    parser.add_argument('--force', default='', help="Steps to rerun even if up to date")
+    parser.add_argument('--mesher', type=int, help="Concurrent groove-mesher steps")
+    parser.add_argument('--blender', type=int, help="Concurrent Blender steps")
+    parser.add_argument('--ml', type=int, help="Concurrent face detection steps")
+    parser.add_argument('--max-active', type=int, help="Maximum scans in flight")
+    parser.add_argument('--warm-blender', action='store_true',
+                        help="Run Blender steps on a pool of persistent Blender workers (one per blender slot)")
+    parser.add_argument('--scratch', action='store_true',
+                        help="Run scans against local-disk working sets (config 'scratch' section; scan_staging.py)")
+    parser.add_argument('--queue', action='store_true',
+                        help="Use the persistent job queue (takes/logs/jobs.sqlite3; manage it with job_queue.py)")
+
+
+def build_scheduler(config, args, queue_factory=None):
+    """
+    Build a ScanScheduler (and optional warm Blender pool) from config.json and parsed arguments.
+
+    Args:
+        queue_factory: Optional job queue connection factory (see ScanScheduler); overrides --queue
+
+    Returns:
+        (scheduler, blender_pool) - blender_pool is None unless warm workers are enabled
+    """
+    selected = resolve_steps(args.steps)
+    forced = resolve_steps(args.force) if args.force else []
+
+    settings = scheduler_settings(config)
+    limits = dict(settings['resource_limits'])
+    for name in ('mesher', 'blender', 'ml'):
+        if getattr(args, name) is not None:
+            limits[name] = getattr(args, name)
+
+    takes_path = args.takes or config.takes_path
+    log_dir = os.path.join(takes_path, 'logs')
+    factory = make_context_factory(config, args.software, args.takes, args.feature_sensitivity,
+                                   settings['blender_threads'], settings['ml_threads'], args.detail)
+    blender_pool = None
+    if args.warm_blender or settings['warm_blender']:
+        blender_pool = BlenderWorkerPool(config.blender_path, size=limits.get('blender', 1),
+                                         recycle_after=settings['worker_recycle_after'], log_dir=log_dir,
+                                         threads=settings['blender_threads'])
+    queue_settings = job_queue.queue_settings(config)
+    queue_path = None
+    if queue_factory is None and (args.queue or queue_settings.get('enabled', False)):
+        queue_path = job_queue.queue_path(takes_path)
+    scheduler = ScanScheduler(factory, limits, args.max_active or settings['max_active_scans'],
+                              selected, forced, log_dir=log_dir, blender_pool=blender_pool,
+                              estimate=lambda scan_id: estimate_durations(factory(scan_id)),
+                              queue_path=queue_path, queue_settings=queue_settings, queue_factory=queue_factory,
+                              scratch=scan_staging.cache_from_config(config, force=args.scratch),
+                              publisher_settings=artifact_publisher.publisher_settings(config))
+    return scheduler, blender_pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the scanner pipeline for many scans concurrently")
+    parser.add_argument('scan_ids', nargs='*', help="Scan identifier(s), in queue order")
+    parser.add_argument('--from-file', '-f', help="File with one scan ID per line")
+    parser.add_argument('--priority', default='normal',
+                        help=f"Priority of the given scans: integer or {'/'.join(job_queue.PRIORITY_LEVELS)}")
+    add_scheduler_arguments(parser)
+    args = parser.parse_args()
+
+    scan_ids = list(args.scan_ids)
+    if args.from_file:
+        scan_ids += read_scan_list(args.from_file)
+
+    try:
+        priority = job_queue.parse_priority(args.priority)
+        config = get_config(args.environment)
+        scheduler, blender_pool = build_scheduler(config, args)
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if not scan_ids and not scheduler.uses_job_queue:
+        parser.error("no scan IDs given (or use --queue to work through the job queue)")
+
+    print(f"📋 Scheduling {len(scan_ids)} scan(s) | limits: {scheduler.resources.limits} "
+          f"| max active scans: {scheduler.max_active_scans}"
+          f"{' | warm Blender workers' if blender_pool else ''}"
+          f"{f' | job queue {scheduler.queue_path}' if scheduler.queue_path else ''}")
+    for scan_id in scan_ids:
+        scheduler.enqueue(scan_id, priority)
+
+    start = time.perf_counter()
+    try:
+        if blender_pool:
+            blender_pool.start()
+        results = scheduler.run_until_empty()
+    finally:
+        if blender_pool:
+            blender_pool.close()
+    elapsed = time.perf_counter() - start
+
+    scan_ids += [scan_id for scan_id in results if scan_id not in scan_ids]
+    failed = 0
+    for scan_id in scan_ids:
+        scan_results = results.get(scan_id, [])
+        print_results(scan_id, scan_results)
+        if not scan_results or any(r.status in ('failed', 'blocked', 'interrupted') for r in scan_results):
+            failed += 1
+
+    print(f"\n🏁 {len(scan_ids) - failed}/{len(scan_ids)} scan(s) succeeded in {elapsed:.1f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Local-SSD working sets for scans on network or Dropbox takes folders.
+
+The mesher and Blender read and write a scan's files many times; on a mounted
+scan drive or inside a Dropbox folder every one of those reads goes over the
+network (or triggers a sync). A checkout copies the scan's working set
+(source images, published outputs, manifests, pipeline state) into a takes-like
+scratch root on local disk with parallel copies:
+
+    <scratch>/<takes-key>/logs    -> <takes>/logs (symlink, timelines/run history stay central)
+    <scratch>/<takes-key>/<scan>/ -> local copy of <takes>/<scan>/ (without .staging/.versions)
+
+Every step then runs against the scratch root. The artifact publisher
+(artifact_publisher.py) copies each step's outputs back as soon as the step is
+committed. The final sync copies back only changed files that were not published
+yet (each one atomically, data before manifests and state) and removes files the
+run archived. Working sets are kept for reuse, so a rerun only
+copies what changed remotely. The least recently used ones are evicted when the
+scratch quota or the free-space floor would be exceeded. Sets that are in use or
+hold results that were never synced back are never evicted.
+
+Usage:
+    python3 scan_staging.py checkout --takes /takes --scan X     # prints the local takes root
+    python3 scan_staging.py sync --takes /takes --scan X
+    python3 scan_staging.py list
+    python3 scan_staging.py evict [--bytes N]                    # make room (default: enforce the quota)
+    python3 scan_staging.py drop --takes /takes --scan X [--force]
+    python3 scan_staging.py enabled -e local                     # exit status 0 if config enables scratch
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+import step_staging
+
+INDEX_FILENAME = 'index.json'
+CHECKOUT_FILENAME = '.checkout.json'  # remote state of every file at the last checkout/sync
+EXCLUDED_DIRS = {step_staging.STAGING_DIRNAME, step_staging.VERSIONS_DIRNAME}
+METADATA_FILES = ('.pipeline_state.json',)
+GB = 1024 ** 3
+
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'path': '~/scanner_scratch',
+    'quota_gb': 200,
+    'min_free_gb': 20,
+    'workers': 8,
+}
+
+
+def scratch_settings(config) -> Dict:
+    """Settings from the 'scratch' section of config.json."""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get_section('scratch'))
+    return settings
+
+
+def scan_files(scan_dir, include_versions=False) -> Dict[str, Tuple[int, int]]:
+    """Scan-relative path -> (size, mtime_ns) of every file in a scan folder."""
+    scan_dir = Path(scan_dir)
+    excluded = EXCLUDED_DIRS - ({step_staging.VERSIONS_DIRNAME} if include_versions else set())
+    files = {}
+    for root, dirs, names in os.walk(scan_dir):
+        dirs[:] = [name for name in dirs if name not in excluded]
+        for name in names:
+            if name == CHECKOUT_FILENAME or name.endswith('.sync-tmp'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files[os.path.relpath(path, scan_dir)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def file_state(path):
+    """(size, mtime_ns) of a file, None when it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _is_metadata(relative_path) -> bool:
+    """Manifests and pipeline state: synced after the data they describe."""
+    parts = Path(relative_path).parts
+    return step_staging.MANIFEST_DIRNAME in parts or parts[-1] in METADATA_FILES
+
+
+def copy_file(src, dst) -> int:
+    """Copy with metadata to a temporary name, then rename over dst (readers never see a partial file)."""
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dst.with_name(f".{dst.name}.{os.getpid()}.sync-tmp")
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+    return os.path.getsize(dst)
+
+
+def copy_files(pairs: Iterable[Tuple[Path, Path]], workers=8) -> int:
+    """Copy (src, dst) pairs concurrently; returns the bytes copied."""
+    pairs = list(pairs)
+    if not pairs:
+        return 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pairs)))) as executor:
+        return sum(executor.map(lambda pair: copy_file(*pair), pairs))
+
+
+def _remove_empty_dirs(path, stop):
+    path, stop = Path(path), Path(stop)
+    while path != stop and stop in path.parents:
+        try:
+            path.rmdir()
+        except OSError:
+            return
+        path = path.parent
+
+
+def _directory_size(path) -> int:
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class ScratchCache:
+    """
+    Local scratch directory holding scan working sets.
+
+    Args:
+        root: Scratch directory on local disk
+        quota_bytes: Maximum bytes of all working sets together (0 = unlimited)
+        min_free_bytes: Free space to leave on the scratch filesystem
+        workers: Concurrent file copies
+    """
+
+    def __init__(self, root, quota_bytes=DEFAULT_SETTINGS['quota_gb'] * GB,
+                 min_free_bytes=DEFAULT_SETTINGS['min_free_gb'] * GB, workers=DEFAULT_SETTINGS['workers'], log=print):
+        self.root = Path(os.path.expanduser(str(root)))
+        self.quota_bytes = quota_bytes
+        self.min_free_bytes = min_free_bytes
+        self.workers = workers
+        self.log = log
+
+    @classmethod
+    def from_settings(cls, settings, log=print):
+        return cls(settings['path'], int(float(settings['quota_gb']) * GB), int(float(settings['min_free_gb']) * GB),
+                   int(settings['workers']), log)
+
+    @staticmethod
+    def takes_key(takes_path) -> str:
+        real = os.path.realpath(takes_path)
+        return f"{Path(real).name or 'takes'}-{hashlib.sha1(real.encode('utf-8')).hexdigest()[:10]}"
+
+    def local_takes(self, takes_path) -> Path:
+        return self.root / self.takes_key(takes_path)
+
+    def _entry_key(self, takes_path, scan_id) -> str:
+        return f"{self.takes_key(takes_path)}/{scan_id}"
+
+    @contextmanager
+    def _index(self):
+        """Exclusive access to index.json (working set sizes, last use, unsynced results)."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.root / INDEX_FILENAME, 'r') as f:
+                        index = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    index = {}
+                yield index
+                tmp_path = self.root / f".{INDEX_FILENAME}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(index, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.root / INDEX_FILENAME)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _use_lock_path(self, entry_key) -> Path:
+        return self.root / f"{entry_key}.inuse"
+
+    @contextmanager
+    def in_use(self, takes_path, scan_id):
+        """Hold a working set (shared lock) so eviction leaves it alone; blocks while it is being dropped."""
+        lock_path = self._use_lock_path(self._entry_key(takes_path, scan_id))
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _remove_set(self, entry_key, force=False) -> bool:
+        """Delete a working set unless someone holds it (caller holds the index lock)."""
+        lock_path = self._use_lock_path(entry_key)
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if not force:
+                    return False
+            shutil.rmtree(self.root / entry_key, ignore_errors=True)
+            lock_path.unlink()
+        return True
+
+    def evict(self, needed_bytes=0, keep=()) -> list:
+        """
+        Remove least recently used working sets until needed_bytes fit the quota and free-space floor.
+
+        Args:
+            needed_bytes: Bytes about to be copied into scratch
+            keep: Entry keys ("<takes-key>/<scan>") that must not be evicted
+
+        Returns:
+            Entry keys that were evicted
+        """
+        evicted = []
+        with self._index() as index:
+            def over():
+                used = sum(entry.get('bytes', 0) for entry in index.values())
+                free = shutil.disk_usage(self.root).free
+                return ((self.quota_bytes and used + needed_bytes > self.quota_bytes)
+                        or free - needed_bytes < self.min_free_bytes)
+
+            candidates = sorted((entry.get('last_used', 0), key) for key, entry in index.items()
+                                if key not in keep and not entry.get('dirty'))
+            for _, key in candidates:
+                if not over():
+                    break
+                if self._remove_set(key):
+                    self.log(f"🧹 Evicted scratch working set {key} ({index[key].get('bytes', 0) / (1024 * 1024):.0f} MB)")
+                    evicted.append(key)
+                    del index[key]
+            if over():
+                self.log(f"WARNING: scratch {self.root} stays over its quota/free-space limit "
+                         f"(remaining working sets are in use or not synced back)")
+        return evicted
+
+    def _checkout_record(self, local_scan) -> Dict[str, Tuple[int, int]]:
+        try:
+            with open(local_scan / CHECKOUT_FILENAME, 'r') as f:
+                return {path: tuple(state) for path, state in json.load(f).items()}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _write_checkout_record(self, local_scan, files):
+        with open(local_scan / CHECKOUT_FILENAME, 'w') as f:
+            json.dump(files, f)
+
+    def _update_entry(self, takes_path, scan_id, dirty):
+        local_scan = self.local_takes(takes_path) / scan_id
+        size = _directory_size(local_scan)
+        with self._index() as index:
+            index[self._entry_key(takes_path, scan_id)] = {
+                'takes': os.path.realpath(takes_path), 'scan': scan_id, 'bytes': size,
+                'last_used': time.time(), 'dirty': dirty}
+
+    def checkout(self, takes_path, scan_id) -> Path:
+        """
+        Bring the local working set of a scan up to date with the takes folder.
+
+        Returns:
+            Local takes root to run the pipeline against
+        """
+        entry_key = self._entry_key(takes_path, scan_id)
+        with self._index() as index:
+            dirty = index.get(entry_key, {}).get('dirty', False)
+        if dirty:
+            # an earlier run ended without syncing back; its results are newer than the takes folder
+            self.log(f"⚠️  {scan_id}: syncing back results of an earlier unfinished run first")
+            self.sync_back(takes_path, scan_id)
+
+        start = time.perf_counter()
+        local_root = self.local_takes(takes_path)
+        remote_scan = Path(takes_path) / scan_id
+        local_scan = local_root / scan_id
+        if not remote_scan.is_dir():
+            raise FileNotFoundError(f"Scan folder not found: {remote_scan}")
+        remote = scan_files(remote_scan)
+        local = scan_files(local_scan) if local_scan.is_dir() else {}
+        changed = [path for path, state in remote.items() if local.get(path) != state]
+        needed = sum(remote[path][0] for path in changed)
+        self.evict(needed, keep={entry_key})
+
+        local_scan.mkdir(parents=True, exist_ok=True)
+        (Path(takes_path) / 'logs').mkdir(parents=True, exist_ok=True)
+        step_staging._symlink(Path(takes_path) / 'logs', local_root / 'logs')
+        copied = copy_files(((remote_scan / path, local_scan / path) for path in changed), self.workers)
+        for path in set(local) - set(remote):
+            (local_scan / path).unlink()
+            _remove_empty_dirs((local_scan / path).parent, local_scan)
+        self._write_checkout_record(local_scan, scan_files(local_scan))
+        self._update_entry(takes_path, scan_id, dirty=True)
+        self.log(f"📥 {scan_id}: working set in {local_scan} ({len(changed)} of {len(remote)} files, "
+                 f"{copied / (1024 * 1024):.0f} MB copied in {time.perf_counter() - start:.1f}s)")
+        return local_root
+
+    def sync_back(self, takes_path, scan_id, keep_versions=step_staging.DEFAULT_KEEP_VERSIONS) -> int:
+        """
+        Copy changed files of the working set back to the takes folder.
+
+        Files are replaced atomically, data before manifests and pipeline state, so an
+        interrupted sync leaves the affected steps incomplete instead of inconsistent.
+        Source images are never written back. Returns the number of files copied.
+        """
+        start = time.perf_counter()
+        remote_scan = Path(takes_path) / scan_id
+        local_scan = self.local_takes(takes_path) / scan_id
+        if not local_scan.is_dir():
+            return 0
+        record = self._checkout_record(local_scan)
+        local = {path: state for path, state in scan_files(local_scan).items()
+                 if Path(path).parts[0] != 'source'}
+        changed = [path for path, state in local.items() if record.get(path) != state]
+        removed = [path for path in record if path not in local and Path(path).parts[0] != 'source']
+
+        remote = {path: state for path in changed + removed
+                  if (state := file_state(remote_scan / path)) is not None}
+        # files the artifact publisher already copied during the run
+        changed = sorted(path for path in changed if remote.get(path) != local[path])
+        for path in changed + removed:
+            if path in record and remote.get(path) not in (None, record[path]):
+                self.log(f"⚠️  {scan_id}: {path} also changed in the takes folder; keeping the pipeline's result")
+
+        data = [(local_scan / path, remote_scan / path) for path in changed if not _is_metadata(path)]
+        metadata = [(local_scan / path, remote_scan / path) for path in changed if _is_metadata(path)]
+        copied = copy_files(data, self.workers) + copy_files(metadata, self.workers)
+        for path in removed:
+            if remote.get(path) == record[path]:
+                (remote_scan / path).unlink()
+                _remove_empty_dirs((remote_scan / path).parent, remote_scan)
+
+        versions = self._sync_versions(local_scan, remote_scan, keep_versions)
+        self._write_checkout_record(local_scan, scan_files(local_scan))
+        self._update_entry(takes_path, scan_id, dirty=False)
+        self.log(f"📤 {scan_id}: synced back {len(changed)} files ({copied / (1024 * 1024):.0f} MB)"
+                 + (f", {len(removed)} removed" if removed else "")
+                 + (f", {versions} versions" if versions else "")
+                 + f" in {time.perf_counter() - start:.1f}s")
+        return len(changed)
+
+    def _sync_versions(self, local_scan, remote_scan, keep) -> int:
+        """Move versions created by local publishes to the takes folder and prune them there."""
+        local_versions = local_scan / 'photogrammetry' / step_staging.VERSIONS_DIRNAME
+        if not local_versions.is_dir():
+            return 0
+        remote_photogrammetry = remote_scan / 'photogrammetry'
+        steps = set()
+        moved = 0
+        for version in step_staging.list_versions(local_scan / 'photogrammetry'):
+            target = remote_photogrammetry / step_staging.VERSIONS_DIRNAME / version['id']
+            if not target.exists():
+                files = [p for p in version['path'].rglob('*') if p.is_file()]
+                copy_files(((p, target.with_name(f".{version['id']}.sync") / p.relative_to(version['path']))
+                            for p in files), self.workers)
+                os.replace(target.with_name(f".{version['id']}.sync"), target)
+                moved += 1
+            steps.add(version.get('step'))
+        shutil.rmtree(local_versions, ignore_errors=True)
+        for step_name in steps:
+            step_staging.prune_versions(remote_photogrammetry, step_name, keep)
+        return moved
+
+    def drop(self, takes_path, scan_id, force=False) -> bool:
+        """Delete a working set (refused while it is in use or holds unsynced results, unless forced)."""
+        entry_key = self._entry_key(takes_path, scan_id)
+        with self._index() as index:
+            if index.get(entry_key, {}).get('dirty') and not force:
+                return False
+            if not self._remove_set(entry_key, force):
+                return False
+            index.pop(entry_key, None)
+        return True
+
+    def entries(self):
+        with self._index() as index:
+            return sorted(({'key': key, **entry} for key, entry in index.items()),
+                          key=lambda entry: entry.get('last_used', 0), reverse=True)
+
+
+@contextmanager
+def checked_out(cache, ctx, log=None):
+    """
+    Run against a local working set: yields a copy of the ScanContext whose takes_path is
+    the scratch root and syncs the results back on exit (also after failures).
+    A cache of None yields ctx unchanged.
+    """
+    if cache is None:
+        yield ctx
+        return
+    if log is not None:
+        cache.log = log
+    with cache.in_use(ctx.takes_path, ctx.scan_id):
+        local_root = cache.checkout(ctx.takes_path, ctx.scan_id)
+        try:
+            yield replace(ctx, takes_path=str(local_root))
+        finally:
+            try:
+                cache.sync_back(ctx.takes_path, ctx.scan_id, ctx.keep_versions)
+            except OSError as e:
+                cache.log(f"❌ {ctx.scan_id}: sync back failed ({e}); results stay in "
+                          f"{local_root / ctx.scan_id} and are synced by the next run or 'scan_staging.py sync'")
+                raise
+
+
+def cache_from_config(config, log=print, force=False):
+    """ScratchCache for the 'scratch' section of config.json (None when disabled and not forced)."""
+    settings = scratch_settings(config)
+    if not (force or settings.get('enabled')):
+        return None
+    return ScratchCache.from_settings(settings, log)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Local scratch working sets for network/Dropbox takes folders")
+    parser.add_argument('command', choices=['checkout', 'sync', 'list', 'evict', 'drop', 'enabled'])
+    parser.add_argument('--takes', help="Takes path (default: from config.json)")
+    parser.add_argument('--scan', help="Scan identifier (checkout, sync, drop)")
+    parser.add_argument('--scratch', help="Scratch directory (default: config 'scratch.path')")
+    parser.add_argument('--bytes', type=int, default=0, help="Bytes to make room for (evict)")
+    parser.add_argument('--force', action='store_true', help="Drop a working set even if in use or not synced back")
+    parser.add_argument('--environment', '-e', help="Environment for config defaults")
+    args = parser.parse_args()
+
+    # progress goes to stderr: checkout prints only the local takes root on stdout
+    log = lambda message: print(message, file=sys.stderr, flush=True)
+    try:
+        from config_reader import get_config
+        config = get_config(args.environment)
+        settings = scratch_settings(config)
+        takes_path = args.takes or config.takes_path
+        keep = int(config.get_section('versions').get('keep', step_staging.DEFAULT_KEEP_VERSIONS))
+    except (ImportError, ValueError, KeyError, FileNotFoundError) as e:
+        if args.command == 'enabled':
+            sys.exit(1)
+        settings, takes_path, keep = dict(DEFAULT_SETTINGS), args.takes, step_staging.DEFAULT_KEEP_VERSIONS
+        log(f"WARNING: no usable config ({e}), using scratch defaults")
+
+    if args.command == 'enabled':
+        sys.exit(0 if settings.get('enabled') else 1)
+    if args.scratch:
+        settings['path'] = args.scratch
+    cache = ScratchCache.from_settings(settings, log)
+    if args.command in ('checkout', 'sync', 'drop') and not (takes_path and args.scan):
+        parser.error(f"{args.command} needs --scan (and --takes without a config)")
+
+    try:
+        if args.command == 'checkout':
+            print(cache.checkout(takes_path, args.scan))
+        elif args.command == 'sync':
+            with cache.in_use(takes_path, args.scan):
+                cache.sync_back(takes_path, args.scan, keep)
+        elif args.command == 'list':
+            print(f"Scratch: {cache.root} (quota {cache.quota_bytes / GB:.0f} GB, "
+                  f"{shutil.disk_usage(cache.root).free / GB:.0f} GB free)" if cache.root.is_dir()
+                  else f"Scratch: {cache.root} (empty)")
+            for entry in cache.entries():
+                print(f"   {entry['key']:<50} {entry.get('bytes', 0) / GB:7.2f} GB  "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.get('last_used', 0)))}"
+                      f"{'  NOT SYNCED' if entry.get('dirty') else ''}")
+        elif args.command == 'evict':
+            evicted = cache.evict(args.bytes)
+            print(f"Evicted {len(evicted)} working set(s)")
+        elif args.command == 'drop':
+            if not cache.drop(takes_path, args.scan, args.force):
+                print(f"Error: {args.scan} is in use or has results that were not synced back (use --force)")
+                sys.exit(1)
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
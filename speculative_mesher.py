@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Speculative final-model meshing.
+
+groove_mesh_check.py can only launch the full-detail `--create-final-model` run once
+the preview mesh exists and prep_usdz has measured its bounding box. With speculation
+enabled, generate_mesh.sh starts the final run right away, next to the preview
+mesher, with bounds predicted from the rig's recent scans (bbox_cache.py) or, until
+there is enough history, from its configured capture volume. When groove_mesh_check
+has the real box it either:
+
+    confirms  - the predicted box contains the real one with no face more than
+                `tolerance` (meters) too far out: it waits for the running final model
+    rejects   - the run is cancelled and its partial output removed; the final model
+                is meshed from the real box as before
+
+A confirmed run that fails falls back to the normal (supervised, retried) run too.
+The speculative run executes detached under the groove_mesher_final watchdog policy
+(mesher_runner.py); its output goes to photogrammetry/speculative_final.log and its state to
+speculative_final.json. Both meshers share the machine while they overlap, so this
+pays off when the preview phase is long compared to the final run's slowdown.
+
+Usage:
+    python3 speculative_mesher.py start --takes /takes --scan X --mesher builds/groove-mesher \\
+        --source /takes/X/source/ --output /takes/X/photogrammetry/ [--sensitivity normal] [--detail full]
+    python3 speculative_mesher.py cancel --output /takes/X/photogrammetry/
+    python3 speculative_mesher.py status --output /takes/X/photogrammetry/
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+import bbox_cache
+import mesher_runner
+import pipeline_timeline
+import step_supervisor
+
+STATE_FILENAME = 'speculative_final.json'
+RESULT_FILENAME = 'speculative_final.result.json'
+LOG_FILENAME = 'speculative_final.log'
+FINAL_USDZ_DIRNAME = 'final_usdz_files'
+POLL_INTERVAL = 2.0
+
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'tolerance': 0.15,
+    'padding': 0.05,
+    'quantile': 0.9,
+    'min_samples': 5,
+    'history': bbox_cache.DEFAULT_HISTORY,
+    'capture_volume': None,
+    'rig': '',
+}
+
+
+def speculation_settings(config=None) -> Dict:
+    """Settings from the 'speculative_mesh' section of config.json (defaults if it cannot be read)."""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        if config is None:
+            from config_reader import get_config
+            config = get_config()
+        settings.update(config.get_section('speculative_mesh'))
+    except (ImportError, ValueError, KeyError, FileNotFoundError):
+        pass
+    return settings
+
+
+def mesher_bounds(bounds) -> Tuple[float, ...]:
+    """groove-mesher --minX..--maxZ values for a prep_usdz box (Blender Z-up to mesher Y-up)."""
+    min_x, max_x, min_y, max_y, min_z, max_z = bounds
+    return (min_x, max_x, min_z, max_z, -abs(max_y), abs(min_y))
+
+
+def final_model_command(groove_mesher_path, source_images_path, final_usdz_dir, feature_sensitivity,
+                        detail_level, bounds) -> str:
+    """Shell command of the groove-mesher final model run for a prep_usdz box."""
+    min_x, max_x, min_y, max_y, min_z, max_z = mesher_bounds(bounds)
+    command_list = [
+        f'"{groove_mesher_path}"',
+        f'"{source_images_path}"',
+        f'"{final_usdz_dir}"',
+        "--create-final-model",
+        # "--enable-object-masking",
+        "--feature-sensitivity=" + feature_sensitivity,
+        f"-d={detail_level}",
+        f"--minX={min_x:.2f}",
+        f"--maxX={max_x:.2f}",
+        f"--minY={min_y:.2f}",
+        f"--maxY={max_y:.2f}",
+        f"--minZ={min_z:.2f}",
+        f"--maxZ={max_z:.2f}"
+    ]
+    return ' '.join(command_list)
+
+
+def predict_bounds(settings, takes_path) -> Tuple[Optional[tuple], str]:
+    """(prep_usdz box, where it came from) for the next scan on this rig; (None, reason) if unknown."""
+    rig = bbox_cache.rig_name(settings)
+    history = bbox_cache.BoundsHistory.for_takes(takes_path, settings['history'])
+    predicted = history.predict(rig, settings['min_samples'], settings['quantile'], settings['padding'])
+    if predicted is not None:
+        return predicted, f"recent scans on rig '{rig}'"
+    volume = settings.get('capture_volume')
+    if volume and len(volume) == len(bbox_cache.AXES):
+        return tuple(float(v) for v in volume), f"capture volume of rig '{rig}'"
+    return None, f"fewer than {settings['min_samples']} scans on rig '{rig}' and no capture_volume configured"
+
+
+def check_bounds(predicted, real, tolerance) -> Tuple[bool, str]:
+    """
+    Whether a run started with the predicted box is as good as one with the real box: it must
+    contain the real box (in mesher coordinates) and no face may be more than tolerance out.
+    """
+    names = ('minX', 'maxX', 'minY', 'maxY', 'minZ', 'maxZ')
+    for index, (guess, actual) in enumerate(zip(mesher_bounds(predicted), mesher_bounds(real))):
+        slack = actual - guess if index % 2 == 0 else guess - actual
+        if slack < 0:
+            return False, f"{names[index]} {guess:.2f} cuts the subject ({actual:.2f})"
+        if slack > tolerance:
+            return False, f"{names[index]} {guess:.2f} is {slack:.2f}m beyond {actual:.2f} (tolerance {tolerance:g})"
+    return True, "predicted box fits"
+
+
+def _read_json(path) -> Optional[Dict]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _alive(pid) -> bool:
+    try:
+        if os.waitpid(pid, os.WNOHANG)[0] == pid:  # our own child (start() in this process) that exited
+            return False
+    except ChildProcessError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Speculation:
+    """A speculative final run started by start(), as seen from its photogrammetry folder."""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.state_path = os.path.join(output_path, STATE_FILENAME)
+        self.result_path = os.path.join(output_path, RESULT_FILENAME)
+        self.log_path = os.path.join(output_path, LOG_FILENAME)
+        self.state = _read_json(self.state_path)
+
+    @property
+    def exists(self) -> bool:
+        return self.state is not None
+
+    @property
+    def bounds(self):
+        return tuple(self.state['bounds'])
+
+    def matches(self, feature_sensitivity, detail_level) -> bool:
+        return (self.exists and self.state.get('feature_sensitivity') == feature_sensitivity
+                and self.state.get('detail_level') == detail_level)
+
+    def result(self) -> Optional[Dict]:
+        return _read_json(self.result_path)
+
+    def running(self) -> bool:
+        return self.exists and self.result() is None and _alive(self.state['pid'])
+
+    def wait(self, log=print) -> int:
+        """Wait for the run to finish; its exit code (1 if the runner vanished without a result)."""
+        while self.running():
+            time.sleep(POLL_INTERVAL)
+        result = self.result()
+        if result is None:
+            log("❌ Speculative final run ended without reporting a result")
+            return 1
+        return result['exit_code']
+
+    def cancel(self, grace=step_supervisor.DEFAULT_POLICY['kill_grace'], log=print) -> bool:
+        """Stop the run (the runner terminates the mesher's process group) and remove its output."""
+        if not self.exists:
+            return False
+        pid = self.state['pid']
+        if self.running():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            deadline = time.monotonic() + grace + POLL_INTERVAL * 2
+            while _alive(pid) and time.monotonic() < deadline:
+                time.sleep(0.2)
+            if _alive(pid):
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            log(f"🛑 Cancelled the speculative final run (pid {pid})")
+        shutil.rmtree(self.state['final_usdz_dir'], ignore_errors=True)
+        self.discard()
+        return True
+
+    def discard(self):
+        """Forget the run (keeps its output); called once the result has been used."""
+        for path in (self.state_path, self.result_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.state = None
+
+
+def start(takes_path, scan_id, groove_mesher_path, source_images_path, output_path, feature_sensitivity='normal',
+          detail_level='full', settings=None, log=print) -> Optional[Speculation]:
+    """Launch the speculative final run in the background; None if speculation is off or has no prediction."""
+    settings = settings or speculation_settings()
+    if not settings.get('enabled'):
+        log("Speculative final meshing is disabled (config.json speculative_mesh.enabled)")
+        return None
+    bounds, source = predict_bounds(settings, takes_path)
+    if bounds is None:
+        log(f"⏭️  No speculative final run: {source}")
+        return None
+
+    Speculation(output_path).cancel(log=log)  # leftover of an interrupted run
+    final_usdz_dir = os.path.join(output_path, FINAL_USDZ_DIRNAME)
+    command = final_model_command(groove_mesher_path, source_images_path, final_usdz_dir, feature_sensitivity,
+                                  detail_level, bounds)
+    state = {
+        'scan': scan_id, 'takes': takes_path, 'bounds': list(bounds), 'source': source,
+        'feature_sensitivity': feature_sensitivity, 'detail_level': detail_level,
+        'final_usdz_dir': final_usdz_dir, 'command': command, 'started': round(time.time(), 3),
+    }
+    state_path = os.path.join(output_path, STATE_FILENAME)
+    with open(os.path.join(output_path, LOG_FILENAME), 'wb') as log_file:
+        runner = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'run', '--state', state_path],
+                                  stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT,
+                                  start_new_session=True)
+    state['pid'] = runner.pid
+    _write_json(state_path, state)
+    log(f"🔮 Speculative final run started (pid {runner.pid}) with bounds from {source}: "
+        f"{bbox_cache.format_bounds(bounds)}")
+    return Speculation(output_path)
+
+
+def _run(state_path):
+    """Body of the detached runner: the final model under the watchdog, then the result file."""
+    for _ in range(50):  # start() writes the state right after spawning us
+        state = _read_json(state_path)
+        if state is not None:
+            break
+        time.sleep(0.1)
+    else:
+        sys.exit(1)
+
+    def stop(signum, frame):
+        raise SystemExit(128 + signum)  # supervise() terminates the mesher's process group on the way out
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    policy = step_supervisor.policy_for('groove_mesher_final', step_supervisor.config_overrides())
+    os.makedirs(state['final_usdz_dir'], exist_ok=True)
+    print(f"Executing command: {state['command']}", flush=True)
+    timeline = pipeline_timeline.for_scan(state['takes'], state['scan'], step='generate_mesh')
+    timeline.started('groove_mesher_final')
+    result = mesher_runner.run(mesher_runner.supervise(
+        state['command'], policy['wall_timeout'], policy['stall_timeout'], stdout=sys.stdout, shell=True,
+        on_event=mesher_runner.status_sink(state['scan'], 'generate_mesh', 'groove_mesher_final'),
+        kill_grace=policy['kill_grace'], tail_lines=policy['tail_lines']))
+    timeline.record('groove_mesher_final', result.duration, 'substep', start=result.start,
+                    exit_code=result.exit_code, usage=result.usage, speculative=True,
+                    detail=state['detail_level'], stages=result.stages,
+                    **({'timeout': result.reason} if result.reason in ('wall', 'stall') else {}))
+    _write_json(os.path.join(os.path.dirname(state_path), RESULT_FILENAME),
+                {'exit_code': result.exit_code, 'reason': result.reason, 'duration': round(result.duration, 3)})
+    sys.exit(result.exit_code)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Speculative groove-mesher final model runs")
+    parser.add_argument('command', choices=['start', 'cancel', 'status', 'run'])
+    parser.add_argument('--takes', help="Takes path (start)")
+    parser.add_argument('--scan', help="Scan identifier (start)")
+    parser.add_argument('--mesher', help="groove-mesher executable (start)")
+    parser.add_argument('--source', help="Source images folder (start)")
+    parser.add_argument('--output', help="Photogrammetry folder of the scan")
+    parser.add_argument('--sensitivity', default='normal', help="Feature sensitivity (start)")
+    parser.add_argument('--detail', default='full', help="Detail level (start)")
+    parser.add_argument('--state', help=argparse.SUPPRESS)
+    parser.add_argument('--quiet', '-q', action='store_true', help="Only print errors")
+    args = parser.parse_args()
+    log = (lambda message: None) if args.quiet else (lambda message: print(message, flush=True))
+
+    if args.command == 'run':
+        _run(args.state)
+    if not args.output:
+        parser.error(f"{args.command} needs --output")
+
+    if args.command == 'start':
+        missing = [name for name in ('takes', 'scan', 'mesher', 'source') if not getattr(args, name)]
+        if missing:
+            parser.error(f"start needs --{', --'.join(missing)}")
+        speculation = start(args.takes, args.scan, args.mesher, args.source, args.output, args.sensitivity,
+                            args.detail, log=log)
+        sys.exit(0 if speculation else 1)
+
+    speculation = Speculation(args.output)
+    if args.command == 'cancel':
+        speculation.cancel(log=log)
+        return
+
+    if not speculation.exists:
+        print("No speculative final run")
+        sys.exit(1)
+    result = speculation.result()
+    state = speculation.state
+    status = 'running' if speculation.running() else (f"exit code {result['exit_code']}" if result else 'lost')
+    print(f"🔮 pid {state['pid']} {status}, started {time.time() - state['started']:.0f}s ago")
+    print(f"   bounds from {state['source']}: {bbox_cache.format_bounds(state['bounds'])}")
+
+
+if __name__ == "__main__":
+    main()
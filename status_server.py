@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Live status of running scans over local HTTP/JSON.
+
+Pipeline processes report what they are doing with notify(): one small UDP datagram to
+the status server, sent without waiting for anything and silently lost when no server
+runs, so reporting costs a pipeline step next to nothing. Events come from:
+
+    pipeline_timeline   start/end of every step and substep (the same spans as the timeline)
+    pipeline_runner     start/end of a run (runScriptAutomated.sh: `status_server.py notify`)
+    ProgressReporter    groove-mesher percent, parsed from its output (at most one event per percent)
+    mesher_runner       the same, with the mesher's processing stage and an ETA
+    scan_scheduler      queue depth
+
+The server folds them into one state per scan and compares the running step with its
+predicted duration (duration_predictor.py). Queue depth comes from takes/logs/jobs.sqlite3
+when the server knows the takes folder, else from the scheduler's events.
+
+    GET /status            every scan seen in the last `retention_minutes`, plus the queue
+    GET /scans/<scan_id>   one scan (404 if unknown)
+    GET /health
+
+Usage:
+    python3 status_server.py serve [--takes /takes] [--port 8765]
+    python3 status_server.py show [scan_id] [--json]
+    python3 status_server.py notify --scan X --event run --status success   # from shell scripts
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+DEFAULT_SETTINGS = {'enabled': True, 'host': '127.0.0.1', 'port': 8765, 'retention_minutes': 120}
+MAX_DATAGRAM = 8192
+QUEUE_CACHE_S = 2.0
+PREDICTOR_CACHE_S = 600.0
+
+# groove-mesher progress: "42%" / "42.5 %", or a fraction as in "Progress(...) = 0.42"
+PROGRESS_PATTERNS = (
+    (re.compile(r'(\d{1,3}(?:\.\d+)?)\s*%'), 1.0),
+    (re.compile(r'progress\b.*?[=:]\s*([01](?:\.\d+)?)\s*$', re.IGNORECASE), 100.0),
+)
+
+
+def status_settings(config=None) -> Dict:
+    """Settings from the 'status' section of config.json (defaults if it cannot be read)."""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        if config is None:
+            from config_reader import get_config
+            config = get_config()
+        settings.update(config.get_section('status'))
+    except (ImportError, ValueError, KeyError, FileNotFoundError):
+        pass
+    return settings
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ EVENTS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+class Notifier:
+    """Fire-and-forget event sender (a non-blocking UDP socket)."""
+
+    def __init__(self, host, port):
+        self.address = (host, int(port))
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def send(self, event: Dict):
+        event.setdefault('ts', round(time.time(), 3))
+        try:
+            self._socket.sendto(json.dumps(event, separators=(',', ':')).encode()[:MAX_DATAGRAM], self.address)
+        except OSError:  # no server, full socket buffer: status is best effort
+            pass
+
+
+_notifier: Optional[Notifier] = None
+_notifier_lock = threading.Lock()
+_notifier_ready = False
+
+
+def notify(event: Dict):
+    """Send one event to the status server (no-op when status is disabled in config.json)."""
+    global _notifier, _notifier_ready
+    if not _notifier_ready:
+        with _notifier_lock:
+            if not _notifier_ready:
+                settings = status_settings()
+                if settings.get('enabled', True):
+                    _notifier = Notifier(settings['host'], settings['port'])
+                _notifier_ready = True
+    if _notifier is not None:
+        _notifier.send(event)
+
+
+def parse_progress(line) -> Optional[float]:
+    """Percent (0-100) reported on a line of groove-mesher output, None if there is none."""
+    for pattern, scale in PROGRESS_PATTERNS:
+        matches = pattern.findall(line)
+        if matches:
+            percent = float(matches[-1]) * scale
+            if 0.0 <= percent <= 100.0:
+                return percent
+    return None
+
+
+class ProgressReporter:
+    """
+    Output-line callback (step_supervisor's echo) that reports groove-mesher progress.
+
+    Args:
+        scan_id / step / name: Where the progress belongs (name: the substep, e.g. groove_mesher_preview)
+        echo: Callable(line) the lines are passed on to (e.g. the script's logger)
+    """
+
+    def __init__(self, scan_id, step, name, echo: Optional[Callable[[str], None]] = None):
+        self.scan_id = scan_id
+        self.step = step
+        self.name = name
+        self.echo = echo
+        self.percent = None
+
+    def __call__(self, line):
+        if self.echo is not None:
+            self.echo(line)
+        percent = parse_progress(line)
+        if percent is not None and (self.percent is None or int(percent) != int(self.percent)):
+            self.percent = percent
+            notify({'event': 'progress', 'scan': self.scan_id, 'step': self.step, 'name': self.name,
+                    'percent': round(percent, 1)})
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ STATE ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def _new_scan(scan_id, run_id, ts):
+    return {'scan': scan_id, 'run_id': run_id, 'host': None, 'takes': None, 'status': 'running',
+            'started': ts, 'updated': ts, 'step': None, 'substeps': {}, 'progress': None, 'steps_done': []}
+
+
+class StatusBoard:
+    """
+    Per-scan state built from events.
+
+    Args:
+        predict: Optional callable(takes_path, scan_id) -> {step name: predicted seconds}
+        queue_depth: Optional callable() -> int (None: use the scheduler's queue events)
+        retention_s: Scans without events for this long are dropped
+    """
+
+    def __init__(self, predict=None, queue_depth=None, retention_s=DEFAULT_SETTINGS['retention_minutes'] * 60):
+        self.predict = predict
+        self.queue_depth = queue_depth
+        self.retention_s = retention_s
+        self.events = 0
+        self._scans: Dict[str, Dict] = {}
+        self._queue = {'depth': None, 'active': [], 'updated': None}
+        self._lock = threading.Lock()
+
+    def apply(self, event: Dict):
+        kind = event.get('event')
+        ts = event.get('ts') or time.time()
+        with self._lock:
+            self.events += 1
+            if kind == 'queue':
+                self._queue = {'depth': event.get('depth'), 'active': event.get('active') or [], 'updated': ts}
+                return
+            scan_id = event.get('scan')
+            if not scan_id:
+                return
+            scan = self._scans.get(scan_id)
+            run_id = event.get('run_id')
+            if scan is None or (run_id and scan['run_id'] and run_id != scan['run_id'] and kind in ('run', 'start')):
+                scan = self._scans[scan_id] = _new_scan(scan_id, run_id, ts)
+            scan['run_id'] = scan['run_id'] or run_id
+            scan['updated'] = max(scan['updated'], ts)
+            scan['host'] = event.get('host') or scan['host']
+            scan['takes'] = scan['takes'] or event.get('takes')
+            if kind == 'run':
+                scan['status'] = event.get('status') or 'running'
+                if scan['status'] != 'running':
+                    scan['step'], scan['substeps'], scan['progress'] = None, {}, None
+            elif kind == 'start':
+                scan['status'] = 'running'
+                if event.get('kind') == 'step':
+                    scan['step'] = {'name': event.get('name'), 'started': ts}
+                    scan['substeps'], scan['progress'] = {}, None
+                else:
+                    scan['substeps'][event.get('name')] = {'step': event.get('step'), 'started': ts}
+                    if scan['step'] is None and event.get('step'):
+                        scan['step'] = {'name': event.get('step'), 'started': ts}
+            elif kind == 'end':
+                name = event.get('name')
+                if event.get('kind') == 'step':
+                    scan['steps_done'].append({'name': name, 'wall_s': event.get('wall_s'),
+                                               'exit_code': event.get('exit_code')})
+                    if scan['step'] and scan['step']['name'] == name:
+                        scan['step'] = None
+                    scan['substeps'], scan['progress'] = {}, None
+                else:
+                    scan['substeps'].pop(name, None)
+                    if scan['progress'] and scan['progress']['name'] == name:
+                        scan['progress'] = None
+            elif kind == 'progress':
+                scan['progress'] = {'name': event.get('name'), 'percent': event.get('percent'), 'updated': ts}
+                for key in ('stage', 'eta_s'):  # mesher_runner events
+                    if event.get(key) is not None:
+                        scan['progress'][key] = event[key]
+
+    def _expire(self, now):
+        for scan_id in [s for s, scan in self._scans.items() if now - scan['updated'] > self.retention_s]:
+            del self._scans[scan_id]
+
+    def scan(self, scan_id, now=None) -> Optional[Dict]:
+        now = now or time.time()
+        with self._lock:
+            self._expire(now)
+            scan = self._scans.get(scan_id)
+            scan = json.loads(json.dumps(scan)) if scan else None
+        return self._describe(scan, now) if scan else None
+
+    def snapshot(self, now=None) -> Dict:
+        now = now or time.time()
+        with self._lock:
+            self._expire(now)
+            scans = json.loads(json.dumps(list(self._scans.values())))
+            queue = dict(self._queue)
+            events = self.events
+        if self.queue_depth is not None:
+            try:
+                queue.update({'depth': self.queue_depth(), 'source': 'job_queue'})
+            except Exception as e:  # sqlite3.Error, OSError
+                queue['error'] = str(e)
+        else:
+            queue['source'] = 'scheduler'
+        scans = sorted((self._describe(scan, now) for scan in scans), key=lambda s: -s['started'])
+        return {'ts': round(now, 3), 'events': events, 'queue': queue,
+                'running': sum(1 for s in scans if s['status'] == 'running'), 'scans': scans}
+
+    def _describe(self, scan, now) -> Dict:
+        """Add elapsed/predicted times to a copy of a scan's state."""
+        predicted = {}
+        if self.predict is not None and scan.get('takes'):
+            try:
+                predicted = self.predict(scan['takes'], scan['scan']) or {}
+            except Exception:  # prediction is a nice-to-have; never fail the request over it
+                predicted = {}
+        scan['elapsed_s'] = round((scan['updated'] if scan['status'] != 'running' else now) - scan['started'], 1)
+        step = scan['step']
+        if step:
+            step['elapsed_s'] = round(now - step['started'], 1)
+            if step['name'] in predicted:
+                step['predicted_s'] = round(predicted[step['name']], 1)
+                step['remaining_s'] = round(max(0.0, predicted[step['name']] - step['elapsed_s']), 1)
+        progress = scan['progress']
+        if progress and progress.get('eta_s') is not None:  # counts down between events
+            progress['eta_s'] = round(max(0.0, progress['eta_s'] - (now - progress['updated'])), 1)
+        running = sorted(scan.pop('substeps').items(), key=lambda item: item[1]['started'])
+        scan['substeps'] = [{'name': name, 'elapsed_s': round(now - info['started'], 1)} for name, info in running]
+        scan['substep'] = scan['substeps'][-1]['name'] if running else None
+        if predicted:
+            done = {entry['name'] for entry in scan['steps_done']}
+            scan['predicted_remaining_s'] = round(
+                (step or {}).get('remaining_s', 0.0)
+                + sum(seconds for name, seconds in predicted.items() if name not in done and name != (step or {}).get('name')), 1)
+        return scan
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ SERVER ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+class Predictions:
+    """Cached step predictions per scan; the duration model is reloaded every 10 minutes."""
+
+    def __init__(self):
+        self._models = {}
+        self._scans = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, takes_path, scan_id) -> Dict[str, float]:
+        import duration_predictor
+        now = time.time()
+        with self._lock:
+            cached = self._scans.get((takes_path, scan_id))
+            if cached is not None:
+                return cached
+            model = self._models.get(takes_path)
+            if model is None or now - model[1] > PREDICTOR_CACHE_S:
+                model = self._models[takes_path] = (duration_predictor.DurationPredictor.for_takes(takes_path), now)
+        features = duration_predictor.scan_features(os.path.join(takes_path, scan_id))
+        predicted = {step: model[0].predict(step, features) for step in duration_predictor.DEFAULT_DURATIONS}
+        with self._lock:
+            self._scans[(takes_path, scan_id)] = predicted
+        return predicted
+
+
+def job_queue_depth(takes_path) -> Optional[Callable[[], int]]:
+    """Callable returning the number of queued jobs in takes/logs/jobs.sqlite3, cached for 2s."""
+    import job_queue
+    path = job_queue.queue_path(takes_path)
+    if not os.path.exists(path):
+        return None
+    cache = {'at': 0.0, 'depth': 0}
+
+    def depth():
+        if time.monotonic() - cache['at'] > QUEUE_CACHE_S:
+            with job_queue.JobQueue(path) as jobs:
+                cache['depth'] = jobs.queued_count()
+            cache['at'] = time.monotonic()
+        return cache['depth']
+
+    return depth
+
+
+def _listen(board: StatusBoard, sock):
+    while True:
+        data, _ = sock.recvfrom(MAX_DATAGRAM)
+        try:
+            board.apply(json.loads(data))
+        except (ValueError, TypeError, AttributeError):
+            continue
+
+
+def serve(board: StatusBoard, host, port, log=print):
+    """Receive events on UDP host:port and answer HTTP on TCP host:port until interrupted."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    events = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    events.bind((host, port))
+    threading.Thread(target=_listen, args=(board, events), name='status-events', daemon=True).start()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code, body):
+            payload = json.dumps(body, indent=2).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            path = self.path.split('?', 1)[0].rstrip('/')
+            if path in ('', '/status'):
+                self._reply(200, board.snapshot())
+            elif path.startswith('/scans/'):
+                scan = board.scan(path[len('/scans/'):])
+                if scan is None:
+                    self._reply(404, {'error': 'unknown scan'})
+                else:
+                    self._reply(200, scan)
+            elif path == '/health':
+                self._reply(200, {'ok': True, 'events': board.events})
+            else:
+                self._reply(404, {'error': 'not found'})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    log(f"📡 Status on http://{host}:{port}/status (events on udp/{port})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        events.close()
+
+
+def fetch_status(scan_id=None, host=None, port=None, timeout=1.0) -> Optional[Dict]:
+    """GET the server's status (one scan when scan_id is given); None if it is not running."""
+    import urllib.error
+    import urllib.request
+    if host is None or port is None:
+        settings = status_settings()
+        host, port = host or settings['host'], port or settings['port']
+    url = f"http://{host}:{port}/" + (f"scans/{scan_id}" if scan_id else 'status')
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return json.load(response)
+    except (urllib.error.URLError, OSError, ValueError):  # HTTPError (404: unknown scan) is a URLError
+        return None
+
+
+def format_scan(scan) -> str:
+    line = f"{scan['scan']:<24} {scan['status']:<9} {scan['elapsed_s']:>7.0f}s"
+    step = scan.get('step')
+    if step:
+        line += f"  {step['name']} {step['elapsed_s']:.0f}s"
+        if 'predicted_s' in step:
+            line += f" of ~{step['predicted_s']:.0f}s"
+    progress = scan.get('progress')
+    if scan.get('substep') and not (progress and progress['name'] == scan['substep']):
+        line += f"  / {scan['substep']}"
+    if progress and progress.get('percent') is not None:
+        line += f"  / {progress['name']} {progress['percent']:.0f}%"
+        if progress.get('stage'):
+            line += f" {progress['stage']}"
+        if progress.get('eta_s') is not None:
+            line += f" ETA {progress['eta_s']:.0f}s"
+    if 'predicted_remaining_s' in scan and scan['status'] == 'running':
+        line += f"  (~{scan['predicted_remaining_s']:.0f}s left)"
+    return line
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Live status of running scans")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="Run the status server")
+    serve_parser.add_argument('--takes', help="Takes path (queue depth from its job queue)")
+    serve_parser.add_argument('--host', help="Address to bind (default: status.host)")
+    serve_parser.add_argument('--port', type=int, help="HTTP and event port (default: status.port)")
+
+    show_parser = subparsers.add_parser('show', help="Print the status of running scans")
+    show_parser.add_argument('scan', nargs='?', help="Only this scan")
+    show_parser.add_argument('--json', action='store_true', help="Raw JSON")
+
+    notify_parser = subparsers.add_parser('notify', help="Send one event (for shell scripts)")
+    notify_parser.add_argument('--scan', required=True, help="Scan ID")
+    notify_parser.add_argument('--event', default='run', choices=['run', 'start', 'end'])
+    notify_parser.add_argument('--status', help="Run status (run events): running, success, failed")
+    notify_parser.add_argument('--name', help="Step/substep name (start/end events)")
+    notify_parser.add_argument('--kind', default='step', choices=['step', 'substep'])
+    notify_parser.add_argument('--takes', help="Takes path (enables duration predictions)")
+
+    for sub in (serve_parser, show_parser, notify_parser):
+        sub.add_argument('--environment', '-e', help="Environment for config defaults")
+    args = parser.parse_args()
+
+    try:
+        from config_reader import get_config
+        config = get_config(args.environment)
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    settings = status_settings(config)
+
+    if args.command == 'notify':
+        import pipeline_timeline
+        event = {'event': args.event, 'scan': args.scan, 'run_id': os.environ.get(pipeline_timeline.RUN_ID_ENV, ''),
+                 'host': socket.gethostname(), 'takes': args.takes}
+        if args.event == 'run':
+            event['status'] = args.status or 'running'
+        else:
+            event.update({'name': args.name, 'kind': args.kind, 'step': args.name if args.kind == 'step' else None})
+        if settings.get('enabled', True):
+            Notifier(settings['host'], settings['port']).send(event)
+        return
+
+    if args.command == 'show':
+        status = fetch_status(args.scan, settings['host'], settings['port'])
+        if status is None:
+            print(f"Error: {'unknown scan ' + args.scan if args.scan else 'no status server'} "
+                  f"on {settings['host']}:{settings['port']}")
+            sys.exit(1)
+        if args.json:
+            print(json.dumps(status, indent=2))
+        elif args.scan:
+            print(format_scan(status))
+        else:
+            queue = status['queue']
+            print(f"📡 {status['running']} running, {queue.get('depth') if queue.get('depth') is not None else '?'} queued")
+            for scan in status['scans']:
+                print(f"   {format_scan(scan)}")
+        return
+
+    takes_path = args.takes or config.takes_path
+    depth = job_queue_depth(takes_path) if takes_path else None
+    board = StatusBoard(Predictions(), depth, float(settings['retention_minutes']) * 60)
+    try:
+        serve(board, args.host or settings['host'], args.port or settings['port'])
+    except OSError as e:
+        print(f"Error: cannot serve status: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Staged step outputs with atomic publishing and versioned rollback.
+
+A step no longer writes into the shared photogrammetry folder. It runs against a
+staging takes root, takes/<scan>/.staging/<tag>/, laid out like the real takes folder:
+
+    .staging/<tag>/logs                  -> takes/logs (symlink)
+    .staging/<tag>/<scan>/source         -> takes/<scan>/source (symlink)
+    .staging/<tag>/<scan>/photogrammetry/<input> -> published input (symlink per declared input)
+
+The step's outputs are never linked, so they are written fresh inside staging. Inputs
+the step rewrites in place (face detection rotates {scan}.blend/png) get private copies.
+Intermediate files (preview.zip, final_usdz_files, ...) stay in staging, which also lets
+an interrupted step reuse them on the next attempt.
+
+Publishing hardlinks the current files into photogrammetry/.versions/<version>/ and then
+os.replace()s each staged output over the published one. Readers therefore always see a
+complete old or a complete new file, and the last N versions per step can be rolled back.
+
+Runs with different tags stage side by side, so a step can be rerun concurrently on the
+same scan (A/B comparisons) and only the chosen result gets published.
+
+Usage:
+    python3 step_staging.py stage --takes /takes --scan X --step cleanup      # prints the staging takes root
+    python3 step_staging.py publish --takes /takes --scan X --step cleanup [--keep 3]
+    python3 step_staging.py archive --takes /takes --scan X                   # replaces the old rm -f cleanup
+    python3 step_staging.py versions --takes /takes --scan X
+    python3 step_staging.py rollback --takes /takes --scan X --version 20261018-101500-cleanup
+    python3 step_staging.py discard --takes /takes --scan X [--tag B]
+"""
+
+import argparse
+import filecmp
+import fcntl
+import json
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+STAGING_DIRNAME = '.staging'
+VERSIONS_DIRNAME = '.versions'
+MANIFEST_DIRNAME = '.manifests'
+DEFAULT_TAG = 'default'
+DEFAULT_KEEP_VERSIONS = 3
+
+# Scan-level files steps append to (through a symlink, even before they exist)
+SHARED_SCAN_FILES = ('face_detection_log.txt',)
+
+
+def _link_or_copy(src, dst):
+    """Hardlink (no data copied) and fall back to a copy on filesystems without links."""
+    Path(dst).parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _symlink(target, link):
+    """Point link at target unless link is a real file (a staged result that must be kept)."""
+    target = os.path.abspath(target)
+    if os.path.islink(link):
+        if os.readlink(link) == target:
+            return
+        os.unlink(link)
+    elif os.path.lexists(link):
+        return
+    os.symlink(target, link)
+
+
+class StagingArea:
+    """
+    Staging takes root for one scan.
+
+    Args:
+        takes_path: Real takes folder
+        scan_id: Scan identifier
+        tag: Name of the staging area; concurrent runs of the same scan need different tags
+    """
+
+    def __init__(self, takes_path, scan_id, tag=DEFAULT_TAG):
+        self.takes_path = Path(takes_path)
+        self.scan_id = scan_id
+        self.tag = tag or DEFAULT_TAG
+        self.scan_dir = self.takes_path / scan_id
+        self.photogrammetry_dir = self.scan_dir / 'photogrammetry'
+        self.root = self.scan_dir / STAGING_DIRNAME / self.tag
+        self.staged_scan_dir = self.root / scan_id
+        self.staged_photogrammetry_dir = self.staged_scan_dir / 'photogrammetry'
+
+    @contextmanager
+    def lock(self):
+        """Exclusive use of this staging area (blocks while another run of the same tag holds it)."""
+        self.root.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.root.parent / f"{self.tag}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def prepare(self, inputs: Iterable[str] = (), outputs: Iterable[str] = (), rewrites: Iterable[str] = (),
+                chained=False) -> Path:
+        """
+        Link the step's published inputs into staging and return the staging takes root.
+
+        Only declared inputs are linked, so a step writing to any other name can never
+        modify a published file through a symlink.
+
+        Args:
+            inputs: Scan-relative files the step reads (symlinked to the published files)
+            outputs: Scan-relative outputs of the step (written fresh, never linked)
+            rewrites: Scan-relative inputs the step modifies in place (private copies)
+            chained: Inputs already produced in this staging area (by upstream steps run
+                without publishing) are used instead of the published files
+        """
+        outputs = set(outputs)
+        rewrites = set(rewrites)
+        self.staged_photogrammetry_dir.mkdir(parents=True, exist_ok=True)
+        self.photogrammetry_dir.mkdir(parents=True, exist_ok=True)
+
+        # logs/timelines written by the step go to the real takes/logs
+        (self.takes_path / 'logs').mkdir(parents=True, exist_ok=True)
+        _symlink(self.takes_path / 'logs', self.root / 'logs')
+
+        for entry in self.scan_dir.iterdir():
+            if entry.name.startswith('.') or entry.name == 'photogrammetry':
+                continue
+            _symlink(entry, self.staged_scan_dir / entry.name)
+        for name in SHARED_SCAN_FILES:
+            _symlink(self.scan_dir / name, self.staged_scan_dir / name)
+
+        for staged in self.staged_photogrammetry_dir.iterdir():
+            if staged.is_symlink():
+                staged.unlink()
+
+        for relative_path in inputs:
+            staged = self.staged_scan_dir / relative_path
+            published = self.scan_dir / relative_path
+            if relative_path in outputs or not published.exists() or staged.parent == self.staged_scan_dir:
+                continue
+            if chained and staged.is_file() and not staged.is_symlink():
+                continue
+            if relative_path in rewrites:
+                # always start from the published file, never from an earlier run's copy
+                if staged.exists():
+                    staged.unlink()
+                shutil.copy2(published, staged)
+                continue
+            # the published input wins over anything an earlier run left in staging
+            if staged.is_file():
+                staged.unlink()
+            _symlink(published, staged)
+        return self.root
+
+    def staged_results(self, outputs: Iterable[str], rewrites: Iterable[str] = ()) -> Dict[str, Path]:
+        """
+        Staged files that publishing would move. Raises FileNotFoundError for a missing output.
+        """
+        results = {}
+        for relative_path in outputs:
+            staged = self.staged_scan_dir / relative_path
+            if staged.is_symlink() or not staged.is_file():
+                raise FileNotFoundError(f"{relative_path} was not produced")
+            results[relative_path] = staged
+        for relative_path in rewrites:
+            staged = self.staged_scan_dir / relative_path
+            published = self.scan_dir / relative_path
+            if staged.is_symlink() or not staged.is_file():
+                continue
+            if published.is_file() and filecmp.cmp(staged, published, shallow=True):
+                continue
+            results[relative_path] = staged
+        return results
+
+    def publish(self, step_name, outputs: Iterable[str], rewrites: Iterable[str] = (),
+                keep=DEFAULT_KEEP_VERSIONS) -> Optional[str]:
+        """
+        Atomically replace the published files with the staged results.
+
+        Returns:
+            Id of the version holding the replaced files (None if nothing was replaced)
+        """
+        results = self.staged_results(outputs, rewrites)
+        replaced = [path for path in results if (self.scan_dir / path).is_file()]
+
+        version_id = None
+        if replaced:
+            suffix = '' if self.tag == DEFAULT_TAG else f"-{self.tag}"
+            version_id = new_version_id(self.photogrammetry_dir, f"{step_name}{suffix}")
+            version_dir = self.photogrammetry_dir / VERSIONS_DIRNAME / version_id
+            for relative_path in replaced:
+                _link_or_copy(self.scan_dir / relative_path, version_dir / relative_path)
+            manifest = self.photogrammetry_dir / MANIFEST_DIRNAME / f"{step_name}.json"
+            if manifest.is_file():
+                shutil.copy2(manifest, version_dir / 'manifest.json')
+            write_version_info(version_dir, step_name, replaced, self.tag)
+
+        for relative_path, staged in results.items():
+            target = self.scan_dir / relative_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staged, target)
+
+        prune_versions(self.photogrammetry_dir, step_name, keep)
+        return version_id
+
+    def discard(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ VERSIONS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def new_version_id(photogrammetry_dir, label) -> str:
+    base = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}"
+    version_id = base
+    counter = 1
+    while (Path(photogrammetry_dir) / VERSIONS_DIRNAME / version_id).exists():
+        counter += 1
+        version_id = f"{base}.{counter}"
+    return version_id
+
+
+def write_version_info(version_dir, step_name, files, tag=DEFAULT_TAG):
+    Path(version_dir).mkdir(parents=True, exist_ok=True)
+    with open(Path(version_dir) / 'version.json', 'w') as f:
+        json.dump({'step': step_name, 'tag': tag, 'files': list(files), 'created': time.time(),
+                   'created_at': time.strftime('%Y-%m-%d %H:%M:%S')}, f, indent=2)
+
+
+def list_versions(photogrammetry_dir, step_name=None) -> List[Dict]:
+    """Versions (oldest first), optionally only those of one step."""
+    versions = []
+    versions_dir = Path(photogrammetry_dir) / VERSIONS_DIRNAME
+    if not versions_dir.is_dir():
+        return versions
+    for version_dir in versions_dir.iterdir():
+        try:
+            with open(version_dir / 'version.json', 'r') as f:
+                info = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if step_name is None or info.get('step') == step_name:
+            versions.append({'id': version_dir.name, 'path': version_dir, **info})
+    return sorted(versions, key=lambda version: (version.get('created', 0), version['id']))
+
+
+def prune_versions(photogrammetry_dir, step_name, keep=DEFAULT_KEEP_VERSIONS):
+    if keep is None or keep < 0:
+        return
+    versions = list_versions(photogrammetry_dir, step_name)
+    for version in versions[:max(0, len(versions) - keep)]:
+        shutil.rmtree(version['path'], ignore_errors=True)
+
+
+def archive_outputs(scan_dir, relative_paths: Iterable[str], label='reset', keep=DEFAULT_KEEP_VERSIONS) -> Optional[str]:
+    """
+    Move existing outputs (files or folders) out of the way into a version instead of deleting them.
+
+    The step manifests go with them, so every step counts as incomplete afterwards.
+    """
+    scan_dir = Path(scan_dir)
+    photogrammetry_dir = scan_dir / 'photogrammetry'
+    present = [path for path in dict.fromkeys(relative_paths) if (scan_dir / path).exists()]
+    manifests_dir = photogrammetry_dir / MANIFEST_DIRNAME
+    if not present and not manifests_dir.is_dir():
+        return None
+
+    version_id = new_version_id(photogrammetry_dir, label)
+    version_dir = photogrammetry_dir / VERSIONS_DIRNAME / version_id
+    version_dir.mkdir(parents=True)
+    for relative_path in present:
+        (version_dir / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        os.rename(scan_dir / relative_path, version_dir / relative_path)
+    if manifests_dir.is_dir():
+        os.rename(manifests_dir, version_dir / MANIFEST_DIRNAME)
+    write_version_info(version_dir, label, present)
+    prune_versions(photogrammetry_dir, label, keep)
+    return version_id
+
+
+def rollback(scan_dir, version_id, keep=DEFAULT_KEEP_VERSIONS) -> Optional[str]:
+    """
+    Restore the files of a version (the current files become a new version first).
+
+    Returns:
+        Id of the version holding the files that were replaced by the rollback
+    """
+    scan_dir = Path(scan_dir)
+    photogrammetry_dir = scan_dir / 'photogrammetry'
+    version_dir = photogrammetry_dir / VERSIONS_DIRNAME / version_id
+    with open(version_dir / 'version.json', 'r') as f:
+        info = json.load(f)
+    step_name = info['step']
+    files = [path for path in info.get('files', []) if (version_dir / path).is_file()]
+
+    current = [path for path in files if (scan_dir / path).is_file()]
+    previous_id = None
+    if current:
+        previous_id = new_version_id(photogrammetry_dir, f"{step_name}-rollback")
+        previous_dir = photogrammetry_dir / VERSIONS_DIRNAME / previous_id
+        for relative_path in current:
+            _link_or_copy(scan_dir / relative_path, previous_dir / relative_path)
+        write_version_info(previous_dir, step_name, current)
+
+    for relative_path in files:
+        target = scan_dir / relative_path
+        tmp_path = target.with_name(f".{target.name}.rollback")
+        if tmp_path.exists():
+            tmp_path.unlink()
+        _link_or_copy(version_dir / relative_path, tmp_path)
+        os.replace(tmp_path, target)
+
+    manifest = photogrammetry_dir / MANIFEST_DIRNAME / f"{step_name}.json"
+    if (version_dir / 'manifest.json').is_file():
+        manifest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(version_dir / 'manifest.json', manifest)
+    elif manifest.exists():
+        manifest.unlink()
+
+    prune_versions(photogrammetry_dir, step_name, keep)
+    return previous_id
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def keep_versions_setting(environment=None) -> int:
+    try:
+        from config_reader import get_config
+        return int(get_config(environment).get_section('versions').get('keep', DEFAULT_KEEP_VERSIONS))
+    except Exception:
+        return DEFAULT_KEEP_VERSIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Staged step outputs with atomic publishing and rollback")
+    parser.add_argument('command', choices=['stage', 'publish', 'archive', 'versions', 'rollback', 'discard'])
+    parser.add_argument('--takes', required=True, help="Takes path")
+    parser.add_argument('--scan', required=True, help="Scan identifier")
+    parser.add_argument('--step', help="Step number or name (stage, publish, versions)")
+    parser.add_argument('--tag', default=DEFAULT_TAG, help="Staging area name (default: default)")
+    parser.add_argument('--version', help="Version id (rollback)")
+    parser.add_argument('--keep', type=int, help="Versions to keep per step (default: config 'versions.keep' or 3)")
+    parser.add_argument('--environment', '-e', help="Environment for config defaults")
+    args = parser.parse_args()
+
+    keep = args.keep if args.keep is not None else keep_versions_setting(args.environment)
+    staging = StagingArea(args.takes, args.scan, args.tag)
+
+    step = None
+    if args.step:
+        from pipeline_runner import STEPS_BY_NAME, STEPS_BY_NUMBER
+        step = STEPS_BY_NUMBER.get(int(args.step)) if args.step.isdigit() else STEPS_BY_NAME.get(args.step)
+        if step is None:
+            parser.error(f"Unknown step '{args.step}'")
+    inputs = [p.format(scan=args.scan) for p in step.inputs] if step else []
+    outputs = [p.format(scan=args.scan) for p in step.outputs] if step else []
+    rewrites = [p.format(scan=args.scan) for p in step.rewrites] if step else []
+
+    try:
+        if args.command == 'stage':
+            if step is None:
+                parser.error("stage needs --step")
+            print(staging.prepare(inputs, outputs, rewrites))
+        elif args.command == 'publish':
+            if step is None:
+                parser.error("publish needs --step")
+            version_id = staging.publish(step.name, outputs, rewrites, keep)
+            print(f"📦 Published {step.name}" + (f" (previous outputs kept as version {version_id})" if version_id else ""))
+        elif args.command == 'archive':
+            from pipeline_runner import PIPELINE_STEPS
+            paths = [p.format(scan=args.scan) for s in PIPELINE_STEPS for p in s.outputs]
+            # leftovers of runs that wrote straight into the photogrammetry folder
+            paths += ['photogrammetry/final_usdz_files', 'photogrammetry/preview.zip', 'photogrammetry/0',
+                      'photogrammetry/baked_mesh.usdc', 'photogrammetry/preview.usdc']
+            version_id = archive_outputs(staging.scan_dir, paths, keep=keep)
+            print(f"📦 Existing outputs moved to version {version_id}" if version_id else "No existing outputs")
+        elif args.command == 'versions':
+            for version in list_versions(staging.photogrammetry_dir, step.name if step else None):
+                print(f"{version['id']:<40} {version.get('created_at', '')}  {', '.join(version.get('files', []))}")
+        elif args.command == 'rollback':
+            if not args.version:
+                parser.error("rollback needs --version")
+            previous_id = rollback(staging.scan_dir, args.version, keep)
+            print(f"⏪ Restored {args.version}" + (f" (replaced files kept as {previous_id})" if previous_id else ""))
+        elif args.command == 'discard':
+            staging.discard()
+    except (OSError, KeyError, json.JSONDecodeError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Hang watchdog for pipeline subprocesses.
+
+Runs a command in its own process group and watches it from a single select()
+loop (no threads, a few syscalls per output chunk, so it can wrap every step):
+
+    wall_timeout   - seconds the command may run in total (0 = unlimited)
+    stall_timeout  - seconds it may go without printing anything (0 = unlimited)
+
+A command over either limit has its whole process group terminated (SIGTERM,
+then SIGKILL after `kill_grace` seconds) and exits with TIMEOUT_EXIT_CODE; the
+last lines of its output are kept for the failure report. Failed attempts are
+retried with exponential backoff, optionally with degraded settings (the
+groove-mesher retries at a lower `-d` detail level).
+
+Policies come from built-in per-step defaults overridden by the `supervisor`
+section of config.json (see STEP_DEFAULTS).
+
+Usage:
+    python3 step_supervisor.py exec --takes /takes --scan X --step cleanup -- blender -b -P cleanup.py -- ...
+    python3 step_supervisor.py exec --wall 60 --stall 10 --retries 1 -- some command
+    python3 step_supervisor.py policy [--step generate_mesh]
+"""
+
+import argparse
+import errno
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+TIMEOUT_EXIT_CODE = 124  # as coreutils timeout
+READ_SIZE = 65536
+POLL_INTERVAL = 1.0
+EXIT_DRAIN_SECONDS = 2.0  # output still arriving from leftover group members after the command exited
+_RSS_TO_MB = 1 / (1024 * 1024) if sys.platform == 'darwin' else 1 / 1024  # ru_maxrss: bytes on macOS, KB on Linux
+
+DEFAULT_POLICY = {
+    'wall_timeout': 0,
+    'stall_timeout': 0,
+    'retries': 0,
+    'backoff': 30,
+    'backoff_max': 300,
+    'retry_on': ['wall', 'stall', 'signal'],  # also 'exit' to retry ordinary non-zero exits
+    'degrade': [],
+    'kill_grace': 10,
+    'tail_lines': 40,
+}
+# Per step / substep defaults; config.json "supervisor": {"<name>": {...}, "default": {...}} overrides them
+STEP_DEFAULTS = {
+    'generate_mesh': {'wall_timeout': 12 * 3600, 'stall_timeout': 1800},
+    'groove_mesher_preview': {'wall_timeout': 2 * 3600, 'stall_timeout': 900, 'retries': 1,
+                              'retry_on': ['wall', 'stall', 'signal', 'exit']},
+    'groove_mesher_final': {'wall_timeout': 3 * 3600, 'stall_timeout': 900, 'retries': 2,
+                            'retry_on': ['wall', 'stall', 'signal', 'exit'], 'degrade': ['medium', 'reduced']},
+    'prep_usdz_bbox': {'wall_timeout': 1800, 'stall_timeout': 600},
+    'cleanup': {'wall_timeout': 1800, 'stall_timeout': 600, 'retries': 1},
+    'face_detection': {'wall_timeout': 1200, 'stall_timeout': 600, 'retries': 1},
+    'add_rig': {'wall_timeout': 1200, 'stall_timeout': 600, 'retries': 1},
+    'pose_test': {'wall_timeout': 1800, 'stall_timeout': 600, 'retries': 1},
+}
+
+
+def policy_for(name, overrides=None) -> Dict:
+    """
+    Effective policy for a step or substep.
+
+    Args:
+        name: Step/substep name (key of STEP_DEFAULTS)
+        overrides: The `supervisor` section of config.json ({'default': {...}, name: {...}})
+    """
+    overrides = overrides or {}
+    policy = dict(DEFAULT_POLICY)
+    policy.update(overrides.get('default', {}))
+    policy.update(STEP_DEFAULTS.get(name, {}))
+    policy.update(overrides.get(name, {}))
+    return policy
+
+
+def config_overrides(environment=None) -> Dict:
+    """The `supervisor` section of config.json ({} if there is no readable config)."""
+    try:
+        from config_reader import get_config
+        return get_config(environment).get_section('supervisor')
+    except (ImportError, ValueError, KeyError, FileNotFoundError):
+        return {}
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ SUPERVISE ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+@dataclass
+class Supervised:
+    exit_code: int
+    reason: str = ''  # '', 'exit' (non-zero), 'signal', 'wall', 'stall' or 'error' (could not start)
+    duration: float = 0.0
+    start: float = 0.0
+    tail: List[str] = field(default_factory=list)
+    usage: Dict[str, float] = field(default_factory=dict)
+    attempts: int = 1
+    setting: Optional[str] = None  # degraded setting of the final attempt
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+
+class _Output:
+    """Forwards output and keeps the last lines (carriage returns count as line breaks)."""
+
+    def __init__(self, sink=None, echo=None, tail_lines=40):
+        self.sink = sink
+        self.echo = echo
+        self.tail = deque(maxlen=max(1, tail_lines))
+        self._partial = ''
+
+    def feed(self, data: bytes):
+        if self.sink is not None:
+            self.sink.write(data)
+            self.sink.flush()
+        text = self._partial + data.decode('utf-8', errors='ignore').replace('\r', '\n')
+        lines = text.split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            line = line.strip()
+            if line:
+                self.tail.append(line)
+                if self.echo is not None:
+                    self.echo(line)
+
+    def close(self):
+        line = self._partial.strip()
+        self._partial = ''
+        if line:
+            self.tail.append(line)
+            if self.echo is not None:
+                self.echo(line)
+
+
+def _binary_sink(stream):
+    if stream is None:
+        return None
+    return getattr(stream, 'buffer', stream)
+
+
+def terminate_steps(pid, grace):
+    """
+    SIGTERM the process group led by pid, SIGKILL it after grace seconds.
+
+    A generator of the pauses (seconds) it needs between wait4 polls, so a caller that must
+    not block (mesher_runner) can sleep its own way; returns wait4's (status, usage).
+    """
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+    status = usage = None
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        waited, wait_status, wait_usage = os.wait4(pid, os.WNOHANG)
+        if waited == pid:
+            status, usage = wait_status, wait_usage
+            break
+        yield 0.1
+    try:
+        os.killpg(pid, signal.SIGKILL)  # also catches group members that outlived the leader
+    except (ProcessLookupError, PermissionError):
+        pass
+    while status is None:
+        waited, wait_status, wait_usage = os.wait4(pid, os.WNOHANG)
+        if waited == pid:
+            status, usage = wait_status, wait_usage
+        else:
+            yield 0.05
+    return status, usage
+
+
+def drive(steps, perform):
+    """Run a step generator (terminate_steps, policy_attempts) to its return value, answering each request with perform(request)."""
+    try:
+        request = next(steps)
+        while True:
+            request = steps.send(perform(request))
+    except StopIteration as done:
+        return done.value
+
+
+def _terminate(pid, grace):
+    return drive(terminate_steps(pid, grace), time.sleep)
+
+
+def supervise(command, wall_timeout=0, stall_timeout=0, use_pty=False, stdout=sys.stdout, echo=None,
+              env=None, cwd=None, shell=False, kill_grace=10, tail_lines=40) -> Supervised:
+    """
+    Run a command under the watchdog.
+
+    Args:
+        command: Argument list (or string with shell=True)
+        wall_timeout / stall_timeout: Limits in seconds (0 = unlimited)
+        use_pty: Give the command a pseudo-terminal (tools that only flush their progress to a tty)
+        stdout: Stream the raw output is copied to (None to discard)
+        echo: Optional callable(line) for every complete output line (instead of or besides stdout)
+        kill_grace: Seconds between SIGTERM and SIGKILL
+        tail_lines: Lines of output kept for the failure report
+    """
+    output = _Output(_binary_sink(stdout), echo, tail_lines)
+    start, began = time.time(), time.monotonic()
+    master = slave = None
+    try:
+        if use_pty:
+            import pty
+            master, slave = pty.openpty()
+            process = subprocess.Popen(command, shell=shell, stdin=slave, stdout=slave, stderr=slave, env=env,
+                                       cwd=cwd, close_fds=True, start_new_session=True)
+            os.close(slave)
+            fd = master
+        else:
+            process = subprocess.Popen(command, shell=shell, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT, env=env, cwd=cwd, start_new_session=True)
+            fd = process.stdout.fileno()
+    except OSError as e:
+        if master is not None:
+            os.close(master)
+        output.tail.append(f"cannot start {command if isinstance(command, str) else command[0]}: {e}")
+        return Supervised(127, 'error', 0.0, start, list(output.tail))
+
+    pid = pgid = process.pid  # start_new_session: the child leads its own process group
+    status = usage = None
+    reason = ''
+    last_output = began
+    exited_at = None
+    try:
+        while True:
+            now = time.monotonic()
+            if status is None:
+                if wall_timeout and now - began >= wall_timeout:
+                    reason = 'wall'
+                    break
+                if stall_timeout and now - last_output >= stall_timeout:
+                    reason = 'stall'
+                    break
+            elif fd is None or now - exited_at >= EXIT_DRAIN_SECONDS:
+                break
+
+            wait_s = POLL_INTERVAL if status is None else EXIT_DRAIN_SECONDS - (now - exited_at)
+            if wall_timeout:
+                wait_s = min(wait_s, wall_timeout - (now - began))
+            if stall_timeout:
+                wait_s = min(wait_s, stall_timeout - (now - last_output))
+            wait_s = max(wait_s, 0.0)
+
+            if fd is not None:
+                ready, _, _ = select.select([fd], [], [], wait_s)
+                if ready:
+                    try:
+                        data = os.read(fd, READ_SIZE)
+                    except OSError as e:  # EIO: pty closed after the command exited (macOS/Linux)
+                        if e.errno != errno.EIO:
+                            raise
+                        data = b''
+                    if data:
+                        output.feed(data)
+                        last_output = time.monotonic()
+                    else:
+                        fd = None  # EOF; keep waiting for the process itself
+            else:
+                time.sleep(min(wait_s, 0.1))
+
+            if status is None:
+                waited, wait_status, wait_usage = os.wait4(pid, os.WNOHANG)
+                if waited == pid:
+                    status, usage, exited_at = wait_status, wait_usage, time.monotonic()
+    finally:
+        if status is None:
+            status, usage = _terminate(pid, kill_grace)
+        else:
+            # stragglers of a finished command (daemonized helpers holding the output open)
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        output.close()
+        if master is not None:
+            os.close(master)
+        elif process.stdout is not None:
+            process.stdout.close()
+
+    exit_code = os.waitstatus_to_exitcode(status)
+    process.returncode = exit_code
+    if reason:
+        exit_code = TIMEOUT_EXIT_CODE
+    elif exit_code < 0:
+        reason = 'signal'
+    elif exit_code:
+        reason = 'exit'
+    return Supervised(exit_code, reason, time.monotonic() - began, start, list(output.tail), {
+        'child_cpu': usage.ru_utime + usage.ru_stime,
+        'child_peak_rss_mb': usage.ru_maxrss * _RSS_TO_MB,
+    })
+
+
+def describe(result: Supervised, policy) -> str:
+    if result.reason == 'wall':
+        return f"timed out after {policy['wall_timeout']:g}s"
+    if result.reason == 'stall':
+        return f"printed nothing for {policy['stall_timeout']:g}s"
+    if result.reason == 'signal':
+        return f"killed by signal {-result.exit_code}"
+    if result.reason == 'error':
+        return "could not start"
+    return f"exit code {result.exit_code}"
+
+
+def policy_limits(policy) -> Dict[str, float]:
+    """The supervise() keyword arguments a policy sets."""
+    return {'wall_timeout': policy.get('wall_timeout', 0), 'stall_timeout': policy.get('stall_timeout', 0),
+            'kill_grace': policy.get('kill_grace', 10), 'tail_lines': policy.get('tail_lines', 40)}
+
+
+def policy_attempts(command_for: Callable[[int, Optional[str]], list], policy, label, log=print):
+    """
+    The attempt loop of run_with_policy, as a generator of requests for its runner.
+
+    Yields ('run', command), to be answered with the attempt's Supervised result, and
+    ('sleep', seconds) for the backoff; returns the last result.
+    """
+    degrade = list(policy.get('degrade') or [])
+    attempts = int(policy.get('retries', 0)) + 1
+    setting = None
+    for attempt in range(attempts):
+        if attempt and degrade:
+            setting = degrade[min(attempt, len(degrade)) - 1]
+        result = yield 'run', command_for(attempt, setting)
+        result.attempts, result.setting = attempt + 1, setting
+        if result.ok:
+            return result
+        log(f"❌ {label} {describe(result, policy)} (attempt {attempt + 1}/{attempts})")
+        if result.reason in ('wall', 'stall', 'signal') and result.tail:
+            log(f"   Last output of {label}:")
+            for line in result.tail[-policy.get('tail_lines', 40):]:
+                log(f"   │ {line}")
+        if attempt + 1 >= attempts or result.reason not in policy.get('retry_on', DEFAULT_POLICY['retry_on']):
+            return result
+        delay = min(policy.get('backoff', 30) * 2 ** attempt, policy.get('backoff_max', 300))
+        next_setting = degrade[min(attempt + 1, len(degrade)) - 1] if degrade else None
+        log(f"🔁 Retrying {label} in {delay:g}s" + (f" with degraded setting '{next_setting}'" if next_setting else ""))
+        yield 'sleep', delay
+    return result
+
+
+def run_with_policy(command_for: Callable[[int, Optional[str]], list], policy, label, log=print,
+                    sleep=time.sleep, supervise=supervise, **supervise_kwargs) -> Supervised:
+    """
+    Run attempts until one succeeds, the failure is not retryable or retries are used up.
+
+    Args:
+        command_for: Callable(attempt, setting) -> command; setting is None for the first
+            attempt, then the next entry of policy['degrade'] (the last one repeats)
+        policy: See policy_for
+        label: Name used in the log messages
+        log: Callable(message) for progress/failure messages
+        sleep / supervise: What runs the backoff pauses and the attempts
+    """
+    limits = policy_limits(policy)
+
+    def perform(request):
+        action, value = request
+        if action == 'sleep':
+            return sleep(value)
+        return supervise(value, **limits, **supervise_kwargs)
+
+    return drive(policy_attempts(command_for, policy, label, log), perform)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pipeline commands under a hang watchdog")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    exec_parser = subparsers.add_parser('exec', help="Run a command under its step's policy")
+    exec_parser.add_argument('--takes', help="Takes path (records a timeline span when given with --scan)")
+    exec_parser.add_argument('--scan', help="Scan identifier")
+    exec_parser.add_argument('--step', help="Pipeline step name (selects the policy)")
+    exec_parser.add_argument('--name', help="Policy/span name (default: the step name)")
+    exec_parser.add_argument('--kind', default='step', choices=['step', 'substep'])
+    exec_parser.add_argument('--environment', '-e', help="Environment whose config.json supervisor section applies")
+    exec_parser.add_argument('--wall', type=float, help="Wall-clock timeout in seconds")
+    exec_parser.add_argument('--stall', type=float, help="Output stall timeout in seconds")
+    exec_parser.add_argument('--retries', type=int, help="Retries after a failed attempt")
+    exec_parser.add_argument('--pty', action='store_true', help="Run the command on a pseudo-terminal")
+    exec_parser.add_argument('--progress', action='store_true',
+                             help="Report percent progress from the output to the status server")
+    exec_parser.add_argument('cmd', nargs=argparse.REMAINDER, help="-- command and arguments")
+
+    policy_parser = subparsers.add_parser('policy', help="Show effective policies")
+    policy_parser.add_argument('--step', help="Only this step/substep")
+    policy_parser.add_argument('--environment', '-e', help="Environment to read config.json from")
+    args = parser.parse_args()
+
+    overrides = config_overrides(args.environment)
+    if args.command == 'policy':
+        names = [args.step] if args.step else list(STEP_DEFAULTS)
+        print(json.dumps({name: policy_for(name, overrides) for name in names}, indent=2))
+        return
+
+    command = args.cmd[1:] if args.cmd and args.cmd[0] == '--' else args.cmd
+    if not command:
+        parser.error("exec needs a command after --")
+    name = args.name or args.step or os.path.basename(command[0])
+    policy = policy_for(name, overrides)
+    for key, value in (('wall_timeout', args.wall), ('stall_timeout', args.stall), ('retries', args.retries)):
+        if value is not None:
+            policy[key] = value
+
+    timeline = None
+    if args.takes and args.scan:
+        import pipeline_timeline
+        timeline = pipeline_timeline.for_scan(args.takes, args.scan, args.step)
+        timeline.started(name, args.kind, args.step)
+    echo = None
+    if args.progress and args.scan:
+        import status_server
+        echo = status_server.ProgressReporter(args.scan, args.step, name)
+    result = run_with_policy(lambda attempt, setting: command, policy, name,
+                             log=lambda message: print(message, flush=True), use_pty=args.pty, echo=echo)
+    if timeline is not None:
+        timeline.record(name, result.duration, args.kind, step=args.step, start=result.start,
+                        exit_code=result.exit_code, usage=result.usage, attempts=result.attempts,
+                        **({'timeout': result.reason} if result.reason in ('wall', 'stall') else {}))
+    sys.exit(result.exit_code)
+
+
+if __name__ == "__main__":
+    main()
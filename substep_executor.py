@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Concurrent substeps within one pipeline step.
+
+A step declares its substeps and what each one needs; substeps whose dependencies
+are satisfied run at the same time on an asyncio event loop:
+
+    command  - a subprocess (Blender, the mediapipe script, ...), awaited without blocking
+    func     - a Python callable, run in a worker thread (I/O, OpenCV/TensorFlow inference)
+    inline   - a Python callable run on the calling thread; use it for bpy, which must
+               stay on Blender's main thread (the other substeps keep running meanwhile,
+               as long as they are subprocesses)
+
+A substep whose dependency failed is skipped; independent substeps still run. Every
+substep is recorded in the scan timeline under its own name, so the report shows the
+same spans as before, overlapping.
+
+Usage:
+    results = substep_executor.run_substeps([
+        Substep("mtcnn", func=lambda: detect_faces(image_path)),
+        Substep("get_camera_corners", command=[blender, "-b", blend_file, "-P", script]),
+        Substep("mediapipe", command=[python, pose_script, "-i", image_path], deps=("mtcnn", "get_camera_corners")),
+    ], timeline)
+    faces = results["mtcnn"].result()          # re-raises the substep's exception, if any
+    if results["get_camera_corners"].ok: ...
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pipeline_timeline
+
+
+@dataclass
+class Substep:
+    """
+    One unit of work inside a step.
+
+    Args:
+        name: Timeline span name (unique within one run_substeps call)
+        command: Command line to run as a subprocess
+        func: Callable taking no arguments (use a lambda or functools.partial)
+        deps: Names of the substeps that must succeed first
+        inline: Call func on the calling thread instead of a worker thread
+        env: Environment for command (default: inherited)
+        cwd: Working directory for command
+    """
+    name: str
+    command: Optional[Sequence[str]] = None
+    func: Optional[Callable[[], Any]] = None
+    deps: Tuple[str, ...] = ()
+    inline: bool = False
+    env: Optional[Dict[str, str]] = None
+    cwd: Optional[str] = None
+
+
+@dataclass
+class SubstepResult:
+    name: str
+    value: Any = None
+    exit_code: Optional[int] = None
+    start: float = 0.0
+    wall_s: float = 0.0
+    error: Optional[BaseException] = None
+    skipped: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.skipped and self.error is None and self.exit_code in (None, 0)
+
+    def result(self):
+        """The callable's return value (or the exit code); re-raises its exception."""
+        if self.error is not None:
+            raise self.error
+        if self.skipped:
+            raise RuntimeError(f"substep {self.name} was skipped because a dependency failed")
+        return self.value if self.exit_code is None else self.exit_code
+
+
+def _check_graph(substeps: List[Substep]):
+    names = [substep.name for substep in substeps]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate substep names: {', '.join(sorted(duplicates))}")
+    by_name = {substep.name: substep for substep in substeps}
+    for substep in substeps:
+        if (substep.command is None) == (substep.func is None):
+            raise ValueError(f"Substep {substep.name} needs exactly one of command or func")
+        unknown = [dep for dep in substep.deps if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Substep {substep.name} depends on unknown substep(s): {', '.join(unknown)}")
+
+    visiting, done = set(), set()
+
+    def visit(name, path):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Substep dependency cycle: {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep, path + [name])
+        visiting.discard(name)
+        done.add(name)
+
+    for name in names:
+        visit(name, [])
+
+
+async def _run_command(substep: Substep, result: SubstepResult):
+    process = await asyncio.create_subprocess_exec(*substep.command, env=substep.env, cwd=substep.cwd)
+    try:
+        result.exit_code = await process.wait()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+
+
+async def _run_one(substep: Substep, result: SubstepResult, semaphore: Optional[asyncio.Semaphore], timeline):
+    async def run():
+        timeline.started(substep.name)
+        result.start, perf = time.time(), time.perf_counter()
+        try:
+            if substep.command is not None:
+                await _run_command(substep, result)
+            elif substep.inline:
+                result.value = substep.func()
+            else:
+                result.value = await asyncio.to_thread(substep.func)
+        except Exception as e:
+            result.error = e
+        finally:
+            result.wall_s = time.perf_counter() - perf
+
+    if semaphore is None:
+        await run()
+    else:
+        async with semaphore:
+            await run()
+
+
+async def execute(substeps: List[Substep], timeline=None, max_parallel=None, log=print) -> Dict[str, SubstepResult]:
+    """
+    Run substeps as soon as their dependencies succeed (coroutine form of run_substeps).
+
+    Args:
+        substeps: List of Substep
+        timeline: Timeline receiving one 'substep' record per substep that ran
+        max_parallel: Upper bound on substeps running at once (default: no bound)
+        log: Callable(message) for failures and the overlap summary
+    """
+    _check_graph(substeps)
+    timeline = timeline or pipeline_timeline.NullTimeline()
+    semaphore = asyncio.Semaphore(max_parallel) if max_parallel else None
+    results = {substep.name: SubstepResult(substep.name) for substep in substeps}
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def schedule(substep: Substep):
+        for dep in substep.deps:
+            await tasks[dep]
+        failed = [dep for dep in substep.deps if not results[dep].ok]
+        result = results[substep.name]
+        if failed:
+            result.skipped = True
+            log(f"⏭️  {substep.name} skipped: {', '.join(failed)} failed")
+            return
+        await _run_one(substep, result, semaphore, timeline)
+        attrs = {'error': type(result.error).__name__} if result.error is not None else {}
+        timeline.record(substep.name, result.wall_s, 'substep', start=result.start, exit_code=result.exit_code,
+                        **attrs)
+        if result.error is not None:
+            log(f"❌ {substep.name} failed: {result.error}")
+        elif result.exit_code not in (None, 0):
+            log(f"❌ {substep.name} exited with code {result.exit_code}")
+
+    start = time.perf_counter()
+    for substep in substeps:
+        tasks[substep.name] = asyncio.ensure_future(schedule(substep))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    elapsed = time.perf_counter() - start
+    busy = sum(result.wall_s for result in results.values())
+    if len(substeps) > 1 and busy > elapsed:
+        log(f"⚡ {len(substeps)} substeps in {elapsed:.1f}s ({busy:.1f}s if run one after another)")
+    return results
+
+
+def run_substeps(substeps: List[Substep], timeline=None, max_parallel=None, log=print) -> Dict[str, SubstepResult]:
+    """
+    Run a step's substeps concurrently and wait for all of them.
+
+    Must be called where no event loop is running (scripts call it from main).
+    Returns a SubstepResult per substep name.
+    """
+    return asyncio.run(execute(substeps, timeline, max_parallel, log))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Write the preview fixtures used by tests/test_preview_bbox.py (needs usd-core).
+
+One Y-up mesh under a transformed Xform, as groove-mesher's preview comes out, with
+everything prep_usdz.py has to sort out:
+
+    person      a cylinder near the origin (quads below, triangles above) whose top ring
+                is within CEILING_CUT of the highest vertex
+    floor       a grid facing up
+    distractor  another cylinder with more than MIN_PERSON_FACES faces, farther away
+    clutter     a small box closer to the origin than the person, with too few faces
+
+The same stage is saved as preview_mesh.usda, preview_mesh.usdc and preview.usdz.
+
+Usage:
+    python3 tests/fixtures/make_preview_fixtures.py
+"""
+
+import math
+import os
+
+from pxr import Gf, Sdf, Usd, UsdGeom, UsdUtils
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))
+
+
+def cylinder(points, counts, indices, center, radius, bottom, top, segments, rings, quad_rings):
+    """Open cylinder around the Y axis; the lowest quad_rings rings are quads, the others triangle pairs."""
+    base = len(points)
+    for ring in range(rings + 1):
+        y = bottom + (top - bottom) * ring / rings
+        for segment in range(segments):
+            angle = 2 * math.pi * segment / segments
+            points.append((center[0] + radius * math.cos(angle), y, center[1] - radius * math.sin(angle)))
+    for ring in range(rings):
+        for segment in range(segments):
+            a = base + ring * segments + segment
+            b = base + ring * segments + (segment + 1) % segments
+            c, d = b + segments, a + segments
+            if ring < quad_rings:
+                counts.append(4)
+                indices.extend((a, b, c, d))
+            else:
+                counts.extend((3, 3))
+                indices.extend((a, b, c, a, c, d))
+
+
+def grid(points, counts, indices, y, low, high, cells):
+    """Square grid at height y facing up (+Y)."""
+    base = len(points)
+    step = (high - low) / cells
+    for i in range(cells + 1):
+        for j in range(cells + 1):
+            points.append((low + i * step, y, low + j * step))
+    for i in range(cells):
+        for j in range(cells):
+            a = base + i * (cells + 1) + j
+            counts.append(4)
+            indices.extend((a, a + 1, a + cells + 2, a + cells + 1))
+
+
+def box(points, counts, indices, low, high):
+    base = len(points)
+    points.extend((x, y, z) for x in (low[0], high[0]) for y in (low[1], high[1]) for z in (low[2], high[2]))
+    for face in ((0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)):
+        counts.append(4)
+        indices.extend(base + corner for corner in face)
+
+
+def main():
+    points, counts, indices = [], [], []
+    cylinder(points, counts, indices, (0.2, -0.1), 0.3, 0.05, 1.8, 64, 10, 4)  # person: 256 quads + 768 triangles
+    grid(points, counts, indices, 0.0, -3.0, 3.0, 12)
+    cylinder(points, counts, indices, (2.6, 1.4), 0.25, 0.05, 1.2, 32, 14, 0)  # distractor: 896 triangles
+    box(points, counts, indices, (-0.05, 0.5, -0.05), (0.05, 0.6, 0.05))
+
+    stage = Usd.Stage.CreateInMemory()
+    UsdGeom.SetStageUpAxis(stage, UsdGeom.Tokens.y)
+    UsdGeom.SetStageMetersPerUnit(stage, 1.0)
+    root = UsdGeom.Xform.Define(stage, '/root')
+    root.AddTranslateOp().Set(Gf.Vec3d(0.1, 0.0, 0.2))
+    root.AddRotateYOp().Set(30.0)
+    stage.SetDefaultPrim(root.GetPrim())
+    mesh = UsdGeom.Mesh.Define(stage, '/root/preview_mesh')
+    mesh.CreatePointsAttr([Gf.Vec3f(*point) for point in points])
+    mesh.CreateFaceVertexCountsAttr(counts)
+    mesh.CreateFaceVertexIndicesAttr(indices)
+    mesh.CreateSubdivisionSchemeAttr(UsdGeom.Tokens.none)
+
+    usda_path = os.path.join(FIXTURES, 'preview_mesh.usda')
+    usdc_path = os.path.join(FIXTURES, 'preview_mesh.usdc')
+    usdz_path = os.path.join(FIXTURES, 'preview.usdz')
+    stage.GetRootLayer().Export(usda_path)
+    stage.GetRootLayer().Export(usdc_path, args={'format': 'usdc'})
+    if os.path.exists(usdz_path):
+        os.remove(usdz_path)
+    if not UsdUtils.CreateNewUsdzPackage(Sdf.AssetPath(usdc_path), usdz_path):
+        raise SystemExit(f"cannot package {usdz_path}")
+    for path in (usda_path, usdc_path, usdz_path):
+        print(f"📦 {os.path.relpath(path)} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+job_queue.py ordering, preemption and recovery, and the step-boundary interrupts
+scan_scheduler.py acts on.
+"""
+
+import socket
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import job_queue
+import scan_scheduler
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    with job_queue.JobQueue(str(tmp_path / 'jobs.sqlite3')) as queue:
+        yield queue
+
+
+def age(jobs, scan_id, seconds):
+    jobs.conn.execute("UPDATE jobs SET enqueued_at = enqueued_at - ? WHERE scan_id = ?", (seconds, scan_id))
+
+
+def test_priority_then_longest_mesher_run(jobs):
+    jobs.submit('normal', 'normal', predicted_s=100)
+    jobs.submit('short', 'high', predicted_s=100)
+    jobs.submit('long', 'high', predicted_s=900)
+    jobs.submit('rush', 'rush')
+    assert jobs.submit('normal', 'rush') is None  # already queued
+    assert [jobs.claim('w')['scan_id'] for _ in range(4)] == ['rush', 'long', 'short', 'normal']
+    assert jobs.claim('w') is None
+
+
+def test_aging_lets_old_jobs_through(jobs):
+    jobs.submit('old', 'normal')
+    jobs.submit('new', 'high')
+    age(jobs, 'old', 11 * 60 * job_queue.DEFAULT_SETTINGS['aging_minutes'])  # 11 points, high is 10
+    assert jobs.claim('w')['scan_id'] == 'old'
+
+
+def test_preempted_job_keeps_its_age(jobs):
+    jobs.submit('a', 'normal')
+    age(jobs, 'a', 60)
+    job = jobs.claim('w')
+    jobs.submit('b', 'normal')
+    jobs.request_interrupt(job['job_id'], 'preempt')
+    assert jobs.interrupt_requested(job['job_id']) == 'preempt'
+    assert jobs.finish(job['job_id'], 'preempt')
+
+    requeued = jobs.open_job('a')
+    assert (requeued['state'], requeued['preemptions'], requeued['interrupt']) == ('queued', 1, None)
+    assert requeued['enqueued_at'] == job['enqueued_at']
+    assert jobs.claim('w')['scan_id'] == 'a'  # older than b at the same priority
+
+
+@pytest.mark.parametrize('action, state', [('pause', 'paused'), ('cancel', 'cancelled')])
+def test_running_job_stops_at_step_boundary(jobs, action, state):
+    jobs.submit('a')
+    job = jobs.claim('w')
+    assert getattr(jobs, action)('a') == ('pausing' if action == 'pause' else 'cancelling')
+    assert jobs.open_job('a')['state'] == 'running'  # until the runner reaches a step boundary
+    assert jobs.interrupt_requested(job['job_id']) == action
+    jobs.finish(job['job_id'], action)
+    row = jobs.conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job['job_id'],)).fetchone()
+    assert row['state'] == state
+
+
+def test_recover_requeues_jobs_of_dead_local_processes(jobs):
+    dead = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                          capture_output=True, text=True, check=True).stdout.strip()
+    jobs.submit('crashed')
+    jobs.claim(f"{socket.gethostname()}:{dead}")
+    jobs.submit('alive')
+    jobs.claim(job_queue.owner_id())
+    assert jobs.recover() == ['crashed']
+    assert jobs.open_job('crashed')['state'] == 'queued'
+    assert jobs.open_job('alive')['state'] == 'running'
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ SCHEDULER ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def scheduler(jobs):
+    return scan_scheduler.ScanScheduler(lambda scan_id: SimpleNamespace(scan_id=scan_id), queue_path=jobs.path)
+
+
+def test_scheduler_preempts_lowest_priority_running_scan(jobs):
+    sched = scheduler(jobs)
+    for scan_id, priority in (('low', 'low'), ('normal', 'normal')):
+        jobs.submit(scan_id, priority)
+    for _ in range(2):
+        job = jobs.claim(sched.owner)
+        sched._jobs[job['scan_id']] = job
+
+    jobs.submit('high', 'high')  # within preempt_margin of both
+    sched._preempt_for_head(jobs)
+    assert not any(job['interrupt'] for job in jobs.jobs(('running',)))
+
+    jobs.submit('rush', 'rush')
+    sched._preempt_for_head(jobs)
+    assert {job['scan_id']: job['interrupt'] for job in jobs.jobs(('running',))} == {'low': 'preempt', 'normal': None}
+    sched._preempt_for_head(jobs)  # one interrupt at a time
+    assert jobs.open_job('normal')['interrupt'] is None
+
+
+def fake_run_scan(jobs, interrupt_after):
+    """Stands in for pipeline_runner.run_scan: asks `interrupt` at every step boundary, as PipelineRunner does."""
+    seen = {}
+
+    def run_scan(ctx, scratch, publisher_settings, log=print, interrupt=None, **runner_kwargs):
+        seen['interrupt'] = interrupt
+        runner = SimpleNamespace(interrupted='')
+        results = []
+        for number, name in ((1, 'generate_mesh'), (2, 'cleanup'), (3, 'face_detection')):
+            reason = interrupt(SimpleNamespace(number=number, name=name)) if interrupt else ''
+            if reason:
+                runner.interrupted = reason
+                break
+            results.append(SimpleNamespace(status='ran'))
+            if interrupt_after and name == interrupt_after[0]:
+                job = jobs.open_job(ctx.scan_id)
+                jobs.request_interrupt(job['job_id'], interrupt_after[1])
+                seen['progress'] = jobs.open_job(ctx.scan_id)['progress']
+        return runner, results
+
+    return run_scan, seen
+
+
+@pytest.mark.parametrize('action, state', [('preempt', 'queued'), ('pause', 'paused'), ('cancel', 'cancelled')])
+def test_queued_scan_obeys_interrupt_at_next_step(jobs, monkeypatch, action, state):
+    run_scan, seen = fake_run_scan(jobs, ('cleanup', action))
+    monkeypatch.setattr(scan_scheduler, 'run_scan', run_scan)
+    jobs.submit('a')
+    job = jobs.claim(job_queue.owner_id())
+    scheduler(jobs)._run_scan('a', job['priority'], job)
+
+    assert seen['progress'] == 'step 2: cleanup'
+    row = jobs.conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job['job_id'],)).fetchone()
+    assert (row['state'], row['interrupt']) == (state, None)
+    assert row['preemptions'] == (1 if action == 'preempt' else 0)
+
+
+def test_scan_without_job_gets_no_interrupt_callback(jobs, monkeypatch):
+    run_scan, seen = fake_run_scan(jobs, None)
+    monkeypatch.setattr(scan_scheduler, 'run_scan', run_scan)
+    sched = scan_scheduler.ScanScheduler(lambda scan_id: SimpleNamespace(scan_id=scan_id))
+    sched._run_scan('a')
+    assert seen['interrupt'] is None
+    assert len(sched.results['a']) == 3
+
+
+def test_uninterrupted_queued_scan_is_done(jobs, monkeypatch):
+    run_scan, _ = fake_run_scan(jobs, None)
+    monkeypatch.setattr(scan_scheduler, 'run_scan', run_scan)
+    jobs.submit('a')
+    job = jobs.claim(job_queue.owner_id())
+    scheduler(jobs)._run_scan('a', job['priority'], job)
+    assert jobs.conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job['job_id'],)).fetchone()['state'] == 'done'
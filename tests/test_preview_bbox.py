@@ -0,0 +1,161 @@
+"""
+preview_bbox.py on checked-in previews (tests/fixtures, written by make_preview_fixtures.py
+with usd-core), and the -j bounds JSON that groove_mesh_check.py reads back from prep_usdz.py.
+
+EXPECTED_BOUNDS by hand: the person cylinder (radius 0.3, center (0.2, -0.1) in the mesh)
+sits at (0.2232, -0.0134) after /root's translate and rotateY, i.e. Blender x 0.2232 and
+y 0.0134; Blender z runs from 0.05 to the ring below the ceiling cut, 1.625. Each side
+grows by the 0.4 offset.
+"""
+
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+
+import pytest
+
+import preview_bbox
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PREVIEWS = ('preview_mesh.usda', 'preview_mesh.usdc', 'preview.usdz')
+EXPECTED_BOUNDS = (-0.48, 0.92, -0.71, 0.69, -0.35, 2.02)
+EXPECTED_STATS = {'vertices': 1361, 'faces': 2070, 'kept_faces': 1797, 'parts': 3, 'person_faces': 896}
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+@pytest.fixture
+def without_pxr(monkeypatch):
+    """Read with preview_bbox's own crate/text readers even when usd-core is installed."""
+    monkeypatch.setattr(preview_bbox, '_read_with_pxr', lambda path: None)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ LAYERS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def test_crate_and_text_layers_agree():
+    metadata, prims = preview_bbox._read_layer(fixture('preview_mesh.usdc'))
+    text_metadata, text_prims = preview_bbox._read_layer(fixture('preview_mesh.usda'))
+    assert metadata == text_metadata == {'upAxis': 'Y', 'metersPerUnit': 1.0}
+    assert prims['/root/preview_mesh']['type'] == text_prims['/root/preview_mesh']['type'] == 'Mesh'
+
+    mesh, text_mesh = prims['/root/preview_mesh']['attrs'], text_prims['/root/preview_mesh']['attrs']
+    assert list(mesh['faceVertexCounts']) == [int(n) for n in text_mesh['faceVertexCounts']]
+    assert list(mesh['faceVertexIndices']) == [int(n) for n in text_mesh['faceVertexIndices']]
+    assert len(mesh['points']) == len(text_mesh['points']) == 3 * EXPECTED_STATS['vertices']
+    assert all(abs(a - b) < 1e-6 for a, b in zip(mesh['points'], text_mesh['points']))
+
+    root, text_root = prims['/root']['attrs'], text_prims['/root']['attrs']
+    assert list(root['xformOpOrder']) == text_root['xformOpOrder'] == ['xformOp:translate', 'xformOp:rotateY']
+    assert root['xformOp:rotateY'] == text_root['xformOp:rotateY'] == 30.0
+    assert root['xformOp:translate'] == pytest.approx(text_root['xformOp:translate'])
+
+
+def test_packaged_layer_matches_crate():
+    assert preview_bbox._read_layer(fixture('preview.usdz')) == preview_bbox._read_layer(fixture('preview_mesh.usdc'))
+
+
+def test_not_a_usd_layer(tmp_path):
+    path = tmp_path / 'preview_mesh.usdc'
+    path.write_bytes(b'PXR-USDC' + bytes(80))
+    with pytest.raises(preview_bbox.PreviewBboxError):
+        preview_bbox._read_layer(str(path))
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ BOUNDS ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+@pytest.mark.parametrize('name', PREVIEWS)
+def test_bounds(name, without_pxr):
+    pytest.importorskip('numpy')
+    stats = {}
+    assert preview_bbox.bounding_box(fixture(name), stats=stats) == EXPECTED_BOUNDS
+    assert {key: stats[key] for key in EXPECTED_STATS} == EXPECTED_STATS
+
+
+@pytest.mark.parametrize('name', PREVIEWS)
+def test_reader_matches_pxr(name, monkeypatch):
+    np = pytest.importorskip('numpy')
+    pytest.importorskip('pxr')
+    points, counts, indices, flipped = preview_bbox.read_preview_mesh(fixture(name))
+    monkeypatch.setattr(preview_bbox, '_read_with_pxr', lambda path: None)
+    own_points, own_counts, own_indices, own_flipped = preview_bbox.read_preview_mesh(fixture(name))
+    assert np.allclose(own_points, points, atol=1e-6)
+    assert np.array_equal(own_counts, counts) and np.array_equal(own_indices, indices)
+    assert own_flipped == flipped
+    assert preview_bbox.person_bounds(points, counts, indices, flipped) == EXPECTED_BOUNDS
+
+
+def test_compute_json_cli():
+    pytest.importorskip('numpy')
+    result = subprocess.run([sys.executable, os.path.join(REPO, 'preview_bbox.py'), 'compute',
+                             fixture('preview.usdz'), '--offset', '0.4', '--json'],
+                            capture_output=True, text=True, check=True)
+    assert tuple(json.loads(result.stdout)) == EXPECTED_BOUNDS
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ PREP_USDZ FALLBACK ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+# Stands in for Blender running prep_usdz.py: checks the arguments groove_mesh_check passes and
+# answers through -j as prep_usdz.py's __main__ does (no JSON when it "fails")
+FAKE_BLENDER = '''#!{python}
+import argparse, json, sys
+argv = sys.argv[1:]
+assert argv[:2] == ['-b', '-P'] and argv[2].endswith('prep_usdz.py') and argv[3] == '--', argv
+parser = argparse.ArgumentParser()
+for flag in ('-n', '-m', '-l', '-j'):
+    parser.add_argument(flag)
+args = parser.parse_args(argv[4:])
+assert args.l == '1', argv
+if {bounds!r} is None:
+    sys.exit(1)
+with open(args.j, 'w') as f:
+    json.dump({bounds!r}, f)
+'''
+
+
+def fallback_bounds(tmp_path, monkeypatch, blender_path):
+    import groove_mesh_check
+    monkeypatch.setattr(groove_mesh_check.preview_bbox, 'available', lambda settings=None: False)
+    shutil.copy(fixture('preview.usdz'), tmp_path / 'preview.usdz')
+    span = {'attrs': {}}
+    bounds = groove_mesh_check.preview_bounds('S1', str(tmp_path), str(tmp_path / 'preview.usdz'),
+                                              os.path.join(REPO, 'prep_usdz.py'), blender_path, span)
+    assert span['attrs']['engine'] == 'blender'
+    return bounds
+
+
+def fake_blender(tmp_path, bounds):
+    path = tmp_path / 'blender'
+    path.write_text(FAKE_BLENDER.format(python=sys.executable, bounds=bounds))
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+def test_fallback_reads_bounds_json(tmp_path, monkeypatch):
+    bounds = fallback_bounds(tmp_path, monkeypatch, fake_blender(tmp_path, list(EXPECTED_BOUNDS)))
+    assert bounds == EXPECTED_BOUNDS
+    assert json.loads((tmp_path / 'S1_bounding_box.json').read_text()) == list(EXPECTED_BOUNDS)
+
+
+def test_fallback_ignores_previous_bounds_json(tmp_path, monkeypatch):
+    (tmp_path / 'S1_bounding_box.json').write_text(json.dumps([0, 1, 0, 1, 0, 1]))
+    assert fallback_bounds(tmp_path, monkeypatch, fake_blender(tmp_path, None)) is None
+
+
+def test_prep_usdz_matches_reader(tmp_path, monkeypatch):
+    """prep_usdz.py in a real Blender (BLENDER, or blender on PATH) against the expected bounds."""
+    blender_path = os.environ.get('BLENDER') or shutil.which('blender')
+    if not blender_path:
+        pytest.skip("Blender is not installed")
+    assert fallback_bounds(tmp_path, monkeypatch, blender_path) == EXPECTED_BOUNDS
@@ -0,0 +1,121 @@
+"""
+work_coordinator.py leases, heartbeats, requeue and preemption, through Coordinator.handle
+and over TCP with CoordinatorClient.
+"""
+
+import threading
+import time
+
+import pytest
+
+import work_coordinator
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    return work_coordinator.Coordinator(str(tmp_path / 'jobs.sqlite3'), {'lease_seconds': 0.2, 'max_attempts': 2},
+                                        {'poll_interval': 0.01})
+
+
+def claim(coordinator, worker):
+    response = coordinator.handle({'op': 'claim', 'worker': worker, 'slots': 1})
+    assert response['status'] == 'ok'
+    return response['job']
+
+
+def state(coordinator, scan_id):
+    return coordinator._jobs().conn.execute("SELECT * FROM jobs WHERE scan_id = ? ORDER BY job_id DESC LIMIT 1",
+                                            (scan_id,)).fetchone()
+
+
+def test_heartbeat_keeps_the_lease(coordinator):
+    coordinator.handle({'op': 'submit', 'scan_id': 'a'})
+    job = claim(coordinator, 'w1')
+    for _ in range(3):
+        time.sleep(0.1)
+        assert coordinator.handle({'op': 'heartbeat', 'worker': 'w1', 'job_id': job['job_id'],
+                                   'progress': 'step 2: cleanup'}) == {'status': 'ok', 'interrupt': ''}
+        coordinator.maintain()
+    assert (state(coordinator, 'a')['state'], state(coordinator, 'a')['progress']) == ('running', 'step 2: cleanup')
+    assert coordinator.handle({'op': 'heartbeat', 'worker': 'w2', 'job_id': job['job_id']})['status'] == 'lost'
+    assert coordinator.handle({'op': 'finish', 'worker': 'w1', 'job_id': job['job_id'], 'outcome': 'done'}) == \
+        {'status': 'ok'}
+    assert state(coordinator, 'a')['state'] == 'done'
+
+
+def test_expired_lease_is_requeued_then_failed(coordinator):
+    coordinator.handle({'op': 'submit', 'scan_id': 'a'})
+    first = claim(coordinator, 'w1')
+    time.sleep(0.25)
+    coordinator.maintain()
+    row = state(coordinator, 'a')
+    assert (row['state'], row['owner'], row['note']) == ('queued', None, 'lease expired on w1')
+
+    # the first worker comes back: its heartbeat and finish are refused, the scan moves on
+    assert coordinator.handle({'op': 'heartbeat', 'worker': 'w1', 'job_id': first['job_id']})['status'] == 'lost'
+    second = claim(coordinator, 'w2')
+    assert second['job_id'] == first['job_id']
+    assert coordinator.handle({'op': 'finish', 'worker': 'w1', 'job_id': first['job_id'],
+                               'outcome': 'done'})['status'] == 'lost'
+
+    time.sleep(0.25)
+    coordinator.maintain()  # second attempt of max_attempts 2
+    assert state(coordinator, 'a')['state'] == 'failed'
+    assert claim(coordinator, 'w3') is None
+
+
+def test_rush_scan_preempts_across_workers(coordinator):
+    for scan_id, priority in (('low', 'low'), ('normal', 'normal')):
+        coordinator.handle({'op': 'submit', 'scan_id': scan_id, 'priority': priority})
+    workers = {}
+    for worker in ('w1', 'w2'):
+        job = claim(coordinator, worker)
+        workers[job['scan_id']] = {'op': 'heartbeat', 'worker': worker, 'job_id': job['job_id']}
+    coordinator.handle({'op': 'submit', 'scan_id': 'rush', 'priority': 'rush'})
+
+    coordinator.maintain()  # no worker had a chance to take it yet
+    assert state(coordinator, 'low')['interrupt'] is None
+    time.sleep(work_coordinator.PREEMPT_AFTER_POLLS * 0.01 + 0.01)
+    for heartbeat in workers.values():  # keep the leases while waiting
+        coordinator.handle(heartbeat)
+    coordinator.maintain()
+
+    assert coordinator.handle(workers['low']) == {'status': 'ok', 'interrupt': 'preempt'}
+    assert coordinator.handle(workers['normal']) == {'status': 'ok', 'interrupt': ''}
+    coordinator.handle(dict(workers['low'], op='finish', outcome='preempt'))
+    assert claim(coordinator, workers['low']['worker'])['scan_id'] == 'rush'
+    assert (state(coordinator, 'low')['state'], state(coordinator, 'low')['preemptions']) == ('queued', 1)
+
+
+def test_client_over_tcp(coordinator):
+    server = threading.Thread(target=coordinator.serve, kwargs={'host': '127.0.0.1', 'port': 0}, daemon=True)
+    server.start()
+    for _ in range(100):
+        if coordinator.server is not None:
+            break
+        time.sleep(0.01)
+    client = work_coordinator.CoordinatorClient(coordinator.server.server_address[:2], worker_id='node-1', slots=1)
+    try:
+        assert client.submit('a', 'high') is not None
+        job = client.claim()
+        assert (job['scan_id'], client.lease_s) == ('a', 0.2)
+        assert state(coordinator, 'a')['owner'] == 'node-1'
+        client.set_progress(job['job_id'], 'step 1: generate_mesh')
+        time.sleep(0.3)  # heartbeats every lease/3 keep it past the lease
+        coordinator.maintain()
+        assert state(coordinator, 'a')['state'] == 'running'
+        assert state(coordinator, 'a')['progress'] == 'step 1: generate_mesh'
+
+        coordinator._jobs().request_interrupt(job['job_id'], 'pause')
+        deadline = time.time() + 2
+        while client.interrupt_requested(job['job_id']) != 'pause' and time.time() < deadline:
+            time.sleep(0.02)
+        assert client.interrupt_requested(job['job_id']) == 'pause'
+        assert client.finish(job['job_id'], 'pause')
+        assert state(coordinator, 'a')['state'] == 'paused'
+        assert client.status()['queued'] == 0
+    finally:
+        client.shutdown()
+        coordinator.shutdown()
+        server.join(timeout=5)
+    assert not server.is_alive()
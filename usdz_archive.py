@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Selective, in-place access to USDZ packages and the final model files.
+
+A USDZ is a zip archive of USD layers and textures, stored uncompressed. Members
+are read straight out of the package: there is no copy to .zip and no `unzip`
+subprocess. Only the members a consumer asks for are written, streamed in
+COPY_BUFFER chunks, and they get their canonical names in the same pass.
+groove-mesher adds a random hex id to its file names, which is dropped:
+
+    baked_mesh_1f3a9c.usdc           -> baked_mesh.usdc
+    0/baked_mesh_1f3a9c_tex0.png     -> 0/baked_mesh_tex0.png
+
+Readers that can take bytes instead of a file use MappedUsdz: the package is
+memory-mapped, its central directory indexed once, and since USDZ members are
+stored uncompressed (and 64-byte aligned) each member is a zero-copy memoryview
+of the mapping.
+
+The final model (baked_mesh.usda + baked_mesh_tex0.png, read by cleanup.py) is
+moved out of final_usdz_files under the same canonical names. Only these loose
+files are supported: they are step 1's declared outputs and step 2's inputs in
+pipeline_runner.py.
+
+Usage:
+    python3 usdz_archive.py list photogrammetry/preview.usdz
+    python3 usdz_archive.py extract photogrammetry/preview.usdz [--dest DIR] [--kinds layer texture]
+    python3 usdz_archive.py final-model photogrammetry/
+"""
+
+import argparse
+import io
+import mmap
+import os
+import posixpath
+import re
+import shutil
+import struct
+import sys
+import zipfile
+from typing import Dict, Iterable, List, Optional, Tuple
+
+COPY_BUFFER = 4 * 1024 * 1024
+RANDOM_ID_PATTERN = re.compile(r'_[a-f0-9]+(?=\.|_)')  # groove-mesher's id, as in baked_mesh_1f3a9c_tex0.png
+MEMBER_KINDS = {
+    'layer': ('.usdc', '.usda', '.usd'),
+    'texture': ('.png', '.jpg', '.jpeg', '.exr'),
+}
+PREVIEW_FILENAME = 'preview.usdz'
+FINAL_LAYER = 'baked_mesh.usda'
+FINAL_TEXTURE = 'baked_mesh_tex0.png'
+LOCAL_HEADER = struct.Struct('<4s5H3I2H')  # zip local file header; name/extra lengths are the last two fields
+
+
+def canonical_name(name) -> str:
+    """Member or file name without groove-mesher's random id (directories are kept)."""
+    folder, base = posixpath.split(name)
+    return posixpath.join(folder, RANDOM_ID_PATTERN.sub('', base))
+
+
+def member_kind(name) -> Optional[str]:
+    """'layer', 'texture' or None for a member name."""
+    suffix = posixpath.splitext(name)[1].lower()
+    return next((kind for kind, suffixes in MEMBER_KINDS.items() if suffix in suffixes), None)
+
+
+class UsdzArchive:
+    """
+    A USDZ package opened in place (use as a context manager).
+
+    Args:
+        path: Path to the .usdz file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    def members(self, kinds: Optional[Iterable[str]] = None) -> List[zipfile.ZipInfo]:
+        """File members in package order, only those of the given kinds if kinds is set."""
+        kinds = set(kinds) if kinds is not None else None
+        return [info for info in self._zip.infolist() if not info.is_dir()
+                and (kinds is None or member_kind(info.filename) in kinds)]
+
+    def root_layer(self) -> Optional[zipfile.ZipInfo]:
+        """The package's default layer (by the USDZ spec, the first layer in the archive)."""
+        return next(iter(self.members(['layer'])), None)
+
+    def extract(self, member, dest_path) -> int:
+        """
+        Stream one member to dest_path (written next to it, then renamed into place).
+
+        Args:
+            member: ZipInfo or member name
+            dest_path: File to write
+
+        Returns:
+            int: Bytes written
+        """
+        info = member if isinstance(member, zipfile.ZipInfo) else self._zip.getinfo(member)
+        os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+        part_path = dest_path + '.part'
+        with self._zip.open(info) as source, open(part_path, 'wb') as target:
+            shutil.copyfileobj(source, target, COPY_BUFFER)
+        os.replace(part_path, dest_path)
+        return info.file_size
+
+    def extract_canonical(self, dest_dir, kinds: Iterable[str] = ('layer', 'texture')) -> Dict[str, str]:
+        """
+        Extract the members of the given kinds under their canonical names.
+
+        Returns:
+            dict: Canonical member name -> extracted path
+        """
+        extracted = {}
+        root = os.path.abspath(dest_dir)
+        for info in self.members(kinds):
+            name = canonical_name(info.filename)
+            dest_path = os.path.abspath(os.path.join(root, *name.split('/')))
+            if os.path.commonpath([root, dest_path]) != root:
+                raise ValueError(f"{self.path}: member {info.filename} points outside {dest_dir}")
+            self.extract(info, dest_path)
+            extracted[name] = dest_path
+        return extracted
+
+
+class _MemberReader(io.RawIOBase):
+    """Seekable read-only file object over a member's memoryview (no temporary file, no copy)."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = max(0, min(len(buffer), len(self._view) - self._position))
+        buffer[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+class MappedUsdz:
+    """
+    A USDZ package memory-mapped read-only, its members exposed as zero-copy memoryviews
+    (use as a context manager; views handed out stay valid until they are released).
+
+    Args:
+        path: Path to the .usdz file
+
+    Raises:
+        ValueError: A member is compressed (not a valid USDZ; use UsdzArchive)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with zipfile.ZipFile(path) as package:  # central directory, read once
+            infos = [info for info in package.infolist() if not info.is_dir()]
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self.index: Dict[str, Tuple[int, int]] = {}
+        for info in infos:
+            if info.compress_type != zipfile.ZIP_STORED:
+                self.close()
+                raise ValueError(f"{path}: member {info.filename} is compressed")
+            header = LOCAL_HEADER.unpack_from(self._map, info.header_offset)
+            start = info.header_offset + LOCAL_HEADER.size + header[-2] + header[-1]
+            self.index[info.filename] = (start, info.file_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:  # member views still in use; the mapping goes away with the last one
+            pass
+
+    def member(self, name) -> memoryview:
+        """The member's bytes as a memoryview of the mapping (KeyError if there is no such member)."""
+        start, size = self.index[name]
+        return self._view[start:start + size]
+
+    def open(self, name) -> io.BufferedReader:
+        """The member as a read-only, seekable file object."""
+        return io.BufferedReader(_MemberReader(self.member(name)), COPY_BUFFER)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ FINAL MODEL ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def publish_final_model(final_dir, output_dir, log=print) -> List[str]:
+    """
+    Move groove-mesher's final model files into output_dir under canonical names (one pass).
+
+    Returns:
+        list: Paths written in output_dir
+    """
+    moved = []
+    for name in sorted(os.listdir(final_dir)):
+        source = os.path.join(final_dir, name)
+        dest = os.path.join(output_dir, canonical_name(name))
+        log(f"Moving {source} to {dest}")
+        shutil.move(source, dest)
+        moved.append(dest)
+    return moved
+
+
+def final_model(photogrammetry_dir) -> Tuple[str, str]:
+    """Paths of the final model's USD layer and texture (baked_mesh.usda, baked_mesh_tex0.png)."""
+    return os.path.join(photogrammetry_dir, FINAL_LAYER), os.path.join(photogrammetry_dir, FINAL_TEXTURE)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def main():
+    parser = argparse.ArgumentParser(description="Selective USDZ extraction")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help="List the members of a USDZ")
+    list_parser.add_argument('usdz', help="Path to the .usdz file")
+
+    extract_parser = subparsers.add_parser('extract', help="Extract members under canonical names")
+    extract_parser.add_argument('usdz', help="Path to the .usdz file")
+    extract_parser.add_argument('--dest', help="Destination folder (default: the folder of the .usdz)")
+    extract_parser.add_argument('--kinds', nargs='+', default=['layer', 'texture'], choices=sorted(MEMBER_KINDS))
+
+    final_parser = subparsers.add_parser('final-model', help="Show the final model's layer and texture")
+    final_parser.add_argument('photogrammetry_dir', help="The scan's photogrammetry folder")
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'list':
+            with UsdzArchive(args.usdz) as archive:
+                for info in archive.members():
+                    print(f"{info.file_size:>12}  {member_kind(info.filename) or '-':<8} {info.filename}"
+                          f"  -> {canonical_name(info.filename)}")
+        elif args.command == 'extract':
+            with UsdzArchive(args.usdz) as archive:
+                extracted = archive.extract_canonical(args.dest or os.path.dirname(os.path.abspath(args.usdz)),
+                                                      args.kinds)
+            for path in extracted.values():
+                print(f"📦 {path}")
+        elif args.command == 'final-model':
+            layer, texture = final_model(args.photogrammetry_dir)
+            print(f"layer:   {layer}{'' if os.path.exists(layer) else ' (missing)'}")
+            print(f"texture: {texture}{'' if os.path.exists(texture) else ' (missing)'}")
+    except (OSError, zipfile.BadZipFile, KeyError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Multi-machine work distribution for the scanner mesh processing pipeline.
+
+One coordinator owns the job queue (job_queue.py, on its local disk) and hands scans
+to worker nodes over TCP; every processing machine runs a worker that pulls scans
+while it has free slots and runs them with its own environment's paths (config.json
+"server", "local", ...), all pointing at the shared takes volume.
+
+    lease      - a claimed scan belongs to its worker for `lease_seconds`
+    heartbeat  - the worker renews the lease every third of it while the scan runs and
+                 learns about preempt/pause/cancel requests in the reply
+    requeue    - a scan whose lease expired (crashed, rebooted or unplugged worker) goes
+                 back to the queue and resumes from its last completed step on the next
+                 worker; after `max_attempts` claims it is marked failed
+    preempt    - when no worker takes a rush scan within a few polls (every slot busy),
+                 the lowest priority running scan yields at its next step boundary
+
+Protocol: one newline-terminated JSON request per connection, answered with one
+newline-terminated JSON response (as blender_worker.py).
+
+    {"op": "claim", "worker": "host:pid", "slots": 2}
+    {"op": "heartbeat", "worker": "host:pid", "job_id": 7, "progress": "step 1: generate_mesh"}
+    {"op": "finish", "worker": "host:pid", "job_id": 7, "outcome": "done"}
+    {"op": "submit", "scan_id": "X", "priority": "rush"} | {"op": "status"} | {"op": "ping"}
+
+Usage:
+    python3 work_coordinator.py serve --port 5700                       # on the coordinator machine
+    python3 work_coordinator.py worker --coordinator server:5700 -e local  # on every processing machine
+    python3 work_coordinator.py submit --coordinator server:5700 scan_a scan_b [--priority rush]
+    python3 work_coordinator.py status --coordinator server:5700
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import job_queue
+from blender_worker import parse_address, receive_message, send_message
+
+DEFAULT_PORT = 5700
+DEFAULT_SETTINGS = {
+    'address': f"127.0.0.1:{DEFAULT_PORT}",
+    'bind': '0.0.0.0',
+    'lease_seconds': 60,
+    'max_attempts': 3,
+}
+# A rush scan still queued after this many worker polls means every slot is busy
+PREEMPT_AFTER_POLLS = 3
+
+
+def coordinator_settings(config):
+    """Coordinator settings from the 'coordinator' section of config.json."""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get_section('coordinator'))
+    return settings
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ COORDINATOR ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            request = receive_message(self.request)
+        except (OSError, ValueError) as e:
+            print(f"work_coordinator: bad request from {self.client_address[0]}: {e}", flush=True)
+            return
+        if request is None:
+            return
+        try:
+            response = self.server.coordinator.handle(request, self.client_address[0])
+        except Exception as e:
+            response = {'status': 'error', 'error': str(e)}
+        try:
+            send_message(self.request, response)
+        except OSError:
+            pass
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class Coordinator:
+    """
+    Serves the job queue to worker nodes.
+
+    Args:
+        queue_path: Job queue database (keep it on the coordinator's local disk)
+        settings: Coordinator settings (DEFAULT_SETTINGS)
+        queue_settings: Job queue settings (job_queue.DEFAULT_SETTINGS)
+    """
+
+    def __init__(self, queue_path, settings=None, queue_settings=None):
+        self.queue_path = queue_path
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings or {})
+        self.queue_settings = dict(job_queue.DEFAULT_SETTINGS)
+        self.queue_settings.update(queue_settings or {})
+        self.lease_s = float(self.settings['lease_seconds'])
+        self.workers = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.server = None
+
+    def _jobs(self) -> job_queue.JobQueue:
+        """This thread's connection to the queue."""
+        if getattr(self._local, 'jobs', None) is None:
+            self._local.jobs = job_queue.JobQueue(self.queue_path, self.queue_settings['aging_minutes'])
+        return self._local.jobs
+
+    def _seen(self, worker, address, request):
+        with self._lock:
+            info = self.workers.setdefault(worker, {'worker': worker, 'address': address, 'claims': 0})
+            info['last_seen'] = time.time()
+            if 'slots' in request:
+                info['slots'] = request['slots']
+            if request.get('op') == 'claim':
+                info['claims'] += 1
+
+    def handle(self, request, address=''):
+        op = request.get('op')
+        worker = request.get('worker')
+        if worker and op in ('claim', 'heartbeat', 'finish'):
+            self._seen(worker, address, request)
+        jobs = self._jobs()
+
+        if op == 'ping':
+            return {'status': 'ok', 'pid': os.getpid()}
+        if op == 'claim':
+            if not worker:
+                return {'status': 'error', 'error': 'claim needs a worker id'}
+            job = jobs.claim(worker, self.lease_s)
+            if job is not None:
+                print(f"📤 [{job['scan_id']}] → {worker} (attempt {job['attempts'] + 1})", flush=True)
+            return {'status': 'ok', 'job': dict(job) if job else None, 'lease_s': self.lease_s}
+        if op == 'heartbeat':
+            interrupt = jobs.renew(request['job_id'], worker, self.lease_s, request.get('progress'))
+            if interrupt is None:
+                return {'status': 'lost'}
+            return {'status': 'ok', 'interrupt': interrupt}
+        if op == 'finish':
+            if not jobs.finish(request['job_id'], request.get('outcome', 'failed'), owner=worker):
+                return {'status': 'lost'}
+            print(f"📥 job {request['job_id']} {request.get('outcome')} on {worker}", flush=True)
+            return {'status': 'ok'}
+        if op == 'submit':
+            job_id = jobs.submit(request['scan_id'], request.get('priority', 0), request.get('predicted_s', 0.0))
+            return {'status': 'ok', 'job_id': job_id}
+        if op == 'status':
+            with self._lock:
+                workers = [dict(info) for info in self.workers.values()]
+            states = job_queue.OPEN_STATES + (job_queue.FINAL_STATES if request.get('all') else ())
+            return {'status': 'ok', 'queued': jobs.queued_count(), 'workers': workers,
+                    'jobs': [dict(job) for job in jobs.jobs(states)]}
+        return {'status': 'error', 'error': f"unknown op '{op}'"}
+
+    # MAINTENANCE
+    def maintain(self):
+        """Requeue expired leases and preempt for rush scans nobody could take."""
+        jobs = self._jobs()
+        for scan_id, owner, state in jobs.requeue_expired(int(self.settings['max_attempts'])):
+            print(f"♻️  [{scan_id}] lease expired on {owner} → {state}", flush=True)
+
+        head = jobs.head()
+        if head is None or time.time() - head['enqueued_at'] < PREEMPT_AFTER_POLLS * self.queue_settings['poll_interval']:
+            return
+        running = jobs.jobs(('running',))
+        if any(job['interrupt'] for job in running):
+            return  # one interrupt at a time; its slot goes to the head once it yields
+        victims = [job for job in running if job['priority'] + self.queue_settings['preempt_margin'] <= head['priority']]
+        if victims:
+            victim = min(victims, key=lambda job: (job['priority'], -job['started_at']))
+            jobs.request_interrupt(victim['job_id'], 'preempt')
+            print(f"⏸️  [{victim['scan_id']}] on {victim['owner']} preempted for {head['scan_id']} "
+                  f"(priority {head['priority']})", flush=True)
+
+    def _maintain_loop(self):
+        interval = min(self.lease_s / 3, self.queue_settings['poll_interval'])
+        while not self._stop.wait(interval):
+            try:
+                self.maintain()
+            except Exception as e:
+                print(f"work_coordinator: maintenance failed: {e}", flush=True)
+
+    def serve(self, host=None, port=DEFAULT_PORT):
+        self.server = _Server((host or self.settings['bind'], port), _RequestHandler)
+        self.server.coordinator = self
+        bound_host, bound_port = self.server.server_address[:2]
+        print(f"work_coordinator: listening on {bound_host}:{bound_port} (queue {self.queue_path}, "
+              f"lease {self.lease_s:g}s, pid {os.getpid()})", flush=True)
+        maintainer = threading.Thread(target=self._maintain_loop, name="coordinator-maintenance", daemon=True)
+        maintainer.start()
+        try:
+            self.server.serve_forever(poll_interval=0.5)
+        finally:
+            self._stop.set()
+            self.server.server_close()
+
+    def shutdown(self, *_):
+        self._stop.set()
+        if self.server is not None:
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ WORKER ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+class CoordinatorClient:
+    """
+    Connection to a coordinator with the job queue interface ScanScheduler uses
+    (claim, interrupt_requested, set_progress, finish, ...), so a scheduler given
+    `queue_factory=lambda: client` becomes a worker node. Claimed jobs are kept
+    alive by a heartbeat thread.
+
+    Args:
+        address: (host, port) tuple or 'host:port' string
+        worker_id: Identifies this node to the coordinator (default: host:pid)
+        slots: Scans this node runs at once (reported to the coordinator)
+    """
+
+    def __init__(self, address, worker_id=None, slots=0):
+        self.address = parse_address(address) if isinstance(address, str) else tuple(address)
+        self.worker_id = worker_id or job_queue.owner_id()
+        self.slots = slots
+        self.lease_s = float(DEFAULT_SETTINGS['lease_seconds'])
+        self._leases = {}  # job_id -> {'interrupt': str, 'progress': str}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+        self._unreachable = False
+
+    def _request(self, op, timeout=10.0, **fields):
+        message = {'op': op, 'worker': self.worker_id, **fields}
+        with socket.create_connection(self.address, timeout=timeout) as sock:
+            sock.settimeout(timeout)
+            send_message(sock, message)
+            response = receive_message(sock)
+        if response is None:
+            raise ConnectionError(f"coordinator {self.address[0]}:{self.address[1]} closed the connection")
+        if response.get('status') == 'error':
+            raise RuntimeError(response.get('error', 'coordinator error'))
+        return response
+
+    def _reachable(self, error=None):
+        """Report the coordinator going away / coming back once, not on every poll."""
+        if error is not None and not self._unreachable:
+            print(f"WARNING: coordinator {self.address[0]}:{self.address[1]} unreachable: {error}", flush=True)
+        elif error is None and self._unreachable:
+            print(f"🔌 coordinator {self.address[0]}:{self.address[1]} reachable again", flush=True)
+        self._unreachable = error is not None
+
+    # JOB QUEUE INTERFACE
+    def claim(self, owner=None):
+        try:
+            response = self._request('claim', slots=self.slots)
+        except (OSError, ValueError, RuntimeError) as e:
+            self._reachable(e)
+            return None
+        self._reachable()
+        job = response.get('job')
+        if job is None:
+            return None
+        self.lease_s = float(response.get('lease_s', self.lease_s))
+        with self._lock:
+            self._leases[job['job_id']] = {'interrupt': '', 'progress': None}
+        self._start_heartbeat()
+        return job
+
+    def head(self):
+        return None  # the coordinator preempts across all nodes
+
+    def recover(self):
+        return []  # expired leases are requeued by the coordinator
+
+    def queued_count(self) -> int:
+        try:
+            return int(self._request('status').get('queued', 0))
+        except (OSError, ValueError, RuntimeError):
+            return 0
+
+    def interrupt_requested(self, job_id) -> str:
+        with self._lock:
+            lease = self._leases.get(job_id)
+        return lease['interrupt'] if lease else 'cancel'
+
+    def set_progress(self, job_id, progress):
+        with self._lock:
+            if job_id in self._leases:
+                self._leases[job_id]['progress'] = progress
+
+    def finish(self, job_id, outcome) -> bool:
+        with self._lock:
+            self._leases.pop(job_id, None)
+        for attempt in range(3):
+            try:
+                return self._request('finish', job_id=job_id, outcome=outcome).get('status') == 'ok'
+            except (OSError, ValueError, RuntimeError) as e:
+                self._reachable(e)
+                time.sleep(2 ** attempt)
+        # the lease runs out and the scan is requeued; its finished steps are skipped on the rerun
+        return False
+
+    def submit(self, scan_id, priority=0, predicted_s=0.0):
+        return self._request('submit', scan_id=scan_id, priority=priority, predicted_s=predicted_s).get('job_id')
+
+    def status(self, include_finished=False):
+        return self._request('status', all=include_finished)
+
+    def close(self):
+        pass  # connections are per request; shutdown() stops the heartbeats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # HEARTBEATS
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="coordinator-heartbeat",
+                                                   daemon=True)
+                self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.lease_s / 3):
+            with self._lock:
+                leases = {job_id: dict(lease) for job_id, lease in self._leases.items()}
+            for job_id, lease in leases.items():
+                try:
+                    response = self._request('heartbeat', job_id=job_id, progress=lease['progress'])
+                except (OSError, ValueError, RuntimeError) as e:
+                    self._reachable(e)
+                    continue
+                self._reachable()
+                with self._lock:
+                    if job_id not in self._leases:
+                        continue
+                    if response.get('status') == 'lost':
+                        # another worker may own the scan now; stop at the next step boundary
+                        print(f"WARNING: lease on job {job_id} lost; stopping at the next step", flush=True)
+                        self._leases[job_id]['interrupt'] = 'cancel'
+                    else:
+                        self._leases[job_id]['interrupt'] = response.get('interrupt', '')
+
+    def shutdown(self):
+        self._stop.set()
+
+
+def print_status(response):
+    workers = response.get('workers', [])
+    print(f"🖥️  {len(workers)} worker(s), {response.get('queued', 0)} scan(s) queued")
+    for info in sorted(workers, key=lambda w: w['worker']):
+        running = [job['scan_id'] for job in response.get('jobs', [])
+                   if job['state'] == 'running' and job['owner'] == info['worker']]
+        age = time.time() - info.get('last_seen', 0)
+        print(f"   • {info['worker']:<30} slots {info.get('slots', '?')}  seen {age:.0f}s ago"
+              f"  running: {', '.join(running) or '-'}")
+    print("")
+    job_queue.print_jobs(response.get('jobs', []), as_json=False)
+
+
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ CLI ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+# ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬
+
+def run_worker(config, args, address):
+    """Run scans pulled from the coordinator until interrupted."""
+    from scan_scheduler import build_scheduler
+
+    client = CoordinatorClient(address, args.worker_id)
+    scheduler, blender_pool = build_scheduler(config, args, queue_factory=lambda: client)
+    client.slots = scheduler.max_active_scans
+    print(f"🛠️  Worker {client.worker_id} → coordinator {address} | limits: {scheduler.resources.limits} "
+          f"| max active scans: {scheduler.max_active_scans}", flush=True)
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    try:
+        if blender_pool:
+            blender_pool.start()
+        scheduler.start()
+        stopping.wait()
+    finally:
+        print("⏳ Waiting for active scans to finish...", flush=True)
+        scheduler.stop(wait=True)
+        client.shutdown()
+        if blender_pool:
+            blender_pool.close()
+
+
+def main():
+    from scan_scheduler import add_scheduler_arguments
+
+    parser = argparse.ArgumentParser(description="Distribute scans across processing machines")
+    parser.add_argument('command', choices=['serve', 'worker', 'submit', 'status'])
+    parser.add_argument('scan_ids', nargs='*', help="submit: scan identifier(s)")
+    parser.add_argument('--coordinator', help="Coordinator host:port (default: coordinator.address in config.json)")
+    parser.add_argument('--port', type=int, help=f"serve: port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--bind', help="serve: interface to listen on (default: coordinator.bind)")
+    parser.add_argument('--lease', type=float, help="serve: lease seconds (default: coordinator.lease_seconds)")
+    parser.add_argument('--worker-id', help="worker: name reported to the coordinator (default: host:pid)")
+    parser.add_argument('--priority', default='normal', help="submit: integer or rush/high/normal/low")
+    parser.add_argument('--all', action='store_true', help="status: include finished jobs")
+    parser.add_argument('--json', action='store_true', help="status: print JSON")
+    add_scheduler_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        from config_reader import get_config
+        config = get_config(args.environment)
+        settings = coordinator_settings(config)
+        address = args.coordinator or settings['address']
+    except (ValueError, KeyError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.command == 'serve':
+        if args.lease:
+            settings['lease_seconds'] = args.lease
+        takes_path = args.takes or config.takes_path
+        coordinator = Coordinator(job_queue.queue_path(takes_path), settings, job_queue.queue_settings(config))
+        signal.signal(signal.SIGTERM, coordinator.shutdown)
+        signal.signal(signal.SIGINT, coordinator.shutdown)
+        coordinator.serve(args.bind, args.port or parse_address(address)[1])
+    elif args.command == 'worker':
+        run_worker(config, args, address)
+    else:
+        client = CoordinatorClient(address)
+        try:
+            if args.command == 'submit':
+                if not args.scan_ids:
+                    parser.error("submit needs scan IDs")
+                for scan_id in args.scan_ids:
+                    job_id = client.submit(scan_id, job_queue.parse_priority(args.priority))
+                    print(f"📥 Queued {scan_id} (job {job_id})" if job_id else f"⚠️  {scan_id} is already queued")
+            else:
+                response = client.status(args.all)
+                if args.json:
+                    print(json.dumps(response, indent=2))
+                else:
+                    print_status(response)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"Error: coordinator {address}: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()